@@ -0,0 +1,261 @@
+"""阈值 / 止盈止损参数的自适应搜索（逐级减半 + 好区域附近补充候选）。
+
+第 0 级所有候选只回测种子数据最近的一小段，按得分保留前 1/eta 进入下一级；每一级窗口按 eta 倍向前延长，
+最后一级为完整窗口，因此最终排名与全量网格对同一批候选的排名同口径。第 0 级之后在得分最高的候选之间取中点补充
+少量新候选（proposals），它们同样从第 0 级开始筛选。评估函数与 iter_sweep 同签名，可换成 lockstep 引擎。
+"""
+import math
+import time
+
+import numpy as np
+
+from backtest.sweep import iter_sweep
+from utils.utils import log_info
+
+
+def rung_row_counts(total_rows, rungs=3, eta=3, min_rows=0):
+    """每一级回测的行数：最后一级为全量，往前每级缩小 eta 倍，不少于 min_rows；相同行数的级会合并。"""
+    total_rows = int(total_rows)
+    eta = max(2, int(eta))
+    counts = []
+    for level in range(max(1, int(rungs)) - 1, -1, -1):
+        rows = min(total_rows, max(int(min_rows), math.ceil(total_rows / eta ** level)))
+        if not counts or rows > counts[-1]:
+            counts.append(rows)
+    return counts
+
+
+def _candidate_pair(candidate):
+    if isinstance(candidate, dict):
+        return candidate.get("name"), dict(candidate.get("overrides") or {})
+    name, overrides = candidate
+    return name, dict(overrides)
+
+
+def _overrides_key(overrides):
+    return tuple(
+        sorted(
+            (key, round(float(value), 8) if isinstance(value, (int, float)) and not isinstance(value, bool) else repr(value))
+            for key, value in overrides.items()
+        )
+    )
+
+
+def midpoint_proposals(ranked, existing_keys, limit, derive=None):
+    """在得分最高的候选与其后几名之间取数值覆盖项的中点，生成至多 limit 个新候选。
+
+    ranked 为按得分降序的 (name, overrides)；非数值覆盖项沿用最优候选；derive(overrides) 可按调用方规则
+    重新推导依赖项（如最小调仓金额）。与 existing_keys 重复的中点跳过。
+    """
+    proposals = []
+    if limit <= 0 or len(ranked) < 2:
+        return proposals
+    seen = set(existing_keys)
+    best_name, best_overrides = ranked[0]
+    for other_name, other_overrides in ranked[1:]:
+        merged = {}
+        for key, value in best_overrides.items():
+            other = other_overrides.get(key, value)
+            numeric = all(
+                isinstance(item, (int, float)) and not isinstance(item, bool)
+                for item in (value, other)
+            )
+            merged[key] = (float(value) + float(other)) / 2.0 if numeric else value
+        if derive is not None:
+            merged = derive(merged)
+        key = _overrides_key(merged)
+        if key in seen:
+            continue
+        seen.add(key)
+        proposals.append((f"mid_{best_name}_{other_name}", merged))
+        if len(proposals) >= limit:
+            break
+    return proposals
+
+
+def _run_rung(backtester_kwargs, rows, entries, evaluate):
+    data = backtester_kwargs["precomputed_data"]
+    rung_kwargs = {**backtester_kwargs, "precomputed_data": data.iloc[len(data) - rows:]}
+    by_name = {entry["name"]: entry for entry in entries}
+    evaluated = 0
+    for name, _, summary in evaluate(rung_kwargs, [(entry["name"], entry["overrides"]) for entry in entries]):
+        by_name[name]["summaries"].append(summary)
+        evaluated += 1
+    return evaluated
+
+
+def successive_halving_sweep(
+    backtester_kwargs,
+    candidates,
+    *,
+    score,
+    evaluate=None,
+    eta=3,
+    rungs=3,
+    min_rows=0,
+    proposals=0,
+    derive=None,
+    keep=(),
+):
+    """按窗口长度逐级减半地评估候选，返回最后一级（完整窗口）的结果及节省的回测量。
+
+    score(summary) 返回可比较的得分（越大越好）；evaluate(backtester_kwargs, candidates) 按候选顺序产出
+    (name, overrides, summary)，默认 iter_sweep。keep 中的候选名（如 current）每一级都保留，便于与最优候选对比。
+    """
+    evaluate = evaluate or iter_sweep
+    eta = max(2, int(eta))
+    total_rows = len(backtester_kwargs["precomputed_data"])
+    row_counts = rung_row_counts(total_rows, rungs, eta, min_rows)
+    pinned = set(keep or ())
+
+    entries = []
+    seen = set()
+    for candidate in candidates:
+        name, overrides = _candidate_pair(candidate)
+        key = _overrides_key(overrides)
+        if key in seen:
+            continue
+        seen.add(key)
+        entries.append({"name": name, "overrides": overrides, "summaries": [], "status": "running", "proposed": False})
+    grid_count = len(entries)
+    log_info(
+        "自适应参数搜索: "
+        f"candidates={grid_count} eta={eta} rung_rows={row_counts} proposals={int(proposals)}"
+    )
+
+    started = time.perf_counter()
+    evaluations = 0
+    bar_evaluations = 0
+    rung_summaries = []
+    survivors = list(entries)
+    for rung, rows in enumerate(row_counts):
+        evaluated = _run_rung(backtester_kwargs, rows, survivors, evaluate)
+        if rung == 0 and proposals > 0:
+            ranked = sorted(survivors, key=lambda entry: score(entry["summaries"][-1]), reverse=True)
+            new_entries = [
+                {"name": name, "overrides": overrides, "summaries": [], "status": "running", "proposed": True}
+                for name, overrides in midpoint_proposals(
+                    [(entry["name"], entry["overrides"]) for entry in ranked],
+                    seen,
+                    int(proposals),
+                    derive=derive,
+                )
+            ]
+            if new_entries:
+                seen.update(_overrides_key(entry["overrides"]) for entry in new_entries)
+                evaluated += _run_rung(backtester_kwargs, rows, new_entries, evaluate)
+                entries.extend(new_entries)
+                survivors.extend(new_entries)
+        evaluations += evaluated
+        bar_evaluations += evaluated * rows
+
+        survivors.sort(key=lambda entry: score(entry["summaries"][-1]), reverse=True)
+        last_rung = rung == len(row_counts) - 1
+        keep_count = len(survivors) if last_rung else max(1, math.ceil(len(survivors) / eta))
+        kept = survivors[:keep_count] + [entry for entry in survivors[keep_count:] if entry["name"] in pinned]
+        kept_ids = {id(entry) for entry in kept}
+        for entry in survivors:
+            if id(entry) not in kept_ids:
+                entry["status"] = "pruned"
+                entry["pruned_after_rows"] = int(rows)
+        survivors = kept
+        rung_summaries.append({
+            "rung": rung,
+            "rows": int(rows),
+            "evaluated": int(evaluated),
+            "kept": len(survivors),
+            "best": survivors[0]["name"],
+        })
+        log_info(
+            "自适应参数搜索进度: "
+            f"rung={rung} rows={rows} evaluated={evaluated} kept={len(survivors)} best={survivors[0]['name']}"
+        )
+
+    for entry in survivors:
+        entry["status"] = "completed"
+    results = []
+    for entry in survivors:
+        summary = dict(entry["summaries"][-1])
+        summary["name"] = entry["name"]
+        summary["overrides"] = entry["overrides"]
+        results.append(summary)
+
+    full_grid_bar_evaluations = grid_count * total_rows
+    return {
+        "eta": eta,
+        "rung_rows": row_counts,
+        "rungs": rung_summaries,
+        "candidate_count": grid_count,
+        "proposed_count": sum(entry["proposed"] for entry in entries),
+        "evaluations": int(evaluations),
+        "bar_evaluations": int(bar_evaluations),
+        "full_grid_bar_evaluations": int(full_grid_bar_evaluations),
+        "full_window_equivalents": round(bar_evaluations / max(1, total_rows), 2),
+        "saved_pct": round(100.0 * (1.0 - bar_evaluations / max(1, full_grid_bar_evaluations)), 2),
+        "elapsed_sec": round(time.perf_counter() - started, 3),
+        "results": results,
+        "screening_summaries": {entry["name"]: entry["summaries"][0] for entry in entries},
+        "statuses": {entry["name"]: entry["status"] for entry in entries},
+    }
+
+
+def _average_ranks(values, score):
+    """按得分降序给出名次（1 为最好），并列取平均名次。"""
+    order = sorted(range(len(values)), key=lambda index: score(values[index]), reverse=True)
+    ranks = [0.0] * len(values)
+    start = 0
+    while start < len(order):
+        end = start
+        while end + 1 < len(order) and score(values[order[end + 1]]) == score(values[order[start]]):
+            end += 1
+        for position in range(start, end + 1):
+            ranks[order[position]] = (start + end) / 2.0 + 1.0
+        start = end + 1
+    return ranks
+
+
+def spearman_rank_correlation(left, right):
+    if len(left) < 2:
+        return None
+    left = np.asarray(left, dtype=float)
+    right = np.asarray(right, dtype=float)
+    if np.std(left) == 0.0 or np.std(right) == 0.0:
+        return None
+    return float(np.corrcoef(left, right)[0, 1])
+
+
+def compare_with_exhaustive(search, exhaustive, score):
+    """与全量网格（每个候选完整窗口回测）对比：最终选择在全量排名中的位置，以及第 0 级筛选排名与全量排名的相关性。
+
+    exhaustive 为带 name 的完整窗口 summary 列表；最终选择若是补充候选（不在网格内），按其完整窗口得分插入全量排名。
+    """
+    exhaustive_ranks = dict(zip(
+        [item["name"] for item in exhaustive],
+        _average_ranks(exhaustive, score),
+    ))
+    screening = search.get("screening_summaries") or {}
+    screened = [name for name in screening if name in exhaustive_ranks]
+    screening_ranks = _average_ranks([screening[name] for name in screened], score)
+    exhaustive_best = max(exhaustive, key=score) if exhaustive else None
+    pick = search["results"][0] if search.get("results") else None
+    pick_rank = None
+    if pick is not None and exhaustive:
+        pick_rank = 1 + sum(score(item) > score(pick) for item in exhaustive if item["name"] != pick["name"])
+    return {
+        "pick": pick["name"] if pick is not None else None,
+        "pick_exhaustive_rank": pick_rank,
+        "pick_exhaustive_percentile": (
+            round(100.0 * (1.0 - (pick_rank - 1) / len(exhaustive)), 2)
+            if pick_rank is not None
+            else None
+        ),
+        "exhaustive_best": exhaustive_best["name"] if exhaustive_best is not None else None,
+        "pick_at_least_exhaustive_best": bool(
+            pick is not None and exhaustive_best is not None and score(pick) >= score(exhaustive_best)
+        ),
+        "screening_spearman": spearman_rank_correlation(
+            screening_ranks,
+            [exhaustive_ranks[name] for name in screened],
+        ),
+        "exhaustive_count": len(exhaustive),
+    }
@@ -0,0 +1,849 @@
+"""数组化回测引擎。
+
+Backtester.run_backtest 逐 bar 用 iloc 取行、重新推导趋势/regime 字典、调用 StrategyCore.on_bar 并记录十几组诊断，
+参数扫描要把这套开销重复上百次。这里把与仓位状态无关的量（趋势/regime、自适应 TP/SL、目标仓位比例、
+各类入场拦截、动态风控缩放）一次性按列算成 NumPy 数组，再用只含标量状态的循环重放同一套决策状态机：
+开/平/调仓、bar 内 TP/SL、资金费、手续费和滑点。
+
+结果写回 Backtester 后复用其 _summary()，收益类指标与参考引擎同口径；逐 bar 的原因分布、概率分位等诊断不统计。
+check_parity 在同一份输入上分别跑两个引擎，对照交易记录和汇总指标。
+"""
+import math
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from backtest.backtest import resolve_intrabar_tp_sl
+from config import config
+from core.regime_filter import HIGH_VOL_REGIMES, TREND_REGIMES, derive_market_regimes
+from core.trend_filter import derive_trend_biases, derive_trend_gaps
+from utils.utils import log_error, log_info
+
+
+DIRECTION_NONE = 0
+DIRECTION_LONG = 1
+DIRECTION_SHORT = 2
+CLOSE_TAKE_PROFIT = 1
+CLOSE_STOP_LOSS = 2
+CLOSE_OTHER = 3
+PARITY_SUMMARY_KEYS = (
+    "final_equity",
+    "final_balance",
+    "max_drawdown_pct",
+    "trade_count",
+    "closed_trade_count",
+    "winning_trade_count",
+    "losing_trade_count",
+    "gross_profit",
+    "gross_loss",
+    "net_pnl_after_costs",
+    "fees_paid",
+    "slippage_cost",
+    "funding_pnl",
+    "funding_event_count",
+    "take_profit_count",
+    "stop_loss_count",
+    "ending_position",
+    "ending_entry_price",
+    "decision_action_counts",
+    "decision_trend_counts",
+    "decision_direction_counts",
+    "decision_regime_counts",
+    "decision_regime_signal_summary",
+    "closed_trade_attribution",
+)
+
+
+def _numeric(frame, column):
+    return pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype=float)
+
+
+def target_ratios(position_manager, probs, money_flow_ratio, volatility, reward_risk):
+    """PositionManager.calculate_target_ratio 的按列版本；最后的 round 逐个用 Python round，保证逐位一致。"""
+    pm = position_manager
+    probs = np.asarray(probs, dtype=float)
+    denominator = max(1e-9, 1.0 - pm.probability_center)
+    strength = np.clip((np.clip(probs, 0.0, 1.0) - pm.probability_center) / denominator, 0.0, 1.0)
+    if reward_risk <= 0:
+        kelly = np.zeros_like(probs)
+    else:
+        kelly = np.clip(((probs * (reward_risk + 1)) - 1) / reward_risk, 0.0, 0.75)
+
+    money_flow = np.asarray(money_flow_ratio, dtype=float)
+    money_flow = np.where(np.isfinite(money_flow), money_flow, 1.0)
+    volatility = np.asarray(volatility, dtype=float)
+    target_vol = pm._target_vol()
+    volatility = np.where(np.isfinite(volatility) & (volatility > 0), volatility, target_vol)
+    money_flow_score = (np.clip(money_flow, 0.5, 1.5) - 0.5) / 1.0
+    volatility_score = np.minimum(1.0, target_vol / np.maximum(volatility, 1e-6))
+    score = np.clip(0.5 * probs + 0.25 * money_flow_score + 0.25 * volatility_score, 0.0, 1.0)
+
+    blended = pm.min_ratio + strength * (pm.max_ratio - pm.min_ratio)
+    final = blended * kelly * score
+    return np.asarray([round(value, 4) for value in final.tolist()], dtype=float)
+
+
+def risk_threshold_arrays(core, volatility, atr_ratio, regimes):
+    """StrategyCore.resolve_risk_thresholds 的按列版本，返回 (take_profit, stop_loss)。"""
+    size = len(regimes)
+    if not core.adaptive_tp_sl_enabled:
+        return np.full(size, core.take_profit), np.full(size, core.stop_loss)
+
+    def clean(values):
+        values = np.asarray(values, dtype=float)
+        return np.where(np.isfinite(values) & (values > 0), values, np.nan)
+
+    atr_ratio = clean(atr_ratio)
+    volatility = clean(volatility)
+    has_atr = np.isfinite(atr_ratio)
+    has_vol = np.isfinite(volatility)
+    take_profit = np.fmax(atr_ratio * core.atr_take_profit_multiplier, volatility * core.volatility_take_profit_multiplier)
+    stop_loss = np.fmax(atr_ratio * core.atr_stop_loss_multiplier, volatility * core.volatility_stop_loss_multiplier)
+    take_profit = np.where(has_atr | has_vol, take_profit, core.take_profit)
+    stop_loss = np.where(has_atr | has_vol, stop_loss, core.stop_loss)
+
+    stop_loss_floor = np.full(size, core.adaptive_stop_loss_min)
+    if core.regime_high_vol_stop_loss_min is not None:
+        high_vol = np.isin(regimes, list(HIGH_VOL_REGIMES))
+        stop_loss_floor = np.where(
+            high_vol,
+            max(core.adaptive_stop_loss_min, core.regime_high_vol_stop_loss_min),
+            stop_loss_floor,
+        )
+    stop_loss = np.minimum(np.maximum(stop_loss, stop_loss_floor), core.adaptive_stop_loss_max)
+    take_profit_floor = np.maximum(
+        max(core.adaptive_take_profit_min, core.estimated_round_trip_cost_ratio() * core.min_take_profit_cost_multiplier),
+        stop_loss * core.min_take_profit_to_stop_loss_ratio,
+    )
+    take_profit = np.clip(np.maximum(take_profit, take_profit_floor), core.adaptive_take_profit_min, core.adaptive_take_profit_max)
+    return take_profit, stop_loss
+
+
+def _regime_adjustment_arrays(core, regimes):
+    size = len(regimes)
+    bonus = np.zeros(size)
+    multiplier = np.ones(size)
+    min_target = np.full(size, core.min_signal_target_ratio)
+    if not core.regime_filter_enabled:
+        return bonus, multiplier, min_target
+    is_range = regimes == "range"
+    is_high_vol = np.isin(regimes, list(HIGH_VOL_REGIMES))
+    bonus = np.where(is_range, core.regime_range_threshold_bonus, np.where(is_high_vol, core.regime_high_vol_threshold_bonus, 0.0))
+    multiplier = np.where(
+        is_range,
+        core.regime_range_target_multiplier,
+        np.where(is_high_vol, core.regime_high_vol_target_multiplier, 1.0),
+    )
+    if core.regime_range_min_signal_target_ratio is not None:
+        min_target = np.where(is_range, core.regime_range_min_signal_target_ratio, min_target)
+    if core.regime_high_vol_min_signal_target_ratio is not None:
+        min_target = np.where(is_high_vol, core.regime_high_vol_min_signal_target_ratio, min_target)
+    return bonus, multiplier, min_target
+
+
+def _regime_blocked(core, directions, regimes):
+    """StrategyCore._regime_block_reason 是否拦截（DIRECTION_NONE 不拦截）。"""
+    if not core.regime_filter_enabled:
+        return np.zeros(len(regimes), dtype=bool)
+    allowed = np.select(
+        [regimes == "trend_long", regimes == "trend_short", regimes == "range", np.isin(regimes, list(HIGH_VOL_REGIMES))],
+        [directions == DIRECTION_LONG, directions == DIRECTION_SHORT, core.regime_range_allow_trades, core.regime_high_vol_allow_trades],
+        default=True,
+    )
+    blocked = (directions != DIRECTION_NONE) & ~allowed
+    if not core.regime_trend_against_block:
+        blocked &= ~np.isin(regimes, list(TREND_REGIMES))
+    return blocked
+
+
+def _long_entry_blocked(core, trend_biases, trend_gaps, money_flow_ratio, regimes, is_high_vol):
+    """StrategyCore._long_entry_guard_reason 是否拦截做多。"""
+    if not core.long_entry_guard_enabled:
+        return np.zeros(len(regimes), dtype=bool)
+    gap_abs = np.abs(trend_gaps)
+    required_gap = max(core.long_entry_min_trend_gap, core.long_entry_high_vol_gap_buffer)
+    required_gap = np.where(is_high_vol, max(required_gap, core.long_entry_high_vol_min_trend_gap), required_gap)
+    regime_high_vol = np.isin(regimes, list(HIGH_VOL_REGIMES))
+    blocked = (trend_biases != "long") | ~np.isfinite(gap_abs) | ((required_gap > 0) & (gap_abs < required_gap))
+    if core.long_entry_block_high_vol:
+        blocked |= regime_high_vol
+    if core.long_entry_overheat_guard_enabled and core.long_entry_overheat_money_flow_max > 0:
+        money_flow = np.asarray(money_flow_ratio, dtype=float)
+        blocked |= (
+            np.isfinite(money_flow)
+            & (money_flow > 0)
+            & (money_flow >= core.long_entry_overheat_money_flow_max)
+            & (is_high_vol | regime_high_vol)
+        )
+    return blocked
+
+
+def build_market_arrays(backtester):
+    """与候选参数无关的按 bar 输入：价格、概率、趋势/regime 上下文。
+
+    只取决于数据和趋势/regime 相关配置，参数扫描中同一组候选共用一份（见 backtest.lockstep_engine）。
+    """
+    settings = backtester.settings
+    data = backtester.data
+    signal = data.iloc[:-1]
+    executed = data.iloc[1:]
+
+    long_prob = _numeric(signal, "long_prob")
+    short_prob = _numeric(signal, "short_prob")
+    money_flow = _numeric(signal, "money_flow_ratio")
+    volatility = _numeric(signal, "volatility_15")
+    close_price = _numeric(signal, "5m_close")
+    if "5m_atr" in signal.columns:
+        atr_value = _numeric(signal, "5m_atr")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            atr_ratio = np.where(~np.isnan(atr_value) & (close_price > 0), atr_value / close_price, np.nan)
+    else:
+        atr_ratio = np.full(len(signal), np.nan)
+
+    trend_kwargs = {
+        "interval": settings.TREND_FILTER_INTERVAL,
+        "fast_col": settings.TREND_FILTER_FAST_COL,
+        "slow_col": settings.TREND_FILTER_SLOW_COL,
+    }
+    trend_biases = np.asarray(derive_trend_biases(signal, min_gap=settings.TREND_FILTER_MIN_GAP, **trend_kwargs))
+    trend_gaps = derive_trend_gaps(signal, **trend_kwargs)
+    regimes, is_high_vol = derive_market_regimes(
+        trend_biases=trend_biases,
+        trend_gaps=trend_gaps,
+        volatility=volatility,
+        atr_ratio=atr_ratio,
+        money_flow_ratio=money_flow,
+        trend_gap_threshold=settings.REGIME_TREND_GAP_THRESHOLD,
+        high_vol_atr_threshold=settings.REGIME_HIGH_VOL_ATR_THRESHOLD,
+        high_volatility_threshold=settings.REGIME_HIGH_VOLATILITY_THRESHOLD,
+        money_flow_extreme_threshold=settings.REGIME_MONEY_FLOW_EXTREME_THRESHOLD,
+    )
+    is_long = long_prob >= short_prob
+    exec_close = _numeric(executed, "5m_close")
+    return {
+        "labels": list(executed.index),
+        "valid": ~np.isnan(volatility),
+        "price": _numeric(executed, "5m_open") if "5m_open" in executed.columns else exec_close,
+        "high": _numeric(executed, "5m_high"),
+        "low": _numeric(executed, "5m_low"),
+        "close": exec_close,
+        "long_prob": long_prob,
+        "short_prob": short_prob,
+        "money_flow": money_flow,
+        "volatility": volatility,
+        "atr_ratio": atr_ratio,
+        "trend_biases": trend_biases,
+        "trend_gaps": trend_gaps,
+        "regimes": regimes,
+        "is_high_vol": is_high_vol,
+        "is_long": is_long,
+        "prob_gap": np.abs(long_prob - short_prob),
+        "dominant": np.where(is_long, long_prob, short_prob),
+    }
+
+
+def build_candidate_arrays(backtester, market, ratio_cache=None):
+    """按 backtester 自身参数算出逐 bar 的目标仓位、TP/SL 和入场拦截（NumPy 数组）。
+
+    ratio_cache 为 dict 时按仓位参数缓存 target_ratios 结果，供共用同一份 market 的多个候选复用。
+    """
+    core = backtester.core
+    if getattr(core, "_simple_rule_mode", False):
+        raise ValueError("数组回测引擎不支持简单规则模式")
+    long_prob = market["long_prob"]
+    short_prob = market["short_prob"]
+    money_flow = market["money_flow"]
+    volatility = market["volatility"]
+    atr_ratio = market["atr_ratio"]
+    trend_biases = market["trend_biases"]
+    trend_gaps = market["trend_gaps"]
+    regimes = market["regimes"]
+    is_high_vol = market["is_high_vol"]
+    is_long = market["is_long"]
+    prob_gap = market["prob_gap"]
+    dominant = market["dominant"]
+    take_profit, stop_loss = risk_threshold_arrays(core, volatility, atr_ratio, regimes)
+
+    # ===== _resolve_directional_target_ratio（on_bar 调用时 apply_trend_filter=False）=====
+    bonus, multiplier, min_target = _regime_adjustment_arrays(core, regimes)
+    threshold = np.where(is_long, core.threshold_long + bonus, core.threshold_short + bonus)
+    weak = (dominant <= threshold) | (prob_gap < core.signal_min_prob_diff)
+    clipped = np.clip(dominant, 0.0, 1.0)
+    expected_edge = (clipped * take_profit - (1.0 - clipped) * stop_loss) - core.cost_floor_ratio()
+    cost_blocked = expected_edge <= core.min_expected_net_edge
+    signal_direction = np.where(is_long, DIRECTION_LONG, DIRECTION_SHORT)
+    regime_blocked = _regime_blocked(core, signal_direction, regimes)
+    pm = core.pm
+    ratio_key = (pm.min_ratio, pm.max_ratio, pm.probability_center, pm._target_vol(), core.reward_risk)
+    if ratio_cache is None or ratio_key not in ratio_cache:
+        base_ratio = target_ratios(pm, dominant, money_flow, volatility, core.reward_risk)
+        if ratio_cache is not None:
+            ratio_cache[ratio_key] = base_ratio
+    else:
+        base_ratio = ratio_cache[ratio_key]
+    ratio = base_ratio * multiplier
+    small = ~weak & (ratio < min_target)
+    blocked = ~weak & ~small & (cost_blocked | regime_blocked)
+    passed = ~(weak | small | blocked)
+    target = np.where(passed, np.where(is_long, ratio, -ratio), 0.0)
+    raw_target = np.where(weak, 0.0, np.where(passed & ~is_long, -ratio, ratio))
+
+    # ===== on_bar 里与仓位无关的方向判断和入场拦截 =====
+    target_direction = np.where(target > 0, DIRECTION_LONG, np.where(target < 0, DIRECTION_SHORT, DIRECTION_NONE))
+    reverse_weak = (dominant <= threshold) | (prob_gap < core.reverse_exit_min_prob_diff)
+    raw_direction = np.where(reverse_weak, DIRECTION_NONE, signal_direction)
+    guard_direction = np.where(
+        (target_direction == DIRECTION_NONE) & blocked & ~cost_blocked & (np.abs(raw_target) > 0),
+        np.where(raw_target > 0, DIRECTION_LONG, DIRECTION_SHORT),
+        target_direction,
+    )
+    controller = core.dynamic_risk_controller
+    if controller is not None and controller.enabled:
+        for index in np.flatnonzero(target_direction != DIRECTION_NONE):
+            decision = controller.evaluate(
+                long_prob=long_prob[index],
+                short_prob=short_prob[index],
+                volatility=volatility[index],
+                atr_ratio=atr_ratio[index],
+                trend_bias=trend_biases[index],
+                target_direction="long" if target_direction[index] == DIRECTION_LONG else "short",
+            )
+            target[index] = controller.apply_to_target_ratio(target[index], decision)
+
+    entry_blocked = _regime_blocked(core, target_direction, regimes)
+    if core.trend_filter_enabled:
+        entry_blocked |= (
+            ((target_direction == DIRECTION_LONG) & (trend_biases == "short"))
+            | ((target_direction == DIRECTION_SHORT) & (trend_biases == "long"))
+        )
+    if core.loss_condition_guard_enabled:
+        blocked_directions = [code for code, name in ((DIRECTION_LONG, "long"), (DIRECTION_SHORT, "short")) if name in core.loss_guard_block_directions]
+        entry_blocked |= (guard_direction != DIRECTION_NONE) & (
+            np.isin(guard_direction, blocked_directions) | np.isin(regimes, list(core.loss_guard_block_new_regimes))
+        )
+    entry_blocked |= (guard_direction == DIRECTION_LONG) & _long_entry_blocked(
+        core, trend_biases, trend_gaps, money_flow, regimes, is_high_vol
+    )
+
+    loss_guard_exit_regime = np.zeros(len(regimes), dtype=bool)
+    if core.loss_condition_guard_enabled:
+        loss_guard_exit_regime = np.isin(regimes, list(core.loss_guard_exit_regimes))
+
+    return {
+        "take_profit": take_profit,
+        "stop_loss": stop_loss,
+        "target": target,
+        "raw_target": raw_target,
+        "raw_direction": raw_direction,
+        "entry_blocked": entry_blocked,
+        "loss_guard_exit_regime": loss_guard_exit_regime,
+    }
+
+
+def build_signal_arrays(backtester, market=None):
+    """按 bar 预计算决策输入；第 i 个元素对应用第 i 行信号、在第 i+1 行开盘成交的那根 bar。"""
+    market = build_market_arrays(backtester) if market is None else market
+    arrays = {key: value.tolist() for key, value in build_candidate_arrays(backtester, market).items()}
+    for key in ("valid", "price", "high", "low", "close", "prob_gap", "regimes", "trend_biases"):
+        arrays[key] = market[key].tolist()
+    arrays["labels"] = market["labels"]
+    arrays["directions"] = np.where(market["is_long"], "long", "short").tolist()
+    return arrays
+
+
+def ensure_probabilities(backtester):
+    has_probabilities = {"long_prob", "short_prob"}.issubset(backtester.data.columns)
+    if not (backtester.precomputed_probabilities and has_probabilities):
+        backtester.data[["long_prob", "short_prob"]] = backtester._predict_probabilities(backtester.data)
+        backtester.precomputed_probabilities = True
+
+
+def funding_schedule(backtester):
+    """资金费结算时间、费率、标记价格，以及各成交 bar（与 labels 对齐）上已到期的累计事件数。"""
+    schedule = backtester.funding_schedule
+    return schedule.times, schedule.rates, schedule.marks, schedule.due_counts[1:].tolist()
+
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+
+def run_array_backtest(backtester):
+    """用数组引擎跑完 backtester 的回测，状态写回 backtester 并返回与 run_backtest 相同结构的 summary。"""
+    ensure_probabilities(backtester)
+    if len(backtester.data) < 2:
+        log_error("回测样本不足，无法使用已收盘信号 -> 下一根开盘成交的模式")
+        return None
+    bt = backtester
+    core = bt.core
+    arrays = build_signal_arrays(bt)
+
+    min_adjust = core.min_adjust_amount
+    min_hold = core.min_hold_bars
+    add_threshold = core.add_threshold
+    max_rebalance = core.max_rebalance_ratio
+    reverse_min_gap = core.reverse_signal_min_prob_diff
+    reverse_min_ratio = core.reverse_min_target_ratio
+    reverse_exit_bars = core.reverse_exit_consecutive_bars
+    trade_cooldown = core._next_trade_cooldown()
+    close_cooldowns = {
+        CLOSE_TAKE_PROFIT: core._next_trade_cooldown("TakeProfit"),
+        CLOSE_STOP_LOSS: core._next_trade_cooldown("StopLoss"),
+        CLOSE_OTHER: trade_cooldown,
+    }
+    intrabar_cooldown = int(bt.settings.TRADE_COOLDOWN_BARS)
+    loss_guard_min_hold = core.loss_guard_exit_min_hold_bars
+    loss_guard_only_unprofitable = core.loss_guard_exit_only_when_unprofitable
+    loss_guard_min_loss = core.loss_guard_exit_min_unrealized_loss
+    loss_guard_confirm = core.loss_guard_exit_confirm_bars
+    block_losing_adds = core.block_losing_position_adds
+    slip_ratio = bt.slippage_bps / 10000.0
+    fee_rate = bt.fee_rate
+    intrabar = bt.enable_intrabar_tp_sl
+    worst_case = bt.worst_case_tp_sl
+    replay = bt.intrabar_replay
+
+    funding_times, funding_rates, funding_marks, funding_due = funding_schedule(bt)
+    funding_index = bt.next_funding_idx
+
+    position = float(bt.position)
+    entry = float(bt.entry_price)
+    hold = int(bt.hold_bars)
+    cooldown = int(core.cooldown_bars_remaining)
+    reverse_bars = int(core.reverse_signal_bars)
+    loss_guard_bars = int(core.loss_guard_exit_bars)
+    balance = float(bt.balance)
+    last_closed_balance = float(bt.last_closed_balance)
+    max_balance = float(bt.max_balance)
+    max_drawdown = float(bt.max_drawdown)
+    final_equity = float(bt.final_equity)
+    fees = slippage = funding_total = 0.0
+    tp_exits = sl_exits = 0
+    active_direction = bt.active_trade_direction
+    active_regime = bt.active_trade_entry_regime
+    trade_log = []
+    funding_log = []
+    closed_pnls = []
+    closed_details = []
+    actions = Counter()
+    valid_rows = []
+    last_regime = None
+
+    labels = arrays["labels"]
+    valid = arrays["valid"]
+    prices = arrays["price"]
+    highs = arrays["high"]
+    lows = arrays["low"]
+    closes = arrays["close"]
+    take_profits = arrays["take_profit"]
+    stop_losses = arrays["stop_loss"]
+    targets = arrays["target"]
+    raw_targets = arrays["raw_target"]
+    prob_gaps = arrays["prob_gap"]
+    raw_directions = arrays["raw_direction"]
+    entry_blocked = arrays["entry_blocked"]
+    loss_guard_regime = arrays["loss_guard_exit_regime"]
+    regimes = arrays["regimes"]
+
+    def fill(price, side, bar_low, bar_high):
+        if side > 0:
+            return min(price * (1 + slip_ratio), bar_high)
+        return max(price * (1 - slip_ratio), bar_low)
+
+    def close_trade(exit_regime):
+        nonlocal last_closed_balance
+        net_pnl = balance - last_closed_balance
+        closed_pnls.append(net_pnl)
+        direction = active_direction
+        if direction not in {"long", "short"} and position != 0:
+            direction = "long" if position > 0 else "short"
+        closed_details.append({
+            "net_pnl_after_costs": float(net_pnl),
+            "direction": direction or "unknown",
+            "entry_regime": active_regime or "unknown",
+            "exit_regime": str(exit_regime or "unknown"),
+        })
+        last_closed_balance = balance
+
+    for i in range(len(labels)):
+        if not valid[i]:
+            continue
+        valid_rows.append(i)
+        label = labels[i]
+        regime = regimes[i]
+        last_regime = regime
+
+        while funding_index < funding_due[i]:
+            if position != 0:
+                funding_pnl = -position * funding_marks[funding_index] * funding_rates[funding_index]
+                balance += funding_pnl
+                funding_total += funding_pnl
+                funding_log.append((funding_times[funding_index], "资金费", funding_marks[funding_index], position, balance))
+            funding_index += 1
+
+        if position == 0 or entry <= 0:
+            reverse_bars = 0
+            loss_guard_bars = 0
+        price = prices[i]
+        bar_high = highs[i]
+        bar_low = lows[i]
+        take_profit = take_profits[i]
+        stop_loss = stop_losses[i]
+        equity = balance if position == 0 or entry <= 0 else balance + (price - entry) * position
+
+        # ===== StrategyCore.on_bar =====
+        pos = position
+        action = "HOLD"
+        close_reason = None
+        delta = 0.0
+        next_state = None
+        if pos != 0:
+            pnl_pct = (price - entry) / entry if pos > 0 else (entry - price) / entry
+            if pnl_pct >= take_profit:
+                action, close_reason = "CLOSE", CLOSE_TAKE_PROFIT
+            elif pnl_pct <= -stop_loss:
+                action, close_reason = "CLOSE", CLOSE_STOP_LOSS
+            elif (
+                loss_guard_regime[i]
+                and hold >= loss_guard_min_hold
+                and not (loss_guard_only_unprofitable and pnl_pct >= 0)
+                and not (loss_guard_min_loss > 0 and pnl_pct > -loss_guard_min_loss)
+                and not (loss_guard_confirm > 1 and loss_guard_bars + 1 < loss_guard_confirm)
+            ):
+                action, close_reason = "CLOSE", CLOSE_OTHER
+
+        if action == "CLOSE":
+            pass
+        elif pos == 0:
+            target_position = targets[i] * equity / price
+            flat_hold = (0.0, 0.0, 0, max(0, cooldown - 1), 0, 0)
+            if cooldown > 0:
+                next_state = flat_hold
+            elif entry_blocked[i] and max(abs(target_position * price), abs(raw_targets[i] * equity)) >= min_adjust:
+                next_state = flat_hold
+            elif abs(target_position * price) >= min_adjust and target_position != 0:
+                action, delta = "OPEN", target_position
+            else:
+                next_state = flat_hold
+        else:
+            target_position = targets[i] * equity / price
+            raw_target = raw_targets[i]
+            same_direction = (pos > 0 and target_position > 0) or (pos < 0 and target_position < 0)
+            raw_reverse = (pos > 0 and raw_directions[i] == DIRECTION_SHORT) or (
+                pos < 0 and raw_directions[i] == DIRECTION_LONG
+            )
+            next_reverse = reverse_bars + 1 if raw_reverse else 0
+            position_pnl = 0.0
+            if entry > 0:
+                position_pnl = (price - entry) / entry if pos > 0 else (entry - price) / entry
+            loss_guard_candidate = (
+                loss_guard_regime[i]
+                and hold >= loss_guard_min_hold
+                and (not loss_guard_only_unprofitable or position_pnl < 0)
+                and (loss_guard_min_loss <= 0 or position_pnl <= -loss_guard_min_loss)
+            )
+            next_loss_guard = loss_guard_bars + 1 if loss_guard_candidate else 0
+            reverse_is_strong = (
+                not same_direction
+                and abs(raw_target) > 0
+                and prob_gaps[i] >= reverse_min_gap
+                and abs(raw_target) >= reverse_min_ratio
+            )
+            if reverse_is_strong or (reverse_exit_bars > 0 and raw_reverse and next_reverse >= reverse_exit_bars):
+                action, close_reason = "CLOSE", CLOSE_OTHER
+            else:
+                next_hold = hold + 1
+                next_state = (pos, entry, next_hold, max(0, cooldown - 1), next_reverse, next_loss_guard)
+                if next_hold >= min_hold and same_direction and cooldown <= 0:
+                    raw_delta = target_position - pos
+                    add_blocked = (
+                        entry_blocked[i]
+                        and _sign(raw_delta) == _sign(pos)
+                        and abs(raw_delta * price) >= min_adjust
+                    )
+                    if not add_blocked and abs(raw_delta / max(abs(pos), 1e-9)) >= add_threshold:
+                        cap = max_rebalance * abs(pos)
+                        candidate = min(max(raw_delta, -cap), cap)
+                        losing_add = (
+                            block_losing_adds
+                            and _sign(candidate) == _sign(pos)
+                            and entry > 0
+                            and position_pnl < 0
+                        )
+                        if abs(candidate * price) >= min_adjust and not losing_add:
+                            action, delta, next_state = "REBALANCE", candidate, None
+        actions[action] += 1
+
+        # ===== Backtester 执行 =====
+        if action == "CLOSE":
+            exec_price = fill(price, -1 if pos > 0 else 1, bar_low, bar_high)
+            balance += (exec_price - entry) * pos
+            fee = abs(pos * exec_price * fee_rate)
+            balance -= fee
+            fees += fee
+            slippage += abs(pos) * abs(exec_price - price)
+            close_trade(regime)
+            trade_label = "平仓" if close_reason in (CLOSE_TAKE_PROFIT, CLOSE_STOP_LOSS) else "反向平仓"
+            trade_log.append((label, trade_label, exec_price, pos, balance))
+            position, entry, hold = 0.0, 0.0, 0
+            cooldown, reverse_bars, loss_guard_bars = close_cooldowns[close_reason], 0, 0
+            active_direction = active_regime = None
+        elif action == "OPEN":
+            exec_price = fill(price, 1 if delta > 0 else -1, bar_low, bar_high)
+            fee = abs(delta * exec_price * fee_rate)
+            balance -= fee
+            fees += fee
+            slippage += abs(delta) * abs(exec_price - price)
+            position, entry, hold, cooldown = float(delta), exec_price, 0, trade_cooldown
+            active_direction = "long" if delta > 0 else "short"
+            active_regime = regime
+            trade_log.append((label, "开多" if delta > 0 else "开空", exec_price, position, balance))
+        elif action == "REBALANCE":
+            old_pos, old_entry = position, entry
+            new_pos = pos + delta
+            if old_pos > 0:
+                side = 1 if delta > 0 else -1
+            else:
+                side = -1 if delta < 0 else 1
+            exec_price = fill(price, side, bar_low, bar_high)
+            reduced_qty = 0.0
+            if _sign(delta) != _sign(old_pos):
+                reduced_qty = min(abs(delta), abs(old_pos))
+                balance += (exec_price - old_entry) * math.copysign(reduced_qty, old_pos)
+            fee = abs(delta * exec_price * fee_rate)
+            balance -= fee
+            fees += fee
+            slippage += abs(delta) * abs(exec_price - price)
+            if reduced_qty > 0:
+                close_trade(regime)
+            if abs(new_pos) > abs(old_pos):
+                new_entry = ((abs(old_pos) * old_entry) + (abs(delta) * exec_price)) / max(abs(old_pos) + abs(delta), 1e-9)
+            else:
+                new_entry = old_entry
+            position, entry, hold, cooldown = float(new_pos), float(new_entry), hold + 1, trade_cooldown
+            if position == 0 or entry <= 0:
+                reverse_bars = loss_guard_bars = 0
+            if active_direction is None and position != 0:
+                active_direction = "long" if position > 0 else "short"
+                active_regime = regime
+            if position > 0:
+                trade_label = "加多" if delta > 0 else "减多"
+            else:
+                trade_label = "减空" if delta > 0 else "加空"
+            trade_log.append((label, trade_label, exec_price, position, balance))
+        else:
+            position, entry, hold, cooldown, reverse_bars, loss_guard_bars = next_state
+
+        if intrabar and position != 0 and entry > 0:
+            hit = resolve_intrabar_tp_sl(
+                position, entry, price, bar_high, bar_low, take_profit, stop_loss, worst_case=worst_case
+            )
+            if replay is not None:
+                hit = replay.resolve(label, hit, position, entry, take_profit, stop_loss, worst_case=worst_case)
+            if hit is not None:
+                reference_price = float(hit["trigger_price"])
+                exec_price = fill(reference_price, -1 if position > 0 else 1, bar_low, bar_high)
+                balance += (exec_price - entry) * position
+                fee = abs(position * exec_price * fee_rate)
+                balance -= fee
+                fees += fee
+                slippage += abs(position) * abs(exec_price - reference_price)
+                close_trade(regime)
+                if hit["reason"] == "SL":
+                    sl_exits += 1
+                else:
+                    tp_exits += 1
+                trade_log.append((label, "止损" if hit["reason"] == "SL" else "止盈", exec_price, position, balance))
+                position, entry, hold = 0.0, 0.0, 0
+                cooldown, reverse_bars, loss_guard_bars = intrabar_cooldown, 0, 0
+                active_direction = active_regime = None
+
+        equity = balance if position == 0 or entry <= 0 else balance + (closes[i] - entry) * position
+        final_equity = equity
+        max_balance = max(max_balance, equity)
+        if max_balance > 0:
+            max_drawdown = min(max_drawdown, (equity - max_balance) / max_balance)
+
+    state = {
+        "position": position,
+        "entry": entry,
+        "hold": hold,
+        "cooldown": cooldown,
+        "reverse_bars": reverse_bars,
+        "loss_guard_bars": loss_guard_bars,
+        "balance": balance,
+        "last_closed_balance": last_closed_balance,
+        "final_equity": final_equity,
+        "max_balance": max_balance,
+        "max_drawdown": max_drawdown,
+        "fees": fees,
+        "slippage": slippage,
+        "funding_total": funding_total,
+        "tp_exits": tp_exits,
+        "sl_exits": sl_exits,
+        "funding_index": funding_index,
+        "active_direction": active_direction,
+        "active_regime": active_regime,
+        "trade_log": trade_log,
+        "funding_log": funding_log,
+        "closed_pnls": closed_pnls,
+        "closed_details": closed_details,
+        "actions": actions,
+    }
+    context_counts = decision_context_counts(arrays, valid_rows) if bt.record_decisions else None
+    return finish_backtest(bt, state, context_counts, last_regime)
+
+
+def decision_context_counts(arrays, valid_rows):
+    """有效 bar 上的趋势、regime、方向分布；同一份行情上的候选可共用。"""
+    regimes = [arrays["regimes"][i] for i in valid_rows]
+    directions = [arrays["directions"][i] for i in valid_rows]
+    return {
+        "trend": Counter(arrays["trend_biases"][i] for i in valid_rows),
+        "regime": Counter(regimes),
+        "direction": Counter(directions),
+        "regime_direction": Counter(zip(regimes, directions)),
+    }
+
+
+def finish_backtest(backtester, state, context_counts, last_regime):
+    """把引擎循环结束时的状态写回 Backtester，期末平仓和汇总复用参考实现。"""
+    bt = backtester
+    bt.position, bt.entry_price, bt.hold_bars = state["position"], state["entry"], state["hold"]
+    bt.balance = state["balance"]
+    bt.last_closed_balance = state["last_closed_balance"]
+    bt.final_equity = state["final_equity"]
+    bt.max_balance = state["max_balance"]
+    bt.max_drawdown = state["max_drawdown"]
+    bt.trade_log.extend(state["trade_log"])
+    bt.funding_log.extend(state["funding_log"])
+    bt.closed_trade_pnls.extend(state["closed_pnls"])
+    bt.closed_trade_details.extend(state["closed_details"])
+    bt.fee_paid_total += state["fees"]
+    bt.slippage_paid_total += state["slippage"]
+    bt.funding_pnl_total += state["funding_total"]
+    bt.tp_exit_count += state["tp_exits"]
+    bt.sl_exit_count += state["sl_exits"]
+    bt.next_funding_idx = state["funding_index"]
+    bt.active_trade_direction = state["active_direction"]
+    bt.active_trade_entry_regime = state["active_regime"]
+    bt.core.set_state(
+        state["position"],
+        state["entry"],
+        state["hold"],
+        cooldown_bars_remaining=state["cooldown"],
+        reverse_signal_bars=state["reverse_bars"],
+        loss_guard_exit_bars=state["loss_guard_bars"],
+    )
+    if bt.decision_log is not None and context_counts is not None:
+        bt.decision_log.add_counts("action", state["actions"])
+        bt.decision_log.add_counts("trend", context_counts["trend"])
+        bt.decision_log.add_counts("regime", context_counts["regime"])
+        bt.decision_log.add_counts("direction", context_counts["direction"])
+        bt.decision_log.add_counts(("regime", "direction"), context_counts["regime_direction"])
+
+    bt._force_close_end_position(bt.data.iloc[-1], market_regime=last_regime)
+    return bt._summary()
+
+
+def clone_backtester(backtester):
+    """用同一份数据、概率、模型、资金费历史和参数构造一个全新状态的 Backtester。"""
+    ensure_probabilities(backtester)
+    return type(backtester)(
+        backtester.interval,
+        backtester.window,
+        data_dict=backtester.data_dict,
+        reward_risk=backtester.reward_risk,
+        precomputed_data=backtester.data,
+        feature_cols=backtester.feature_cols,
+        models=backtester.models,
+        model_weights=backtester.model_weights,
+        model_metadata=backtester.model_metadata,
+        funding_history=backtester.funding_history,
+        precomputed_probabilities=True,
+        enable_csv_dump=False,
+        show_progress=False,
+        emit_diagnostics=False,
+        record_decisions=backtester.record_decisions,
+        settings=backtester.settings,
+    )
+
+
+def _close(a, b, tolerance):
+    return abs(float(a) - float(b)) <= tolerance * max(1.0, abs(float(a)), abs(float(b)))
+
+
+def _collect_differences(path, expected, actual, tolerance, differences):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in sorted(set(expected) | set(actual), key=str):
+            _collect_differences(f"{path}.{key}", expected.get(key), actual.get(key), tolerance, differences)
+        return
+    if isinstance(expected, float) or isinstance(actual, float):
+        if expected is not None and actual is not None:
+            if (math.isinf(float(expected)) and float(expected) == float(actual)) or _close(expected, actual, tolerance):
+                return
+    elif expected == actual:
+        return
+    differences.append({"field": path, "reference": expected, "array": actual})
+
+
+def compare_results(reference, candidate, reference_summary, candidate_summary, *, tolerance=1e-9):
+    """对照两个已跑完的 Backtester 的交易记录和 PARITY_SUMMARY_KEYS，返回差异列表。"""
+    differences = []
+    if len(reference.trade_log) != len(candidate.trade_log):
+        differences.append({
+            "field": "trade_log.length",
+            "reference": len(reference.trade_log),
+            "array": len(candidate.trade_log),
+        })
+    for index, (expected, actual) in enumerate(zip(reference.trade_log, candidate.trade_log)):
+        same = expected[0] == actual[0] and expected[1] == actual[1] and all(
+            _close(a, b, tolerance) for a, b in zip(expected[2:], actual[2:])
+        )
+        if not same:
+            differences.append({"field": f"trade_log[{index}]", "reference": expected, "array": actual})
+            break
+    for key in PARITY_SUMMARY_KEYS:
+        _collect_differences(key, (reference_summary or {}).get(key), (candidate_summary or {}).get(key), tolerance, differences)
+    return differences
+
+
+def check_parity(backtester, *, tolerance=1e-9):
+    """在同一份输入上分别跑参考引擎和数组引擎，返回耗时和差异报告。"""
+    reference = clone_backtester(backtester)
+    candidate = clone_backtester(backtester)
+
+    started_at = time.perf_counter()
+    reference_summary = reference.run_backtest(engine="reference")
+    reference_sec = time.perf_counter() - started_at
+    started_at = time.perf_counter()
+    candidate_summary = run_array_backtest(candidate)
+    array_sec = time.perf_counter() - started_at
+
+    differences = compare_results(reference, candidate, reference_summary, candidate_summary, tolerance=tolerance)
+    report = {
+        "match": not differences,
+        "differences": differences[:20],
+        "difference_count": len(differences),
+        "trade_count": len(reference.trade_log),
+        "reference_sec": reference_sec,
+        "array_sec": array_sec,
+        "speedup": reference_sec / array_sec if array_sec > 0 else None,
+    }
+    log_info(
+        "数组回测引擎对照: "
+        f"match={report['match']} trades={report['trade_count']} differences={report['difference_count']} "
+        f"reference={reference_sec:.3f}s array={array_sec:.3f}s"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    from backtest.backtest import Backtester
+
+    base_interval = config.INTERVALS[0] if config.INTERVALS else "5m"
+    parity_report = check_parity(Backtester("multi_period", config.WINDOWS.get(base_interval, 1000)))
+    for difference in parity_report["differences"]:
+        log_error(f"差异: {difference}")
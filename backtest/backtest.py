@@ -2,15 +2,19 @@ import os
 from datetime import datetime
 import csv
 import json
-from collections import Counter
+from collections import Counter, OrderedDict
 import joblib
 import traceback
 import math
 from core.strategy_core import StrategyCore
-from core.trend_filter import derive_trend_context
+from core.trend_filter import derive_trend_biases, derive_trend_context
 from core.regime_filter import derive_market_regime
 from core.reward_risk import get_configured_reward_risk
 from core.dynamic_risk import DynamicRiskController
+from core.prediction_cache import cached_weighted_predict_proba_batch
+from backtest.decision_log import EDGE_GATE_FAIL, EDGE_GATE_PASS, EDGE_GATE_SKIPPED, NUMERIC_FIELDS, DecisionLog
+from backtest.funding import FundingSchedule
+from backtest.settings import BacktestSettings
 import time
 import numpy as np
 import pandas as pd
@@ -72,22 +76,44 @@ def resolve_intrabar_tp_sl(position, entry_price, bar_open, bar_high, bar_low, t
         "trigger_price": float(trigger_price),
         "tp_price": float(take_profit_price),
         "sl_price": float(stop_loss_price),
+        # TP 与 SL 在同一根 bar 内都被触及，先后顺序无法从 OHLC 判断
+        "ambiguous": bool(hit_tp and hit_sl),
     }
 
 
-def _quantiles(values, points=(0.1, 0.25, 0.5, 0.75, 0.9, 0.95)):
-    cleaned = []
-    for value in values:
-        try:
-            value = float(value)
-        except (TypeError, ValueError):
-            continue
-        if math.isfinite(value):
-            cleaned.append(value)
-    if not cleaned:
-        return {}
-    arr = np.array(cleaned)
-    return {f"p{int(point * 100)}": float(np.quantile(arr, point)) for point in points}
+# 同一进程内按窗口复用的 funding 历史（最近 FUNDING_WINDOW_CACHE_SIZE 个窗口）。
+# 只保存覆盖到窗口起点的非空结果：接口失败或分页中途放弃时得到的是空表或残缺表，下次构造 Backtester 重新拉取。
+FUNDING_WINDOW_CACHE_SIZE = 8
+_funding_windows = OrderedDict()
+
+
+def _fetch_funding_window(start_ts, end_ts, record_limit):
+    """拉取 [start_ts, end_ts] 内的 funding 历史；同一进程内同一窗口的多个 Backtester 只请求一次接口。"""
+    key = (start_ts, end_ts, record_limit)
+    cached = _funding_windows.get(key)
+    if cached is not None:
+        _funding_windows.move_to_end(key)
+        return cached
+
+    client = okx_api.OKXClient()
+    funding_df = client.fetch_funding_rate_history(max_records=record_limit)
+    if funding_df.empty:
+        log_info("回测未获取到 funding 历史，按 0 处理")
+        return funding_df
+
+    complete = funding_df['funding_time'].min() <= start_ts
+    funding_df = funding_df[
+        (funding_df['funding_time'] >= start_ts) &
+        (funding_df['funding_time'] <= end_ts)
+    ].copy()
+
+    log_info(f"回测加载 funding 记录: {len(funding_df)} 条")
+    funding_df = funding_df.reset_index(drop=True)
+    if complete and not funding_df.empty:
+        _funding_windows[key] = funding_df
+        while len(_funding_windows) > FUNDING_WINDOW_CACHE_SIZE:
+            _funding_windows.popitem(last=False)
+    return funding_df
 
 
 class Backtester:
@@ -104,10 +130,15 @@ class Backtester:
         model_weights=None,
         model_metadata=None,
         funding_history=None,
+        precomputed_probabilities=False,
         enable_csv_dump=True,
         show_progress=True,
         emit_diagnostics=True,
+        record_decisions=True,
+        settings=None,
     ):
+        # 本次回测的只读参数（参数扫描的候选覆盖项），未覆盖的键读全局 config
+        self.settings = BacktestSettings.from_overrides(settings)
         self.interval = interval
         self.window = window
         self.in_high_conf = False
@@ -116,6 +147,10 @@ class Backtester:
         self.enable_csv_dump = bool(enable_csv_dump)
         self.show_progress = bool(show_progress)
         self.emit_diagnostics = bool(emit_diagnostics)
+        # False 为精简模式：不记录逐 bar 决策诊断，summary 里的 decision_* 字段为空（参数扫描只读收益指标时使用）
+        self.record_decisions = bool(record_decisions)
+        # precomputed_data 已带 long_prob/short_prob（如阈值研究里校准过的概率）时直接沿用，不再调用模型
+        self.precomputed_probabilities = bool(precomputed_probabilities)
 
         # 拉取多周期数据以及计算reward_risk
         if data_dict is None:
@@ -133,17 +168,17 @@ class Backtester:
             self.data = precomputed_data.copy()
 
         # 读取训练时的特征列表
-        self.feature_cols = feature_cols if feature_cols is not None else joblib.load(config.FEATURE_LIST_PATH)
+        self.feature_cols = feature_cols if feature_cols is not None else joblib.load(self.settings.FEATURE_LIST_PATH)
 
         # 加载模型与权重
-        self.models = models if models is not None else signal_engine.load_models(config.MODEL_PATHS)
-        self.model_weights = model_weights if model_weights is not None else config.MODEL_WEIGHTS
+        self.models = models if models is not None else signal_engine.load_models(self.settings.MODEL_PATHS)
+        self.model_weights = model_weights if model_weights is not None else self.settings.MODEL_WEIGHTS
         self.model_metadata = model_metadata if model_metadata is not None else self._load_model_metadata()
 
         # 初始化仓位和资金
         self.position = 0
         self.entry_price = 0
-        self.balance = config.INITIAL_BALANCE
+        self.balance = self.settings.INITIAL_BALANCE
         self.max_balance = self.balance
         self.max_drawdown = 0.0
         self.trade_log = []
@@ -153,109 +188,113 @@ class Backtester:
         self.active_trade_entry_regime = None
         self.last_closed_balance = self.balance
         self.funding_log = []
-        self.fee_rate = config.FEE_RATE
-        self.slippage_bps = float(config.BACKTEST_SLIPPAGE_BPS)
-        self.enable_funding = bool(config.BACKTEST_ENABLE_FUNDING)
-        self.enable_intrabar_tp_sl = bool(config.BACKTEST_INTRABAR_TP_SL)
-        self.worst_case_tp_sl = bool(config.BACKTEST_WORST_CASE_TP_SL)
-        self.force_close_on_end = bool(config.BACKTEST_FORCE_CLOSE_ON_END)
+        self.fee_rate = self.settings.FEE_RATE
+        self.slippage_bps = float(self.settings.BACKTEST_SLIPPAGE_BPS)
+        self.enable_funding = bool(self.settings.BACKTEST_ENABLE_FUNDING)
+        self.enable_intrabar_tp_sl = bool(self.settings.BACKTEST_INTRABAR_TP_SL)
+        self.worst_case_tp_sl = bool(self.settings.BACKTEST_WORST_CASE_TP_SL)
+        # TP/SL 同时触及的 bar 按细粒度 K 线重放（见 backtest.intrabar_replay）；未开启时为 None
+        self.intrabar_replay = None
+        if self.enable_intrabar_tp_sl and bool(self.settings.BACKTEST_INTRABAR_REPLAY_ENABLED):
+            from backtest.intrabar_replay import IntrabarReplay
+
+            self.intrabar_replay = IntrabarReplay.from_settings(self.settings)
+        self.force_close_on_end = bool(self.settings.BACKTEST_FORCE_CLOSE_ON_END)
         self.fee_paid_total = 0.0
         self.slippage_paid_total = 0.0
         self.funding_pnl_total = 0.0
         self.tp_exit_count = 0
         self.sl_exit_count = 0
         self.final_equity = self.balance
-        self.decision_reason_counts = Counter()
-        self.decision_action_counts = Counter()
-        self.decision_trend_counts = Counter()
-        self.decision_regime_counts = Counter()
-        self.decision_regime_direction_counts = Counter()
-        self.decision_regime_reason_counts = Counter()
-        self.decision_direction_reason_counts = Counter()
-        self.decision_direction_counts = Counter()
-        self.decision_max_probs = []
-        self.decision_prob_gaps = []
-        self.decision_target_ratios = []
-        self.decision_raw_target_ratios = []
-        self.decision_edge_values = []
-        self.decision_required_trade_probs = []
-        self.decision_prob_edge_margins = []
-        self.decision_round_trip_costs = []
-        self.decision_cost_floors = []
-        self.decision_take_profits = []
-        self.decision_stop_losses = []
-        self.decision_edge_gate_counts = Counter()
-        self.decision_regime_edge_margins = {}
-        self.decision_direction_edge_margins = {}
-        self.decision_examples = []
+        self.decision_log = DecisionLog(len(self.data)) if self.record_decisions else None
 
         # 初始化 position_manager
-        self.position_manager = position_manager.PositionManager()
-        self.dynamic_risk_controller = DynamicRiskController()
+        settings = self.settings
+        self.position_manager = position_manager.PositionManager(
+            min_ratio=settings.POSITION_MIN,
+            max_ratio=settings.POSITION_MAX,
+            probability_center=settings.POSITION_PROBABILITY_CENTER,
+            target_vol=settings.TARGET_VOL,
+        )
+        self.dynamic_risk_controller = DynamicRiskController(
+            enabled=settings.DYNAMIC_RISK_ENABLED,
+            base_leverage=settings.LEVERAGE,
+            min_leverage=settings.DYNAMIC_LEVERAGE_MIN,
+            max_leverage=settings.DYNAMIC_LEVERAGE_MAX,
+            base_position_ratio=settings.MAX_POSITION_RATIO,
+            min_position_ratio=settings.POSITION_MIN,
+            max_position_ratio=settings.DYNAMIC_POSITION_MAX,
+            target_vol=settings.TARGET_VOL,
+            high_vol_multiplier=settings.DYNAMIC_RISK_HIGH_VOL_MULTIPLIER,
+            low_signal_multiplier=settings.DYNAMIC_RISK_LOW_SIGNAL_MULTIPLIER,
+            trend_mismatch_multiplier=settings.DYNAMIC_RISK_TREND_MISMATCH_MULTIPLIER,
+            strong_signal_threshold=settings.DYNAMIC_RISK_STRONG_SIGNAL_THRESHOLD,
+            weak_signal_threshold=settings.DYNAMIC_RISK_WEAK_SIGNAL_THRESHOLD,
+        )
         # ✅ 统一核心策略（以回测为准）
         self.core = StrategyCore(
             self.position_manager,
-            threshold_long=config.THRESHOLD_LONG,
-            threshold_short=config.THRESHOLD_SHORT,
-            take_profit=config.TAKE_PROFIT,
-            stop_loss=config.STOP_LOSS,
-            adaptive_tp_sl_enabled=config.ADAPTIVE_TP_SL_ENABLED,
-            atr_take_profit_multiplier=config.ATR_TAKE_PROFIT_MULTIPLIER,
-            atr_stop_loss_multiplier=config.ATR_STOP_LOSS_MULTIPLIER,
-            volatility_take_profit_multiplier=config.VOLATILITY_TAKE_PROFIT_MULTIPLIER,
-            volatility_stop_loss_multiplier=config.VOLATILITY_STOP_LOSS_MULTIPLIER,
-            adaptive_take_profit_min=config.ADAPTIVE_TAKE_PROFIT_MIN,
-            adaptive_take_profit_max=config.ADAPTIVE_TAKE_PROFIT_MAX,
-            adaptive_stop_loss_min=config.ADAPTIVE_STOP_LOSS_MIN,
-            adaptive_stop_loss_max=config.ADAPTIVE_STOP_LOSS_MAX,
-            min_hold_bars=config.MIN_HOLD_BARS,
-            add_threshold=config.ADD_THRESHOLD,
-            max_rebalance_ratio=config.MAX_REBALANCE_RATIO,
-            min_adjust_amount=float(config.BACKTEST_MIN_ADJUST_AMOUNT),
-            signal_min_prob_diff=config.SIGNAL_MIN_PROB_DIFF,
-            min_signal_target_ratio=config.MIN_SIGNAL_TARGET_RATIO,
-            reverse_signal_min_prob_diff=config.REVERSE_SIGNAL_MIN_PROB_DIFF,
-            reverse_min_target_ratio=config.REVERSE_MIN_TARGET_RATIO,
-            reverse_exit_consecutive_bars=config.REVERSE_EXIT_CONSECUTIVE_BARS,
-            reverse_exit_min_prob_diff=config.REVERSE_EXIT_MIN_PROB_DIFF,
+            threshold_long=self.settings.THRESHOLD_LONG,
+            threshold_short=self.settings.THRESHOLD_SHORT,
+            take_profit=self.settings.TAKE_PROFIT,
+            stop_loss=self.settings.STOP_LOSS,
+            adaptive_tp_sl_enabled=self.settings.ADAPTIVE_TP_SL_ENABLED,
+            atr_take_profit_multiplier=self.settings.ATR_TAKE_PROFIT_MULTIPLIER,
+            atr_stop_loss_multiplier=self.settings.ATR_STOP_LOSS_MULTIPLIER,
+            volatility_take_profit_multiplier=self.settings.VOLATILITY_TAKE_PROFIT_MULTIPLIER,
+            volatility_stop_loss_multiplier=self.settings.VOLATILITY_STOP_LOSS_MULTIPLIER,
+            adaptive_take_profit_min=self.settings.ADAPTIVE_TAKE_PROFIT_MIN,
+            adaptive_take_profit_max=self.settings.ADAPTIVE_TAKE_PROFIT_MAX,
+            adaptive_stop_loss_min=self.settings.ADAPTIVE_STOP_LOSS_MIN,
+            adaptive_stop_loss_max=self.settings.ADAPTIVE_STOP_LOSS_MAX,
+            min_hold_bars=self.settings.MIN_HOLD_BARS,
+            add_threshold=self.settings.ADD_THRESHOLD,
+            max_rebalance_ratio=self.settings.MAX_REBALANCE_RATIO,
+            min_adjust_amount=float(self.settings.BACKTEST_MIN_ADJUST_AMOUNT),
+            signal_min_prob_diff=self.settings.SIGNAL_MIN_PROB_DIFF,
+            min_signal_target_ratio=self.settings.MIN_SIGNAL_TARGET_RATIO,
+            reverse_signal_min_prob_diff=self.settings.REVERSE_SIGNAL_MIN_PROB_DIFF,
+            reverse_min_target_ratio=self.settings.REVERSE_MIN_TARGET_RATIO,
+            reverse_exit_consecutive_bars=self.settings.REVERSE_EXIT_CONSECUTIVE_BARS,
+            reverse_exit_min_prob_diff=self.settings.REVERSE_EXIT_MIN_PROB_DIFF,
             reward_risk=float(self.reward_risk),
-            fee_rate=float(config.FEE_RATE),
-            slippage_bps=float(config.ESTIMATED_SLIPPAGE_BPS),
-            cost_buffer_multiplier=float(config.COST_BUFFER_MULTIPLIER),
-            min_expected_net_edge=float(config.MIN_EXPECTED_NET_EDGE),
-            min_take_profit_to_stop_loss_ratio=float(config.MIN_TAKE_PROFIT_TO_STOP_LOSS_RATIO),
-            min_take_profit_cost_multiplier=float(config.MIN_TAKE_PROFIT_COST_MULTIPLIER),
-            regime_high_vol_stop_loss_min=float(config.REGIME_HIGH_VOL_STOP_LOSS_MIN),
-            trade_cooldown_bars=int(config.TRADE_COOLDOWN_BARS),
-            take_profit_cooldown_bars=int(config.TAKE_PROFIT_COOLDOWN_BARS),
-            stop_loss_cooldown_bars=int(config.STOP_LOSS_COOLDOWN_BARS),
-            trend_filter_enabled=bool(config.TREND_FILTER_ENABLED),
-            regime_filter_enabled=bool(config.REGIME_FILTER_ENABLED),
-            regime_range_allow_trades=bool(config.REGIME_RANGE_ALLOW_TRADES),
-            regime_high_vol_allow_trades=bool(config.REGIME_HIGH_VOL_ALLOW_TRADES),
-            regime_range_threshold_bonus=float(config.REGIME_RANGE_THRESHOLD_BONUS),
-            regime_high_vol_threshold_bonus=float(config.REGIME_HIGH_VOL_THRESHOLD_BONUS),
-            regime_trend_against_block=bool(config.REGIME_TREND_AGAINST_BLOCK),
-            regime_range_target_multiplier=float(config.REGIME_RANGE_TARGET_MULTIPLIER),
-            regime_high_vol_target_multiplier=float(config.REGIME_HIGH_VOL_TARGET_MULTIPLIER),
-            regime_range_min_signal_target_ratio=float(config.REGIME_RANGE_MIN_SIGNAL_TARGET_RATIO),
-            regime_high_vol_min_signal_target_ratio=float(config.REGIME_HIGH_VOL_MIN_SIGNAL_TARGET_RATIO),
-            block_losing_position_adds=bool(config.BLOCK_LOSING_POSITION_ADDS),
-            loss_condition_guard_enabled=bool(config.LOSS_CONDITION_GUARD_ENABLED),
-            loss_guard_block_new_regimes=config.LOSS_GUARD_BLOCK_NEW_REGIMES,
-            loss_guard_block_directions=config.LOSS_GUARD_BLOCK_DIRECTIONS,
-            loss_guard_exit_regimes=config.LOSS_GUARD_EXIT_REGIMES,
-            loss_guard_exit_min_hold_bars=int(config.LOSS_GUARD_EXIT_MIN_HOLD_BARS),
-            loss_guard_exit_only_when_unprofitable=bool(config.LOSS_GUARD_EXIT_ONLY_WHEN_UNPROFITABLE),
-            loss_guard_exit_min_unrealized_loss=float(config.LOSS_GUARD_EXIT_MIN_UNREALIZED_LOSS),
-            loss_guard_exit_confirm_bars=int(config.LOSS_GUARD_EXIT_CONFIRM_BARS),
-            long_entry_guard_enabled=bool(config.LONG_ENTRY_GUARD_ENABLED),
-            long_entry_min_trend_gap=float(config.LONG_ENTRY_MIN_TREND_GAP),
-            long_entry_high_vol_gap_buffer=float(config.LONG_ENTRY_HIGH_VOL_GAP_BUFFER),
-            long_entry_high_vol_min_trend_gap=float(config.LONG_ENTRY_HIGH_VOL_MIN_TREND_GAP),
-            long_entry_block_high_vol=bool(config.LONG_ENTRY_BLOCK_HIGH_VOL),
-            long_entry_overheat_guard_enabled=bool(config.LONG_ENTRY_OVERHEAT_GUARD_ENABLED),
-            long_entry_overheat_money_flow_max=float(config.LONG_ENTRY_OVERHEAT_MONEY_FLOW_MAX),
+            fee_rate=float(self.settings.FEE_RATE),
+            slippage_bps=float(self.settings.ESTIMATED_SLIPPAGE_BPS),
+            cost_buffer_multiplier=float(self.settings.COST_BUFFER_MULTIPLIER),
+            min_expected_net_edge=float(self.settings.MIN_EXPECTED_NET_EDGE),
+            min_take_profit_to_stop_loss_ratio=float(self.settings.MIN_TAKE_PROFIT_TO_STOP_LOSS_RATIO),
+            min_take_profit_cost_multiplier=float(self.settings.MIN_TAKE_PROFIT_COST_MULTIPLIER),
+            regime_high_vol_stop_loss_min=float(self.settings.REGIME_HIGH_VOL_STOP_LOSS_MIN),
+            trade_cooldown_bars=int(self.settings.TRADE_COOLDOWN_BARS),
+            take_profit_cooldown_bars=int(self.settings.TAKE_PROFIT_COOLDOWN_BARS),
+            stop_loss_cooldown_bars=int(self.settings.STOP_LOSS_COOLDOWN_BARS),
+            trend_filter_enabled=bool(self.settings.TREND_FILTER_ENABLED),
+            regime_filter_enabled=bool(self.settings.REGIME_FILTER_ENABLED),
+            regime_range_allow_trades=bool(self.settings.REGIME_RANGE_ALLOW_TRADES),
+            regime_high_vol_allow_trades=bool(self.settings.REGIME_HIGH_VOL_ALLOW_TRADES),
+            regime_range_threshold_bonus=float(self.settings.REGIME_RANGE_THRESHOLD_BONUS),
+            regime_high_vol_threshold_bonus=float(self.settings.REGIME_HIGH_VOL_THRESHOLD_BONUS),
+            regime_trend_against_block=bool(self.settings.REGIME_TREND_AGAINST_BLOCK),
+            regime_range_target_multiplier=float(self.settings.REGIME_RANGE_TARGET_MULTIPLIER),
+            regime_high_vol_target_multiplier=float(self.settings.REGIME_HIGH_VOL_TARGET_MULTIPLIER),
+            regime_range_min_signal_target_ratio=float(self.settings.REGIME_RANGE_MIN_SIGNAL_TARGET_RATIO),
+            regime_high_vol_min_signal_target_ratio=float(self.settings.REGIME_HIGH_VOL_MIN_SIGNAL_TARGET_RATIO),
+            block_losing_position_adds=bool(self.settings.BLOCK_LOSING_POSITION_ADDS),
+            loss_condition_guard_enabled=bool(self.settings.LOSS_CONDITION_GUARD_ENABLED),
+            loss_guard_block_new_regimes=self.settings.LOSS_GUARD_BLOCK_NEW_REGIMES,
+            loss_guard_block_directions=self.settings.LOSS_GUARD_BLOCK_DIRECTIONS,
+            loss_guard_exit_regimes=self.settings.LOSS_GUARD_EXIT_REGIMES,
+            loss_guard_exit_min_hold_bars=int(self.settings.LOSS_GUARD_EXIT_MIN_HOLD_BARS),
+            loss_guard_exit_only_when_unprofitable=bool(self.settings.LOSS_GUARD_EXIT_ONLY_WHEN_UNPROFITABLE),
+            loss_guard_exit_min_unrealized_loss=float(self.settings.LOSS_GUARD_EXIT_MIN_UNREALIZED_LOSS),
+            loss_guard_exit_confirm_bars=int(self.settings.LOSS_GUARD_EXIT_CONFIRM_BARS),
+            long_entry_guard_enabled=bool(self.settings.LONG_ENTRY_GUARD_ENABLED),
+            long_entry_min_trend_gap=float(self.settings.LONG_ENTRY_MIN_TREND_GAP),
+            long_entry_high_vol_gap_buffer=float(self.settings.LONG_ENTRY_HIGH_VOL_GAP_BUFFER),
+            long_entry_high_vol_min_trend_gap=float(self.settings.LONG_ENTRY_HIGH_VOL_MIN_TREND_GAP),
+            long_entry_block_high_vol=bool(self.settings.LONG_ENTRY_BLOCK_HIGH_VOL),
+            long_entry_overheat_guard_enabled=bool(self.settings.LONG_ENTRY_OVERHEAT_GUARD_ENABLED),
+            long_entry_overheat_money_flow_max=float(self.settings.LONG_ENTRY_OVERHEAT_MONEY_FLOW_MAX),
             dynamic_risk_controller=self.dynamic_risk_controller,
         )
         if self.emit_diagnostics:
@@ -267,6 +306,8 @@ class Backtester:
             if funding_history is not None
             else self._load_funding_history()
         )
+        # 资金费事件一次性映射到行下标，回测循环按下标结算
+        self.funding_schedule = FundingSchedule.build(self.funding_history, self.price_series)
         self.next_funding_idx = 0
 
     def _load_data(self):
@@ -285,24 +326,12 @@ class Backtester:
         end_ts = self.data.index.max()
         funding_span = end_ts - start_ts
         estimated_records = max(16, math.ceil(funding_span.total_seconds() / (8 * 3600)) + 16)
-        record_limit = max(int(config.BACKTEST_FUNDING_HISTORY_LIMIT), estimated_records)
-
-        client = okx_api.OKXClient()
-        funding_df = client.fetch_funding_rate_history(max_records=record_limit)
-        if funding_df.empty:
-            log_info("回测未获取到 funding 历史，按 0 处理")
-            return funding_df
-
-        funding_df = funding_df[
-            (funding_df['funding_time'] >= start_ts) &
-            (funding_df['funding_time'] <= end_ts)
-        ].copy()
+        record_limit = max(int(self.settings.BACKTEST_FUNDING_HISTORY_LIMIT), estimated_records)
 
-        log_info(f"回测加载 funding 记录: {len(funding_df)} 条")
-        return funding_df.reset_index(drop=True)
+        return _fetch_funding_window(start_ts, end_ts, record_limit).copy()
 
     def _load_model_metadata(self):
-        metadata_path = os.path.join(BASE_DIR, config.TRAINING_METADATA_PATH)
+        metadata_path = os.path.join(BASE_DIR, self.settings.TRAINING_METADATA_PATH)
         if not os.path.exists(metadata_path):
             return {}
         try:
@@ -416,20 +445,15 @@ class Backtester:
         self.last_closed_balance = float(self.balance)
         return net_pnl
 
-    def _apply_funding_until(self, ts):
-        if self.funding_history.empty:
-            return
-
-        while self.next_funding_idx < len(self.funding_history):
-            event = self.funding_history.iloc[self.next_funding_idx]
-            funding_time = event['funding_time']
-            if funding_time > ts:
-                break
-
+    def _apply_funding_until(self, row_index):
+        """结算到 self.data 第 row_index 行时间戳为止已到期的资金费。"""
+        schedule = self.funding_schedule
+        due = schedule.due_counts[row_index]
+        while self.next_funding_idx < due:
             if self.position != 0:
-                mark_price = float(self.price_series.asof(funding_time))
-                funding_rate = float(event['funding_rate'])
-                funding_pnl = -self.position * mark_price * funding_rate
+                funding_time = schedule.times[self.next_funding_idx]
+                mark_price = schedule.marks[self.next_funding_idx]
+                funding_pnl = -self.position * mark_price * schedule.rates[self.next_funding_idx]
                 self.balance += funding_pnl
                 self.funding_pnl_total += funding_pnl
                 self.funding_log.append((funding_time, "资金费", mark_price, self.position, self.balance))
@@ -440,28 +464,19 @@ class Backtester:
         return mark_to_market_equity(self.balance, self.position, self.entry_price, mark_price)
 
     def _record_decision_diagnostic(self, out, signal_row, trend_context, take_profit, stop_loss, regime_context=None):
-        self.decision_action_counts[out.get("action", "")] += 1
+        decision_log = self.decision_log
+        if decision_log is None:
+            return
         reason = out.get("reason", "")
-        self.decision_reason_counts[reason] += 1
         trend_bias = trend_context.get("trend_bias")
         regime_context = regime_context or {}
         market_regime = str(regime_context.get("regime") or "unknown")
-        self.decision_trend_counts[trend_bias] += 1
-        self.decision_regime_counts[market_regime] += 1
 
         long_prob = float(signal_row["long_prob"])
         short_prob = float(signal_row["short_prob"])
         dominant_prob = max(long_prob, short_prob)
         prob_gap = abs(long_prob - short_prob)
         direction = "long" if long_prob >= short_prob else "short"
-        self.decision_direction_counts[direction] += 1
-        self.decision_regime_direction_counts[(market_regime, direction)] += 1
-        self.decision_regime_reason_counts[(market_regime, reason)] += 1
-        self.decision_direction_reason_counts[(direction, reason)] += 1
-        self.decision_max_probs.append(dominant_prob)
-        self.decision_prob_gaps.append(prob_gap)
-        self.decision_target_ratios.append(abs(float(out.get("target_ratio") or 0.0)))
-        self.decision_raw_target_ratios.append(abs(float(out.get("raw_target_ratio") or 0.0)))
         expected_edge = out.get("expected_net_edge")
         if expected_edge is None:
             expected_edge = self.core._expected_net_edge_ratio(dominant_prob, take_profit, stop_loss)
@@ -481,21 +496,36 @@ class Backtester:
         if cost_floor is None:
             cost_floor = self.core.cost_floor_ratio()
         weak_signal = str(reason).startswith("WeakSignal") or str(reason) in {"FlatNoSignal", "Neutral"}
-        edge_gate_passed = expected_edge > self.core.min_expected_net_edge
-        self.decision_edge_values.append(expected_edge)
-        self.decision_required_trade_probs.append(required_prob)
-        self.decision_prob_edge_margins.append(prob_edge_margin)
-        self.decision_round_trip_costs.append(float(round_trip_cost))
-        self.decision_cost_floors.append(float(cost_floor))
-        self.decision_take_profits.append(float(take_profit))
-        self.decision_stop_losses.append(float(stop_loss))
-        if not weak_signal:
-            self.decision_edge_gate_counts["pass" if edge_gate_passed else "fail"] += 1
-        self.decision_regime_edge_margins.setdefault(market_regime, []).append(prob_edge_margin)
-        self.decision_direction_edge_margins.setdefault(direction, []).append(prob_edge_margin)
-
-        if len(self.decision_examples) < 12 and out.get("action") == "HOLD":
-            self.decision_examples.append({
+        if weak_signal:
+            edge_gate = EDGE_GATE_SKIPPED
+        else:
+            edge_gate = EDGE_GATE_PASS if expected_edge > self.core.min_expected_net_edge else EDGE_GATE_FAIL
+        target_ratio = float(out.get("target_ratio") or 0.0)
+        raw_target_ratio = float(out.get("raw_target_ratio") or 0.0)
+        decision_log.append(
+            out.get("action", ""),
+            reason,
+            trend_bias,
+            market_regime,
+            direction,
+            (
+                dominant_prob,
+                prob_gap,
+                abs(target_ratio),
+                abs(raw_target_ratio),
+                expected_edge,
+                required_prob,
+                prob_edge_margin,
+                float(take_profit),
+                float(stop_loss),
+                float(round_trip_cost),
+                float(cost_floor),
+            ),
+            edge_gate,
+        )
+
+        if out.get("action") == "HOLD" and decision_log.wants_example():
+            decision_log.examples.append({
                 "ts": signal_row.name.isoformat() if hasattr(signal_row.name, "isoformat") else str(signal_row.name),
                 "reason": reason,
                 "direction": direction,
@@ -505,8 +535,8 @@ class Backtester:
                 "prob_gap": round(prob_gap, 4),
                 "trend_bias": trend_bias,
                 "market_regime": market_regime,
-                "target_ratio": round(float(out.get("target_ratio") or 0.0), 4),
-                "raw_target_ratio": round(float(out.get("raw_target_ratio") or 0.0), 4),
+                "target_ratio": round(target_ratio, 4),
+                "raw_target_ratio": round(raw_target_ratio, 4),
                 "expected_edge": round(float(expected_edge), 6),
                 "required_trade_prob": round(required_prob, 4),
                 "prob_edge_margin": round(prob_edge_margin, 4),
@@ -521,47 +551,63 @@ class Backtester:
             for primary, counts in sorted(grouped.items())
         }
 
-    def _quantiles_by_key(self, values_by_key):
+    def _decision_edge_gate_summary(self, decision_log):
+        counts = decision_log.edge_gate_counts()
+        total = sum(counts.values())
+        passed = int(counts.get("pass", 0))
+        failed = int(counts.get("fail", 0))
         return {
-            str(key): _quantiles(values)
-            for key, values in sorted(values_by_key.items())
-            if values
+            "counts": dict(counts),
+            "pass_pct": float(passed / total * 100.0) if total else 0.0,
+            "fail_pct": float(failed / total * 100.0) if total else 0.0,
+            "prob_edge_margin_by_regime": decision_log.quantiles_by("prob_edge_margin", "regime"),
+            "prob_edge_margin_by_direction": decision_log.quantiles_by("prob_edge_margin", "direction"),
         }
 
-    def _decision_edge_gate_summary(self):
-        total = sum(self.decision_edge_gate_counts.values())
-        passed = int(self.decision_edge_gate_counts.get("pass", 0))
-        failed = int(self.decision_edge_gate_counts.get("fail", 0))
+    def _decision_diagnostics(self):
+        """把决策记录汇总成 summary 的 decision_* 字段；精简模式下各字段为空。"""
+        decision_log = self.decision_log if self.decision_log is not None else DecisionLog()
+        regime_counts = decision_log.counts("regime")
         return {
-            "counts": dict(self.decision_edge_gate_counts),
-            "pass_pct": float(passed / total * 100.0) if total else 0.0,
-            "fail_pct": float(failed / total * 100.0) if total else 0.0,
-            "prob_edge_margin_by_regime": self._quantiles_by_key(self.decision_regime_edge_margins),
-            "prob_edge_margin_by_direction": self._quantiles_by_key(self.decision_direction_edge_margins),
+            "decision_action_counts": dict(decision_log.counts("action")),
+            "decision_reason_top": decision_log.counts("reason").most_common(15),
+            "decision_trend_counts": dict(decision_log.counts("trend")),
+            "decision_direction_counts": dict(decision_log.counts("direction")),
+            "decision_regime_counts": dict(regime_counts),
+            "decision_regime_signal_summary": self._decision_regime_signal_summary(
+                regime_counts,
+                decision_log.pair_counts("regime", "direction"),
+            ),
+            "decision_regime_reason_top": self._top_counts_by_primary(decision_log.pair_counts("regime", "reason")),
+            "decision_direction_reason_top": self._top_counts_by_primary(decision_log.pair_counts("direction", "reason")),
+            "decision_probability_quantiles": {field: decision_log.quantiles(field) for field in NUMERIC_FIELDS},
+            "decision_edge_gate_summary": self._decision_edge_gate_summary(decision_log),
+            "decision_hold_examples": list(decision_log.examples),
         }
 
     def _log_decision_diagnostics(self):
-        if not self.decision_action_counts:
+        decision_log = self.decision_log
+        if decision_log is None or not decision_log.counts("action"):
             return
 
         log_info("回测决策诊断:")
-        log_info(f"动作分布: {dict(self.decision_action_counts)}")
-        log_info(f"原因分布TOP: {self.decision_reason_counts.most_common(12)}")
-        log_info(f"信号方向分布: {dict(self.decision_direction_counts)}")
-        log_info(f"趋势分布: {dict(self.decision_trend_counts)}")
-        log_info(f"Regime分布: {dict(self.decision_regime_counts)}")
-        log_info(f"最大概率分位: {_quantiles(self.decision_max_probs)}")
-        log_info(f"概率差分位: {_quantiles(self.decision_prob_gaps)}")
-        log_info(f"目标仓位比例分位: {_quantiles(self.decision_target_ratios)}")
-        log_info(f"原始目标仓位比例分位: {_quantiles(self.decision_raw_target_ratios)}")
-        log_info(f"预期净边际分位: {_quantiles(self.decision_edge_values)}")
-        log_info(f"交易所需概率分位: {_quantiles(self.decision_required_trade_probs)}")
-        log_info(f"概率-edge余量分位: {_quantiles(self.decision_prob_edge_margins)}")
-        log_info(f"成本门槛通过率: {self._decision_edge_gate_summary()}")
-        log_info(f"Regime原因TOP: {self._top_counts_by_primary(self.decision_regime_reason_counts, limit=5)}")
-        log_info(f"方向原因TOP: {self._top_counts_by_primary(self.decision_direction_reason_counts, limit=5)}")
-        if self.decision_examples:
-            log_info(f"HOLD样例: {self.decision_examples}")
+        log_info(f"动作分布: {dict(decision_log.counts('action'))}")
+        log_info(f"原因分布TOP: {decision_log.counts('reason').most_common(12)}")
+        log_info(f"信号方向分布: {dict(decision_log.counts('direction'))}")
+        log_info(f"趋势分布: {dict(decision_log.counts('trend'))}")
+        log_info(f"Regime分布: {dict(decision_log.counts('regime'))}")
+        log_info(f"最大概率分位: {decision_log.quantiles('dominant_prob')}")
+        log_info(f"概率差分位: {decision_log.quantiles('prob_gap')}")
+        log_info(f"目标仓位比例分位: {decision_log.quantiles('target_ratio')}")
+        log_info(f"原始目标仓位比例分位: {decision_log.quantiles('raw_target_ratio')}")
+        log_info(f"预期净边际分位: {decision_log.quantiles('expected_net_edge')}")
+        log_info(f"交易所需概率分位: {decision_log.quantiles('required_trade_prob')}")
+        log_info(f"概率-edge余量分位: {decision_log.quantiles('prob_edge_margin')}")
+        log_info(f"成本门槛通过率: {self._decision_edge_gate_summary(decision_log)}")
+        log_info(f"Regime原因TOP: {self._top_counts_by_primary(decision_log.pair_counts('regime', 'reason'), limit=5)}")
+        log_info(f"方向原因TOP: {self._top_counts_by_primary(decision_log.pair_counts('direction', 'reason'), limit=5)}")
+        if decision_log.examples:
+            log_info(f"HOLD样例: {decision_log.examples}")
 
     def _maybe_execute_intrabar_tp_sl(
         self,
@@ -589,6 +635,16 @@ class Backtester:
             stop_loss,
             worst_case=self.worst_case_tp_sl,
         )
+        if self.intrabar_replay is not None:
+            hit = self.intrabar_replay.resolve(
+                exec_row.name,
+                hit,
+                self.position,
+                self.entry_price,
+                take_profit,
+                stop_loss,
+                worst_case=self.worst_case_tp_sl,
+            )
         if hit is None:
             return False
 
@@ -618,7 +674,7 @@ class Backtester:
             0.0,
             0.0,
             0,
-            cooldown_bars_remaining=int(config.TRADE_COOLDOWN_BARS),
+            cooldown_bars_remaining=int(self.settings.TRADE_COOLDOWN_BARS),
         )
         return True
 
@@ -653,12 +709,17 @@ class Backtester:
         return True
 
 
-    def run_backtest(self):
+    def run_backtest(self, engine=None):
+        engine = str(engine or getattr(self.settings, "BACKTEST_ENGINE", "reference")).lower()
+        if engine == "array":
+            from backtest.array_engine import run_array_backtest
+
+            return run_array_backtest(self)
 
         # ========== 预计算信号 ==========
-        self.data[['long_prob', 'short_prob']] = self.data.apply(
-            self._predict_row, axis=1, result_type="expand"
-        )
+        has_probabilities = {'long_prob', 'short_prob'}.issubset(self.data.columns)
+        if not (self.precomputed_probabilities and has_probabilities):
+            self.data[['long_prob', 'short_prob']] = self._predict_probabilities(self.data)
 
         if len(self.data) < 2:
             log_error("回测样本不足，无法使用已收盘信号 -> 下一根开盘成交的模式")
@@ -689,10 +750,10 @@ class Backtester:
                 atr_ratio = float(atr_value) / close_price
             trend_context = derive_trend_context(
                 signal_row,
-                interval=config.TREND_FILTER_INTERVAL,
-                fast_col=config.TREND_FILTER_FAST_COL,
-                slow_col=config.TREND_FILTER_SLOW_COL,
-                min_gap=config.TREND_FILTER_MIN_GAP,
+                interval=self.settings.TREND_FILTER_INTERVAL,
+                fast_col=self.settings.TREND_FILTER_FAST_COL,
+                slow_col=self.settings.TREND_FILTER_SLOW_COL,
+                min_gap=self.settings.TREND_FILTER_MIN_GAP,
             )
             regime_context = derive_market_regime(
                 trend_bias=trend_context.get("trend_bias"),
@@ -700,15 +761,15 @@ class Backtester:
                 volatility=volatility,
                 atr_ratio=atr_ratio,
                 money_flow_ratio=money_flow_ratio,
-                trend_gap_threshold=config.REGIME_TREND_GAP_THRESHOLD,
-                high_vol_atr_threshold=config.REGIME_HIGH_VOL_ATR_THRESHOLD,
-                high_volatility_threshold=config.REGIME_HIGH_VOLATILITY_THRESHOLD,
-                money_flow_extreme_threshold=config.REGIME_MONEY_FLOW_EXTREME_THRESHOLD,
+                trend_gap_threshold=self.settings.REGIME_TREND_GAP_THRESHOLD,
+                high_vol_atr_threshold=self.settings.REGIME_HIGH_VOL_ATR_THRESHOLD,
+                high_volatility_threshold=self.settings.REGIME_HIGH_VOLATILITY_THRESHOLD,
+                money_flow_extreme_threshold=self.settings.REGIME_MONEY_FLOW_EXTREME_THRESHOLD,
             )
             market_regime = str(regime_context.get("regime") or "unknown")
             last_market_regime = market_regime
 
-            self._apply_funding_until(exec_row.name)
+            self._apply_funding_until(i)
 
             # ===== 将回测状态同步进 core =====
             self.core.set_state(self.position, self.entry_price, self.hold_bars)
@@ -837,19 +898,60 @@ class Backtester:
         )
         return self._summary()
 
+    def _predict_probabilities(self, data, chunk_rows=None, parity_rows=None):
+        """批量计算每根 bar 的 [long_prob, short_prob]。
+
+        与逐行 _predict_row 的融合逻辑一致，只是一次处理 chunk_rows 行；
+        模型来自磁盘时经持久化预测缓存只计算缺失的 bar；另抽样 parity_rows 行走逐行路径对照
+        （同时能发现过期缓存），不一致时整体回退逐行计算。
+        """
+        if len(data) == 0:
+            return np.zeros((0, 2), dtype=float)
+        chunk_rows = max(1, int(chunk_rows or getattr(self.settings, "BACKTEST_PREDICT_CHUNK_ROWS", 5000)))
+        if parity_rows is None:
+            parity_rows = getattr(self.settings, "BACKTEST_PREDICT_PARITY_ROWS", 8)
+
+        trend_biases = derive_trend_biases(
+            data,
+            interval=self.settings.TREND_FILTER_INTERVAL,
+            fast_col=self.settings.TREND_FILTER_FAST_COL,
+            slow_col=self.settings.TREND_FILTER_SLOW_COL,
+            min_gap=self.settings.TREND_FILTER_MIN_GAP,
+        )
+        avg_pred = cached_weighted_predict_proba_batch(
+            self.models,
+            data[self.feature_cols].astype(float),
+            self.model_weights,
+            trend_biases=trend_biases,
+            model_metadata=self.model_metadata,
+            feature_cols=self.feature_cols,
+            chunk_rows=chunk_rows,
+        )
+        probs = np.column_stack([avg_pred[:, 1], avg_pred[:, 0]])
+
+        parity_rows = min(int(parity_rows), len(data))
+        if parity_rows > 0:
+            positions = np.unique(np.linspace(0, len(data) - 1, parity_rows).astype(int))
+            expected = np.asarray([self._predict_row(data.iloc[pos]) for pos in positions], dtype=float)
+            difference = float(np.max(np.abs(expected - probs[positions])))
+            if not difference <= 1e-9:
+                log_error(f"批量预测与逐行预测不一致(max_diff={difference:.3g})，回退逐行计算")
+                return data.apply(self._predict_row, axis=1, result_type="expand").to_numpy(dtype=float)
+        return probs
+
     def _predict_row(self, row):
         """
-        复用实盘信号融合逻辑，保持一致性
+        复用实盘信号融合逻辑，保持一致性（批量预计算的对照路径）
         """
         X_row = row[self.feature_cols].values.reshape(1, -1).astype(float)
         X_row = pd.DataFrame(X_row, columns=self.feature_cols)
 
         trend_context = derive_trend_context(
             row,
-            interval=config.TREND_FILTER_INTERVAL,
-            fast_col=config.TREND_FILTER_FAST_COL,
-            slow_col=config.TREND_FILTER_SLOW_COL,
-            min_gap=config.TREND_FILTER_MIN_GAP,
+            interval=self.settings.TREND_FILTER_INTERVAL,
+            fast_col=self.settings.TREND_FILTER_FAST_COL,
+            slow_col=self.settings.TREND_FILTER_SLOW_COL,
+            min_gap=self.settings.TREND_FILTER_MIN_GAP,
         )
         avg_pred = signal_engine.weighted_predict_proba(
             self.models,
@@ -861,13 +963,13 @@ class Backtester:
         long_prob, short_prob = avg_pred[1], avg_pred[0]
         return long_prob, short_prob
 
-    def _decision_regime_signal_summary(self):
+    def _decision_regime_signal_summary(self, regime_counts, regime_direction_counts):
         summary = {}
-        regimes = sorted(str(key) for key in self.decision_regime_counts if key is not None)
+        regimes = sorted(str(key) for key in regime_counts if key is not None)
         for regime in regimes:
-            rows = int(self.decision_regime_counts.get(regime, 0))
-            long_count = int(self.decision_regime_direction_counts.get((regime, "long"), 0))
-            short_count = int(self.decision_regime_direction_counts.get((regime, "short"), 0))
+            rows = int(regime_counts.get(regime, 0))
+            long_count = int(regime_direction_counts.get((regime, "long"), 0))
+            short_count = int(regime_direction_counts.get((regime, "short"), 0))
             denom = max(rows, 1)
             summary[regime] = {
                 "rows": rows,
@@ -930,7 +1032,7 @@ class Backtester:
         }
 
     def _summary(self):
-        pnl = self.final_equity - config.INITIAL_BALANCE
+        pnl = self.final_equity - self.settings.INITIAL_BALANCE
         drawdown = self.max_drawdown
         wins = [value for value in self.closed_trade_pnls if value > 0]
         losses = [value for value in self.closed_trade_pnls if value < 0]
@@ -955,7 +1057,7 @@ class Backtester:
             log_info(f"期末已实现余额: {self.balance:.2f} USDT")
         if self.position != 0:
             log_info(f"期末持仓: {self.position:.4f} @ {self.entry_price:.4f}")
-        log_info(f"累计收益: {pnl:.2f} USDT ({pnl / config.INITIAL_BALANCE * 100:.2f}%)")
+        log_info(f"累计收益: {pnl:.2f} USDT ({pnl / self.settings.INITIAL_BALANCE * 100:.2f}%)")
         log_info(f"最大回撤: {drawdown * 100:.2f}%")
         log_info(f"交易次数: {len(self.trade_log)}")
         log_info(f"平仓交易数: {closed_trade_count}")
@@ -963,10 +1065,12 @@ class Backtester:
         log_info(f"盈利因子: {profit_factor:.4f}")
         log_info(f"平均盈亏比: {avg_win_loss_ratio:.4f}")
         log_info(f"平均平仓净PnL: {avg_closed_trade_pnl:.2f} USDT")
-        log_info(f"手续费后收益: {net_pnl_after_costs:.2f} USDT ({net_pnl_after_costs / config.INITIAL_BALANCE * 100:.2f}%)")
+        log_info(f"手续费后收益: {net_pnl_after_costs:.2f} USDT ({net_pnl_after_costs / self.settings.INITIAL_BALANCE * 100:.2f}%)")
         log_info(f"资金费事件数: {len(self.funding_log)}")
         log_info(f"止盈次数: {self.tp_exit_count}")
         log_info(f"止损次数: {self.sl_exit_count}")
+        if self.intrabar_replay is not None:
+            log_info(f"bar内TP/SL歧义重放: {self.intrabar_replay.summary()}")
         log_info(f"手续费合计: {self.fee_paid_total:.2f} USDT")
         log_info(f"滑点成本合计: {self.slippage_paid_total:.2f} USDT")
         log_info(f"资金费净额: {self.funding_pnl_total:.2f} USDT")
@@ -983,14 +1087,15 @@ class Backtester:
                 "avg_win_loss_ratio": avg_win_loss_ratio,
                 "avg_closed_trade_pnl": avg_closed_trade_pnl,
                 "net_pnl_after_costs": net_pnl_after_costs,
-                "net_return_pct_after_costs": net_pnl_after_costs / config.INITIAL_BALANCE * 100,
+                "net_return_pct_after_costs": net_pnl_after_costs / self.settings.INITIAL_BALANCE * 100,
             })
 
+        decision = self._decision_diagnostics()
         return {
             "final_equity": float(self.final_equity),
             "final_balance": float(self.balance),
             "pnl": float(pnl),
-            "return_pct": float(pnl / config.INITIAL_BALANCE * 100),
+            "return_pct": float(pnl / self.settings.INITIAL_BALANCE * 100),
             "max_drawdown_pct": float(drawdown * 100),
             "trade_count": int(len(self.trade_log)),
             "closed_trade_count": int(closed_trade_count),
@@ -1005,45 +1110,34 @@ class Backtester:
             "avg_win_loss_ratio": float(avg_win_loss_ratio),
             "avg_closed_trade_pnl": float(avg_closed_trade_pnl),
             "net_pnl_after_costs": float(net_pnl_after_costs),
-            "net_return_pct_after_costs": float(net_pnl_after_costs / config.INITIAL_BALANCE * 100),
+            "net_return_pct_after_costs": float(net_pnl_after_costs / self.settings.INITIAL_BALANCE * 100),
             "funding_event_count": int(len(self.funding_log)),
             "take_profit_count": int(self.tp_exit_count),
             "stop_loss_count": int(self.sl_exit_count),
+            "intrabar_replay": self.intrabar_replay.summary() if self.intrabar_replay is not None else {},
             "fees_paid": float(self.fee_paid_total),
             "slippage_cost": float(self.slippage_paid_total),
             "funding_pnl": float(self.funding_pnl_total),
             "ending_position": float(self.position),
             "ending_entry_price": float(self.entry_price),
-            "decision_action_counts": dict(self.decision_action_counts),
-            "decision_reason_top": self.decision_reason_counts.most_common(15),
-            "decision_trend_counts": dict(self.decision_trend_counts),
-            "decision_direction_counts": dict(self.decision_direction_counts),
-            "decision_regime_counts": dict(self.decision_regime_counts),
-            "decision_regime_signal_summary": self._decision_regime_signal_summary(),
+            "decision_action_counts": decision["decision_action_counts"],
+            "decision_reason_top": decision["decision_reason_top"],
+            "decision_trend_counts": decision["decision_trend_counts"],
+            "decision_direction_counts": decision["decision_direction_counts"],
+            "decision_regime_counts": decision["decision_regime_counts"],
+            "decision_regime_signal_summary": decision["decision_regime_signal_summary"],
             "closed_trade_attribution": self._closed_trade_attribution(),
-            "decision_regime_reason_top": self._top_counts_by_primary(self.decision_regime_reason_counts),
-            "decision_direction_reason_top": self._top_counts_by_primary(self.decision_direction_reason_counts),
-            "decision_probability_quantiles": {
-                "dominant_prob": _quantiles(self.decision_max_probs),
-                "prob_gap": _quantiles(self.decision_prob_gaps),
-                "target_ratio": _quantiles(self.decision_target_ratios),
-                "raw_target_ratio": _quantiles(self.decision_raw_target_ratios),
-                "expected_net_edge": _quantiles(self.decision_edge_values),
-                "required_trade_prob": _quantiles(self.decision_required_trade_probs),
-                "prob_edge_margin": _quantiles(self.decision_prob_edge_margins),
-                "take_profit": _quantiles(self.decision_take_profits),
-                "stop_loss": _quantiles(self.decision_stop_losses),
-                "round_trip_cost": _quantiles(self.decision_round_trip_costs),
-                "cost_floor": _quantiles(self.decision_cost_floors),
-            },
-            "decision_edge_gate_summary": self._decision_edge_gate_summary(),
+            "decision_regime_reason_top": decision["decision_regime_reason_top"],
+            "decision_direction_reason_top": decision["decision_direction_reason_top"],
+            "decision_probability_quantiles": decision["decision_probability_quantiles"],
+            "decision_edge_gate_summary": decision["decision_edge_gate_summary"],
             "decision_gate_config": {
                 "threshold_long": float(self.core.threshold_long),
                 "threshold_short": float(self.core.threshold_short),
                 "signal_min_prob_diff": float(self.core.signal_min_prob_diff),
                 "min_signal_target_ratio": float(self.core.min_signal_target_ratio),
                 "min_adjust_amount": float(self.core.min_adjust_amount),
-                "live_min_adjust_amount": float(config.MIN_ADJUST_AMOUNT),
+                "live_min_adjust_amount": float(self.settings.MIN_ADJUST_AMOUNT),
                 "min_expected_net_edge": float(self.core.min_expected_net_edge),
                 "fee_rate": float(self.core.fee_rate),
                 "slippage_bps": float(self.core.slippage_bps),
@@ -1053,7 +1147,7 @@ class Backtester:
                 "position_probability_center": float(self.position_manager.probability_center),
                 "force_close_on_end": bool(self.force_close_on_end),
             },
-            "decision_hold_examples": list(self.decision_examples),
+            "decision_hold_examples": decision["decision_hold_examples"],
         }
 
     def dump_trade_log_to_csv(self,pnl, drawdown, performance_metrics=None):
@@ -1077,7 +1171,7 @@ class Backtester:
             writer.writerow(["PnL (USDT)", round(pnl, 2)])
             writer.writerow([
                 "Return (%)",
-                round(pnl / config.INITIAL_BALANCE * 100, 2)
+                round(pnl / self.settings.INITIAL_BALANCE * 100, 2)
             ])
             writer.writerow([
                 "Max Drawdown (%)",
@@ -1121,7 +1215,7 @@ class Backtester:
             ])
             writer.writerow([
                 "Net Return After Costs (%)",
-                round(performance_metrics.get("net_return_pct_after_costs", pnl / config.INITIAL_BALANCE * 100), 2)
+                round(performance_metrics.get("net_return_pct_after_costs", pnl / self.settings.INITIAL_BALANCE * 100), 2)
             ])
             writer.writerow([
                 "Funding Event Count",
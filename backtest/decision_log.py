@@ -0,0 +1,159 @@
+"""逐 bar 决策诊断的列式记录。
+
+按回测行数预分配：数值诊断为 float64 列，动作/原因/趋势/regime/方向存为 int32 类别码（码表按首次出现顺序编号），
+成本门槛结果存为 int8。分布计数、分位数、按 regime/方向分组的分位数在回测结束时一次性向量化计算；
+计数键的顺序与逐 bar 累加 Counter 时一致（按首次出现），summary 与逐条累加的结果逐位相同。
+"""
+from collections import Counter
+
+import numpy as np
+
+
+NUMERIC_FIELDS = (
+    "dominant_prob",
+    "prob_gap",
+    "target_ratio",
+    "raw_target_ratio",
+    "expected_net_edge",
+    "required_trade_prob",
+    "prob_edge_margin",
+    "take_profit",
+    "stop_loss",
+    "round_trip_cost",
+    "cost_floor",
+)
+CATEGORY_FIELDS = ("action", "reason", "trend", "regime", "direction")
+QUANTILE_POINTS = (0.1, 0.25, 0.5, 0.75, 0.9, 0.95)
+
+# 成本门槛：弱信号不计入
+EDGE_GATE_SKIPPED = -1
+EDGE_GATE_FAIL = 0
+EDGE_GATE_PASS = 1
+
+MAX_EXAMPLES = 12
+
+_NUMERIC_INDEX = {field: index for index, field in enumerate(NUMERIC_FIELDS)}
+_CATEGORY_INDEX = {field: index for index, field in enumerate(CATEGORY_FIELDS)}
+
+
+def finite_quantiles(values, points=QUANTILE_POINTS):
+    """只取有限值计算分位数；没有有限值时返回空 dict。"""
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return {}
+    return {f"p{int(point * 100)}": float(np.quantile(values, point)) for point in points}
+
+
+class DecisionLog:
+    """一次回测的逐 bar 决策记录；容量不足时按倍数扩容。
+
+    外部引擎（array / lockstep）只产出聚合后的计数，用 add_counts 合并进来，与逐 bar 记录共用同一套汇总接口。
+    """
+
+    def __init__(self, capacity=0):
+        capacity = max(1, int(capacity))
+        self.size = 0
+        self.values = np.empty((capacity, len(NUMERIC_FIELDS)), dtype=np.float64, order="F")
+        self.codes = np.empty((capacity, len(CATEGORY_FIELDS)), dtype=np.int32, order="F")
+        self.edge_gates = np.empty(capacity, dtype=np.int8)
+        self.categories = {field: [] for field in CATEGORY_FIELDS}
+        self._lookup = {field: {} for field in CATEGORY_FIELDS}
+        self._extra_counts = {}
+        self.examples = []
+
+    def __len__(self):
+        return self.size
+
+    def _code(self, field, value):
+        lookup = self._lookup[field]
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(self.categories[field])
+            self.categories[field].append(value)
+        return code
+
+    def _grow(self):
+        capacity = len(self.edge_gates) * 2
+        values = np.empty((capacity, len(NUMERIC_FIELDS)), dtype=np.float64, order="F")
+        codes = np.empty((capacity, len(CATEGORY_FIELDS)), dtype=np.int32, order="F")
+        edge_gates = np.empty(capacity, dtype=np.int8)
+        values[: self.size] = self.values[: self.size]
+        codes[: self.size] = self.codes[: self.size]
+        edge_gates[: self.size] = self.edge_gates[: self.size]
+        self.values, self.codes, self.edge_gates = values, codes, edge_gates
+
+    def append(self, action, reason, trend, regime, direction, values, edge_gate):
+        """记录一根 bar；values 按 NUMERIC_FIELDS 顺序。"""
+        row = self.size
+        if row >= len(self.edge_gates):
+            self._grow()
+        self.codes[row] = (
+            self._code("action", action),
+            self._code("reason", reason),
+            self._code("trend", trend),
+            self._code("regime", regime),
+            self._code("direction", direction),
+        )
+        self.values[row] = values
+        self.edge_gates[row] = edge_gate
+        self.size = row + 1
+
+    def wants_example(self):
+        return len(self.examples) < MAX_EXAMPLES
+
+    def add_counts(self, key, counts):
+        """合并外部引擎算好的计数；key 为类别列名或 (主列, 次列)。"""
+        self._extra_counts.setdefault(key, Counter()).update(counts)
+
+    def column(self, field):
+        return self.values[: self.size, _NUMERIC_INDEX[field]]
+
+    def _ordered_counts(self, keys):
+        """按首次出现顺序返回 (键, 次数)。"""
+        if not len(keys):
+            return []
+        unique, first, counts = np.unique(keys, return_index=True, return_counts=True)
+        order = np.argsort(first, kind="stable")
+        return [(int(unique[index]), int(counts[index])) for index in order]
+
+    def counts(self, field):
+        categories = self.categories[field]
+        result = Counter()
+        for code, count in self._ordered_counts(self.codes[: self.size, _CATEGORY_INDEX[field]]):
+            result[categories[code]] = count
+        result.update(self._extra_counts.get(field, Counter()))
+        return result
+
+    def pair_counts(self, primary, secondary):
+        primary_categories = self.categories[primary]
+        secondary_categories = self.categories[secondary]
+        width = max(1, len(secondary_categories))
+        keys = (
+            self.codes[: self.size, _CATEGORY_INDEX[primary]].astype(np.int64) * width
+            + self.codes[: self.size, _CATEGORY_INDEX[secondary]]
+        )
+        result = Counter()
+        for key, count in self._ordered_counts(keys):
+            result[(primary_categories[key // width], secondary_categories[key % width])] = count
+        result.update(self._extra_counts.get((primary, secondary), Counter()))
+        return result
+
+    def quantiles(self, field):
+        return finite_quantiles(self.column(field))
+
+    def quantiles_by(self, field, group):
+        """按某类别列分组的分位数，组名转 str 后排序。"""
+        values = self.column(field)
+        codes = self.codes[: self.size, _CATEGORY_INDEX[group]]
+        grouped = {}
+        for code, _ in self._ordered_counts(codes):
+            grouped[str(self.categories[group][code])] = finite_quantiles(values[codes == code])
+        return dict(sorted(grouped.items()))
+
+    def edge_gate_counts(self):
+        gates = self.edge_gates[: self.size]
+        result = Counter()
+        for gate, count in self._ordered_counts(gates[gates != EDGE_GATE_SKIPPED]):
+            result["pass" if gate == EDGE_GATE_PASS else "fail"] = count
+        return result
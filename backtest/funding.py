@@ -0,0 +1,39 @@
+"""资金费结算表。
+
+逐 bar 回测原先每根 K 线都用 iloc 从 funding DataFrame 取下一条事件，再用 price_series.asof 取标记价格。
+这里在构造 Backtester 时一次性算好：事件时间、费率、标记价格（向量化 asof），以及每根 K 线时间戳上已到期的累计事件数。
+到期数对事件时间的累计最大值做 searchsorted，与逐条推进、遇到 funding_time > ts 即停的顺序一致。
+回测循环和数组引擎都只按下标取值，不再访问 DataFrame。
+"""
+import numpy as np
+import pandas as pd
+
+
+class FundingSchedule:
+    """times 保留原始 Timestamp（写入 funding_log），rates / marks 为 float 列表；
+    due_counts[i] 为推进到 price_series 第 i 行时应已结算的事件数。
+    """
+
+    def __init__(self, times, rates, marks, due_counts):
+        self.times = times
+        self.rates = rates
+        self.marks = marks
+        self.due_counts = due_counts
+
+    def __len__(self):
+        return len(self.times)
+
+    @classmethod
+    def build(cls, funding_history, price_series):
+        rows = len(price_series)
+        if funding_history is None or funding_history.empty:
+            return cls([], [], [], np.zeros(rows, dtype=np.int64))
+
+        times = list(funding_history["funding_time"])
+        rates = [float(rate) for rate in funding_history["funding_rate"]]
+        event_index = pd.DatetimeIndex(times)
+        marks = [float(mark) for mark in price_series.asof(event_index)]
+        # 逐条推进时，一条事件要等它和它之前所有事件的时间都不晚于当前 bar 才会结算
+        running_max = pd.DatetimeIndex(pd.Series(event_index).cummax())
+        due_counts = running_max.searchsorted(price_series.index, side="right").astype(np.int64)
+        return cls(times, rates, marks, due_counts)
@@ -0,0 +1,186 @@
+"""bar 内 TP/SL 歧义的细粒度重放。
+
+一根 5m K 线的最高、最低价同时越过 TP 与 SL 时，只看 OHLC 无法知道先到哪一个，resolve_intrabar_tp_sl 按
+BACKTEST_WORST_CASE_TP_SL 悲观处理。为整个回测窗口加载 1m 数据代价太大；这里在回测过程中遇到歧义 bar 时才取
+这一根 bar 内的细粒度 K 线（先读本地缓存，缺失才向交易所拉取并写入缓存），按时间顺序逐根判断，第一根触及的子 K 线
+决定出场原因和触发价。子 K 线内仍同时触及、或取不到细粒度数据时，退回原来的悲观口径。数据成本与歧义 bar 数成正比。
+"""
+import os
+import time
+import uuid
+from collections import Counter
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from backtest.backtest import resolve_intrabar_tp_sl
+from config import config
+from utils.utils import BASE_DIR, log_info
+
+
+BASE_BAR = pd.Timedelta(minutes=5)
+# 每次远程拉取后的间隔，避免歧义 bar 较多时触发交易所限频
+FETCH_PAUSE_SEC = 0.1
+
+# 同一进程内各 Backtester（参数扫描的候选）共用已加载的切片
+_MEMORY = {}
+
+
+class IntrabarCandleStore:
+    """细粒度 K 线的本地存储：每根被重放的基础 K 线一个 joblib 文件，内容为按时间排序的 (open, high, low) 数组。
+
+    fetch(start_ts, end_ts) 返回含 timestamp/open/high/low 列的 DataFrame；为 None 时只读本地缓存。
+    """
+
+    def __init__(self, cache_dir=None, interval=None, symbol=None, fetch=None):
+        cache_dir = cache_dir or getattr(config, "BACKTEST_INTRABAR_REPLAY_CACHE_DIR", "models/intrabar_candle_cache")
+        self.cache_dir = cache_dir if os.path.isabs(cache_dir) else os.path.join(BASE_DIR, cache_dir)
+        self.interval = str(interval or getattr(config, "BACKTEST_INTRABAR_REPLAY_INTERVAL", "1m"))
+        self.symbol = str(symbol or config.SYMBOL)
+        self.fetch = fetch
+        self.stats = Counter()
+
+    @classmethod
+    def from_settings(cls, settings):
+        fetch = None
+        if bool(settings.BACKTEST_INTRABAR_REPLAY_FETCH):
+            fetch = _okx_fetcher(settings.BACKTEST_INTRABAR_REPLAY_INTERVAL)
+        return cls(
+            settings.BACKTEST_INTRABAR_REPLAY_CACHE_DIR,
+            settings.BACKTEST_INTRABAR_REPLAY_INTERVAL,
+            config.SYMBOL,
+            fetch,
+        )
+
+    def _path(self, bar_start):
+        stamp = int(pd.Timestamp(bar_start).timestamp() * 1000)
+        return os.path.join(self.cache_dir, f"{self.symbol}_{self.interval}_{stamp}.joblib")
+
+    def candles(self, bar_start, bar_end=None):
+        """基础 K 线 [bar_start, bar_end) 内的细粒度 (open, high, low) 数组；取不到时返回 None。"""
+        bar_end = pd.Timestamp(bar_start) + BASE_BAR if bar_end is None else bar_end
+        path = self._path(bar_start)
+        if path in _MEMORY:
+            self.stats["memory"] += 1
+            return _MEMORY[path]
+        if os.path.exists(path):
+            try:
+                candles = joblib.load(path)
+            except Exception as exc:
+                log_info(f"⚠ 细粒度K线缓存读取失败，将重新拉取: {exc}")
+            else:
+                self.stats["disk"] += 1
+                _MEMORY[path] = candles
+                return candles
+        if self.fetch is None:
+            self.stats["missing"] += 1
+            return None
+
+        frame = self.fetch(pd.Timestamp(bar_start), pd.Timestamp(bar_end))
+        self.stats["fetched"] += 1
+        candles = self._slice(frame, bar_start, bar_end)
+        if candles is None:
+            # 没取到数据不写缓存，下次仍会尝试
+            self.stats["missing"] += 1
+            return None
+        self._write(path, candles)
+        _MEMORY[path] = candles
+        return candles
+
+    def _write(self, path, candles):
+        # 并行扫描的多个进程可能同时拉取同一根 bar：各写各的临时文件，重命名时后到者覆盖，内容相同
+        tmp_path = f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex}"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            joblib.dump(candles, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            # 输掉重命名竞争（目标已由别的进程写好）视为成功；其余写失败只影响缓存，不影响本次重放
+            if not os.path.exists(path):
+                log_info(f"⚠ 细粒度K线缓存写入失败: {exc}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _slice(frame, bar_start, bar_end):
+        if frame is None or frame.empty:
+            return None
+        timestamps = pd.DatetimeIndex(frame["timestamp"])
+        bar_start, bar_end = pd.Timestamp(bar_start), pd.Timestamp(bar_end)
+        if timestamps.tz is None and bar_start.tz is not None:
+            timestamps = timestamps.tz_localize(bar_start.tz)
+        inside = (timestamps >= bar_start) & (timestamps < bar_end)
+        if not inside.any():
+            return None
+        frame = frame.loc[inside].assign(_ts=timestamps[inside]).sort_values("_ts")
+        return frame[["open", "high", "low"]].to_numpy(dtype=float)
+
+
+def _okx_fetcher(interval):
+    client = None
+
+    def fetch(start_ts, end_ts):
+        nonlocal client
+        if client is None:
+            from core import okx_api
+
+            client = okx_api.OKXClient()
+        frame = client.fetch_ohlcv_window(start_ts, end_ts, bar=interval)
+        time.sleep(FETCH_PAUSE_SEC)
+        return frame
+
+    return fetch
+
+
+def replay_intrabar_tp_sl(position, entry_price, candles, take_profit, stop_loss, worst_case=True):
+    """按细粒度 K 线顺序重放：第一根触及 TP/SL 的子 K 线决定结果；都未触及时返回 None。"""
+    for bar_open, bar_high, bar_low in np.asarray(candles, dtype=float):
+        hit = resolve_intrabar_tp_sl(
+            position,
+            entry_price,
+            bar_open,
+            bar_high,
+            bar_low,
+            take_profit,
+            stop_loss,
+            worst_case=worst_case,
+        )
+        if hit is not None:
+            return hit
+    return None
+
+
+class IntrabarReplay:
+    """挂在 Backtester 上，供逐 bar 与数组引擎在 TP/SL 同时触及时调用；stats 进入回测 summary。"""
+
+    def __init__(self, store):
+        self.store = store
+        self.stats = Counter()
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(IntrabarCandleStore.from_settings(settings))
+
+    def resolve(self, bar_start, coarse_hit, position, entry_price, take_profit, stop_loss, worst_case=True):
+        """coarse_hit 为 resolve_intrabar_tp_sl 的结果；只对歧义 bar 重放，其余原样返回。"""
+        if coarse_hit is None or not coarse_hit.get("ambiguous"):
+            return coarse_hit
+        self.stats["ambiguous"] += 1
+        candles = self.store.candles(bar_start)
+        if candles is None:
+            self.stats["no_data"] += 1
+            return coarse_hit
+        hit = replay_intrabar_tp_sl(position, entry_price, candles, take_profit, stop_loss, worst_case=worst_case)
+        if hit is None:
+            # 细粒度数据与基础 K 线的高低点不一致（如缺根），不猜测
+            self.stats["unresolved"] += 1
+            return coarse_hit
+        self.stats["replayed"] += 1
+        if hit["reason"] != coarse_hit["reason"]:
+            self.stats[f"{coarse_hit['reason'].lower()}_to_{hit['reason'].lower()}"] += 1
+        return {**hit, "replayed": True}
+
+    def summary(self):
+        return {**dict(self.stats), **{f"store_{key}": int(value) for key, value in self.store.stats.items()}}
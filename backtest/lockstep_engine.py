@@ -0,0 +1,582 @@
+"""多候选同步（lockstep）回测引擎。
+
+阈值类参数扫描的候选只在阈值、最小目标仓位、仓位概率中心、TP/SL 系数等参数上不同，行情、概率和趋势/regime
+上下文完全相同。这里对一组候选只算一次市场数组（build_market_arrays），各候选的目标仓位、TP/SL 和入场拦截
+按列预计算后堆成 (bar, 候选) 矩阵；所有候选的仓位状态以长度为 N 的数组逐 bar 同步推进，开/平/调仓、bar 内 TP/SL、
+资金费、手续费和滑点都在候选维度上向量化，只有当 bar 真正成交的候选才进入 Python 记账。
+
+决策状态机与 backtest.array_engine.run_array_backtest 逐位一致，同样不统计逐 bar 原因分布等诊断。
+趋势/regime 相关配置（MARKET_CONFIG_KEYS）不同的候选自动分组，每组各自同步推进。
+"""
+import contextlib
+import io
+from collections import Counter
+
+import numpy as np
+
+from backtest.array_engine import (
+    CLOSE_OTHER,
+    CLOSE_STOP_LOSS,
+    CLOSE_TAKE_PROFIT,
+    DIRECTION_LONG,
+    DIRECTION_SHORT,
+    build_candidate_arrays,
+    build_market_arrays,
+    decision_context_counts,
+    ensure_probabilities,
+    finish_backtest,
+    funding_schedule,
+)
+from backtest.settings import BacktestSettings
+from backtest.sweep import build_candidate_backtester, normalize_candidate
+from utils.utils import log_error, log_info
+
+
+# build_market_arrays 依赖的配置；取值相同的候选才能共用同一份市场数组
+MARKET_CONFIG_KEYS = (
+    "TREND_FILTER_INTERVAL",
+    "TREND_FILTER_FAST_COL",
+    "TREND_FILTER_SLOW_COL",
+    "TREND_FILTER_MIN_GAP",
+    "REGIME_TREND_GAP_THRESHOLD",
+    "REGIME_HIGH_VOL_ATR_THRESHOLD",
+    "REGIME_HIGH_VOLATILITY_THRESHOLD",
+    "REGIME_MONEY_FLOW_EXTREME_THRESHOLD",
+)
+ACTION_NAMES = ("HOLD", "CLOSE", "OPEN", "REBALANCE")
+
+
+def _param(values, dtype=float):
+    return np.asarray(list(values), dtype=dtype)
+
+
+def _fill(price, long_side, slip_ratio, bar_low, bar_high):
+    """Backtester._fill_price 的按候选版本；long_side 为买入方向。"""
+    return np.where(
+        long_side,
+        np.minimum(price * (1 + slip_ratio), bar_high),
+        np.maximum(price * (1 - slip_ratio), bar_low),
+    )
+
+
+def run_lockstep_backtests(backtesters):
+    """让一组 Backtester 在同一份行情上同步推进，状态写回各自对象，返回与 run_backtest 同结构的 summary 列表。
+
+    所有 Backtester 须处于初始状态、共用同一份数据和资金费历史，且 MARKET_CONFIG_KEYS 取值一致。
+    """
+    backtesters = list(backtesters)
+    if not backtesters:
+        return []
+    for backtester in backtesters:
+        ensure_probabilities(backtester)
+    lead = backtesters[0]
+    if len(lead.data) < 2:
+        log_error("回测样本不足，无法使用已收盘信号 -> 下一根开盘成交的模式")
+        return [None] * len(backtesters)
+
+    market = build_market_arrays(lead)
+    ratio_cache = {}
+    candidate_arrays = [build_candidate_arrays(backtester, market, ratio_cache) for backtester in backtesters]
+
+    def stack(key, dtype=float):
+        return np.ascontiguousarray(np.stack([arrays[key] for arrays in candidate_arrays], axis=1), dtype=dtype)
+
+    take_profits = stack("take_profit")
+    stop_losses = stack("stop_loss")
+    targets = stack("target")
+    raw_targets = stack("raw_target")
+    raw_directions = stack("raw_direction", dtype=np.int64)
+    entry_blocked = stack("entry_blocked", dtype=bool)
+    loss_guard_regime = stack("loss_guard_exit_regime", dtype=bool)
+
+    cores = [backtester.core for backtester in backtesters]
+    min_adjust = _param(core.min_adjust_amount for core in cores)
+    min_hold = _param((core.min_hold_bars for core in cores), np.int64)
+    add_threshold = _param(core.add_threshold for core in cores)
+    max_rebalance = _param(core.max_rebalance_ratio for core in cores)
+    reverse_min_gap = _param(core.reverse_signal_min_prob_diff for core in cores)
+    reverse_min_ratio = _param(core.reverse_min_target_ratio for core in cores)
+    reverse_exit_bars = _param((core.reverse_exit_consecutive_bars for core in cores), np.int64)
+    trade_cooldown = _param((core._next_trade_cooldown() for core in cores), np.int64)
+    take_profit_cooldown = _param((core._next_trade_cooldown("TakeProfit") for core in cores), np.int64)
+    stop_loss_cooldown = _param((core._next_trade_cooldown("StopLoss") for core in cores), np.int64)
+    intrabar_cooldown = _param((int(bt.settings.TRADE_COOLDOWN_BARS) for bt in backtesters), np.int64)
+    guard_min_hold = _param((core.loss_guard_exit_min_hold_bars for core in cores), np.int64)
+    guard_only_unprofitable = _param((core.loss_guard_exit_only_when_unprofitable for core in cores), bool)
+    guard_min_loss = _param(core.loss_guard_exit_min_unrealized_loss for core in cores)
+    guard_confirm = _param((core.loss_guard_exit_confirm_bars for core in cores), np.int64)
+    block_losing_adds = _param((core.block_losing_position_adds for core in cores), bool)
+    slip_ratio = _param(bt.slippage_bps / 10000.0 for bt in backtesters)
+    fee_rate = _param(bt.fee_rate for bt in backtesters)
+    intrabar = _param((bt.enable_intrabar_tp_sl for bt in backtesters), bool)
+    worst_case = _param((bt.worst_case_tp_sl for bt in backtesters), bool)
+    replays = [bt.intrabar_replay for bt in backtesters]
+    has_replay = np.array([replay is not None for replay in replays], dtype=bool)
+
+    funding_times, funding_rates, funding_marks, funding_due = funding_schedule(lead)
+    funding_index = lead.next_funding_idx
+
+    position = _param(float(bt.position) for bt in backtesters)
+    entry = _param(float(bt.entry_price) for bt in backtesters)
+    hold = _param((int(bt.hold_bars) for bt in backtesters), np.int64)
+    cooldown = _param((int(core.cooldown_bars_remaining) for core in cores), np.int64)
+    reverse_bars = _param((int(core.reverse_signal_bars) for core in cores), np.int64)
+    loss_guard_bars = _param((int(core.loss_guard_exit_bars) for core in cores), np.int64)
+    balance = _param(float(bt.balance) for bt in backtesters)
+    last_closed_balance = _param(float(bt.last_closed_balance) for bt in backtesters)
+    max_balance = _param(float(bt.max_balance) for bt in backtesters)
+    max_drawdown = _param(float(bt.max_drawdown) for bt in backtesters)
+    final_equity = _param(float(bt.final_equity) for bt in backtesters)
+    size = len(backtesters)
+    fees = np.zeros(size)
+    slippage = np.zeros(size)
+    funding_total = np.zeros(size)
+    tp_exits = np.zeros(size, dtype=np.int64)
+    sl_exits = np.zeros(size, dtype=np.int64)
+    active_direction = [bt.active_trade_direction for bt in backtesters]
+    active_regime = [bt.active_trade_entry_regime for bt in backtesters]
+    trade_logs = [[] for _ in backtesters]
+    funding_logs = [[] for _ in backtesters]
+    closed_pnls = [[] for _ in backtesters]
+    closed_details = [[] for _ in backtesters]
+    valid_rows = []
+    last_regime = None
+
+    labels = market["labels"]
+    valid = market["valid"].tolist()
+    prices = market["price"].tolist()
+    highs = market["high"].tolist()
+    lows = market["low"].tolist()
+    closes = market["close"].tolist()
+    regimes = market["regimes"].tolist()
+
+    def close_trade(j, exit_regime):
+        net_pnl = float(balance[j] - last_closed_balance[j])
+        closed_pnls[j].append(net_pnl)
+        direction = active_direction[j]
+        if direction not in {"long", "short"} and position[j] != 0:
+            direction = "long" if position[j] > 0 else "short"
+        closed_details[j].append({
+            "net_pnl_after_costs": net_pnl,
+            "direction": direction or "unknown",
+            "entry_regime": active_regime[j] or "unknown",
+            "exit_regime": str(exit_regime or "unknown"),
+        })
+        last_closed_balance[j] = balance[j]
+
+    def close_intrabar(index, take_profit, stop_loss, price, bar_high, bar_low, label, regime):
+        """resolve_intrabar_tp_sl 的按候选版本，命中的候选按触发价平仓。"""
+        qty = position[index]
+        held_entry = entry[index]
+        long_side = qty > 0
+        tp_ratio = take_profit[index]
+        sl_ratio = stop_loss[index]
+        tp_price = np.where(long_side, held_entry * (1 + tp_ratio), held_entry * (1 - tp_ratio))
+        sl_price = np.where(long_side, held_entry * (1 - sl_ratio), held_entry * (1 + sl_ratio))
+        hit_tp = np.where(
+            long_side,
+            (price >= tp_price) | (bar_high >= tp_price),
+            (price <= tp_price) | (bar_low <= tp_price),
+        )
+        hit_sl = np.where(
+            long_side,
+            (price <= sl_price) | (bar_low <= sl_price),
+            (price >= sl_price) | (bar_high >= sl_price),
+        )
+        hit = hit_tp | hit_sl
+        if not hit.any():
+            return
+        index = index[hit]
+        qty = qty[hit]
+        held_entry = held_entry[hit]
+        long_side = long_side[hit]
+        is_stop = hit_sl[hit] & (~hit_tp[hit] | worst_case[index])
+        tp_price = tp_price[hit]
+        sl_price = sl_price[hit]
+        trigger = np.where(
+            long_side,
+            np.where(is_stop, np.minimum(price, sl_price), np.maximum(price, tp_price)),
+            np.where(is_stop, np.maximum(price, sl_price), np.minimum(price, tp_price)),
+        )
+        if has_replay.any():
+            # TP/SL 同时触及的候选逐个按细粒度 K 线重放，细粒度切片在候选之间共用
+            ambiguous = hit_tp[hit] & hit_sl[hit] & has_replay[index]
+            for k in np.flatnonzero(ambiguous).tolist():
+                coarse = {"reason": "SL" if is_stop[k] else "TP", "trigger_price": float(trigger[k]), "ambiguous": True}
+                replayed = replays[int(index[k])].resolve(
+                    label,
+                    coarse,
+                    float(qty[k]),
+                    float(held_entry[k]),
+                    float(tp_ratio[hit][k]),
+                    float(sl_ratio[hit][k]),
+                    worst_case=bool(worst_case[index[k]]),
+                )
+                is_stop[k] = replayed["reason"] == "SL"
+                trigger[k] = replayed["trigger_price"]
+        exec_price = _fill(trigger, ~long_side, slip_ratio[index], bar_low, bar_high)
+        balance[index] += (exec_price - held_entry) * qty
+        fee = np.abs(qty * exec_price * fee_rate[index])
+        balance[index] -= fee
+        fees[index] += fee
+        slippage[index] += np.abs(qty) * np.abs(exec_price - trigger)
+        sl_exits[index] += is_stop
+        tp_exits[index] += ~is_stop
+        for k, j in enumerate(index.tolist()):
+            close_trade(j, regime)
+            trade_logs[j].append(
+                (label, "止损" if is_stop[k] else "止盈", float(exec_price[k]), float(qty[k]), float(balance[j]))
+            )
+            active_direction[j] = active_regime[j] = None
+        position[index] = 0.0
+        entry[index] = 0.0
+        hold[index] = 0
+        cooldown[index] = intrabar_cooldown[index]
+        reverse_bars[index] = 0
+        loss_guard_bars[index] = 0
+
+    # 与仓位状态无关的判断提前按 (bar, 候选) 矩阵算好，循环里只剩依赖状态的部分
+    raw_target_abs = np.abs(raw_targets)
+    reverse_is_strong = (
+        (raw_target_abs > 0)
+        & (market["prob_gap"][:, None] >= reverse_min_gap)
+        & (raw_target_abs >= reverse_min_ratio)
+    )
+    reverse_against_long = raw_directions == DIRECTION_SHORT
+    reverse_against_short = raw_directions == DIRECTION_LONG
+    guard_any = loss_guard_regime.any(axis=1).tolist()
+    blocked_any = entry_blocked.any(axis=1).tolist()
+    check_intrabar = bool(intrabar.any())
+    hold_counts = np.zeros(size, dtype=np.int64)
+    close_counts = np.zeros(size, dtype=np.int64)
+    open_counts = np.zeros(size, dtype=np.int64)
+    rebalance_counts = np.zeros(size, dtype=np.int64)
+    errstate = np.errstate(divide="ignore", invalid="ignore")
+    errstate.__enter__()
+    try:
+        for i in range(len(labels)):
+            if not valid[i]:
+                continue
+            valid_rows.append(i)
+            label = labels[i]
+            regime = regimes[i]
+            last_regime = regime
+
+            while funding_index < funding_due[i]:
+                holding = np.flatnonzero(position != 0)
+                if holding.size:
+                    mark = funding_marks[funding_index]
+                    funding_pnl = -position[holding] * mark * funding_rates[funding_index]
+                    balance[holding] += funding_pnl
+                    funding_total[holding] += funding_pnl
+                    for j in holding.tolist():
+                        funding_logs[j].append(
+                            (funding_times[funding_index], "资金费", mark, float(position[j]), float(balance[j]))
+                        )
+                funding_index += 1
+
+            price = prices[i]
+            bar_high = highs[i]
+            bar_low = lows[i]
+            pos = position.copy()
+            has_pos = pos != 0
+            any_position = bool(has_pos.any())
+            if any_position:
+                flat = ~has_pos | (entry <= 0)
+                reverse_bars[flat] = 0
+                loss_guard_bars[flat] = 0
+                equity = np.where(flat, balance, balance + (price - entry) * position)
+            else:
+                reverse_bars[:] = 0
+                loss_guard_bars[:] = 0
+                equity = balance.copy()
+            target_position = targets[i] * equity / price
+            blocked = entry_blocked[i]
+
+            # ===== StrategyCore.on_bar：空仓候选 =====
+            is_flat = ~has_pos
+            notional = np.abs(target_position * price)
+            opening = is_flat & (cooldown <= 0) & (notional >= min_adjust) & (target_position != 0)
+            if blocked_any[i]:
+                opening &= ~(blocked & (np.maximum(notional, raw_target_abs[i] * equity) >= min_adjust))
+            flat_hold = is_flat & ~opening
+
+            # ===== StrategyCore.on_bar：持仓候选 =====
+            closing = rebalancing = keeping = None
+            if any_position:
+                take_profit = take_profits[i]
+                stop_loss = stop_losses[i]
+                is_long = pos > 0
+                is_short = pos < 0
+                pnl_pct = np.where(is_long, (price - entry) / entry, (entry - price) / entry)
+                take_profit_hit = has_pos & (pnl_pct >= take_profit)
+                stop_loss_hit = has_pos & ~take_profit_hit & (pnl_pct <= -stop_loss)
+                close_reason = np.where(take_profit_hit, CLOSE_TAKE_PROFIT, np.where(stop_loss_hit, CLOSE_STOP_LOSS, 0))
+                position_pnl = np.where(entry > 0, pnl_pct, 0.0)
+                next_guard = np.zeros(size, dtype=np.int64)
+                if guard_any[i]:
+                    guard_regime = loss_guard_regime[i]
+                    guard_exit = (
+                        has_pos
+                        & (close_reason == 0)
+                        & guard_regime
+                        & (hold >= guard_min_hold)
+                        & ~(guard_only_unprofitable & (pnl_pct >= 0))
+                        & ~((guard_min_loss > 0) & (pnl_pct > -guard_min_loss))
+                        & ~((guard_confirm > 1) & (loss_guard_bars + 1 < guard_confirm))
+                    )
+                    close_reason[guard_exit] = CLOSE_OTHER
+                    guard_candidate = (
+                        guard_regime
+                        & (hold >= guard_min_hold)
+                        & (~guard_only_unprofitable | (position_pnl < 0))
+                        & ((guard_min_loss <= 0) | (position_pnl <= -guard_min_loss))
+                    )
+                    next_guard = np.where(guard_candidate, loss_guard_bars + 1, 0)
+
+                in_position = has_pos & (close_reason == 0)
+                same_direction = (is_long & (target_position > 0)) | (is_short & (target_position < 0))
+                raw_reverse = (is_long & reverse_against_long[i]) | (is_short & reverse_against_short[i])
+                next_reverse = np.where(raw_reverse, reverse_bars + 1, 0)
+                reverse_close = in_position & (
+                    (~same_direction & reverse_is_strong[i])
+                    | ((reverse_exit_bars > 0) & raw_reverse & (next_reverse >= reverse_exit_bars))
+                )
+                close_reason[reverse_close] = CLOSE_OTHER
+                closing = close_reason != 0
+                keeping = in_position & ~reverse_close
+                next_hold = hold + 1
+                adjustable = keeping & (next_hold >= min_hold) & same_direction & (cooldown <= 0)
+                if adjustable.any():
+                    raw_delta = target_position - pos
+                    pos_sign = np.sign(pos)
+                    cap = max_rebalance * np.abs(pos)
+                    candidate = np.minimum(np.maximum(raw_delta, -cap), cap)
+                    rebalancing = (
+                        adjustable
+                        & (np.abs(raw_delta / np.maximum(np.abs(pos), 1e-9)) >= add_threshold)
+                        & (np.abs(candidate * price) >= min_adjust)
+                        & ~(block_losing_adds & (np.sign(candidate) == pos_sign) & (entry > 0) & (position_pnl < 0))
+                    )
+                    if blocked_any[i]:
+                        rebalancing &= ~(
+                            blocked & (np.sign(raw_delta) == pos_sign) & (np.abs(raw_delta * price) >= min_adjust)
+                        )
+                    keeping &= ~rebalancing
+                    rebalance_counts += rebalancing
+                    if not rebalancing.any():
+                        rebalancing = None
+                close_counts += closing
+                hold_counts += keeping
+                if not closing.any():
+                    closing = None
+                if keeping.any():
+                    hold[keeping] = next_hold[keeping]
+                    cooldown[keeping] = np.maximum(0, cooldown[keeping] - 1)
+                    reverse_bars[keeping] = next_reverse[keeping]
+                    loss_guard_bars[keeping] = next_guard[keeping]
+            open_counts += opening
+            hold_counts += flat_hold
+
+            # ===== 不成交的空仓候选：推进冷却 =====
+            if flat_hold.any():
+                position[flat_hold] = 0.0
+                entry[flat_hold] = 0.0
+                hold[flat_hold] = 0
+                cooldown[flat_hold] = np.maximum(0, cooldown[flat_hold] - 1)
+
+            # ===== Backtester 执行 =====
+            if closing is not None:
+                index = np.flatnonzero(closing)
+                qty = pos[index]
+                exec_price = _fill(price, qty <= 0, slip_ratio[index], bar_low, bar_high)
+                balance[index] += (exec_price - entry[index]) * qty
+                fee = np.abs(qty * exec_price * fee_rate[index])
+                balance[index] -= fee
+                fees[index] += fee
+                slippage[index] += np.abs(qty) * np.abs(exec_price - price)
+                reasons = close_reason[index]
+                for k, j in enumerate(index.tolist()):
+                    close_trade(j, regime)
+                    trade_label = "平仓" if reasons[k] in (CLOSE_TAKE_PROFIT, CLOSE_STOP_LOSS) else "反向平仓"
+                    trade_logs[j].append((label, trade_label, float(exec_price[k]), float(qty[k]), float(balance[j])))
+                    active_direction[j] = active_regime[j] = None
+                position[index] = 0.0
+                entry[index] = 0.0
+                hold[index] = 0
+                cooldown[index] = np.where(
+                    reasons == CLOSE_TAKE_PROFIT,
+                    take_profit_cooldown[index],
+                    np.where(reasons == CLOSE_STOP_LOSS, stop_loss_cooldown[index], trade_cooldown[index]),
+                )
+                reverse_bars[index] = 0
+                loss_guard_bars[index] = 0
+
+            if opening.any():
+                index = np.flatnonzero(opening)
+                delta = target_position[index]
+                exec_price = _fill(price, delta > 0, slip_ratio[index], bar_low, bar_high)
+                fee = np.abs(delta * exec_price * fee_rate[index])
+                balance[index] -= fee
+                fees[index] += fee
+                slippage[index] += np.abs(delta) * np.abs(exec_price - price)
+                position[index] = delta
+                entry[index] = exec_price
+                hold[index] = 0
+                cooldown[index] = trade_cooldown[index]
+                for k, j in enumerate(index.tolist()):
+                    active_direction[j] = "long" if delta[k] > 0 else "short"
+                    active_regime[j] = regime
+                    trade_logs[j].append(
+                        (label, "开多" if delta[k] > 0 else "开空", float(exec_price[k]), float(delta[k]), float(balance[j]))
+                    )
+
+            if rebalancing is not None:
+                index = np.flatnonzero(rebalancing)
+                old_pos = pos[index]
+                old_entry = entry[index]
+                delta = candidate[index]
+                new_pos = old_pos + delta
+                buy = np.where(old_pos > 0, delta > 0, ~(delta < 0))
+                exec_price = _fill(price, buy, slip_ratio[index], bar_low, bar_high)
+                reducing = np.sign(delta) != np.sign(old_pos)
+                reduced_qty = np.where(reducing, np.minimum(np.abs(delta), np.abs(old_pos)), 0.0)
+                balance[index] = np.where(
+                    reducing,
+                    balance[index] + (exec_price - old_entry) * np.copysign(reduced_qty, old_pos),
+                    balance[index],
+                )
+                fee = np.abs(delta * exec_price * fee_rate[index])
+                balance[index] -= fee
+                fees[index] += fee
+                slippage[index] += np.abs(delta) * np.abs(exec_price - price)
+                for k, j in enumerate(index.tolist()):
+                    if reduced_qty[k] > 0:
+                        close_trade(j, regime)
+                new_entry = np.where(
+                    np.abs(new_pos) > np.abs(old_pos),
+                    ((np.abs(old_pos) * old_entry) + (np.abs(delta) * exec_price))
+                    / np.maximum(np.abs(old_pos) + np.abs(delta), 1e-9),
+                    old_entry,
+                )
+                position[index] = new_pos
+                entry[index] = new_entry
+                hold[index] += 1
+                cooldown[index] = trade_cooldown[index]
+                emptied = index[(new_pos == 0) | (new_entry <= 0)]
+                reverse_bars[emptied] = 0
+                loss_guard_bars[emptied] = 0
+                for k, j in enumerate(index.tolist()):
+                    if active_direction[j] is None and new_pos[k] != 0:
+                        active_direction[j] = "long" if new_pos[k] > 0 else "short"
+                        active_regime[j] = regime
+                    if new_pos[k] > 0:
+                        trade_label = "加多" if delta[k] > 0 else "减多"
+                    else:
+                        trade_label = "减空" if delta[k] > 0 else "加空"
+                    trade_logs[j].append(
+                        (label, trade_label, float(exec_price[k]), float(new_pos[k]), float(balance[j]))
+                    )
+
+            # ===== bar 内 TP/SL（resolve_intrabar_tp_sl 的按候选版本）=====
+            if check_intrabar:
+                index = np.flatnonzero(intrabar & (position != 0) & (entry > 0))
+                if index.size:
+                    close_intrabar(index, take_profits[i], stop_losses[i], price, bar_high, bar_low, label, regime)
+
+            if any_position or opening.any():
+                flat = (position == 0) | (entry <= 0)
+                final_equity = np.where(flat, balance, balance + (closes[i] - entry) * position)
+                max_balance = np.maximum(max_balance, final_equity)
+                max_drawdown = np.where(
+                    max_balance > 0,
+                    np.minimum(max_drawdown, (final_equity - max_balance) / max_balance),
+                    max_drawdown,
+                )
+            else:
+                # 全部空仓且未成交：权益即余额，峰值和回撤不变
+                final_equity = balance.copy()
+    finally:
+        errstate.__exit__(None, None, None)
+    action_counts = np.stack([hold_counts, close_counts, open_counts, rebalance_counts], axis=1)
+
+    context_counts = None
+    if any(backtester.record_decisions for backtester in backtesters):
+        context_counts = decision_context_counts(
+            {
+                "regimes": regimes,
+                "trend_biases": market["trend_biases"].tolist(),
+                "directions": np.where(market["is_long"], "long", "short").tolist(),
+            },
+            valid_rows,
+        )
+    summaries = []
+    for j, backtester in enumerate(backtesters):
+        state = {
+            "position": float(position[j]),
+            "entry": float(entry[j]),
+            "hold": int(hold[j]),
+            "cooldown": int(cooldown[j]),
+            "reverse_bars": int(reverse_bars[j]),
+            "loss_guard_bars": int(loss_guard_bars[j]),
+            "balance": float(balance[j]),
+            "last_closed_balance": float(last_closed_balance[j]),
+            "final_equity": float(final_equity[j]),
+            "max_balance": float(max_balance[j]),
+            "max_drawdown": float(max_drawdown[j]),
+            "fees": float(fees[j]),
+            "slippage": float(slippage[j]),
+            "funding_total": float(funding_total[j]),
+            "tp_exits": int(tp_exits[j]),
+            "sl_exits": int(sl_exits[j]),
+            "funding_index": funding_index,
+            "active_direction": active_direction[j],
+            "active_regime": active_regime[j],
+            "trade_log": trade_logs[j],
+            "funding_log": funding_logs[j],
+            "closed_pnls": closed_pnls[j],
+            "closed_details": closed_details[j],
+            "actions": Counter({
+                name: int(count) for name, count in zip(ACTION_NAMES, action_counts[j]) if count
+            }),
+        }
+        summaries.append(finish_backtest(backtester, state, context_counts, last_regime))
+    return summaries
+
+
+def iter_lockstep_sweep(backtester_kwargs, candidates, *, summarize=None, cache=None):
+    """与 backtest.sweep.iter_sweep 相同的接口：按候选顺序产出 (name, overrides, result)。
+
+    全部候选在当前进程内同步回测后再依次产出；summarize(backtester, summary) 可裁剪结果。
+    cache（ResultCacheScope）命中的候选不参与同步回测。
+    """
+    seed_settings = BacktestSettings.from_overrides(backtester_kwargs.get("settings"))
+    candidates = [normalize_candidate(candidate, seed_settings) for candidate in candidates]
+    if not candidates:
+        return
+    results = [cache.get(overrides, name=name) if cache is not None else None for name, overrides in candidates]
+    backtesters = {}
+    groups = {}
+    for index, (_, overrides) in enumerate(candidates):
+        if results[index] is not None:
+            continue
+        backtester = build_candidate_backtester(backtester_kwargs, overrides)
+        if backtesters:
+            # 候选之间只读共用同一份行情，避免每个候选各持有一份拷贝
+            backtester.data = next(iter(backtesters.values())).data
+        backtesters[index] = backtester
+        key = tuple(repr(getattr(backtester.settings, name)) for name in MARKET_CONFIG_KEYS)
+        groups.setdefault(key, []).append(index)
+    log_info(f"同步回测参数扫描: candidates={len(candidates)} pending={len(backtesters)} groups={len(groups)}")
+
+    for indices in groups.values():
+        group = [backtesters[index] for index in indices]
+        with contextlib.redirect_stdout(io.StringIO()):
+            summaries = run_lockstep_backtests(group)
+        for index, backtester, summary in zip(indices, group, summaries):
+            results[index] = summarize(backtester, summary) if summarize is not None else summary
+            if cache is not None:
+                name, overrides = candidates[index]
+                cache.put(overrides, results[index], name=name)
+    for (name, overrides), result in zip(candidates, results):
+        yield name, overrides, result
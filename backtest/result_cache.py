@@ -0,0 +1,319 @@
+"""跨运行的回测结果缓存（按内容寻址）。
+
+key = sha256(缓存版本, 结果类型, 引擎与回测源码哈希, 行情/特征数据内容哈希, 特征列 key, 模型产物 sha256、推理源码哈希与融合配置,
+资金费历史, 归一化后的覆盖项, 影响回测的全局配置快照)。任一输入变化都会换 key，旧结果只会因淘汰而删除。
+使用预计算概率的回测（参数扫描）结果只取决于数据本身，不需要模型产物哈希；要由模型现算概率的回测必须给出
+产物哈希，否则不缓存。每条结果旁边写一份 JSON 元数据（数据区间、覆盖项、核心指标），供查询 CLI 列表与对比。
+"""
+import functools
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime
+
+import joblib
+
+from backtest.settings import BacktestSettings
+from config import config
+from core.prediction_cache import feature_cache_key, fusion_key, inference_code_hash
+from train.pipeline import code_fingerprint, fingerprint_value
+from utils.utils import BASE_DIR, log_info
+
+
+RESULT_CACHE_VERSION = 1
+
+# 回测结果依赖的源码；任一文件变化即视为引擎版本变化
+BACKTEST_CODE_PATHS = (
+    "backtest/backtest.py",
+    "backtest/array_engine.py",
+    "backtest/lockstep_engine.py",
+    "backtest/decision_log.py",
+    "backtest/funding.py",
+    "backtest/intrabar_replay.py",
+    "backtest/settings.py",
+    "core/strategy_core.py",
+    "core/position_manager.py",
+    "core/trend_filter.py",
+    "core/regime_filter.py",
+    "core/dynamic_risk.py",
+    "core/reward_risk.py",
+    "core/signal_engine.py",
+    "core/prediction_cache.py",
+)
+
+# 这些配置不影响单次回测的结果（通知、实盘连接、扫参调度、缓存自身），不进入 key
+CONFIG_EXCLUDED_PREFIXES = (
+    "TELEGRAM_",
+    "OKX_",
+    "DAILY_REPORT_",
+    "MODEL_WALK_FORWARD_",
+    "MODEL_RETRAIN_",
+    "MODEL_PIPELINE_",
+    "MODEL_TRAIN_",
+    "PREDICTION_CACHE_",
+    "BACKTEST_RESULT_CACHE_",
+    "BACKTEST_SWEEP_",
+)
+
+HEADLINE_KEYS = (
+    "final_equity",
+    "return_pct",
+    "max_drawdown_pct",
+    "trade_count",
+    "closed_trade_count",
+    "win_rate_pct",
+    "profit_factor",
+    "net_pnl_after_costs",
+    "fees_paid",
+    "slippage_cost",
+    "funding_pnl",
+)
+
+RESULT_SUFFIX = ".joblib"
+META_SUFFIX = ".json"
+
+
+def result_cache_enabled():
+    return bool(getattr(config, "BACKTEST_RESULT_CACHE_ENABLED", True))
+
+
+def _json_default(value):
+    item = getattr(value, "item", None)
+    return item() if callable(item) else repr(value)
+
+
+def _plain(value):
+    """转成纯 JSON 值（numpy 标量转 Python 标量），用于 key、比较与元数据。"""
+    return json.loads(json.dumps(value, sort_keys=True, default=_json_default))
+
+
+def _sha256_json(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def backtest_code_hash():
+    return code_fingerprint(BACKTEST_CODE_PATHS)
+
+
+def backtest_config_snapshot():
+    return {
+        name: _plain(getattr(config, name))
+        for name in sorted(dir(config))
+        if name.isupper() and not name.startswith("_") and not name.startswith(CONFIG_EXCLUDED_PREFIXES)
+    }
+
+
+def normalized_overrides(settings):
+    """只保留与当前全局配置不同的覆盖项：{THRESHOLD_LONG: 现值} 与 {} 视为同一组参数。"""
+    settings = BacktestSettings.from_overrides(settings)
+    return {
+        key: _plain(value)
+        for key, value in sorted(settings.as_dict().items())
+        if _plain(value) != _plain(getattr(config, key))
+    }
+
+
+def _tmp_path(path):
+    return f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex}"
+
+
+def _cacheable(result):
+    # bar 内重放缺细粒度数据时按悲观口径结算；数据之后可能补齐，这样的结果不能按 key 复用
+    replay = result.get("intrabar_replay") if isinstance(result, dict) else None
+    return not (isinstance(replay, dict) and int(replay.get("no_data", 0) or 0) > 0)
+
+
+def _headline(result):
+    if not isinstance(result, dict):
+        return {}
+    return {key: _plain(result[key]) for key in HEADLINE_KEYS if key in result}
+
+
+class ResultCacheScope:
+    """一份种子数据 + 一种结果类型下的缓存视图：数据与模型部分的哈希只算一次，每个候选只追加覆盖项。
+
+    statuses 记录本次按名字查询到的命中情况（hit/miss），供调用方写日志。
+    """
+
+    def __init__(self, store, base, seed_settings, describe):
+        self.store = store
+        self.base = base
+        self.seed_settings = BacktestSettings.from_overrides(seed_settings)
+        self.describe = describe
+        self.statuses = {}
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _settings(self, overrides):
+        return {**self.seed_settings.as_dict(), **dict(overrides or {})}
+
+    def key(self, overrides=None):
+        return _sha256_json({**self.base, "overrides": normalized_overrides(self._settings(overrides))})
+
+    def get(self, overrides=None, name=None):
+        result = self.store.load(self.key(overrides))
+        hit = result is not None
+        self.stats["hits" if hit else "misses"] += 1
+        if name is not None:
+            self.statuses[name] = "hit" if hit else "miss"
+        return result
+
+    def put(self, overrides, result, name=None):
+        """写入一条结果并返回 key；结果依赖当时取不到的外部数据时不缓存，返回 None。"""
+        if not _cacheable(result):
+            self.stats["uncached"] = self.stats.get("uncached", 0) + 1
+            return None
+        key = self.key(overrides)
+        meta = {
+            **self.describe,
+            "key": key,
+            "name": name,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "overrides": normalized_overrides(self._settings(overrides)),
+            "headline": _headline(result),
+        }
+        self.store.save(key, result, meta)
+        return key
+
+
+class BacktestResultStore:
+    """一条结果一个 joblib 文件（结果本身）+ 一个 JSON 文件（元数据），按最近使用时间保留 keep 条。"""
+
+    def __init__(self, cache_dir=None, *, keep=None):
+        if cache_dir is None:
+            cache_dir = getattr(config, "BACKTEST_RESULT_CACHE_DIR", "models/backtest_result_cache")
+        self.cache_dir = cache_dir if os.path.isabs(cache_dir) else os.path.join(BASE_DIR, cache_dir)
+        self.keep = max(1, int(getattr(config, "BACKTEST_RESULT_CACHE_KEEP", 5000) if keep is None else keep))
+
+    @classmethod
+    def open_scope(cls, backtester_kwargs, *, kind, engine, artifact_hashes=None, precomputed_probabilities=False, **kwargs):
+        """缓存开启且结果可确定时返回 scope，否则返回 None。"""
+        if not result_cache_enabled():
+            return None
+        return cls(**kwargs).scope(
+            backtester_kwargs,
+            kind=kind,
+            engine=engine,
+            artifact_hashes=artifact_hashes,
+            precomputed_probabilities=precomputed_probabilities,
+        )
+
+    def scope(self, backtester_kwargs, *, kind, engine, artifact_hashes=None, precomputed_probabilities=False):
+        data = backtester_kwargs.get("precomputed_data")
+        if data is None:
+            return None
+        if not precomputed_probabilities and not artifact_hashes:
+            # 由模型现算概率、又无法确定模型产物时，结果不可寻址
+            return None
+        base = {
+            "version": RESULT_CACHE_VERSION,
+            "kind": str(kind),
+            "engine": str(engine),
+            "code": backtest_code_hash(),
+            "data": fingerprint_value(data),
+            "features": feature_cache_key(backtester_kwargs.get("feature_cols") or []),
+            "artifacts": None if precomputed_probabilities else dict(artifact_hashes),
+            # 产物哈希不变时推理代码也可能改了，现算概率的回测还要按推理源码分 key
+            "inference_code": None if precomputed_probabilities else inference_code_hash(),
+            "fusion": None if precomputed_probabilities else fusion_key(
+                backtester_kwargs.get("model_weights"),
+                getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {}),
+                backtester_kwargs.get("model_metadata"),
+            ),
+            "funding": (
+                fingerprint_value(backtester_kwargs["funding_history"])
+                if backtester_kwargs.get("funding_history") is not None
+                else None
+            ),
+            "interval": str(backtester_kwargs.get("interval")),
+            "reward_risk": _plain(backtester_kwargs.get("reward_risk")),
+            # 精简模式的 summary 不含决策诊断，不能与完整 summary 互相顶替
+            "record_decisions": bool(backtester_kwargs.get("record_decisions", True)),
+            "config": _sha256_json(backtest_config_snapshot()),
+        }
+        describe = {
+            "kind": str(kind),
+            "engine": str(engine),
+            "rows": int(len(data)),
+            "start": str(data.index.min()) if len(data) else None,
+            "end": str(data.index.max()) if len(data) else None,
+            "data_hash": base["data"],
+            "artifact_hashes": base["artifacts"],
+        }
+        return ResultCacheScope(self, base, backtester_kwargs.get("settings"), describe)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_dir, f"{key}{suffix}")
+
+    def load(self, key):
+        path = self._path(key, RESULT_SUFFIX)
+        if not os.path.exists(path):
+            return None
+        try:
+            payload = joblib.load(path)
+        except Exception as exc:
+            log_info(f"⚠ 回测结果缓存读取失败，将重新回测: {exc}")
+            return None
+        if not isinstance(payload, dict) or payload.get("key") != key:
+            return None
+        os.utime(path, None)
+        return payload["result"]
+
+    def save(self, key, result, meta):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key, RESULT_SUFFIX)
+        # 并行扫描的多个进程可能同时写同一个 key：各自写唯一的临时文件再原子替换
+        tmp_path = _tmp_path(path)
+        joblib.dump({"key": key, "result": result}, tmp_path)
+        os.replace(tmp_path, path)
+        meta_path = self._path(key, META_SUFFIX)
+        tmp_meta_path = _tmp_path(meta_path)
+        with open(tmp_meta_path, "w", encoding="utf-8") as file:
+            json.dump(meta, file, ensure_ascii=False, indent=2, sort_keys=True, default=str)
+        os.replace(tmp_meta_path, meta_path)
+        self._prune()
+
+    def _prune(self):
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith(RESULT_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, file_name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                # 另一个进程刚淘汰了这条
+                continue
+        if len(entries) <= self.keep:
+            return
+        entries.sort(reverse=True)
+        for _, path in entries[self.keep:]:
+            for stale in (path, path[: -len(RESULT_SUFFIX)] + META_SUFFIX):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+
+    def entries(self):
+        """全部条目的元数据，按写入时间倒序。"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith(META_SUFFIX):
+                continue
+            try:
+                with open(os.path.join(self.cache_dir, file_name), encoding="utf-8") as file:
+                    entries.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+        entries.sort(key=lambda item: str(item.get("created_at") or ""), reverse=True)
+        return entries
+
+    def resolve(self, prefix):
+        """按 key 前缀查找唯一条目；没有或不唯一时抛 KeyError。"""
+        matches = [entry for entry in self.entries() if str(entry.get("key", "")).startswith(str(prefix))]
+        if len(matches) != 1:
+            raise KeyError(f"回测结果缓存 key 前缀 {prefix} 匹配到 {len(matches)} 条")
+        return matches[0]
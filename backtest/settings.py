@@ -0,0 +1,39 @@
+"""单次回测使用的只读参数视图。
+
+参数扫描过去靠 setattr(config, ...) 临时改全局模块再恢复，候选之间共享同一份可变状态，无法并行。
+BacktestSettings 把一个候选的覆盖项冻结在对象里：读属性时覆盖项优先，其余回落到全局 config；
+Backtester 及其创建的 StrategyCore / PositionManager / DynamicRiskController 都从它取参数。
+"""
+from dataclasses import dataclass
+
+from config import config
+
+
+@dataclass(frozen=True)
+class BacktestSettings:
+    overrides: tuple = ()
+
+    def __post_init__(self):
+        object.__setattr__(self, "_values", dict(self.overrides))
+
+    @classmethod
+    def from_overrides(cls, overrides=None):
+        if isinstance(overrides, cls):
+            return overrides
+        overrides = dict(overrides or {})
+        unknown = sorted(key for key in overrides if not hasattr(config, key))
+        if unknown:
+            raise KeyError(f"未知的回测配置覆盖项: {unknown}")
+        return cls(tuple(sorted(overrides.items())))
+
+    def __getattr__(self, name):
+        # 反序列化时 _values 尚未恢复，下划线属性不回落到 config
+        if name.startswith("_"):
+            raise AttributeError(name)
+        values = self.__dict__.get("_values", {})
+        if name in values:
+            return values[name]
+        return getattr(config, name)
+
+    def as_dict(self):
+        return dict(self.overrides)
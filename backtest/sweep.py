@@ -0,0 +1,195 @@
+"""回测参数扫描执行器。
+
+每个候选以 BacktestSettings（不可变覆盖项）传入 Backtester，不再 setattr 全局 config，候选之间互不影响，
+因此可以放进进程池并行。种子数据（含预计算好的 long_prob/short_prob）、模型和资金费历史用 joblib 落盘一次，
+子进程以只读内存映射加载，不随每个任务重复序列化；子进程启动时同步父进程当前的 config 值。
+结果始终按候选顺序返回，与进程数无关；提前停止的调用方按顺序消费 iter_sweep，停下后未开始的任务被取消。
+"""
+import contextlib
+import copy
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+
+from backtest.backtest import Backtester
+from backtest.settings import BacktestSettings
+from config import config
+from utils.utils import log_info
+
+
+SEED_FILE = "sweep_seed.joblib"
+# 这些配置决定模型概率本身；种子里的概率只算一次，候选不能把它们改成与种子不同的值
+PROBABILITY_CONFIG_KEYS = {
+    "TREND_FILTER_INTERVAL",
+    "TREND_FILTER_FAST_COL",
+    "TREND_FILTER_SLOW_COL",
+    "TREND_FILTER_MIN_GAP",
+    "MODEL_WEIGHTS",
+    "MODEL_DIRECTION_MODEL_WEIGHTS",
+}
+_SNAPSHOT_TYPES = (bool, int, float, str, list, tuple, dict, set, frozenset, type(None))
+
+# 子进程内的种子 Backtester 参数（只读内存映射），由 _init_worker 加载一次。
+_worker_seed = None
+
+
+def probability_overrides(overrides):
+    """取出覆盖项中决定模型概率的部分。"""
+    return {key: value for key, value in dict(overrides or {}).items() if key in PROBABILITY_CONFIG_KEYS}
+
+
+def seed_backtester_kwargs(seed_bt, data=None, overrides=None, record_decisions=True):
+    """从种子 Backtester 取出候选共用的构造参数，概率在这里一次性算好。
+
+    overrides 中决定概率的配置（PROBABILITY_CONFIG_KEYS）会随种子一起固定：与种子自身配置不同或 data 缺概率列时
+    按这组配置重算概率，其余覆盖项忽略，由各候选自行传入。
+    record_decisions=False 时候选以精简模式回测，summary 不含 decision_* 诊断，只看收益指标的扫参用它省掉逐 bar 记录。
+    """
+    data = seed_bt.data if data is None else data
+    fixed = probability_overrides(overrides)
+    changed = any(getattr(seed_bt.settings, key) != value for key, value in fixed.items())
+    if changed or not {"long_prob", "short_prob"}.issubset(data.columns):
+        predictor = copy.copy(seed_bt)
+        predictor.settings = BacktestSettings.from_overrides({**seed_bt.settings.as_dict(), **fixed})
+        data = data.copy()
+        data[["long_prob", "short_prob"]] = predictor._predict_probabilities(data)
+    return {
+        "interval": seed_bt.interval,
+        "window": seed_bt.window,
+        "data_dict": seed_bt.data_dict,
+        "reward_risk": seed_bt.reward_risk,
+        "precomputed_data": data,
+        "feature_cols": seed_bt.feature_cols,
+        "models": seed_bt.models,
+        "model_weights": seed_bt.model_weights,
+        "model_metadata": seed_bt.model_metadata,
+        "funding_history": seed_bt.funding_history,
+        "record_decisions": bool(record_decisions),
+        "settings": BacktestSettings.from_overrides({**probability_overrides(seed_bt.settings.as_dict()), **fixed}),
+    }
+
+
+def resolve_sweep_workers(candidate_count, workers=None):
+    if workers is None:
+        workers = int(getattr(config, "BACKTEST_SWEEP_WORKERS", 0) or 0)
+    workers = int(workers or 0)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, int(candidate_count)))
+
+
+def normalize_candidate(candidate, seed_settings):
+    if isinstance(candidate, dict):
+        name, overrides = candidate.get("name"), candidate.get("overrides") or {}
+    else:
+        name, overrides = candidate
+    overrides = dict(overrides)
+    mismatched = sorted(
+        key for key, value in probability_overrides(overrides).items()
+        if getattr(seed_settings, key) != value
+    )
+    if mismatched:
+        raise ValueError(f"候选 {name} 覆盖了决定模型概率的配置 {mismatched}，请为其单独准备种子数据")
+    return name, overrides
+
+
+def build_candidate_backtester(backtester_kwargs, overrides):
+    """按种子参数 + 候选覆盖项构造一个全新状态、使用预计算概率的 Backtester。"""
+    seed_settings = BacktestSettings.from_overrides(backtester_kwargs.get("settings"))
+    return Backtester(**{
+        **backtester_kwargs,
+        "precomputed_probabilities": True,
+        "enable_csv_dump": False,
+        "show_progress": False,
+        "emit_diagnostics": False,
+        "settings": BacktestSettings.from_overrides({**seed_settings.as_dict(), **dict(overrides or {})}),
+    })
+
+
+def run_sweep_candidate(backtester_kwargs, overrides, summarize=None):
+    """用一组覆盖项跑一次回测；summarize(backtester, summary) 可把结果裁剪成调用方需要的形式。"""
+    backtester = build_candidate_backtester(backtester_kwargs, overrides)
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = backtester.run_backtest()
+    if summarize is not None:
+        return summarize(backtester, summary)
+    return summary
+
+
+def config_snapshot():
+    """父进程当前的简单类型 config 值，子进程启动时照此同步。"""
+    return {
+        key: value
+        for key, value in vars(config).items()
+        if key.isupper() and isinstance(value, _SNAPSHOT_TYPES)
+    }
+
+
+def _init_worker(seed_path, config_values):
+    global _worker_seed
+    for key, value in config_values.items():
+        setattr(config, key, value)
+    _worker_seed = joblib.load(seed_path, mmap_mode="r")
+
+
+def _run_in_worker(run, overrides):
+    return run(_worker_seed, overrides)
+
+
+def iter_sweep(backtester_kwargs, candidates, *, run=None, workers=None, cache=None):
+    """按候选顺序逐个产出 (name, overrides, result)。
+
+    run(backtester_kwargs, overrides) 执行单个候选，默认 run_sweep_candidate；进程池模式下它必须能被 pickle
+    （模块级函数或其 functools.partial）。workers<=1 或只有一个候选时在当前进程串行执行。
+    cache 为 backtest.result_cache 的 ResultCacheScope（结果类型须与 run 的输出一致）：命中的候选直接产出缓存结果，
+    只有未命中的候选提交回测，回测完写回缓存。
+    """
+    seed_settings = BacktestSettings.from_overrides(backtester_kwargs.get("settings"))
+    candidates = [normalize_candidate(candidate, seed_settings) for candidate in candidates]
+    if not candidates:
+        return
+    run = run or run_sweep_candidate
+    cached = [cache.get(overrides, name=name) if cache is not None else None for name, overrides in candidates]
+    pending = [candidate for candidate, result in zip(candidates, cached) if result is None]
+    workers = resolve_sweep_workers(max(1, len(pending)), workers)
+    if workers <= 1:
+        for (name, overrides), result in zip(candidates, cached):
+            if result is None:
+                result = run(backtester_kwargs, overrides)
+                if cache is not None:
+                    cache.put(overrides, result, name=name)
+            yield name, overrides, result
+        return
+
+    with tempfile.TemporaryDirectory(prefix="backtest_sweep_") as directory:
+        seed_path = os.path.join(directory, SEED_FILE)
+        joblib.dump(dict(backtester_kwargs), seed_path)
+        log_info(f"回测参数扫描: candidates={len(candidates)} pending={len(pending)} workers={workers}")
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(seed_path, config_snapshot()),
+        )
+        try:
+            futures = iter([executor.submit(_run_in_worker, run, overrides) for _, overrides in pending])
+            for (name, overrides), result in zip(candidates, cached):
+                if result is None:
+                    result = next(futures).result()
+                    if cache is not None:
+                        cache.put(overrides, result, name=name)
+                yield name, overrides, result
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def run_sweep(backtester_kwargs, candidates, *, run=None, workers=None, cache=None):
+    """跑完全部候选，返回按候选顺序排列的结果列表（dict 结果会补上 name / overrides）。"""
+    results = []
+    for name, overrides, result in iter_sweep(backtester_kwargs, candidates, run=run, workers=workers, cache=cache):
+        if isinstance(result, dict):
+            result = {**result, "name": name, "overrides": overrides}
+        results.append(result)
+    return results
@@ -110,6 +110,14 @@ MODEL_WEIGHTS = parse_env_dict(
     os.getenv("MODEL_WEIGHTS", "lgb_v1:0.5,xgb_v1:0.3,rf_v1:0.2"),
     float,
 )
+# 推理入口（实盘、core.predict）从紧凑产物加载编译后的树模型：节点数组内存映射，不反序列化 joblib、不导入训练库
+MODEL_COMPACT_ARTIFACTS = parse_env_bool(os.getenv("MODEL_COMPACT_ARTIFACTS"), True)
+MODEL_COMPACT_DIR = os.getenv("MODEL_COMPACT_DIR", "models/compact")
+MODEL_COMPACT_KEEP = int(os.getenv("MODEL_COMPACT_KEEP", 3))
+# 批量推理（回测、walk-forward 概率）时各模型在共用线程池里并发 predict_proba；0 表示按 CPU 核数
+MODEL_PREDICT_THREADS = int(os.getenv("MODEL_PREDICT_THREADS", 0))
+# 行数低于该值时串行预测（单行实盘推理不走线程池）
+MODEL_PREDICT_PARALLEL_MIN_ROWS = int(os.getenv("MODEL_PREDICT_PARALLEL_MIN_ROWS", 512))
 MODEL_DIRECTION_MODEL_WEIGHTS = parse_env_assignment_dict(
     os.getenv("MODEL_DIRECTION_MODEL_WEIGHTS", ""),
     str,
@@ -201,6 +209,34 @@ MODEL_VALIDATION_LIGHTWEIGHT_TRAINING = parse_env_bool(os.getenv("MODEL_VALIDATI
 MODEL_VALIDATION_LGB_ESTIMATORS = int(os.getenv("MODEL_VALIDATION_LGB_ESTIMATORS", 40))
 MODEL_VALIDATION_XGB_ESTIMATORS = int(os.getenv("MODEL_VALIDATION_XGB_ESTIMATORS", 40))
 MODEL_VALIDATION_RF_ESTIMATORS = int(os.getenv("MODEL_VALIDATION_RF_ESTIMATORS", 30))
+# 模型并发拟合：CPU_BUDGET=0 表示使用全部核心；MAX_CONCURRENT_FITS=0 表示按任务数自动决定
+MODEL_TRAIN_PARALLEL_FITS = parse_env_bool(os.getenv("MODEL_TRAIN_PARALLEL_FITS"), True)
+MODEL_TRAIN_CPU_BUDGET = int(os.getenv("MODEL_TRAIN_CPU_BUDGET", 0))
+MODEL_TRAIN_MAX_CONCURRENT_FITS = int(os.getenv("MODEL_TRAIN_MAX_CONCURRENT_FITS", 0))
+# 共享分箱：同一训练截止位置的 XGBoost 拟合（global/方向子模型）只用训练行做一次分位分箱，按行视图复用
+MODEL_TRAIN_SHARED_BINNING = parse_env_bool(os.getenv("MODEL_TRAIN_SHARED_BINNING"), False)
+# 增量重训（默认关闭）：在上一代 LightGBM/XGBoost 上续训少量树、RF 按比例替换最旧的树；连续增量若干次或树数超限后全量重建
+MODEL_TRAIN_INCREMENTAL = parse_env_bool(os.getenv("MODEL_TRAIN_INCREMENTAL"), False)
+MODEL_TRAIN_INCREMENTAL_EXTRA_TREES = int(os.getenv("MODEL_TRAIN_INCREMENTAL_EXTRA_TREES", 30))
+MODEL_TRAIN_INCREMENTAL_MAX_TREES = int(os.getenv("MODEL_TRAIN_INCREMENTAL_MAX_TREES", 400))
+MODEL_TRAIN_INCREMENTAL_FULL_REBUILD_EVERY = int(os.getenv("MODEL_TRAIN_INCREMENTAL_FULL_REBUILD_EVERY", 7))
+MODEL_TRAIN_INCREMENTAL_RF_REPLACE_RATIO = float(os.getenv("MODEL_TRAIN_INCREMENTAL_RF_REPLACE_RATIO", 0.2))
+MODEL_TRAIN_INCREMENTAL_MIN_ROWS = int(os.getenv("MODEL_TRAIN_INCREMENTAL_MIN_ROWS", 2000))
+MODEL_TRAIN_INCREMENTAL_STATE_PATH = os.getenv("MODEL_TRAIN_INCREMENTAL_STATE_PATH", "models/incremental_state.pkl")
+# 特征剪枝：训练段 walk-forward fold 上按 gain/置换重要性剔除冗余与低重要性特征，AUC 损失不超过容忍度才生效
+MODEL_FEATURE_PRUNE_ENABLED = parse_env_bool(os.getenv("MODEL_FEATURE_PRUNE_ENABLED"), False)
+MODEL_FEATURE_PRUNE_FOLDS = int(os.getenv("MODEL_FEATURE_PRUNE_FOLDS", 3))
+MODEL_FEATURE_PRUNE_MAX_ROWS = int(os.getenv("MODEL_FEATURE_PRUNE_MAX_ROWS", 60000))
+MODEL_FEATURE_PRUNE_PERMUTATION_REPEATS = int(os.getenv("MODEL_FEATURE_PRUNE_PERMUTATION_REPEATS", 2))
+MODEL_FEATURE_PRUNE_MAX_CORR = float(os.getenv("MODEL_FEATURE_PRUNE_MAX_CORR", 0.98))
+MODEL_FEATURE_PRUNE_MIN_GAIN_SHARE = float(os.getenv("MODEL_FEATURE_PRUNE_MIN_GAIN_SHARE", 0.002))
+MODEL_FEATURE_PRUNE_QUALITY_TOLERANCE = float(os.getenv("MODEL_FEATURE_PRUNE_QUALITY_TOLERANCE", 0.005))
+MODEL_FEATURE_PRUNE_MIN_FEATURES = int(os.getenv("MODEL_FEATURE_PRUNE_MIN_FEATURES", 20))
+# 训练流水线阶段缓存：数据/特征/标签/模型阶段按输入内容哈希落盘，仅改回测/扫参配置时可直接复用
+MODEL_PIPELINE_CACHE_ENABLED = parse_env_bool(os.getenv("MODEL_PIPELINE_CACHE_ENABLED"), True)
+MODEL_PIPELINE_CACHE_DIR = os.getenv("MODEL_PIPELINE_CACHE_DIR", "models/pipeline_cache")
+MODEL_PIPELINE_CACHE_KEEP = int(os.getenv("MODEL_PIPELINE_CACHE_KEEP", 3))
+MODEL_PIPELINE_REPORT_PATH = os.getenv("MODEL_PIPELINE_REPORT_PATH", "logs/training_pipeline_report.json")
 MODEL_WALK_FORWARD_ENABLED = parse_env_bool(os.getenv("MODEL_WALK_FORWARD_ENABLED"), True)
 MODEL_WALK_FORWARD_FOLDS = int(os.getenv("MODEL_WALK_FORWARD_FOLDS", 3))
 MODEL_WALK_FORWARD_MIN_FOLDS = int(os.getenv("MODEL_WALK_FORWARD_MIN_FOLDS", 2))
@@ -213,6 +249,12 @@ MODEL_RETRAIN_VALIDATION_GATE_THRESHOLD_SWEEP = os.getenv(
 )
 MODEL_RETRAIN_VALIDATION_GATE_TARGET_PRECISION = float(os.getenv("MODEL_RETRAIN_VALIDATION_GATE_TARGET_PRECISION", 0.25))
 MODEL_WALK_FORWARD_FAIL_FAST = parse_env_bool(os.getenv("MODEL_WALK_FORWARD_FAIL_FAST"), True)
+# walk-forward fold 并行进程数：0=按 CPU 核数（不超过 fold 数），1=串行
+MODEL_WALK_FORWARD_WORKERS = int(os.getenv("MODEL_WALK_FORWARD_WORKERS", 0))
+# walk-forward fold 模型缓存：训练切片、标签参数、估计器参数与特征列都未变化时复用已拟合的 fold 模型
+MODEL_WALK_FORWARD_FOLD_CACHE_ENABLED = parse_env_bool(os.getenv("MODEL_WALK_FORWARD_FOLD_CACHE_ENABLED"), True)
+MODEL_WALK_FORWARD_FOLD_CACHE_DIR = os.getenv("MODEL_WALK_FORWARD_FOLD_CACHE_DIR", "models/walk_forward_fold_cache")
+MODEL_WALK_FORWARD_FOLD_CACHE_KEEP = int(os.getenv("MODEL_WALK_FORWARD_FOLD_CACHE_KEEP", 64))
 MODEL_WALK_FORWARD_LIGHTWEIGHT_TRAINING = parse_env_bool(os.getenv("MODEL_WALK_FORWARD_LIGHTWEIGHT_TRAINING"), True)
 MODEL_WALK_FORWARD_LGB_ESTIMATORS = int(os.getenv("MODEL_WALK_FORWARD_LGB_ESTIMATORS", 40))
 MODEL_WALK_FORWARD_XGB_ESTIMATORS = int(os.getenv("MODEL_WALK_FORWARD_XGB_ESTIMATORS", 40))
@@ -253,6 +295,24 @@ MODEL_WALK_FORWARD_THRESHOLD_SWEEP_EARLY_STOP_MIN_PROFIT_FACTOR = float(os.geten
     "MODEL_WALK_FORWARD_THRESHOLD_SWEEP_EARLY_STOP_MIN_PROFIT_FACTOR",
     1.05,
 ))
+# 阈值扫描搜索方式：grid=抽样网格 + 耐心提前停止；adaptive=逐级减半（短窗口筛选全部网格，前 1/ETA 进入更长窗口）
+MODEL_WALK_FORWARD_THRESHOLD_SWEEP_SEARCH = os.getenv("MODEL_WALK_FORWARD_THRESHOLD_SWEEP_SEARCH", "grid").strip().lower()
+MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_MAX_CANDIDATES = int(os.getenv(
+    "MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_MAX_CANDIDATES",
+    192,
+))
+MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_ETA = int(os.getenv("MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_ETA", 3))
+MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_RUNGS = int(os.getenv("MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_RUNGS", 3))
+# 第 0 级窗口的最少 K 线数，避免窗口过短时几乎不成交、筛选失真
+MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_MIN_ROWS = int(os.getenv(
+    "MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_MIN_ROWS",
+    288,
+))
+# 第 0 级之后在最优候选与其后几名之间取中点补充的候选数，0 表示不补充
+MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_PROPOSALS = int(os.getenv(
+    "MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_PROPOSALS",
+    8,
+))
 
 # ✅ 信号平滑参数
 SMOOTH_ALPHA = float(os.getenv("SMOOTH_ALPHA", 0.3))
@@ -369,7 +429,30 @@ BACKTEST_ENABLE_FUNDING = parse_env_bool(os.getenv("BACKTEST_ENABLE_FUNDING"), T
 BACKTEST_FUNDING_HISTORY_LIMIT = int(os.getenv("BACKTEST_FUNDING_HISTORY_LIMIT", 400))
 BACKTEST_INTRABAR_TP_SL = parse_env_bool(os.getenv("BACKTEST_INTRABAR_TP_SL"), False)
 BACKTEST_WORST_CASE_TP_SL = parse_env_bool(os.getenv("BACKTEST_WORST_CASE_TP_SL"), True)
+# bar 内 TP/SL 同时触及时，只对这些 bar 取细粒度 K 线按路径重放（本地缓存优先，缺失才拉取）；缺数据时仍按 WORST_CASE 处理
+BACKTEST_INTRABAR_REPLAY_ENABLED = parse_env_bool(os.getenv("BACKTEST_INTRABAR_REPLAY_ENABLED"), False)
+BACKTEST_INTRABAR_REPLAY_INTERVAL = os.getenv("BACKTEST_INTRABAR_REPLAY_INTERVAL", "1m").strip()
+BACKTEST_INTRABAR_REPLAY_CACHE_DIR = os.getenv("BACKTEST_INTRABAR_REPLAY_CACHE_DIR", "models/intrabar_candle_cache")
+BACKTEST_INTRABAR_REPLAY_FETCH = parse_env_bool(os.getenv("BACKTEST_INTRABAR_REPLAY_FETCH"), True)
 BACKTEST_FORCE_CLOSE_ON_END = parse_env_bool(os.getenv("BACKTEST_FORCE_CLOSE_ON_END"), True)
+# 回测概率批量预计算：每块行数（控制内存），以及抽样与逐行路径对照校验的行数（0=不校验）
+BACKTEST_PREDICT_CHUNK_ROWS = int(os.getenv("BACKTEST_PREDICT_CHUNK_ROWS", 5000))
+BACKTEST_PREDICT_PARITY_ROWS = int(os.getenv("BACKTEST_PREDICT_PARITY_ROWS", 8))
+# 回测引擎：reference=逐 bar 参考实现（含完整诊断）；array=按列预计算信号的数组引擎，用于参数扫描（python -m backtest.array_engine 对照两者）
+BACKTEST_ENGINE = os.getenv("BACKTEST_ENGINE", "reference").strip().lower()
+# 参数扫描（阈值/TP-SL/趋势过滤 A/B 等）的并行进程数：0=按 CPU 核数，1=当前进程串行
+BACKTEST_SWEEP_WORKERS = int(os.getenv("BACKTEST_SWEEP_WORKERS", 0))
+# 参数扫描执行方式：process=每个候选一次完整回测（进程池并行，含逐 bar 诊断）；
+# lockstep=同一份行情上所有候选按数组同步推进（backtest.lockstep_engine，交易与收益同口径，不统计逐 bar 原因诊断）
+BACKTEST_SWEEP_ENGINE = os.getenv("BACKTEST_SWEEP_ENGINE", "process").strip().lower()
+# 跨运行的回测结果缓存：key 由数据内容、模型产物、归一化覆盖项、配置快照与回测源码哈希组成，命中即直接返回 summary
+BACKTEST_RESULT_CACHE_ENABLED = parse_env_bool(os.getenv("BACKTEST_RESULT_CACHE_ENABLED"), True)
+BACKTEST_RESULT_CACHE_DIR = os.getenv("BACKTEST_RESULT_CACHE_DIR", "models/backtest_result_cache")
+BACKTEST_RESULT_CACHE_KEEP = int(os.getenv("BACKTEST_RESULT_CACHE_KEEP", 5000))
+# 逐 bar 预测概率持久化缓存（按模型产物哈希 + 特征列分库），回测与研究脚本只计算缺失的 bar
+PREDICTION_CACHE_ENABLED = parse_env_bool(os.getenv("PREDICTION_CACHE_ENABLED"), True)
+PREDICTION_CACHE_DIR = os.getenv("PREDICTION_CACHE_DIR", "models/prediction_cache")
+PREDICTION_CACHE_KEEP = int(os.getenv("PREDICTION_CACHE_KEEP", 4))
 
 # ✅ 实盘/模拟盘保护
 LIVE_REQUIRE_SIMULATED_TRADING = parse_env_bool(os.getenv("LIVE_REQUIRE_SIMULATED_TRADING"), True)
@@ -377,6 +460,16 @@ LIVE_AUTO_SET_POSITION_MODE = parse_env_bool(os.getenv("LIVE_AUTO_SET_POSITION_M
 LIVE_AUTO_SET_LEVERAGE = parse_env_bool(os.getenv("LIVE_AUTO_SET_LEVERAGE"), True)
 LIVE_RECONCILE_PENDING_ORDERS = parse_env_bool(os.getenv("LIVE_RECONCILE_PENDING_ORDERS"), True)
 LIVE_PERSIST_LAST_BAR = parse_env_bool(os.getenv("LIVE_PERSIST_LAST_BAR"), True)
+# 启动时把树模型编译为 NumPy 节点数组推理（概率与原模型一致，编译失败/校验不过的模型自动回退原生推理）
+LIVE_COMPILED_INFERENCE = parse_env_bool(os.getenv("LIVE_COMPILED_INFERENCE"), True)
+# 实盘单 bar 全部模型推理的延迟预算（毫秒），run.profile_ensemble 按它给出 MODEL_WEIGHTS 建议
+LIVE_INFERENCE_LATENCY_BUDGET_MS = float(os.getenv("LIVE_INFERENCE_LATENCY_BUDGET_MS", 20))
+# 特征构建和模型推理放到独立子进程，K 线与结果经共享内存环形缓冲传递，实时风控线程不再与推理争用 GIL
+LIVE_MODEL_SERVER_ENABLED = parse_env_bool(os.getenv("LIVE_MODEL_SERVER_ENABLED"), False)
+LIVE_MODEL_SERVER_RING_SLOTS = int(os.getenv("LIVE_MODEL_SERVER_RING_SLOTS", 4))
+LIVE_MODEL_SERVER_SLOT_MB = float(os.getenv("LIVE_MODEL_SERVER_SLOT_MB", 8))
+LIVE_MODEL_SERVER_TIMEOUT_SEC = float(os.getenv("LIVE_MODEL_SERVER_TIMEOUT_SEC", 60))
+LIVE_MODEL_SERVER_STARTUP_TIMEOUT_SEC = float(os.getenv("LIVE_MODEL_SERVER_STARTUP_TIMEOUT_SEC", 180))
 LIVE_USE_AVAILABLE_MARGIN_FOR_SIZING = parse_env_bool(os.getenv("LIVE_USE_AVAILABLE_MARGIN_FOR_SIZING"), True)
 LIVE_MARGIN_USAGE_RATIO = float(os.getenv("LIVE_MARGIN_USAGE_RATIO", 0.85))
 LIVE_MIN_FREE_MARGIN_USDT = float(os.getenv("LIVE_MIN_FREE_MARGIN_USDT", 30))
@@ -408,6 +501,9 @@ MODEL_RETRAIN_REGIME_GATE_MIN_ROWS = int(os.getenv("MODEL_RETRAIN_REGIME_GATE_MI
 MODEL_RETRAIN_MAX_TREND_SHORT_LONG_DOMINANCE_PCT = float(os.getenv("MODEL_RETRAIN_MAX_TREND_SHORT_LONG_DOMINANCE_PCT", 80.0))
 MODEL_RETRAIN_MAX_TREND_LONG_SHORT_DOMINANCE_PCT = float(os.getenv("MODEL_RETRAIN_MAX_TREND_LONG_SHORT_DOMINANCE_PCT", 80.0))
 MODEL_RETRAIN_RESTART_LIVE_MONITOR = parse_env_bool(os.getenv("MODEL_RETRAIN_RESTART_LIVE_MONITOR"), True)
+# 重训发布新产物后 live monitor 后台校验新模型，并在两根 bar 之间原子替换；开启时 scheduler 不再重启 live monitor
+LIVE_MODEL_HOT_RELOAD = parse_env_bool(os.getenv("LIVE_MODEL_HOT_RELOAD"), True)
+LIVE_MODEL_RELOAD_CHECK_SEC = float(os.getenv("LIVE_MODEL_RELOAD_CHECK_SEC", 15))
 MODEL_RETRAIN_KEEP_BACKUPS = int(os.getenv("MODEL_RETRAIN_KEEP_BACKUPS", 5))
 
 # ✅ Telegram配置
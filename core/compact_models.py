@@ -0,0 +1,343 @@
+"""紧凑模型产物。
+
+把 compile_models 编译出的树节点数组逐个保存为 .npy（加载时内存映射），模型结构、方向质量模型的
+校准系数和诊断信息写进 manifest.json。加载紧凑产物不需要反序列化 joblib，也就不会导入
+sklearn / xgboost / lightgbm，实盘和预测入口的启动时间只剩读 manifest 和映射数组。
+
+产物按 (各模型文件 sha256, 特征列文件 sha256) 分目录保存，原产物任何变化都会换一个目录，
+旧目录只保留最近 MODEL_COMPACT_KEEP 个。某个模型无法编译或还原后与原模型概率不一致时，
+manifest 把它记为 joblib，加载时单独反序列化原文件，不影响其它模型。
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from config import config
+from core import signal_engine
+from core.compiled_trees import (
+    ARENA_FIELDS,
+    CompiledTreeEnsemble,
+    TreeArena,
+    compile_models,
+    compiled_arena,
+    probe_frame,
+)
+from core.direction_quality import BinaryProbabilityCalibrator, DirectionQualityModel
+from utils.utils import BASE_DIR, log_error, log_info, sha256_file
+
+
+COMPACT_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+TRAINING_LIBRARIES = ("sklearn", "xgboost", "lightgbm")
+
+KIND_ENSEMBLE = "ensemble"
+KIND_DIRECTION_QUALITY = "direction_quality"
+KIND_JOBLIB = "joblib"
+
+
+def compact_artifacts_enabled():
+    return bool(getattr(config, "MODEL_COMPACT_ARTIFACTS", True))
+
+
+def compact_root(root=None):
+    root = root or getattr(config, "MODEL_COMPACT_DIR", "models/compact")
+    return root if os.path.isabs(root) else os.path.join(BASE_DIR, root)
+
+
+def default_model_paths():
+    return {name: os.path.join(BASE_DIR, path) for name, path in config.MODEL_PATHS.items()}
+
+
+def default_feature_path():
+    return os.path.join(BASE_DIR, config.FEATURE_LIST_PATH)
+
+
+def source_hashes(model_paths, feature_path):
+    return {
+        "models": {str(name): sha256_file(path) for name, path in model_paths.items()},
+        "feature_list": sha256_file(feature_path),
+    }
+
+
+def compact_key(sources):
+    payload = json.dumps({"version": COMPACT_FORMAT_VERSION, **sources}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _SigmoidCalibration:
+    """LogisticRegression 单特征校准的系数形式，predict_proba 与 sklearn 二分类一致。"""
+
+    def __init__(self, coef, intercept):
+        self.coef_ = np.asarray([[float(coef)]])
+        self.intercept_ = np.asarray([float(intercept)])
+
+    def predict_proba(self, X):
+        margin = np.asarray(X, dtype=float).reshape(-1) * self.coef_[0][0] + self.intercept_[0]
+        trade = 1.0 / (1.0 + np.exp(-margin))
+        return np.column_stack([1.0 - trade, trade])
+
+
+class _IsotonicCalibration:
+    """IsotonicRegression(out_of_bounds="clip") 的分段线性形式。"""
+
+    def __init__(self, x_thresholds, y_thresholds):
+        self.X_thresholds_ = np.asarray(x_thresholds, dtype=float)
+        self.y_thresholds_ = np.asarray(y_thresholds, dtype=float)
+
+    def predict(self, X):
+        return np.interp(np.asarray(X, dtype=float).reshape(-1), self.X_thresholds_, self.y_thresholds_)
+
+
+def _calibrator_spec(calibrator):
+    if calibrator is None:
+        return None
+    spec = {
+        "method": calibrator.method,
+        "direction": calibrator.direction,
+        "regime": calibrator.regime,
+        "fallback_reason": calibrator.fallback_reason,
+        "fitted_rows": calibrator.fitted_rows,
+        "positive_rows": calibrator.positive_rows,
+        "negative_rows": calibrator.negative_rows,
+        "weighted": calibrator.weighted,
+        "inverted": calibrator.inverted,
+        "params": None,
+    }
+    model = calibrator.model
+    if model is None:
+        return spec
+    if calibrator.method == "sigmoid":
+        spec["params"] = {"coef": float(model.coef_[0][0]), "intercept": float(model.intercept_[0])}
+    elif calibrator.method == "isotonic":
+        spec["params"] = {
+            "x_thresholds": [float(value) for value in model.X_thresholds_],
+            "y_thresholds": [float(value) for value in model.y_thresholds_],
+        }
+    else:
+        raise ValueError(f"不支持导出的校准方法: {calibrator.method}")
+    return spec
+
+
+def _calibrator_from_spec(spec):
+    if spec is None:
+        return None
+    spec = dict(spec)
+    params = spec.pop("params")
+    model = None
+    if params is not None and spec["method"] == "sigmoid":
+        model = _SigmoidCalibration(params["coef"], params["intercept"])
+    elif params is not None:
+        model = _IsotonicCalibration(params["x_thresholds"], params["y_thresholds"])
+    return BinaryProbabilityCalibrator(model=model, **spec)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def _model_spec(compiled):
+    if isinstance(compiled, CompiledTreeEnsemble):
+        return {"kind": KIND_ENSEMBLE, "ensemble": compiled.to_spec()}
+    if isinstance(compiled, DirectionQualityModel) and isinstance(compiled.global_model, CompiledTreeEnsemble):
+        diagnostics = json.loads(json.dumps(compiled.diagnostics, default=_json_default))
+        return {
+            "kind": KIND_DIRECTION_QUALITY,
+            "global": compiled.global_model.to_spec(),
+            "directions": {direction: model.to_spec() for direction, model in compiled.direction_models.items()},
+            "calibrators": {
+                direction: _calibrator_spec(calibrator)
+                for direction, calibrator in compiled.direction_calibrators.items()
+            },
+            "regime_calibrators": {
+                direction: {regime: _calibrator_spec(calibrator) for regime, calibrator in by_regime.items()}
+                for direction, by_regime in compiled.direction_regime_calibrators.items()
+            },
+            "diagnostics": diagnostics,
+        }
+    return {"kind": KIND_JOBLIB}
+
+
+def _model_from_spec(spec, arena, path):
+    kind = spec["kind"]
+    if kind == KIND_ENSEMBLE:
+        return CompiledTreeEnsemble(arena, **spec["ensemble"])
+    if kind == KIND_DIRECTION_QUALITY:
+        return DirectionQualityModel(
+            CompiledTreeEnsemble(arena, **spec["global"]),
+            direction_models={
+                direction: CompiledTreeEnsemble(arena, **params)
+                for direction, params in spec["directions"].items()
+            },
+            direction_calibrators={
+                direction: _calibrator_from_spec(calibrator)
+                for direction, calibrator in spec["calibrators"].items()
+            },
+            direction_regime_calibrators={
+                direction: {regime: _calibrator_from_spec(calibrator) for regime, calibrator in by_regime.items()}
+                for direction, by_regime in spec["regime_calibrators"].items()
+            },
+            diagnostics=spec["diagnostics"],
+        )
+    import joblib
+
+    return joblib.load(path)
+
+
+def _read_directory(directory, model_paths):
+    with open(os.path.join(directory, MANIFEST_NAME), "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+    if manifest.get("version") != COMPACT_FORMAT_VERSION:
+        raise ValueError(f"紧凑产物版本不匹配: {manifest.get('version')}")
+    arena = None
+    if manifest["arena"]:
+        arena = TreeArena(**{
+            field: np.load(os.path.join(directory, f"{field}.npy"), mmap_mode="r")
+            for field in ARENA_FIELDS
+        })
+    models = {
+        name: _model_from_spec(manifest["models"][name], arena, path)
+        for name, path in model_paths.items()
+    }
+    return manifest, models
+
+
+def _prune(root, keep):
+    entries = [
+        os.path.join(root, name)
+        for name in os.listdir(root)
+        if ".tmp-" not in name and os.path.isfile(os.path.join(root, name, MANIFEST_NAME))
+    ]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for path in entries[max(1, int(keep)):]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def export_compact_bundle(models, feature_cols, model_paths=None, feature_path=None, *, root=None, probe_rows=256):
+    """把已落盘的一套模型导出为紧凑产物，返回目录；还原后概率与原模型不一致的模型记为 joblib。"""
+    model_paths = model_paths or default_model_paths()
+    feature_path = feature_path or default_feature_path()
+    feature_cols = [str(col) for col in feature_cols]
+    started = time.perf_counter()
+    sources = source_hashes(model_paths, feature_path)
+    key = compact_key(sources)
+    root = compact_root(root)
+    directory = os.path.join(root, key)
+    if os.path.isfile(os.path.join(directory, MANIFEST_NAME)):
+        return directory
+
+    compiled = compile_models(models, feature_cols=feature_cols, probe_rows=probe_rows)
+    arena = compiled_arena(compiled)
+    specs = {}
+    for name in models:
+        try:
+            specs[name] = _model_spec(compiled[name]) if compiled[name] is not models[name] else {"kind": KIND_JOBLIB}
+        except ValueError as exc:
+            log_error(f"模型 {name} 无法导出紧凑产物，改为加载原 joblib 文件: {exc}")
+            specs[name] = {"kind": KIND_JOBLIB}
+    manifest = {
+        "version": COMPACT_FORMAT_VERSION,
+        "key": key,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "sources": {
+            "models": {
+                name: {"path": os.path.relpath(path, BASE_DIR), "sha256": sources["models"][name]}
+                for name, path in model_paths.items()
+            },
+            "feature_list": {"path": os.path.relpath(feature_path, BASE_DIR), "sha256": sources["feature_list"]},
+        },
+        "feature_cols": feature_cols,
+        "arena": arena is not None,
+        "models": specs,
+    }
+
+    os.makedirs(root, exist_ok=True)
+    tmp_directory = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    try:
+        if arena is not None:
+            for field in ARENA_FIELDS:
+                np.save(os.path.join(tmp_directory, f"{field}.npy"), np.ascontiguousarray(getattr(arena, field)))
+        with open(os.path.join(tmp_directory, MANIFEST_NAME), "w", encoding="utf-8") as file:
+            json.dump(manifest, file, ensure_ascii=False, sort_keys=True)
+
+        # 逐模型核对还原结果，不一致的降级为 joblib 后重写 manifest
+        _, restored = _read_directory(tmp_directory, model_paths)
+        if arena is not None:
+            probe = probe_frame(arena, feature_cols, rows=probe_rows)
+            for name, model in restored.items():
+                if specs[name]["kind"] == KIND_JOBLIB:
+                    continue
+                difference = float(np.max(np.abs(
+                    np.asarray(models[name].predict_proba(probe), dtype=float)
+                    - np.asarray(model.predict_proba(probe), dtype=float)
+                )))
+                if not difference <= 1e-6:
+                    log_error(f"模型 {name} 紧凑产物概率偏差 {difference:.3g}，改为加载原 joblib 文件")
+                    specs[name] = {"kind": KIND_JOBLIB}
+            with open(os.path.join(tmp_directory, MANIFEST_NAME), "w", encoding="utf-8") as file:
+                json.dump(manifest, file, ensure_ascii=False, sort_keys=True)
+        try:
+            os.rename(tmp_directory, directory)
+        except OSError:
+            # 其它进程已经导出了同一套产物
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        raise
+    _prune(root, getattr(config, "MODEL_COMPACT_KEEP", 3))
+    log_info(
+        "紧凑模型产物已导出: "
+        f"key={key[:12]} compact={','.join(name for name, spec in specs.items() if spec['kind'] != KIND_JOBLIB) or '-'} "
+        f"elapsed={time.perf_counter() - started:.2f}s"
+    )
+    return directory
+
+
+def load_compact_models(model_paths=None, feature_path=None, *, root=None, build=True):
+    """按原产物哈希加载紧凑产物，返回 {"models", "feature_cols", "directory"}。
+
+    对应目录不存在且 build=True 时先用 joblib 加载原产物并导出（只在产物更新后的第一次启动发生）。
+    """
+    model_paths = model_paths or default_model_paths()
+    feature_path = feature_path or default_feature_path()
+    sources = source_hashes(model_paths, feature_path)
+    directory = os.path.join(compact_root(root), compact_key(sources))
+    if not os.path.isfile(os.path.join(directory, MANIFEST_NAME)):
+        if not build:
+            raise FileNotFoundError(f"紧凑模型产物不存在: {directory}")
+        import joblib
+
+        feature_cols = list(joblib.load(feature_path))
+        export_compact_bundle(signal_engine.load_models(model_paths), feature_cols, model_paths, feature_path, root=root)
+
+    manifest, models = _read_directory(directory, model_paths)
+    for name, model in models.items():
+        signal_engine.register_model_artifact_hash(model, sources["models"][str(name)])
+    return {"models": models, "feature_cols": list(manifest["feature_cols"]), "directory": directory}
+
+
+def load_inference_models(model_paths=None, feature_path=None, *, compact=None):
+    """推理入口统一的模型加载：开启紧凑产物时走 load_compact_models，否则 joblib 加载原产物。"""
+    model_paths = model_paths or default_model_paths()
+    feature_path = feature_path or default_feature_path()
+    if compact_artifacts_enabled() if compact is None else compact:
+        try:
+            return load_compact_models(model_paths, feature_path)
+        except Exception as exc:
+            log_error(f"紧凑模型产物加载失败，改用 joblib 原产物: {exc}")
+    import joblib
+
+    return {
+        "models": signal_engine.load_models(model_paths),
+        "feature_cols": list(joblib.load(feature_path)),
+        "directory": None,
+    }
@@ -0,0 +1,488 @@
+"""树模型编译推理。
+
+把 LightGBM / XGBoost / RandomForest 的全部树（含方向质量模型的 long/short 子模型）
+展平到一组连续的节点数组，用纯 NumPy 逐层遍历求叶子值，复现各库的 predict_proba。
+实盘每根 bar 只预测一行，原生库的调用开销（DataFrame 校验、线程池调度）远大于
+树本身的计算量，编译后的评估器跳过这些开销，概率与原模型一致（编译时逐模型校验）。
+"""
+import copy
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.direction_quality import DirectionQualityModel
+from utils.utils import log_error, log_info
+
+
+# 缺失值处理方式（与各库的节点判定规则对应）
+MISSING_AS_ZERO = 0      # LightGBM missing_type=None：NaN 当作 0 参与比较
+MISSING_ZERO_DEFAULT = 1  # LightGBM missing_type=Zero：0/NaN 走默认方向
+MISSING_NAN_DEFAULT = 2   # LightGBM missing_type=NaN、XGBoost、sklearn：NaN 走默认方向
+
+# LightGBM kZeroThreshold（C++ 里是 float 常量 1e-35f）
+ZERO_THRESHOLD = float(np.float32(1e-35))
+
+LINK_SIGMOID = "sigmoid"
+LINK_MEAN = "mean"
+
+DEFAULT_TOLERANCE = 1e-6
+
+# TreeArena 的数组字段（紧凑产物按这些名字逐个保存为 .npy）
+ARENA_FIELDS = ("feature", "threshold", "left", "right", "default_left", "missing_mode", "value", "roots", "depths")
+
+
+class _TreeBuilder:
+    """逐棵追加树节点，最后拼成一个 TreeArena。"""
+
+    def __init__(self):
+        self.feature = []
+        self.threshold = []
+        self.left = []
+        self.right = []
+        self.default_left = []
+        self.missing_mode = []
+        self.value = []
+        self.roots = []
+        self.depths = []
+
+    @property
+    def tree_count(self):
+        return len(self.roots)
+
+    def add_node(self, *, feature=0, threshold=0.0, default_left=False, missing_mode=MISSING_NAN_DEFAULT, value=0.0):
+        index = len(self.feature)
+        self.feature.append(int(feature))
+        self.threshold.append(float(threshold))
+        self.left.append(index)
+        self.right.append(index)
+        self.default_left.append(bool(default_left))
+        self.missing_mode.append(int(missing_mode))
+        self.value.append(float(value))
+        return index
+
+    def link(self, parent, left, right):
+        self.left[parent] = int(left)
+        self.right[parent] = int(right)
+
+    def add_tree(self, root, depth):
+        self.roots.append(int(root))
+        self.depths.append(int(depth))
+
+    def build(self):
+        return TreeArena(
+            feature=np.asarray(self.feature, dtype=np.int32),
+            threshold=np.asarray(self.threshold, dtype=np.float64),
+            left=np.asarray(self.left, dtype=np.int32),
+            right=np.asarray(self.right, dtype=np.int32),
+            default_left=np.asarray(self.default_left, dtype=bool),
+            missing_mode=np.asarray(self.missing_mode, dtype=np.int8),
+            value=np.asarray(self.value, dtype=np.float64),
+            roots=np.asarray(self.roots, dtype=np.int32),
+            depths=np.asarray(self.depths, dtype=np.int32),
+        )
+
+
+class TreeArena:
+    """所有树共用的连续节点数组；叶子节点的左右孩子指向自身。"""
+
+    def __init__(self, *, feature, threshold, left, right, default_left, missing_mode, value, roots, depths):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.missing_mode = missing_mode
+        self.value = value
+        self.roots = roots
+        self.depths = depths
+
+    @property
+    def node_count(self):
+        return int(len(self.feature))
+
+    @property
+    def nbytes(self):
+        return int(sum(getattr(self, field).nbytes for field in ARENA_FIELDS))
+
+    def leaf_values(self, X, tree_start, tree_end, depth, *, strict=False, float32_input=False, zero_missing=False,
+                    snap_zero=False):
+        """返回 [行数, 树数] 的叶子值矩阵。
+
+        strict/float32_input 是整个估计器统一的比较语义（XGBoost 用 float32 的 <，sklearn 用 float32 的 <=，
+        LightGBM 用 float64 的 <=）；输入无 NaN 且没有 Zero 缺失类型的节点时跳过缺失值分支。
+        snap_zero 复现 LightGBM 读行时把 |x|<=kZeroThreshold 当作 0 的处理。
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if snap_zero:
+            X = np.where(np.abs(X) <= ZERO_THRESHOLD, 0.0, X)
+        if float32_input:
+            with np.errstate(over="ignore"):
+                X = X.astype(np.float32).astype(np.float64)
+        handle_missing = zero_missing or bool(np.isnan(X).any())
+        rows = np.arange(len(X)).reshape(-1, 1)
+        nodes = np.repeat(self.roots[tree_start:tree_end].reshape(1, -1), len(X), axis=0)
+        for _ in range(int(depth)):
+            values = X[rows, self.feature[nodes]]
+            if handle_missing:
+                missing = np.isnan(values)
+                mode = self.missing_mode[nodes]
+                values = np.where(missing & (mode != MISSING_NAN_DEFAULT), 0.0, values)
+            go_left = values < self.threshold[nodes] if strict else values <= self.threshold[nodes]
+            if handle_missing:
+                use_default = np.where(
+                    mode == MISSING_NAN_DEFAULT,
+                    missing,
+                    (mode == MISSING_ZERO_DEFAULT) & (np.abs(values) <= ZERO_THRESHOLD),
+                )
+                go_left = np.where(use_default, self.default_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes]
+
+
+class CompiledTreeEnsemble:
+    """单个编译后的二分类树模型，接口与原估计器的 predict_proba / classes_ 一致。"""
+
+    def __init__(self, arena, *, tree_start, tree_end, link, scale=1.0, offset=0.0, strict=False,
+                 float32_input=False, snap_zero=False, feature_names=None, source_type=""):
+        self.arena = arena
+        self.tree_start = int(tree_start)
+        self.tree_end = int(tree_end)
+        self.depth = int(arena.depths[tree_start:tree_end].max()) if tree_end > tree_start else 0
+        self.link = link
+        self.scale = float(scale)
+        self.offset = float(offset)
+        self.strict = bool(strict)
+        self.float32_input = bool(float32_input)
+        self.snap_zero = bool(snap_zero)
+        self.zero_missing = bool(np.any(arena.missing_mode[self._node_range()] == MISSING_ZERO_DEFAULT))
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.source_type = source_type
+        self.classes_ = np.asarray([0, 1], dtype=int)
+
+    @property
+    def tree_count(self):
+        return self.tree_end - self.tree_start
+
+    def to_spec(self):
+        """构造参数（不含 arena），配合同一个 arena 可还原出等价的模型。"""
+        return {
+            "tree_start": self.tree_start,
+            "tree_end": self.tree_end,
+            "link": self.link,
+            "scale": self.scale,
+            "offset": self.offset,
+            "strict": self.strict,
+            "float32_input": self.float32_input,
+            "snap_zero": self.snap_zero,
+            "feature_names": self.feature_names,
+            "source_type": self.source_type,
+        }
+
+    def _node_range(self):
+        if self.tree_end <= self.tree_start:
+            return slice(0, 0)
+        end = self.arena.roots[self.tree_end] if self.tree_end < len(self.arena.roots) else self.arena.node_count
+        return slice(int(self.arena.roots[self.tree_start]), int(end))
+
+    def _matrix(self, X):
+        if hasattr(X, "columns"):
+            if self.feature_names is not None and list(X.columns) != self.feature_names:
+                X = X[self.feature_names]
+            return X.to_numpy(dtype=np.float64)
+        return np.asarray(X, dtype=np.float64)
+
+    def predict_proba(self, X):
+        leaves = self.arena.leaf_values(
+            self._matrix(X),
+            self.tree_start,
+            self.tree_end,
+            self.depth,
+            strict=self.strict,
+            float32_input=self.float32_input,
+            zero_missing=self.zero_missing,
+            snap_zero=self.snap_zero,
+        )
+        if self.link == LINK_MEAN:
+            trade = leaves.mean(axis=1) if self.tree_count else np.zeros(len(leaves))
+        else:
+            margin = leaves.sum(axis=1) + self.offset
+            trade = 1.0 / (1.0 + np.exp(-self.scale * margin))
+        return np.column_stack([1.0 - trade, trade])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] >= 0.5).astype(int)
+
+
+def _binary_classes(model):
+    classes = [int(value) for value in getattr(model, "classes_", [])]
+    if classes != [0, 1]:
+        raise ValueError(f"仅支持 [0, 1] 二分类模型，实际类别: {classes}")
+
+
+def _feature_names(model):
+    names = getattr(model, "feature_names_in_", None)
+    return [str(name) for name in names] if names is not None else None
+
+
+def _lightgbm_subtree(builder, node):
+    if "leaf_value" in node:
+        if "leaf_coeff" in node:
+            raise ValueError("不支持 LightGBM linear_tree")
+        return builder.add_node(value=node["leaf_value"]), 0
+    if node.get("decision_type") != "<=":
+        raise ValueError(f"不支持 LightGBM 分裂类型: {node.get('decision_type')}")
+    missing_mode = {
+        "None": MISSING_AS_ZERO,
+        "Zero": MISSING_ZERO_DEFAULT,
+        "NaN": MISSING_NAN_DEFAULT,
+    }[str(node.get("missing_type", "None"))]
+    index = builder.add_node(
+        feature=node["split_feature"],
+        threshold=node["threshold"],
+        default_left=node.get("default_left", True),
+        missing_mode=missing_mode,
+    )
+    left, left_depth = _lightgbm_subtree(builder, node["left_child"])
+    right, right_depth = _lightgbm_subtree(builder, node["right_child"])
+    builder.link(index, left, right)
+    return index, 1 + max(left_depth, right_depth)
+
+
+def _compile_lightgbm(model, builder):
+    _binary_classes(model)
+    best_iteration = getattr(model, "_best_iteration", None) or None
+    dump = model.booster_.dump_model(num_iteration=best_iteration)
+    objective = str(dump.get("objective", ""))
+    if not objective.startswith("binary"):
+        raise ValueError(f"不支持 LightGBM 目标函数: {objective}")
+    scale = 1.0
+    for part in objective.split()[1:]:
+        if part.startswith("sigmoid:"):
+            scale = float(part.split(":", 1)[1])
+    for tree in dump["tree_info"]:
+        root, depth = _lightgbm_subtree(builder, tree["tree_structure"])
+        builder.add_tree(root, depth)
+    return {"link": LINK_SIGMOID, "scale": scale, "offset": 0.0, "snap_zero": True}
+
+
+def _compile_xgboost(model, builder):
+    _binary_classes(model)
+    booster = model.get_booster()
+    learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+    objective = learner["objective"]["name"]
+    if objective != "binary:logistic":
+        raise ValueError(f"不支持 XGBoost 目标函数: {objective}")
+    gradient_booster = learner["gradient_booster"]
+    if gradient_booster.get("name") != "gbtree":
+        raise ValueError(f"不支持 XGBoost booster: {gradient_booster.get('name')}")
+    trees = gradient_booster["model"]["trees"]
+    try:
+        best_iteration = model.best_iteration
+    except AttributeError:
+        best_iteration = None
+    if best_iteration is not None:
+        indptr = gradient_booster["model"]["iteration_indptr"]
+        trees = trees[:indptr[int(best_iteration) + 1]]
+
+    for tree in trees:
+        if any(int(value) != 0 for value in tree.get("split_type", [])):
+            raise ValueError("不支持 XGBoost 类别分裂")
+        lefts = tree["left_children"]
+        rights = tree["right_children"]
+        base = None
+        depth = np.zeros(len(lefts), dtype=int)
+        for node_id in range(len(lefts)):
+            is_leaf = int(lefts[node_id]) == -1
+            index = builder.add_node(
+                feature=0 if is_leaf else tree["split_indices"][node_id],
+                threshold=np.float32(tree["split_conditions"][node_id]),
+                default_left=bool(int(tree["default_left"][node_id])),
+                value=np.float32(tree["split_conditions"][node_id]) if is_leaf else 0.0,
+            )
+            base = index if base is None else base
+        for node_id in range(len(lefts)):
+            if int(lefts[node_id]) != -1:
+                builder.link(base + node_id, base + int(lefts[node_id]), base + int(rights[node_id]))
+                depth[int(lefts[node_id])] = depth[node_id] + 1
+                depth[int(rights[node_id])] = depth[node_id] + 1
+        builder.add_tree(base, int(depth.max()))
+
+    base_score = float(learner["learner_model_param"]["base_score"])
+    base_score = min(max(base_score, 1e-16), 1.0 - 1e-16)
+    return {
+        "link": LINK_SIGMOID,
+        "scale": 1.0,
+        "offset": float(np.log(base_score / (1.0 - base_score))),
+        "strict": True,
+        "float32_input": True,
+    }
+
+
+def _compile_forest(model, builder):
+    _binary_classes(model)
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        if tree.n_outputs != 1:
+            raise ValueError("不支持多输出决策树")
+        missing_left = getattr(tree, "missing_go_to_left", None)
+        value = tree.value[:, 0, :]
+        totals = value.sum(axis=1)
+        totals[totals == 0] = 1.0
+        trade = value[:, 1] / totals
+        base = None
+        for node_id in range(tree.node_count):
+            is_leaf = tree.children_left[node_id] == -1
+            index = builder.add_node(
+                feature=0 if is_leaf else tree.feature[node_id],
+                threshold=tree.threshold[node_id],
+                default_left=bool(missing_left[node_id]) if missing_left is not None else False,
+                value=trade[node_id] if is_leaf else 0.0,
+            )
+            base = index if base is None else base
+        for node_id in range(tree.node_count):
+            if tree.children_left[node_id] != -1:
+                builder.link(base + node_id, base + tree.children_left[node_id], base + tree.children_right[node_id])
+        builder.add_tree(base, tree.max_depth)
+    return {"link": LINK_MEAN, "float32_input": True}
+
+
+def _estimator_compiler(model):
+    module = type(model).__module__
+    name = type(model).__name__
+    if module.startswith("lightgbm") and hasattr(model, "booster_"):
+        return "lightgbm", _compile_lightgbm
+    if module.startswith("xgboost") and hasattr(model, "get_booster"):
+        return "xgboost", _compile_xgboost
+    if module.startswith("sklearn") and name in {"RandomForestClassifier", "ExtraTreesClassifier"}:
+        return "sklearn_forest", _compile_forest
+    raise ValueError(f"不支持编译的模型类型: {module}.{name}")
+
+
+def _compile_estimator(model, builder):
+    source_type, compiler = _estimator_compiler(model)
+    tree_start = builder.tree_count
+    params = compiler(model, builder)
+    return {
+        "tree_start": tree_start,
+        "tree_end": builder.tree_count,
+        "feature_names": _feature_names(model),
+        "source_type": source_type,
+        **params,
+    }
+
+
+def _compile_model(model, builder):
+    """返回一个延迟构造函数：arena 拼好之后再生成编译模型。"""
+    if isinstance(model, DirectionQualityModel):
+        global_spec = _compile_estimator(model.global_model, builder)
+        direction_specs = {
+            direction: _compile_estimator(estimator, builder)
+            for direction, estimator in model.direction_models.items()
+        }
+
+        def finish(arena):
+            compiled = copy.copy(model)
+            compiled.global_model = CompiledTreeEnsemble(arena, **global_spec)
+            compiled.direction_models = {
+                direction: CompiledTreeEnsemble(arena, **spec)
+                for direction, spec in direction_specs.items()
+            }
+            return compiled
+        return finish
+
+    spec = _compile_estimator(model, builder)
+    return lambda arena: CompiledTreeEnsemble(arena, **spec)
+
+
+def probe_frame(arena, feature_cols, rows=64, seed=7):
+    """按各特征的分裂阈值构造校验样本，覆盖阈值两侧和恰好落在阈值上的情况。"""
+    rng = np.random.default_rng(seed)
+    feature_cols = list(feature_cols)
+    internal = arena.left != np.arange(arena.node_count)
+    data = rng.normal(size=(rows, len(feature_cols)))
+    for column in range(len(feature_cols)):
+        thresholds = arena.threshold[internal & (arena.feature == column)]
+        # LightGBM 对只含 NaN 的分裂使用极大阈值，不适合作为样本值
+        thresholds = thresholds[np.abs(thresholds) < 1e30]
+        if len(thresholds) == 0:
+            continue
+        chosen = rng.choice(thresholds, size=rows)
+        offsets = rng.choice([-1.0, 0.0, 1.0], size=rows) * rng.uniform(1e-6, 1e-2, size=rows) * (np.abs(chosen) + 1.0)
+        data[:, column] = chosen + offsets
+    frame = pd.DataFrame(data, columns=feature_cols)
+    if "trend_bias_num" in frame.columns:
+        frame["trend_bias_num"] = np.resize([1.0, -1.0, 0.0], rows)
+    return frame
+
+
+def compile_models(models, *, feature_cols=None, tolerance=DEFAULT_TOLERANCE, probe_rows=256):
+    """把模型字典里的树模型编译到同一个 TreeArena。
+
+    无法编译或与原模型概率差超过 tolerance 的模型保留原对象，不影响其它模型。
+    feature_cols 用于构造校验样本；为空时跳过校验。
+    """
+    started = time.perf_counter()
+    builder = _TreeBuilder()
+    pending = {}
+    compiled = dict(models)
+    for name, model in models.items():
+        try:
+            pending[name] = _compile_model(model, builder)
+        except (ValueError, KeyError, AttributeError, TypeError) as exc:
+            log_error(f"模型 {name} 无法编译，沿用原生推理: {exc}")
+    if not pending:
+        return compiled
+
+    arena = builder.build()
+    probe = probe_frame(arena, feature_cols, rows=probe_rows) if feature_cols is not None else None
+    for name, finish in pending.items():
+        candidate = finish(arena)
+        if probe is not None:
+            difference = float(np.max(np.abs(
+                np.asarray(models[name].predict_proba(probe), dtype=float)
+                - np.asarray(candidate.predict_proba(probe), dtype=float)
+            )))
+            if not difference <= tolerance:
+                log_error(f"模型 {name} 编译后概率偏差 {difference:.3g} 超过 {tolerance:g}，沿用原生推理")
+                continue
+        compiled[name] = candidate
+
+    log_info(
+        "树模型编译完成: "
+        f"models={','.join(name for name in compiled if compiled[name] is not models[name]) or '-'} "
+        f"trees={len(arena.roots)} nodes={arena.node_count} bytes={arena.nbytes} "
+        f"elapsed={time.perf_counter() - started:.2f}s"
+    )
+    return compiled
+
+
+def is_compiled(model):
+    if isinstance(model, CompiledTreeEnsemble):
+        return True
+    return isinstance(getattr(model, "global_model", None), CompiledTreeEnsemble)
+
+
+def compiled_arena(models):
+    """返回 compile_models 结果中共享的 TreeArena；没有编译模型时返回 None。"""
+    for model in models.values():
+        estimator = getattr(model, "global_model", model)
+        if isinstance(estimator, CompiledTreeEnsemble):
+            return estimator.arena
+    return None
+
+
+def latency_percentiles(samples):
+    """单次推理耗时（秒）列表 -> 毫秒级 p50/p99/mean。"""
+    values = np.asarray(samples, dtype=float) * 1000.0
+    if len(values) == 0:
+        return {"count": 0, "p50_ms": None, "p99_ms": None, "mean_ms": None}
+    return {
+        "count": int(len(values)),
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p99_ms": round(float(np.percentile(values, 99)), 4),
+        "mean_ms": round(float(values.mean()), 4),
+    }
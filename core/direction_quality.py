@@ -1,5 +1,3 @@
-import math
-
 import numpy as np
 
 
@@ -38,18 +36,46 @@ class BinaryProbabilityCalibrator:
         self.weighted = bool(weighted)
         self.inverted = bool(inverted)
 
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop("_lookup", None)
+        return state
+
     @property
     def active(self):
         return self.model is not None and self.fallback_reason is None
 
+    def _lookup_table(self):
+        """把校准模型展开成查表形式：sigmoid 取系数，isotonic 取分段线性节点，随 model 替换重建。"""
+        cached = getattr(self, "_lookup", None)
+        if cached is not None and cached[0] is self.model:
+            return cached[1]
+        table = None
+        if self.method == "sigmoid":
+            # 与 sklearn LogisticRegression.predict_proba 同用 scipy expit，逐位一致
+            from scipy.special import expit
+
+            coef = np.asarray(self.model.coef_, dtype=float).reshape(-1)
+            table = (float(coef[0]), float(np.asarray(self.model.intercept_, dtype=float).reshape(-1)[0]), expit)
+        elif self.method == "isotonic":
+            x = np.asarray(self.model.X_thresholds_, dtype=float)
+            y = np.asarray(self.model.y_thresholds_, dtype=float)
+            if len(x) > 1 and np.all(np.diff(x) > 0):
+                table = (x, y)
+        self._lookup = (self.model, table)
+        return table
+
     def predict_trade_probability(self, trade_probability):
         values = np.asarray(trade_probability, dtype=float)
         values = np.clip(values, 0.0, 1.0)
         if not self.active:
             return values
 
+        table = self._lookup_table()
         if self.method == "sigmoid":
-            calibrated = self.model.predict_proba(values.reshape(-1, 1))[:, 1]
+            calibrated = table[2](values.reshape(-1) * table[0] + table[1])
+        elif self.method == "isotonic" and table is not None:
+            calibrated = np.interp(values.reshape(-1), table[0], table[1])
         elif self.method == "isotonic":
             calibrated = self.model.predict(values)
         else:
@@ -173,6 +199,23 @@ def _binary_probabilities(model, X):
     return np.column_stack([no_trade, trade]).astype(float)
 
 
+REGIME_FLAG_COLUMNS = (
+    ("regime_range_high_vol", "range_high_vol"),
+    ("regime_trend_long", "trend_long"),
+    ("regime_trend_short", "trend_short"),
+)
+# 编码 0 是没有任何 regime 标记时的 range，后面的标记按顺序覆盖前面的
+REGIME_FLAG_NAMES = ("range",) + tuple(name for _column, name in REGIME_FLAG_COLUMNS)
+
+
+def _take_rows(X, rows, row_count):
+    if len(rows) == row_count:
+        return X
+    if hasattr(X, "iloc"):
+        return X.take(rows)
+    return np.asarray(X)[rows]
+
+
 class DirectionQualityModel:
     """Binary trade-quality model with direction-specific submodels.
 
@@ -233,54 +276,63 @@ class DirectionQualityModel:
             values = np.asarray(X["trend_bias_num"], dtype=float)
         else:
             values = np.zeros(len(X), dtype=float)
-        values = np.asarray([0.0 if not math.isfinite(float(v)) else float(v) for v in values])
-        return values
+        return np.where(np.isfinite(values), values, 0.0)
+
+    def trend_codes(self, X):
+        """逐行方向编码：1 走 long 子模型，-1 走 short 子模型，0 只用全局模型。"""
+        return np.sign(self._trend_bias_values(X)).astype(np.int8)
 
     def _regime_values(self, X):
-        regimes = np.asarray(["unknown"] * len(X), dtype=object)
+        codes, names = self.regime_codes(X)
+        return np.asarray(names, dtype=object)[codes]
+
+    def regime_codes(self, X):
+        """逐行 regime 编码 (codes, names)，names[codes[i]] 即第 i 行的 regime 名。"""
         if not hasattr(X, "columns"):
-            return regimes
+            return np.zeros(len(X), dtype=np.intp), ["unknown"]
 
         if "label_regime" in X.columns:
-            return np.asarray(
-                [
-                    str(value or "unknown").strip().lower()
-                    for value in X["label_regime"].fillna("unknown")
-                ],
-                dtype=object,
-            )
-
-        regimes = np.asarray(["range"] * len(X), dtype=object)
-        if "regime_range_high_vol" in X.columns:
-            mask = np.asarray(X["regime_range_high_vol"].astype(float) > 0.5, dtype=bool)
-            regimes[mask] = "range_high_vol"
-        if "regime_trend_long" in X.columns:
-            mask = np.asarray(X["regime_trend_long"].astype(float) > 0.5, dtype=bool)
-            regimes[mask] = "trend_long"
-        if "regime_trend_short" in X.columns:
-            mask = np.asarray(X["regime_trend_short"].astype(float) > 0.5, dtype=bool)
-            regimes[mask] = "trend_short"
-        return regimes
-
-    def _calibrate_probabilities(self, direction, probs, X=None):
+            import pandas as pd
+
+            raw_codes, uniques = pd.factorize(X["label_regime"].fillna("unknown"))
+            # 只对去重后的取值做字符串归一化，不同写法归到同一个 regime 名下
+            normalized = [str(value or "unknown").strip().lower() for value in uniques]
+            names = sorted(set(normalized))
+            remap = np.asarray([names.index(name) for name in normalized], dtype=np.intp)
+            return remap[raw_codes], names
+
+        names = list(REGIME_FLAG_NAMES)
+        codes = np.zeros(len(X), dtype=np.intp)
+        for code, (column, _name) in enumerate(REGIME_FLAG_COLUMNS, start=1):
+            if column in X.columns:
+                codes[np.asarray(X[column].astype(float) > 0.5, dtype=bool)] = code
+        return codes, names
+
+    def _calibrate_probabilities(self, direction, probs, X=None, *, regimes=None):
         probs = np.asarray(probs, dtype=float)
         calibrated = probs.copy()
         applied = np.zeros(len(probs), dtype=bool)
 
         by_regime = self.direction_regime_calibrators.get(direction) or {}
-        if by_regime and X is not None:
-            regimes = self._regime_values(X)
+        if by_regime and regimes is None and X is not None:
+            regimes = self.regime_codes(X)
+        if by_regime and regimes is not None:
+            codes, names = regimes
             for regime, calibrator in by_regime.items():
                 if calibrator is None or not bool(getattr(calibrator, "active", False)):
                     continue
-                mask = regimes == str(regime).strip().lower()
+                regime_key = str(regime).strip().lower()
+                if regime_key not in names:
+                    continue
+                mask = codes == names.index(regime_key)
                 if not np.any(mask):
                     continue
                 trade_probability = np.asarray(
                     calibrator.predict_trade_probability(probs[mask, 1]),
                     dtype=float,
                 )
-                calibrated[mask] = np.column_stack([1.0 - trade_probability, trade_probability]).astype(float)
+                calibrated[mask, 0] = 1.0 - trade_probability
+                calibrated[mask, 1] = trade_probability
                 applied[mask] = True
 
         calibrator = self.direction_calibrators.get(direction)
@@ -293,26 +345,46 @@ class DirectionQualityModel:
             calibrator.predict_trade_probability(probs[fallback_mask, 1]),
             dtype=float,
         )
-        calibrated[fallback_mask] = np.column_stack([1.0 - trade_probability, trade_probability]).astype(float)
+        calibrated[fallback_mask, 0] = 1.0 - trade_probability
+        calibrated[fallback_mask, 1] = trade_probability
         return calibrated
 
-    def predict_proba(self, X):
-        probs = _binary_probabilities(self.global_model, X)
-        trend_bias = self._trend_bias_values(X)
+    def _has_regime_calibrators(self):
+        return any(
+            calibrator is not None and bool(getattr(calibrator, "active", False))
+            for by_regime in self.direction_regime_calibrators.values()
+            for calibrator in (by_regime or {}).values()
+        )
+
+    def predict_proba(self, X, *, trend_codes=None, regime_codes=None):
+        """[no_trade, trade] 概率。
 
-        for direction, sign in (("long", 1.0), ("short", -1.0)):
+        trend_codes / regime_codes 可传入预先算好的编码（见 trend_codes()、regime_codes()），
+        否则按特征列现算。方向子模型只在对应行上预测；全局模型只算没有被子模型覆盖的行。
+        """
+        row_count = len(X)
+        codes = self.trend_codes(X) if trend_codes is None else np.asarray(trend_codes)
+        if self._has_regime_calibrators() and regime_codes is None:
+            regime_codes = self.regime_codes(X)
+
+        probs = np.zeros((row_count, 2), dtype=float)
+        covered = np.zeros(row_count, dtype=bool)
+        for direction, sign in (("long", 1), ("short", -1)):
             model = self.direction_models.get(direction)
             if model is None:
                 continue
-            mask = trend_bias > 0 if sign > 0 else trend_bias < 0
-            if not np.any(mask):
+            rows = np.flatnonzero(codes == sign)
+            if not len(rows):
                 continue
-            if hasattr(X, "iloc"):
-                subset = X.iloc[np.where(mask)[0]]
-            else:
-                subset = np.asarray(X)[mask]
+            subset = _take_rows(X, rows, row_count)
             direction_probs = _binary_probabilities(model, subset)
-            probs[mask] = self._calibrate_probabilities(direction, direction_probs, subset)
+            regimes = None if regime_codes is None else (regime_codes[0][rows], regime_codes[1])
+            probs[rows] = self._calibrate_probabilities(direction, direction_probs, subset, regimes=regimes)
+            covered[rows] = True
+
+        global_rows = np.flatnonzero(~covered)
+        if len(global_rows) or not row_count:
+            probs[global_rows] = _binary_probabilities(self.global_model, _take_rows(X, global_rows, row_count))
 
         return np.clip(probs, 0.0, 1.0)
 
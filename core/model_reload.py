@@ -0,0 +1,237 @@
+"""实盘模型热加载。
+
+重训发布新产物后，后台线程按产物清单（模型文件、特征列、训练元数据的 mtime/size）发现变化，
+在后台完成加载、产物哈希核对、编译和试推理校验，再由主循环在两根 bar 之间整体替换
+models / feature_cols / model_metadata；实时风控线程全程不停。
+
+重训进行中（run.retrain_models 持有 model_retrain.lock）不加载：此时磁盘上的是尚未通过验证、
+可能被回滚的候选产物。清单变化后还要连续两次检查一致才加载，避免读到写了一半的产物。
+"""
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import config
+from core import signal_engine
+from core.compact_models import compact_artifacts_enabled, load_inference_models
+from core.compiled_trees import compile_models
+from utils.utils import BASE_DIR, LOGS_DIR, log_error, log_info, sha256_file
+
+
+RETRAIN_LOCK_PATH = os.path.join(LOGS_DIR, "model_retrain.lock")
+PROBE_TREND_BIASES = ("long", "short", "neutral")
+
+
+def bundle_paths():
+    return {
+        "models": {name: os.path.join(BASE_DIR, path) for name, path in config.MODEL_PATHS.items()},
+        "feature_list": os.path.join(BASE_DIR, config.FEATURE_LIST_PATH),
+        "metadata": os.path.join(BASE_DIR, config.TRAINING_METADATA_PATH),
+    }
+
+
+def manifest_signature(paths=None):
+    """产物清单签名：每个文件的 (路径, mtime_ns, size)，缺失文件记为 None。"""
+    paths = paths or bundle_paths()
+    entries = []
+    for path in sorted({*paths["models"].values(), paths["feature_list"], paths["metadata"]}):
+        try:
+            stat = os.stat(path)
+            entries.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            entries.append((path, None, None))
+    return tuple(entries)
+
+
+def retrain_in_progress(lock_path=None):
+    lock_path = lock_path or RETRAIN_LOCK_PATH
+    if not os.path.exists(lock_path):
+        return False
+    try:
+        with open(lock_path, "r", encoding="utf-8") as file:
+            pid = int(json.load(file).get("pid"))
+    except Exception:
+        # 锁文件正在写入或已损坏时保守认为重训仍在进行
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _read_metadata(path, *, strict):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except Exception as exc:
+        if strict:
+            raise RuntimeError(f"训练元数据读取失败: {exc}") from exc
+        log_error(f"模型训练元数据读取失败，按旧方向模型处理: {exc}")
+        return {}
+
+
+def verify_artifact_hashes(models, model_metadata, paths):
+    """训练元数据记录了 artifact_hashes 时，核对实际加载的产物与之一致。"""
+    expected = model_metadata.get("artifact_hashes") or {}
+    if not expected:
+        return
+    actual = {
+        os.path.relpath(path, BASE_DIR): signal_engine.model_artifact_hash(models[name])
+        for name, path in paths["models"].items()
+    }
+    actual[os.path.relpath(paths["feature_list"], BASE_DIR)] = sha256_file(paths["feature_list"])
+    for rel_path, digest in actual.items():
+        if rel_path in expected and digest is not None and digest != expected[rel_path]:
+            raise RuntimeError(f"产物哈希与训练元数据不一致: {rel_path}")
+
+
+def _check_feature_counts(models, feature_cols, model_metadata):
+    expected = model_metadata.get("feature_count")
+    if expected is not None and int(expected) != len(feature_cols):
+        raise RuntimeError(f"特征列数量 {len(feature_cols)} 与训练元数据 feature_count={expected} 不一致")
+    for name, model in models.items():
+        n_features = getattr(model, "n_features_in_", None)
+        if n_features is not None and int(n_features) != len(feature_cols):
+            raise RuntimeError(f"模型 {name} 输入特征数 {n_features} 与特征列数量 {len(feature_cols)} 不一致")
+
+
+def probe_bundle(bundle, model_weights=None, direction_model_weights=None):
+    """用一行全零特征按三种 trend_bias 试推理，要求输出两个 [0, 1] 内的有限概率。"""
+    feature_cols = bundle["feature_cols"]
+    X = pd.DataFrame(np.zeros((1, len(feature_cols))), columns=feature_cols)
+    for trend_bias in PROBE_TREND_BIASES:
+        probs = np.asarray(
+            signal_engine.weighted_predict_proba(
+                bundle["models"],
+                X,
+                config.MODEL_WEIGHTS if model_weights is None else model_weights,
+                trend_bias=trend_bias,
+                model_metadata=bundle["model_metadata"],
+                direction_model_weights=(
+                    getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {})
+                    if direction_model_weights is None
+                    else direction_model_weights
+                ),
+            ),
+            dtype=float,
+        )
+        if probs.shape != (2,) or not np.isfinite(probs).all() or (probs < 0).any() or (probs > 1).any():
+            raise RuntimeError(f"试推理输出异常 trend_bias={trend_bias}: {probs.tolist()}")
+
+
+def load_model_bundle(paths=None, *, validate=False, compiled=None):
+    """加载一套实盘模型产物；validate=True 时核对哈希、特征数量并试推理，任一不通过即抛异常。"""
+    paths = paths or bundle_paths()
+    signature = manifest_signature(paths)
+    model_metadata = _read_metadata(paths["metadata"], strict=validate)
+    if compiled is None:
+        compiled = getattr(config, "LIVE_COMPILED_INFERENCE", True)
+    # 紧凑产物本身就是编译后的模型，只在开启编译推理时使用
+    loaded = load_inference_models(
+        paths["models"],
+        paths["feature_list"],
+        compact=bool(compiled) and compact_artifacts_enabled(),
+    )
+    models, feature_cols = loaded["models"], loaded["feature_cols"]
+    if validate:
+        verify_artifact_hashes(models, model_metadata, paths)
+        _check_feature_counts(models, feature_cols, model_metadata)
+    if compiled and loaded["directory"] is None:
+        models = compile_models(models, feature_cols=feature_cols)
+    bundle = {
+        "models": models,
+        "feature_cols": feature_cols,
+        "model_metadata": model_metadata,
+        "signature": signature,
+    }
+    if validate:
+        probe_bundle(bundle)
+    return bundle
+
+
+class ModelBundleWatcher:
+    """后台轮询产物清单，新产物校验通过后暂存，由主循环在 bar 之间 take_pending 取走替换。"""
+
+    def __init__(self, signature, *, paths=None, check_sec=None, loader=None):
+        self.paths = paths or bundle_paths()
+        if check_sec is None:
+            check_sec = getattr(config, "LIVE_MODEL_RELOAD_CHECK_SEC", 15)
+        self.check_sec = max(1.0, float(check_sec))
+        self._loader = loader or (lambda: load_model_bundle(self.paths, validate=True))
+        self._current_signature = signature
+        self._candidate_signature = None
+        self._rejected_signature = None
+        self._pending = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def check_once(self):
+        """检查一次产物清单；暂存了新模型包时返回 True。"""
+        signature = manifest_signature(self.paths)
+        with self._lock:
+            known = {self._current_signature, self._rejected_signature}
+            if self._pending is not None:
+                known.add(self._pending["signature"])
+        if signature in known:
+            self._candidate_signature = None
+            return False
+        if retrain_in_progress():
+            self._candidate_signature = None
+            return False
+        if signature != self._candidate_signature:
+            self._candidate_signature = signature
+            return False
+
+        self._candidate_signature = None
+        try:
+            bundle = self._loader()
+        except Exception as exc:
+            self._rejected_signature = signature
+            log_error(f"新模型产物校验失败，继续使用当前模型: {exc}")
+            return False
+        if bundle["signature"] != signature or manifest_signature(self.paths) != signature:
+            log_info("模型产物在加载期间发生变化，等待下一次检查")
+            return False
+
+        with self._lock:
+            self._pending = bundle
+        log_info(
+            "新模型产物已通过校验，等待 bar 间隙切换: "
+            f"models={','.join(sorted(bundle['models']))} features={len(bundle['feature_cols'])} "
+            f"created_at={bundle['model_metadata'].get('created_at') or '-'}"
+        )
+        return True
+
+    def take_pending(self):
+        """取走已校验的模型包（没有则返回 None），之后以它作为当前产物。"""
+        with self._lock:
+            bundle, self._pending = self._pending, None
+            if bundle is not None:
+                self._current_signature = bundle["signature"]
+        return bundle
+
+    def _run(self):
+        while not self._stop_event.wait(self.check_sec):
+            try:
+                self.check_once()
+            except Exception as exc:
+                log_error(f"模型热加载检查异常: {exc}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="model-reload", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
@@ -0,0 +1,400 @@
+"""实盘模型服务子进程。
+
+开启 LIVE_MODEL_SERVER_ENABLED 时，特征构建和模型推理放到独立的 spawn 子进程：主进程的 bar 线程只拉取
+K 线，经共享内存环形缓冲交给子进程，再从另一条环形缓冲取回概率和行情上下文。pandas 特征计算和树模型
+推理不再与实时风控线程、WebSocket 线程争用同一个 GIL，风控检查间隔不受模型开销影响。
+
+子进程自己加载模型产物，并在两次请求之间热替换通过校验的新模型；此模式下主进程不再运行热加载线程。
+"""
+import multiprocessing
+import os
+import pickle
+import struct
+import time
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from config import config
+from core import ml_feature_engineering, model_reload, signal_engine, trend_filter
+from core.regime_filter import derive_market_regime
+from core.trend_filter import derive_trend_context
+from utils.utils import log_error, log_info
+
+
+SLOT_HEADER = struct.Struct("<QQ")  # 写入序号, 负载字节数
+RESPONSE_SLOT_BYTES = 256 * 1024
+PARENT_CHECK_SEC = 1.0
+
+
+def _trend_context(row):
+    return derive_trend_context(
+        row,
+        interval=config.TREND_FILTER_INTERVAL,
+        fast_col=config.TREND_FILTER_FAST_COL,
+        slow_col=config.TREND_FILTER_SLOW_COL,
+        min_gap=config.TREND_FILTER_MIN_GAP,
+    )
+
+
+def predict_latest_probs(row, bundle, *, model_weights, direction_model_weights):
+    """对最新一行特征给出 (long_prob, short_prob)；简单规则模式下按 trend_bias 返回固定概率。"""
+    if bool(config.USE_SIMPLE_RULE_MODE):
+        trend_bias = trend_filter.derive_trend_context(
+            row,
+            interval=config.TREND_FILTER_INTERVAL,
+            fast_col=config.TREND_FILTER_FAST_COL,
+            slow_col=config.TREND_FILTER_SLOW_COL,
+            min_gap=config.TREND_FILTER_MIN_GAP,
+        ).get("trend_bias", "neutral")
+        if trend_bias == "long":
+            return 0.90, 0.10
+        if trend_bias == "short":
+            return 0.10, 0.90
+        return 0.50, 0.50
+
+    feature_cols = bundle["feature_cols"]
+    X = pd.DataFrame(row[feature_cols].values.reshape(1, -1).astype(float), columns=feature_cols)
+    avg = signal_engine.weighted_predict_proba(
+        bundle["models"],
+        X,
+        model_weights,
+        trend_bias=_trend_context(row).get("trend_bias"),
+        model_metadata=bundle["model_metadata"],
+        direction_model_weights=direction_model_weights,
+    )
+    return float(avg[1]), float(avg[0])
+
+
+def build_latest_features(data_dict, price, predict_probs):
+    """由 fetch_data 的 K 线构建最新已收盘 bar 的信号输入；price 为 None 时回退 bar 收盘价。
+
+    返回 (bar_ts, price, long_prob, short_prob, money_flow_ratio, volatility, atr_ratio,
+    trend_context, regime_context)，即 LiveTrader._process_latest_features 的输入。
+    """
+    merged_df = ml_feature_engineering.merge_multi_period_features(data_dict)
+    merged_df = ml_feature_engineering.add_advanced_features(merged_df)
+    merged_df = merged_df.dropna().copy()
+
+    if merged_df.empty:
+        raise RuntimeError("特征数据不足，暂时无法生成已收盘 bar 信号")
+
+    # merge_multi_period_features 已经只保留确认收盘bar，并对高周期特征做了滞后一根对齐。
+    row = merged_df.iloc[-1]
+    bar_ts = pd.Timestamp(merged_df.index[-1])
+    bar_ts = bar_ts.tz_localize("UTC") if bar_ts.tzinfo is None else bar_ts.tz_convert("UTC")
+    price = float(row["5m_close"]) if price is None else float(price)
+    money_flow_ratio = float(row["money_flow_ratio"])
+
+    if pd.notna(row.get("volatility_15")):
+        volatility = float(row["volatility_15"])
+    else:
+        merged_df["log_return"] = np.log(merged_df["5m_close"] / merged_df["5m_close"].shift(1))
+        volatility = float(merged_df["log_return"].rolling(96).std().iloc[-1])
+
+    long_prob, short_prob = predict_probs(row)
+    atr_value = row.get("5m_atr")
+    atr_ratio = None
+    if pd.notna(atr_value) and price > 0:
+        atr_ratio = float(atr_value) / price
+
+    trend_context = _trend_context(row)
+    regime_context = derive_market_regime(
+        trend_bias=trend_context.get("trend_bias"),
+        trend_gap=trend_context.get("trend_gap"),
+        volatility=volatility,
+        atr_ratio=atr_ratio,
+        money_flow_ratio=money_flow_ratio,
+        trend_gap_threshold=config.REGIME_TREND_GAP_THRESHOLD,
+        high_vol_atr_threshold=config.REGIME_HIGH_VOL_ATR_THRESHOLD,
+        high_volatility_threshold=config.REGIME_HIGH_VOLATILITY_THRESHOLD,
+        money_flow_extreme_threshold=config.REGIME_MONEY_FLOW_EXTREME_THRESHOLD,
+    )
+
+    return bar_ts, price, long_prob, short_prob, money_flow_ratio, volatility, atr_ratio, trend_context, regime_context
+
+
+class SharedMemoryRing:
+    """单生产者/单消费者的共享内存环形缓冲。
+
+    固定大小槽位，每个槽位是 (写入序号, 负载字节数) 头加 pickle 负载；两个信号量分别计数空槽和已写槽，
+    读写两端各自维护本地下标，不需要额外的锁。
+    """
+
+    def __init__(self, shm, slots, slot_bytes, free_slots, filled_slots, *, owner):
+        self._shm = shm
+        self.slots = int(slots)
+        self.slot_bytes = int(slot_bytes)
+        self._free_slots = free_slots
+        self._filled_slots = filled_slots
+        self._owner = owner
+        self._write_index = 0
+        self._read_index = 0
+
+    @classmethod
+    def create(cls, slots, slot_bytes, context=None):
+        context = context or multiprocessing.get_context("spawn")
+        slots = max(1, int(slots))
+        slot_bytes = max(SLOT_HEADER.size + 1, int(slot_bytes))
+        shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        return cls(shm, slots, slot_bytes, context.Semaphore(slots), context.Semaphore(0), owner=True)
+
+    @classmethod
+    def attach(cls, handle):
+        shm = shared_memory.SharedMemory(name=handle["name"])
+        return cls(
+            shm,
+            handle["slots"],
+            handle["slot_bytes"],
+            handle["free_slots"],
+            handle["filled_slots"],
+            owner=False,
+        )
+
+    def handle(self):
+        """传给子进程的句柄（需作为 Process 参数传递，信号量才能被继承）。"""
+        return {
+            "name": self._shm.name,
+            "slots": self.slots,
+            "slot_bytes": self.slot_bytes,
+            "free_slots": self._free_slots,
+            "filled_slots": self._filled_slots,
+        }
+
+    @property
+    def capacity(self):
+        return self.slot_bytes - SLOT_HEADER.size
+
+    def put(self, message, timeout=None):
+        payload = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.capacity:
+            raise ValueError(f"消息 {len(payload)} 字节超过共享内存槽位容量 {self.capacity} 字节")
+        if not self._free_slots.acquire(timeout=timeout):
+            raise TimeoutError("共享内存环形缓冲已满")
+        offset = (self._write_index % self.slots) * self.slot_bytes
+        start = offset + SLOT_HEADER.size
+        self._shm.buf[start:start + len(payload)] = payload
+        SLOT_HEADER.pack_into(self._shm.buf, offset, self._write_index + 1, len(payload))
+        self._write_index += 1
+        self._filled_slots.release()
+
+    def get(self, timeout=None):
+        if not self._filled_slots.acquire(timeout=timeout):
+            raise TimeoutError("共享内存环形缓冲读取超时")
+        offset = (self._read_index % self.slots) * self.slot_bytes
+        sequence, length = SLOT_HEADER.unpack_from(self._shm.buf, offset)
+        if sequence != self._read_index + 1:
+            raise RuntimeError(f"共享内存环形缓冲序号错乱: expected={self._read_index + 1} actual={sequence}")
+        start = offset + SLOT_HEADER.size
+        payload = bytes(self._shm.buf[start:start + length])
+        self._read_index += 1
+        self._free_slots.release()
+        return pickle.loads(payload)
+
+    def close(self):
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _compute_latest_features(bundle, request, options):
+    return build_latest_features(
+        request["data_dict"],
+        request.get("price"),
+        lambda row: predict_latest_probs(
+            row,
+            bundle,
+            model_weights=options["model_weights"],
+            direction_model_weights=options["direction_model_weights"],
+        ),
+    )
+
+
+def serve_model_requests(request_handle, response_handle, options):
+    """子进程入口：加载模型后循环处理特征请求，直到收到 stop 或主进程退出。
+
+    options 里的 loader / compute 仅供同进程测试注入；实盘由 paths 和权重配置决定加载哪套产物。
+    """
+    requests = SharedMemoryRing.attach(request_handle)
+    responses = SharedMemoryRing.attach(response_handle)
+    parent_pid = options.get("parent_pid")
+    paths = options.get("paths")
+    loader = options.get("loader") or (lambda: model_reload.load_model_bundle(paths))
+    compute = options.get("compute") or _compute_latest_features
+    watcher = None
+    try:
+        try:
+            bundle = loader()
+        except Exception as exc:
+            responses.put({"seq": 0, "error": f"模型加载失败: {exc}"})
+            return
+        responses.put({
+            "seq": 0,
+            "ready": True,
+            "models": sorted(bundle["models"]),
+            "features": len(bundle["feature_cols"]),
+        })
+        if options.get("hot_reload"):
+            watcher = model_reload.ModelBundleWatcher(bundle["signature"], paths=paths).start()
+
+        while True:
+            try:
+                request = requests.get(timeout=PARENT_CHECK_SEC)
+            except TimeoutError:
+                if parent_pid is not None and os.getppid() != parent_pid:
+                    log_error("模型服务进程检测到主进程已退出，停止服务")
+                    return
+                continue
+            if request.get("op") == "stop":
+                return
+
+            pending = watcher.take_pending() if watcher is not None else None
+            if pending is not None:
+                bundle = pending
+                log_info(
+                    "✅ 模型服务进程已热加载新模型: "
+                    f"models={','.join(sorted(bundle['models']))} features={len(bundle['feature_cols'])} "
+                    f"created_at={bundle['model_metadata'].get('created_at') or '-'}"
+                )
+            try:
+                response = {"seq": request["seq"], "result": compute(bundle, request, options)}
+            except Exception as exc:
+                log_error(traceback.format_exc())
+                response = {"seq": request["seq"], "error": str(exc)}
+            responses.put(response)
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        requests.close()
+        responses.close()
+
+
+class ModelServerClient:
+    """主进程一侧：启动模型服务子进程，提交 K 线并等待对应序号的结果。
+
+    同一时间只有一个进行中的请求（由 bar 线程调用）；超时请求的迟到结果按序号丢弃，
+    子进程异常退出时下一次请求自动重启。
+    """
+
+    def __init__(
+        self,
+        *,
+        slots=None,
+        slot_bytes=None,
+        timeout_sec=None,
+        startup_timeout_sec=None,
+        options=None,
+        context=None,
+        target=None,
+    ):
+        if slots is None:
+            slots = getattr(config, "LIVE_MODEL_SERVER_RING_SLOTS", 4)
+        if slot_bytes is None:
+            slot_bytes = int(float(getattr(config, "LIVE_MODEL_SERVER_SLOT_MB", 8)) * 1024 * 1024)
+        if timeout_sec is None:
+            timeout_sec = getattr(config, "LIVE_MODEL_SERVER_TIMEOUT_SEC", 60)
+        if startup_timeout_sec is None:
+            startup_timeout_sec = getattr(config, "LIVE_MODEL_SERVER_STARTUP_TIMEOUT_SEC", 180)
+        self.slots = max(1, int(slots))
+        self.slot_bytes = int(slot_bytes)
+        self.timeout_sec = max(0.1, float(timeout_sec))
+        self.startup_timeout_sec = max(0.1, float(startup_timeout_sec))
+        self.options = {
+            "paths": model_reload.bundle_paths(),
+            "model_weights": config.MODEL_WEIGHTS,
+            "direction_model_weights": getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {}),
+            "hot_reload": bool(getattr(config, "LIVE_MODEL_HOT_RELOAD", True)),
+            **(options or {}),
+        }
+        self._context = context or multiprocessing.get_context("spawn")
+        self._target = target or serve_model_requests
+        self._process = None
+        self._requests = None
+        self._responses = None
+        self._seq = 0
+
+    def is_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def start(self):
+        self._requests = SharedMemoryRing.create(self.slots, self.slot_bytes, self._context)
+        self._responses = SharedMemoryRing.create(self.slots, RESPONSE_SLOT_BYTES, self._context)
+        self._seq = 0
+        self._process = self._context.Process(
+            target=self._target,
+            args=(
+                self._requests.handle(),
+                self._responses.handle(),
+                {**self.options, "parent_pid": os.getpid()},
+            ),
+            name="model-server",
+            daemon=True,
+        )
+        self._process.start()
+        try:
+            ready = self._wait_response(0, self.startup_timeout_sec)
+        except Exception:
+            self.stop()
+            raise
+        log_info(
+            "🟢 模型服务进程已就绪: "
+            f"pid={getattr(self._process, 'pid', None)} models={','.join(ready.get('models') or [])} "
+            f"features={ready.get('features')} slot_mb={self.slot_bytes / 1024 / 1024:.1f}"
+        )
+        return self
+
+    def _wait_response(self, seq, timeout_sec):
+        deadline = time.monotonic() + timeout_sec
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"模型服务进程 {timeout_sec:.0f}s 内未返回结果 seq={seq}")
+            try:
+                response = self._responses.get(timeout=min(remaining, PARENT_CHECK_SEC))
+            except TimeoutError:
+                if not self.is_alive():
+                    raise RuntimeError("模型服务进程意外退出")
+                continue
+            if response.get("seq") != seq:
+                # 之前超时请求的迟到结果
+                continue
+            if "error" in response:
+                raise RuntimeError(f"模型服务进程计算失败: {response['error']}")
+            return response
+
+    def request_latest_features(self, data_dict, price=None):
+        """把 K 线交给子进程，返回与 build_latest_features 相同的结果元组。"""
+        if not self.is_alive():
+            log_error("模型服务进程不在运行，正在重启")
+            self.stop()
+            self.start()
+        self._seq += 1
+        self._requests.put(
+            {"op": "features", "seq": self._seq, "data_dict": data_dict, "price": price},
+            timeout=self.timeout_sec,
+        )
+        return tuple(self._wait_response(self._seq, self.timeout_sec)["result"])
+
+    def stop(self, timeout=5.0):
+        process, self._process = self._process, None
+        if process is not None:
+            if process.is_alive():
+                try:
+                    self._requests.put({"op": "stop"}, timeout=0.5)
+                except Exception:
+                    pass
+            process.join(timeout=timeout)
+            if process.is_alive() and hasattr(process, "terminate"):
+                log_error("模型服务进程未能按时退出，强制终止")
+                process.terminate()
+                process.join(timeout=timeout)
+        for ring in (self._requests, self._responses):
+            if ring is not None:
+                ring.close()
+        self._requests = None
+        self._responses = None
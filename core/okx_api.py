@@ -106,6 +106,37 @@ def cap_size_by_available_margin(
     return capped_size, capped_required_margin, usable_margin, True
 
 
+def candles_to_frame(rows):
+    """OKX K线原始行 -> 按时间正序、去重后的 DataFrame。"""
+    columns = ["timestamp", "open", "high", "low", "close", "volume", "confirm"]
+    if not rows:
+        return pd.DataFrame(columns=columns)
+
+    # 分页结果可能按“最近批次在前、历史批次在后”拼接，
+    # 这里统一按时间正序排序，并去重，避免滚动特征被乱序数据污染。
+    normalized_rows = []
+    for row in rows:
+        normalized_rows.append({
+            "timestamp": row[0],
+            "open": row[1],
+            "high": row[2],
+            "low": row[3],
+            "close": row[4],
+            "volume": row[5],
+            "confirm": row[8] if len(row) > 8 else "1",
+        })
+
+    df = pd.DataFrame(normalized_rows)
+    df['timestamp'] = pd.to_datetime(df['timestamp'].astype(float), unit='ms', utc=True)
+    df.drop_duplicates(subset=['timestamp'], keep='last', inplace=True)
+    df.sort_values('timestamp', inplace=True)
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = df[col].astype(float)
+    df['confirm'] = df['confirm'].astype(str)
+    df.reset_index(drop=True, inplace=True)
+    return df
+
+
 def is_insufficient_margin_error(result):
     if not isinstance(result, dict):
         return False
@@ -716,29 +747,30 @@ class OKXClient:
         if not all_data:
             raise Exception("❌ 无法拉取任何K线数据，请检查API权限/网络")
 
-        # 转换为DataFrame。分页结果可能按“最近批次在前、历史批次在后”拼接，
-        # 这里统一按时间正序排序，并去重，避免滚动特征被乱序数据污染。
-        normalized_rows = []
-        for row in all_data:
-            normalized_rows.append({
-                "timestamp": row[0],
-                "open": row[1],
-                "high": row[2],
-                "low": row[3],
-                "close": row[4],
-                "volume": row[5],
-                "confirm": row[8] if len(row) > 8 else "1",
-            })
-
-        df = pd.DataFrame(normalized_rows)
-        df['timestamp'] = pd.to_datetime(df['timestamp'].astype(float), unit='ms', utc=True)
-        df.drop_duplicates(subset=['timestamp'], keep='last', inplace=True)
-        df.sort_values('timestamp', inplace=True)
-        for col in ['open', 'high', 'low', 'close', 'volume']:
-            df[col] = df[col].astype(float)
-        df['confirm'] = df['confirm'].astype(str)
-        df.reset_index(drop=True, inplace=True)
-        return df
+        return candles_to_frame(all_data)
+
+    def fetch_ohlcv_window(self, start_ts, end_ts, symbol=config.SYMBOL, bar="1m", max_retry=3, sleep_sec=1):
+        """拉取开盘时间在 [start_ts, end_ts) 内的K线（单页，最多 100 根）；失败或无数据时返回空表。"""
+        start_ms = int(pd.Timestamp(start_ts).timestamp() * 1000)
+        end_ms = int(pd.Timestamp(end_ts).timestamp() * 1000)
+        for attempt in range(max_retry):
+            try:
+                response = self.market_api.get_history_candlesticks(
+                    instId=symbol,
+                    bar=bar,
+                    after=str(end_ms),
+                    before=str(start_ms - 1),
+                    limit="100",
+                )
+                batch = response['data']
+                break
+            except Exception as e:
+                print(f"⚠️ 拉取K线窗口失败，重试中 ({attempt + 1}/{max_retry}): {e}")
+                time.sleep(sleep_sec)
+        else:
+            print("❌ 超过最大重试次数，放弃当前K线窗口")
+            return candles_to_frame([])
+        return candles_to_frame(batch)
 
     # 批量获取多个周期的k线数据
     def fetch_data(self):
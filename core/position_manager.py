@@ -5,13 +5,17 @@ import math
 from config import config
 
 class PositionManager:
-    def __init__(self, min_ratio=None, max_ratio=None, probability_center=None):
+    def __init__(self, min_ratio=None, max_ratio=None, probability_center=None, target_vol=None):
         self.min_ratio = float(config.POSITION_MIN if min_ratio is None else min_ratio)
         self.max_ratio = float(config.POSITION_MAX if max_ratio is None else max_ratio)
         self.probability_center = self._validate_probability_center(
             config.POSITION_PROBABILITY_CENTER if probability_center is None else probability_center
         )
         self.adjust_unit = config.ADJUST_UNIT
+        self.target_vol = target_vol
+
+    def _target_vol(self):
+        return config.TARGET_VOL if self.target_vol is None else float(self.target_vol)
 
     def _validate_probability_center(self, value):
         value = float(value)
@@ -41,7 +45,7 @@ class PositionManager:
 
     # 波动率动态调整账户余额
     def volatility_adjust_balance(self, total_balance, volatility):
-        target_vol = config.TARGET_VOL
+        target_vol = self._target_vol()
         adjust_factor = target_vol / (volatility + 1e-6)
         adjust_factor = min(1.5, max(0.5, adjust_factor))
         return total_balance * adjust_factor
@@ -55,19 +59,19 @@ class PositionManager:
         try:
             volatility = float(volatility)
         except (TypeError, ValueError):
-            volatility = config.TARGET_VOL
+            volatility = self._target_vol()
 
         if not math.isfinite(money_flow_ratio):
             money_flow_ratio = 1.0
         if not math.isfinite(volatility) or volatility <= 0:
-            volatility = config.TARGET_VOL
+            volatility = self._target_vol()
 
         # 把资金流限制在稳健区间，避免极端缩量/放量把仓位评分顶满。
         money_flow_clamped = min(1.5, max(0.5, money_flow_ratio))
         money_flow_score = (money_flow_clamped - 0.5) / 1.0
 
         # 低波动不再无限放大仓位，最高只给满分 1.0。
-        volatility_score = min(1.0, config.TARGET_VOL / max(volatility, 1e-6))
+        volatility_score = min(1.0, self._target_vol() / max(volatility, 1e-6))
 
         score = (
             0.5 * prob +
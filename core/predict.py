@@ -2,7 +2,6 @@
 
 import json
 import os
-import joblib
 import pandas as pd
 from config import config
 from core.ml_feature_engineering import merge_multi_period_features, add_advanced_features
@@ -13,13 +12,17 @@ from core.dynamic_risk import DynamicRiskController
 from core.trend_filter import derive_trend_context
 from core.regime_filter import derive_market_regime
 from core import signal_engine
+from core.compact_models import load_inference_models
 from utils.utils import BASE_DIR
 
 class MultiPeriodSignalPredictor:
     def __init__(self):
         self.fetcher = OKXClient()
         self.model_paths = {name: os.path.join(BASE_DIR, path) for name, path in config.MODEL_PATHS.items()}
-        self.models = {name: joblib.load(path) for name, path in self.model_paths.items()}
+        # 模型与特征列一次加载、整个进程复用；开启紧凑产物时不反序列化 joblib、不导入训练库
+        loaded = load_inference_models(self.model_paths, os.path.join(BASE_DIR, config.FEATURE_LIST_PATH))
+        self.models = loaded["models"]
+        self.feature_cols = loaded["feature_cols"]
         self.model_weights = config.MODEL_WEIGHTS
         self.direction_model_weights = getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {})
         metadata_path = os.path.join(BASE_DIR, config.TRAINING_METADATA_PATH)
@@ -107,7 +110,7 @@ class MultiPeriodSignalPredictor:
             raise ValueError("特征数据不足，暂时无法生成已收盘 bar 信号")
 
         # 统一使用最新一根已确认收盘 bar，和实盘监控逻辑保持一致。
-        feature_cols = joblib.load(os.path.join(BASE_DIR, config.FEATURE_LIST_PATH))
+        feature_cols = self.feature_cols
         X_live = merged_df[feature_cols].iloc[-1:].astype(float)
         X_live = pd.DataFrame(X_live, columns=feature_cols)
 
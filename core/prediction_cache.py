@@ -0,0 +1,318 @@
+"""持久化的逐 bar 预测概率缓存。
+
+按 (模型产物 sha256 集合, 推理源码哈希, 特征列 key) 分库，每根 bar（时间戳）保存各模型的原始类别概率，
+以及按融合配置（权重/元数据）和 trend_bias 算出的 long/short 概率。每行同时记录特征值哈希，
+特征值不同（例如指标预热窗口不同）的同一时间戳不会被误复用。
+
+回测、阈值研究等重复在同一批 bar 上跑同一份模型的场景只需计算缓存缺失的 bar；
+只有经 signal_engine.load_models 从磁盘加载的模型才能确定产物哈希，内存中新训练的模型不走缓存。
+"""
+import functools
+import hashlib
+import json
+import os
+import uuid
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from config import config
+from core import signal_engine
+from utils.utils import BASE_DIR, log_info
+
+
+PREDICTION_CACHE_VERSION = 1
+
+# 由模型现算概率时经过的推理源码：磁盘上的产物只保存参数，predict_proba 的实现来自这些文件
+INFERENCE_CODE_PATHS = (
+    "core/signal_engine.py",
+    "core/direction_quality.py",
+    "core/compiled_trees.py",
+    "core/compact_models.py",
+    "core/predict.py",
+)
+
+ROW_HASH_COL = "row_hash"
+FUSION_KEY_COL = "fusion_key"
+TREND_BIAS_COL = "trend_bias"
+SHORT_PROB_COL = "short_prob"
+LONG_PROB_COL = "long_prob"
+RAW_PREFIX = "raw:"
+
+
+@functools.lru_cache(maxsize=1)
+def inference_code_hash():
+    """INFERENCE_CODE_PATHS 的内容哈希（与 train.pipeline.code_fingerprint 口径一致）。"""
+    h = hashlib.sha256()
+    for rel_path in INFERENCE_CODE_PATHS:
+        path = os.path.join(BASE_DIR, rel_path)
+        h.update(rel_path.encode("utf-8"))
+        if not os.path.exists(path):
+            h.update(b"<missing>")
+            continue
+        with open(path, "rb") as file:
+            h.update(file.read())
+    return h.hexdigest()
+
+
+def prediction_cache_enabled():
+    return bool(getattr(config, "PREDICTION_CACHE_ENABLED", True))
+
+
+def _sha256_json(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def artifact_hash_set(models):
+    """{模型名: 产物 sha256}；任一模型不是从磁盘加载的则返回 None。"""
+    hashes = {}
+    for name, model in models.items():
+        digest = signal_engine.model_artifact_hash(model)
+        if digest is None:
+            return None
+        hashes[str(name)] = digest
+    return hashes
+
+
+def feature_cache_key(feature_cols):
+    return hashlib.sha256("\n".join(str(col) for col in feature_cols).encode("utf-8")).hexdigest()
+
+
+def fusion_key(model_weights, direction_model_weights, model_metadata):
+    return _sha256_json({
+        "model_weights": dict(model_weights or {}),
+        "direction_model_weights": direction_model_weights or {},
+        "model_metadata": model_metadata or {},
+    })
+
+
+def row_hashes(X):
+    return pd.util.hash_pandas_object(X, index=False).to_numpy(dtype=np.uint64)
+
+
+def _raw_column(name, label):
+    return f"{RAW_PREFIX}{name}:{label}"
+
+
+class ReplayModel:
+    """用缓存的原始概率代替 predict_proba，其余属性（classes_、诊断信息等）转发给原模型。"""
+
+    def __init__(self, model, probabilities):
+        self._model = model
+        self._probabilities = probabilities
+
+    def predict_proba(self, X):
+        return self._probabilities
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+class PredictionStore:
+    """一个 (模型产物集合, 特征列) 对应一个缓存文件，按 bar 时间戳索引。"""
+
+    def __init__(self, artifact_hashes, feature_cols, *, cache_dir=None, keep=None):
+        if cache_dir is None:
+            cache_dir = getattr(config, "PREDICTION_CACHE_DIR", "models/prediction_cache")
+        self.cache_dir = cache_dir if os.path.isabs(cache_dir) else os.path.join(BASE_DIR, cache_dir)
+        self.keep = max(1, int(getattr(config, "PREDICTION_CACHE_KEEP", 4) if keep is None else keep))
+        self.artifact_hashes = dict(artifact_hashes)
+        self.feature_cols = list(feature_cols)
+        self.key = _sha256_json({
+            "version": PREDICTION_CACHE_VERSION,
+            "artifacts": self.artifact_hashes,
+            # 产物只保存参数，推理代码改了同一份产物也会给出不同概率
+            "inference_code": inference_code_hash(),
+            "features": feature_cache_key(self.feature_cols),
+        })
+        self.path = os.path.join(self.cache_dir, f"{self.key}.joblib")
+        self.stats = {"raw_hits": 0, "raw_misses": 0, "directional_hits": 0, "directional_misses": 0}
+
+    @classmethod
+    def for_models(cls, models, feature_cols, **kwargs):
+        """模型均来自磁盘且缓存开启时返回 store，否则返回 None。"""
+        if not prediction_cache_enabled() or not models:
+            return None
+        if not all(hasattr(model, "classes_") for model in models.values()):
+            return None
+        hashes = artifact_hash_set(models)
+        if hashes is None:
+            return None
+        return cls(hashes, feature_cols, **kwargs)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return pd.DataFrame()
+        try:
+            payload = joblib.load(self.path)
+        except Exception as exc:
+            log_info(f"⚠ 预测缓存读取失败，将重新计算: {exc}")
+            return pd.DataFrame()
+        if not isinstance(payload, dict) or payload.get("key") != self.key:
+            return pd.DataFrame()
+        return payload["table"]
+
+    def save(self, table):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 多个回测进程可能同时写同一个缓存文件：各自写唯一的临时文件再原子替换
+        tmp_path = f"{self.path}.tmp-{os.getpid()}-{uuid.uuid4().hex}"
+        joblib.dump({"key": self.key, "artifact_hashes": self.artifact_hashes, "table": table}, tmp_path)
+        os.replace(tmp_path, self.path)
+        self._prune()
+
+    def _prune(self):
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith(".joblib"):
+                continue
+            path = os.path.join(self.cache_dir, file_name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue
+        entries.sort(reverse=True)
+        for _, path in entries[self.keep:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _raw_probabilities(self, table, models, X, hashes, chunk_rows):
+        aligned = table.reindex(X.index) if not table.empty else pd.DataFrame(index=X.index)
+        columns = {
+            name: [_raw_column(name, label) for label in getattr(model, "classes_")]
+            for name, model in models.items()
+        }
+        all_columns = [col for cols in columns.values() for col in cols]
+        hit = np.zeros(len(X), dtype=bool)
+        if ROW_HASH_COL in aligned and all(col in aligned for col in all_columns):
+            hit = (aligned[ROW_HASH_COL].to_numpy() == hashes) & aligned[all_columns].notna().all(axis=1).to_numpy()
+
+        probabilities = {
+            name: aligned[cols].to_numpy(dtype=float) if hit.any() else np.full((len(X), len(cols)), np.nan)
+            for name, cols in columns.items()
+        }
+        missing = np.where(~hit)[0]
+        for start in range(0, len(missing), chunk_rows):
+            rows = missing[start:start + chunk_rows]
+            raw = signal_engine.predict_model_probabilities(models, X.iloc[rows])
+            for name in models:
+                probabilities[name][rows] = np.asarray(raw[name], dtype=float)
+        self.stats["raw_hits"] += int(hit.sum())
+        self.stats["raw_misses"] += int(len(missing))
+        return probabilities, columns, hit
+
+    def directional(
+        self,
+        models,
+        X,
+        model_weights=None,
+        *,
+        trend_biases=None,
+        model_metadata=None,
+        direction_model_weights=None,
+        chunk_rows=None,
+    ):
+        """与 signal_engine.weighted_predict_proba_batch 相同的 [short, long] 输出，只计算缓存缺失的 bar。"""
+        X = X[self.feature_cols] if list(X.columns) != self.feature_cols else X
+        chunk_rows = max(1, int(chunk_rows or len(X) or 1))
+        trend_values = [str(value or "").lower() for value in (list(trend_biases) if trend_biases is not None else [])]
+        if len(trend_values) != len(X):
+            trend_values = ["neutral"] * len(X)
+        hashes = row_hashes(X)
+        current_fusion = fusion_key(model_weights, direction_model_weights, model_metadata)
+
+        table = self.load()
+        probabilities, columns, raw_hit = self._raw_probabilities(table, models, X, hashes, chunk_rows)
+
+        aligned = table.reindex(X.index) if not table.empty else pd.DataFrame(index=X.index)
+        result = np.full((len(X), 2), np.nan)
+        hit = raw_hit.copy()
+        for col in (FUSION_KEY_COL, TREND_BIAS_COL, SHORT_PROB_COL, LONG_PROB_COL):
+            if col not in aligned:
+                hit[:] = False
+        if hit.any():
+            hit &= aligned[FUSION_KEY_COL].to_numpy() == current_fusion
+            hit &= aligned[TREND_BIAS_COL].to_numpy() == np.asarray(trend_values, dtype=object)
+            result[:, 0] = aligned[SHORT_PROB_COL].to_numpy(dtype=float)
+            result[:, 1] = aligned[LONG_PROB_COL].to_numpy(dtype=float)
+            hit &= np.isfinite(result).all(axis=1)
+
+        missing = np.where(~hit)[0]
+        if len(missing):
+            replay = {name: ReplayModel(model, probabilities[name][missing]) for name, model in models.items()}
+            result[missing] = signal_engine.weighted_predict_proba_batch(
+                replay,
+                X.iloc[missing],
+                model_weights,
+                trend_biases=[trend_values[pos] for pos in missing],
+                model_metadata=model_metadata,
+                direction_model_weights=direction_model_weights,
+            )
+        self.stats["directional_hits"] += int(hit.sum())
+        self.stats["directional_misses"] += int(len(missing))
+
+        if len(missing):
+            updated = pd.DataFrame(index=X.index[missing])
+            updated[ROW_HASH_COL] = hashes[missing]
+            for name, cols in columns.items():
+                updated[cols] = probabilities[name][missing]
+            updated[FUSION_KEY_COL] = current_fusion
+            updated[TREND_BIAS_COL] = [trend_values[pos] for pos in missing]
+            updated[SHORT_PROB_COL] = result[missing, 0]
+            updated[LONG_PROB_COL] = result[missing, 1]
+            if not table.empty:
+                table = table.drop(index=table.index.intersection(updated.index))
+                table = pd.concat([table, updated]).sort_index()
+            else:
+                table = updated.sort_index()
+            self.save(table)
+        return result
+
+
+def cached_weighted_predict_proba_batch(
+    models,
+    X,
+    model_weights=None,
+    *,
+    trend_biases=None,
+    model_metadata=None,
+    direction_model_weights=None,
+    feature_cols=None,
+    chunk_rows=None,
+):
+    """带持久缓存的 weighted_predict_proba_batch；不满足缓存条件时按 chunk_rows 分块直接计算。"""
+    feature_cols = list(feature_cols) if feature_cols is not None else list(X.columns)
+    store = PredictionStore.for_models(models, feature_cols) if X.index.is_unique else None
+    if store is not None:
+        result = store.directional(
+            models,
+            X,
+            model_weights,
+            trend_biases=trend_biases,
+            model_metadata=model_metadata,
+            direction_model_weights=direction_model_weights,
+            chunk_rows=chunk_rows,
+        )
+        log_info(
+            "预测缓存: "
+            f"rows={len(X)} raw_hits={store.stats['raw_hits']} raw_misses={store.stats['raw_misses']} "
+            f"directional_hits={store.stats['directional_hits']} key={store.key[:12]}"
+        )
+        return result
+
+    trend_biases = list(trend_biases) if trend_biases is not None else None
+    chunk_rows = max(1, int(chunk_rows or len(X) or 1))
+    result = np.empty((len(X), 2), dtype=float)
+    for start in range(0, len(X), chunk_rows):
+        end = min(start + chunk_rows, len(X))
+        result[start:end] = signal_engine.weighted_predict_proba_batch(
+            models,
+            X.iloc[start:end],
+            model_weights,
+            trend_biases=trend_biases[start:end] if trend_biases is not None else None,
+            model_metadata=model_metadata,
+            direction_model_weights=direction_model_weights,
+        )
+    return result
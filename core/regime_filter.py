@@ -1,6 +1,8 @@
 # core/regime_filter.py
 import math
 
+import numpy as np
+
 
 TREND_REGIMES = {"trend_long", "trend_short"}
 RANGE_REGIMES = {"range", "range_high_vol"}
@@ -79,6 +81,41 @@ def derive_market_regime(
     }
 
 
+def derive_market_regimes(
+    *,
+    trend_biases,
+    trend_gaps,
+    volatility,
+    atr_ratio,
+    money_flow_ratio,
+    trend_gap_threshold=0.003,
+    high_vol_atr_threshold=0.0016,
+    high_volatility_threshold=0.0012,
+    money_flow_extreme_threshold=1.8,
+):
+    """按列批量计算 derive_market_regime 的 (regime, is_high_vol)，逐行结果与之一致；NaN 视同缺失。"""
+    biases = np.char.lower(np.asarray(trend_biases, dtype=str))
+    gaps = np.asarray(trend_gaps, dtype=float)
+    gaps = np.abs(np.where(np.isfinite(gaps), gaps, 0.0))
+
+    def at_least(values, threshold):
+        values = np.asarray(values, dtype=float)
+        return np.isfinite(values) & (values >= float(threshold))
+
+    is_trending = np.isin(biases, ["long", "short"]) & (gaps >= max(0.0, float(trend_gap_threshold)))
+    is_high_vol = (
+        at_least(atr_ratio, high_vol_atr_threshold)
+        | at_least(volatility, high_volatility_threshold)
+        | at_least(money_flow_ratio, money_flow_extreme_threshold)
+    )
+    regimes = np.where(
+        is_trending,
+        np.where(biases == "long", "trend_long", "trend_short"),
+        np.where(is_high_vol, "range_high_vol", "range"),
+    )
+    return regimes, is_high_vol
+
+
 def regime_allows_direction(regime, direction, *, allow_range=True, allow_high_vol=True):
     regime = str(regime or "unknown").lower()
     direction = str(direction or "").lower()
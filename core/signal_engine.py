@@ -2,20 +2,50 @@
 
 import os
 import math
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import joblib
 import pandas as pd
 from config import config
-from utils.utils import BASE_DIR
+from utils.utils import BASE_DIR, sha256_file
+
+# 从磁盘加载的模型对象 -> 产物文件 sha256；预测缓存据此确认"同一份模型"
+_MODEL_ARTIFACT_HASHES = weakref.WeakKeyDictionary()
+
 
 # 多模型加载（支持绝对路径）
-def load_models(model_paths):
+def load_models(model_paths, *, compact=False):
+    """compact=True 时从紧凑产物加载编译后的模型（见 core.compact_models），不导入训练库。"""
+    if compact:
+        from core.compact_models import load_compact_models
+
+        return load_compact_models({name: os.path.join(BASE_DIR, path) for name, path in model_paths.items()})["models"]
+
+    import joblib
+
     models = {}
     for name, path in model_paths.items():
         full_path = os.path.join(BASE_DIR, path)
         models[name] = joblib.load(full_path)
+        register_model_artifact_hash(models[name], sha256_file(full_path))
     return models
 
+
+def register_model_artifact_hash(model, digest):
+    try:
+        _MODEL_ARTIFACT_HASHES[model] = digest
+    except TypeError:
+        pass
+
+
+def model_artifact_hash(model):
+    """load_models 加载的模型返回其产物文件 sha256；内存中新训练的模型返回 None。"""
+    try:
+        return _MODEL_ARTIFACT_HASHES.get(model)
+    except TypeError:
+        return None
+
 # 简单平均融合
 def ensemble_predict(models, merged_df, feature_cols):
     X_live = merged_df[feature_cols].iloc[-1:].astype(float)
@@ -269,32 +299,94 @@ def _binary_trade_quality_to_directional(trade_prob, no_trade_prob, trend_bias,
     return np.asarray([0.0, 0.0], dtype=float)
 
 
-def _binary_trade_quality_to_directional_batch(trade_prob, no_trade_prob, trend_biases, *, model_metadata=None, model=None):
-    trade_prob = np.clip(np.asarray(trade_prob, dtype=float).reshape(-1), 0.0, 1.0)
-    trend_values = [str(value or "").lower() for value in (trend_biases or [])]
-    if len(trend_values) != len(trade_prob):
-        trend_values = ["neutral"] * len(trade_prob)
+# trend_bias 的整数编码：方向权重和质量模型方向映射都按编码整列计算
+TREND_CODE_NEUTRAL = 0
+TREND_CODE_LONG = 1
+TREND_CODE_SHORT = 2
+_TREND_CODE_DIRECTIONS = ((TREND_CODE_LONG, "long"), (TREND_CODE_SHORT, "short"))
+
 
+def trend_bias_codes(trend_biases, row_count):
+    """trend_bias 序列 -> int8 编码数组；长度不符时全部视为 neutral。"""
+    if trend_biases is None or len(trend_biases) != row_count:
+        return np.zeros(row_count, dtype=np.int8)
+    values = np.char.lower(np.asarray(["" if value is None else str(value) for value in trend_biases], dtype=str))
+    codes = np.zeros(row_count, dtype=np.int8)
+    codes[values == "long"] = TREND_CODE_LONG
+    codes[values == "short"] = TREND_CODE_SHORT
+    return codes
+
+
+def _binary_trade_quality_to_directional_batch(trade_prob, no_trade_prob, trend_codes, *, model_metadata=None, model=None):
+    trade_prob = np.clip(np.asarray(trade_prob, dtype=float).reshape(-1), 0.0, 1.0)
     prob = np.zeros((len(trade_prob), 2), dtype=float)
-    for direction in ("long", "short"):
-        mask = np.asarray([trend_bias == direction for trend_bias in trend_values], dtype=bool)
+    for code, direction in _TREND_CODE_DIRECTIONS:
+        mask = trend_codes == code
         if not np.any(mask):
             continue
-        trade_prob[mask] = _quality_probability_to_execution_probability(
+        execution_prob = _quality_probability_to_execution_probability(
             trade_prob[mask],
             model_metadata=model_metadata,
             model=model,
             direction=direction,
         )
-
-    for index, trend_bias in enumerate(trend_values):
-        if trend_bias == "long":
-            prob[index, 1] = trade_prob[index]
-        elif trend_bias == "short":
-            prob[index, 0] = trade_prob[index]
+        prob[mask, 1 if code == TREND_CODE_LONG else 0] = execution_prob
     return prob
 
 
+def _row_model_weights(model_name, model_weights, direction_model_weights, trend_codes):
+    """按 trend 编码查表得到逐行模型权重，每个方向只校验一次。"""
+    table = np.zeros(3, dtype=float)
+    for code in np.unique(trend_codes):
+        direction = ("neutral", "long", "short")[int(code)]
+        table[code] = _validate_model_weight(
+            model_name,
+            _model_weight_for_direction(model_weights, direction_model_weights, model_name, direction),
+        )
+    return table[trend_codes]
+
+
+_PREDICT_EXECUTOR = None
+_PREDICT_EXECUTOR_WORKERS = 0
+_PREDICT_EXECUTOR_LOCK = threading.Lock()
+
+
+def _predict_threads(model_count):
+    threads = int(getattr(config, "MODEL_PREDICT_THREADS", 0) or 0)
+    if threads <= 0:
+        threads = os.cpu_count() or 1
+    return max(1, min(int(model_count), threads))
+
+
+def _predict_executor(workers):
+    """进程内共用的推理线程池，需要更多线程时重建。"""
+    global _PREDICT_EXECUTOR, _PREDICT_EXECUTOR_WORKERS
+    with _PREDICT_EXECUTOR_LOCK:
+        if _PREDICT_EXECUTOR is None or _PREDICT_EXECUTOR_WORKERS < workers:
+            previous = _PREDICT_EXECUTOR
+            _PREDICT_EXECUTOR = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="model-predict")
+            _PREDICT_EXECUTOR_WORKERS = workers
+            if previous is not None:
+                previous.shutdown(wait=False)
+        return _PREDICT_EXECUTOR
+
+
+def predict_model_probabilities(models, X):
+    """{模型名: predict_proba 结果}。
+
+    行数达到 MODEL_PREDICT_PARALLEL_MIN_ROWS 且可用线程多于 1 时，各模型在共用线程池里并发预测
+    （LightGBM / XGBoost / sklearn 预测时释放 GIL）；单行实盘推理始终串行，避免线程调度开销。
+    """
+    names = list(models)
+    workers = _predict_threads(len(names))
+    min_rows = int(getattr(config, "MODEL_PREDICT_PARALLEL_MIN_ROWS", 512) or 0)
+    if workers <= 1 or len(X) < min_rows:
+        return {name: models[name].predict_proba(X) for name in names}
+    executor = _predict_executor(workers)
+    futures = {name: executor.submit(models[name].predict_proba, X) for name in names}
+    return {name: future.result() for name, future in futures.items()}
+
+
 def weighted_predict_proba_batch(
     models,
     X,
@@ -312,13 +404,18 @@ def weighted_predict_proba_batch(
     weighted_sum = None
     row_count = len(X)
     direction_model_weights = _direction_model_weight_overrides(direction_model_weights)
-    trend_values = [str(value or "").lower() for value in (trend_biases or [])]
-    if len(trend_values) != row_count:
-        trend_values = ["neutral"] * row_count
+    trend_codes = trend_bias_codes(trend_biases, row_count)
     weight_totals = np.zeros(row_count, dtype=float)
 
-    for name, model in models.items():
-        raw_prob = np.asarray(model.predict_proba(X), dtype=float)
+    row_weights = {
+        name: _row_model_weights(name, model_weights, direction_model_weights, trend_codes)
+        for name in models
+    }
+    active = {name: model for name, model in models.items() if np.any(row_weights[name] > 0)}
+    raw_probs = predict_model_probabilities(active, X)
+
+    for name, model in active.items():
+        raw_prob = np.asarray(raw_probs[name], dtype=float)
         if raw_prob.ndim != 2 or raw_prob.shape[1] < 2:
             raise ValueError(f"模型 {name} 返回的概率维度不足: {raw_prob!r}")
         if raw_prob.shape[0] != row_count:
@@ -333,7 +430,7 @@ def weighted_predict_proba_batch(
             prob = _binary_trade_quality_to_directional_batch(
                 trade_prob=_class_probabilities(raw_prob, classes, 1),
                 no_trade_prob=_class_probabilities(raw_prob, classes, 0),
-                trend_biases=trend_values,
+                trend_codes=trend_codes,
                 model_metadata=model_metadata,
                 model=model,
             )
@@ -343,19 +440,10 @@ def weighted_predict_proba_batch(
                 _class_probabilities(raw_prob, classes, 1),
             ]).astype(float)
 
-        row_weights = np.asarray([
-            _validate_model_weight(
-                name,
-                _model_weight_for_direction(model_weights, direction_model_weights, name, trend_bias),
-            )
-            for trend_bias in trend_values
-        ], dtype=float)
-        if not np.any(row_weights > 0):
-            continue
         if weighted_sum is None:
             weighted_sum = np.zeros_like(prob, dtype=float)
-        weighted_sum += prob * row_weights.reshape(-1, 1)
-        weight_totals += row_weights
+        weighted_sum += prob * row_weights[name].reshape(-1, 1)
+        weight_totals += row_weights[name]
 
     if weighted_sum is None or not np.all(weight_totals > 0):
         raise ValueError("实际参与预测的模型权重总和必须大于 0")
@@ -1,5 +1,8 @@
 import math
 
+import numpy as np
+import pandas as pd
+
 
 def _safe_float(value):
     try:
@@ -81,6 +84,48 @@ def derive_trend_context(
     return context
 
 
+def _numeric_column(frame, key):
+    if key not in frame:
+        return np.full(len(frame), np.nan)
+    values = pd.to_numeric(frame[key], errors="coerce").to_numpy(dtype=float)
+    return np.where(np.isfinite(values), values, np.nan)
+
+
+def derive_trend_biases(
+    frame,
+    *,
+    interval="1H",
+    fast_col="ema_20",
+    slow_col="ema_60",
+    min_gap=0.001,
+    price_col="5m_close",
+):
+    """按列批量计算 derive_trend_context 的 trend_bias，逐行结果与之完全一致。"""
+    prefix = str(interval)
+    fast = _numeric_column(frame, f"{prefix}_{fast_col}")
+    slow = _numeric_column(frame, f"{prefix}_{slow_col}")
+    price = _numeric_column(frame, price_col)
+    min_gap = max(0.0, float(min_gap))
+
+    valid = np.isfinite(fast) & np.isfinite(slow) & (slow > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gap = np.where(valid, (fast - slow) / np.where(valid, slow, 1.0), np.nan)
+    has_price = np.isfinite(price) & (price > 0)
+    long_mask = valid & (gap > min_gap) & (~has_price | (price >= fast * (1.0 - min_gap)))
+    short_mask = valid & ~long_mask & (gap < -min_gap) & (~has_price | (price <= fast * (1.0 + min_gap)))
+    return np.where(long_mask, "long", np.where(short_mask, "short", "neutral")).tolist()
+
+
+def derive_trend_gaps(frame, *, interval="1H", fast_col="ema_20", slow_col="ema_60"):
+    """按列批量计算 derive_trend_context 的 trend_gap；快慢线缺失或慢线非正时为 NaN（逐行结果为 None）。"""
+    prefix = str(interval)
+    fast = _numeric_column(frame, f"{prefix}_{fast_col}")
+    slow = _numeric_column(frame, f"{prefix}_{slow_col}")
+    valid = np.isfinite(fast) & np.isfinite(slow) & (slow > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(valid, (fast - slow) / np.where(valid, slow, 1.0), np.nan)
+
+
 def trend_allows_direction(direction, trend_bias):
     direction = str(direction or "").lower()
     trend_bias = str(trend_bias or "neutral").lower()
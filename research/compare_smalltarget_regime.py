@@ -1,32 +1,19 @@
-import contextlib
-import io
 import json
 import os
 import sys
 from datetime import datetime
+from functools import partial
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from backtest.backtest import Backtester
+from backtest.sweep import iter_sweep, run_sweep_candidate, seed_backtester_kwargs
 from config import config
 from utils.utils import LOGS_DIR, log_info
 
 
-def apply_overrides(overrides):
-    originals = {}
-    for key, value in overrides.items():
-        originals[key] = getattr(config, key)
-        setattr(config, key, value)
-    return originals
-
-
-def restore_overrides(originals):
-    for key, value in originals.items():
-        setattr(config, key, value)
-
-
 def build_seed_backtester():
     base_interval = config.INTERVALS[0] if config.INTERVALS else "5m"
     window = config.WINDOWS.get(base_interval, 1000)
@@ -40,45 +27,28 @@ def build_seed_backtester():
     )
 
 
+def summarize_candidate(_backtester, summary):
+    return {
+        "trade_count": summary.get("trade_count"),
+        "closed_trade_count": summary.get("closed_trade_count"),
+        "net_pnl_after_costs": summary.get("net_pnl_after_costs"),
+        "return_pct": summary.get("return_pct"),
+        "max_drawdown_pct": summary.get("max_drawdown_pct"),
+        "win_rate_pct": summary.get("win_rate_pct"),
+        "profit_factor": summary.get("profit_factor"),
+        "take_profit_count": summary.get("take_profit_count"),
+        "stop_loss_count": summary.get("stop_loss_count"),
+        "fees_paid": summary.get("fees_paid"),
+        "slippage_cost": summary.get("slippage_cost"),
+        "decision_action_counts": summary.get("decision_action_counts"),
+        "decision_reason_top": summary.get("decision_reason_top"),
+        "decision_regime_signal_summary": summary.get("decision_regime_signal_summary"),
+    }
+
+
 def run_candidate(seed_bt, name, overrides):
-    originals = apply_overrides(overrides)
-    try:
-        bt = Backtester(
-            "multi_period",
-            seed_bt.window,
-            data_dict=seed_bt.data_dict,
-            reward_risk=seed_bt.reward_risk,
-            precomputed_data=seed_bt.data,
-            feature_cols=seed_bt.feature_cols,
-            models=seed_bt.models,
-            model_weights=seed_bt.model_weights,
-            funding_history=seed_bt.funding_history,
-            enable_csv_dump=False,
-            show_progress=False,
-            emit_diagnostics=False,
-        )
-        with contextlib.redirect_stdout(io.StringIO()):
-            summary = bt.run_backtest()
-        return {
-            "name": name,
-            "overrides": overrides,
-            "trade_count": summary.get("trade_count"),
-            "closed_trade_count": summary.get("closed_trade_count"),
-            "net_pnl_after_costs": summary.get("net_pnl_after_costs"),
-            "return_pct": summary.get("return_pct"),
-            "max_drawdown_pct": summary.get("max_drawdown_pct"),
-            "win_rate_pct": summary.get("win_rate_pct"),
-            "profit_factor": summary.get("profit_factor"),
-            "take_profit_count": summary.get("take_profit_count"),
-            "stop_loss_count": summary.get("stop_loss_count"),
-            "fees_paid": summary.get("fees_paid"),
-            "slippage_cost": summary.get("slippage_cost"),
-            "decision_action_counts": summary.get("decision_action_counts"),
-            "decision_reason_top": summary.get("decision_reason_top"),
-            "decision_regime_signal_summary": summary.get("decision_regime_signal_summary"),
-        }
-    finally:
-        restore_overrides(originals)
+    result = run_sweep_candidate(seed_backtester_kwargs(seed_bt), overrides, summarize=summarize_candidate)
+    return {"name": name, "overrides": overrides, **result}
 
 
 def main():
@@ -117,9 +87,10 @@ def main():
         }),
     ]
     results = []
-    for name, overrides in candidates:
-        log_info(f"运行 SmallTarget A/B: {name} {overrides}")
-        results.append(run_candidate(seed_bt, name, overrides))
+    sweep = iter_sweep(seed_backtester_kwargs(seed_bt), candidates, run=partial(run_sweep_candidate, summarize=summarize_candidate))
+    for name, overrides, result in sweep:
+        log_info(f"完成 SmallTarget A/B: {name} {overrides}")
+        results.append({"name": name, "overrides": overrides, **result})
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     path = os.path.join(LOGS_DIR, f"smalltarget_regime_ab_{ts}.json")
     report = {"created_at": datetime.now().isoformat(timespec="seconds"), "results": results}
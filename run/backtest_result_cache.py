@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from backtest.result_cache import HEADLINE_KEYS, BacktestResultStore
+
+
+LIST_HEADERS = ["key", "created_at", "kind", "engine", "name", "rows", "start", "end", "equity", "net", "pf", "closed"]
+# 对比时除核心指标外还列出的描述字段，用来判断两次运行差在数据、模型还是参数
+COMPARE_FIELDS = ["kind", "engine", "rows", "start", "end", "data_hash", "artifact_hashes"]
+
+
+def filter_entries(entries, kind=None, name=None, limit=None):
+    selected = [
+        entry for entry in entries
+        if (kind is None or entry.get("kind") == kind)
+        and (name is None or name in str(entry.get("name") or ""))
+    ]
+    return selected[:limit] if limit else selected
+
+
+def compare_entries(entries):
+    """逐项列出各条缓存结果的描述字段、核心指标与覆盖项；only_diff 中是各条之间取值不同的覆盖项。"""
+    override_keys = sorted({key for entry in entries for key in (entry.get("overrides") or {})})
+    overrides = {
+        key: [(entry.get("overrides") or {}).get(key) for entry in entries]
+        for key in override_keys
+    }
+    return {
+        "keys": [entry.get("key") for entry in entries],
+        "names": [entry.get("name") for entry in entries],
+        "fields": {field: [entry.get(field) for entry in entries] for field in COMPARE_FIELDS},
+        "headline": {
+            key: [(entry.get("headline") or {}).get(key) for entry in entries]
+            for key in HEADLINE_KEYS
+        },
+        "overrides": overrides,
+        "only_diff": {
+            key: values
+            for key, values in overrides.items()
+            if len({json.dumps(value, sort_keys=True) for value in values}) > 1
+        },
+    }
+
+
+def _format_number(value, digits=2):
+    if value is None:
+        return "-"
+    return f"{float(value):.{digits}f}"
+
+
+def print_entries(entries):
+    print(",".join(LIST_HEADERS))
+    for entry in entries:
+        headline = entry.get("headline") or {}
+        print(
+            f"{str(entry.get('key'))[:12]},"
+            f"{entry.get('created_at')},"
+            f"{entry.get('kind')},"
+            f"{entry.get('engine')},"
+            f"{entry.get('name') or '-'},"
+            f"{entry.get('rows')},"
+            f"{entry.get('start')},"
+            f"{entry.get('end')},"
+            f"{_format_number(headline.get('final_equity'))},"
+            f"{_format_number(headline.get('net_pnl_after_costs'))},"
+            f"{_format_number(headline.get('profit_factor'), 3)},"
+            f"{headline.get('closed_trade_count', '-')}"
+        )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="查询跨运行的回测结果缓存：列出、查看、对比缓存的回测 summary")
+    parser.add_argument("--cache-dir", default=None, help="缓存目录，默认 BACKTEST_RESULT_CACHE_DIR")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="按写入时间倒序列出缓存结果")
+    list_parser.add_argument("--kind", default=None, help="只列出某类结果，如 summary / walk_forward_compact")
+    list_parser.add_argument("--name", default=None, help="按候选名 / 回测标题子串过滤")
+    list_parser.add_argument("--limit", type=int, default=20, help="最多列出条数；<=0 表示全部")
+
+    show_parser = commands.add_parser("show", help="输出一条缓存结果的元数据与完整 summary")
+    show_parser.add_argument("key", help="key 或其唯一前缀")
+
+    compare_parser = commands.add_parser("compare", help="并排对比多条缓存结果的指标与覆盖项")
+    compare_parser.add_argument("keys", nargs="+", help="两个及以上 key 或唯一前缀")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    store = BacktestResultStore(args.cache_dir)
+    if args.command == "list":
+        print_entries(filter_entries(store.entries(), args.kind, args.name, args.limit if args.limit > 0 else None))
+    elif args.command == "show":
+        entry = store.resolve(args.key)
+        payload = {"meta": entry, "result": store.load(entry["key"])}
+        print(json.dumps(payload, ensure_ascii=False, indent=2, sort_keys=True, default=str))
+    else:
+        entries = [store.resolve(key) for key in args.keys]
+        print(json.dumps(compare_entries(entries), ensure_ascii=False, indent=2, sort_keys=True, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""实盘单 bar 推理延迟基准。
+
+对比原生库推理与编译树推理（core.compiled_trees）在 signal_engine.weighted_predict_proba
+上的逐 bar 延迟 p50/p99，并核对两者输出的方向概率是否一致。
+
+用法:
+    PYTHONPATH=. python -m run.benchmark_inference [--bars 500] [--source okx|probe] [--batch-rows 200000]
+
+--source probe 不请求行情，用按模型分裂阈值构造的样本行，便于离线测量。
+--batch-rows 额外测量回测/walk-forward 场景下 weighted_predict_proba_batch 的大批量吞吐（行/秒）。
+"""
+import argparse
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+
+from config import config
+from core import signal_engine
+from core.compiled_trees import compile_models, compiled_arena, latency_percentiles, probe_frame
+from core.trend_filter import derive_trend_context
+from utils.utils import BASE_DIR
+
+
+def _load_metadata():
+    metadata_path = os.path.join(BASE_DIR, config.TRAINING_METADATA_PATH)
+    if not os.path.exists(metadata_path):
+        return {}
+    with open(metadata_path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _okx_rows(feature_cols, bars):
+    from core.ml_feature_engineering import add_advanced_features, merge_multi_period_features
+    from core.okx_api import OKXClient
+
+    merged = add_advanced_features(merge_multi_period_features(OKXClient().fetch_data())).dropna()
+    merged = merged.iloc[-int(bars):]
+    trend_biases = [
+        derive_trend_context(
+            merged.iloc[i],
+            interval=config.TREND_FILTER_INTERVAL,
+            fast_col=config.TREND_FILTER_FAST_COL,
+            slow_col=config.TREND_FILTER_SLOW_COL,
+            min_gap=config.TREND_FILTER_MIN_GAP,
+        ).get("trend_bias")
+        for i in range(len(merged))
+    ]
+    return merged[feature_cols].astype(float), trend_biases
+
+
+def _probe_rows(compiled, feature_cols, bars):
+    arena = compiled_arena(compiled)
+    if arena is None:
+        raise RuntimeError("没有可编译的模型，无法构造 probe 样本")
+    X = probe_frame(arena, feature_cols, rows=int(bars))
+    trend_biases = np.resize(["long", "short", "neutral"], len(X)).tolist()
+    return X, trend_biases
+
+
+def time_per_bar(models, X, trend_biases, *, model_metadata, warmup=5):
+    """逐行调用与实盘相同的 weighted_predict_proba，返回 (每行耗时秒数, 概率矩阵)。"""
+    kwargs = {
+        "model_metadata": model_metadata,
+        "direction_model_weights": getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {}),
+    }
+    for i in range(min(int(warmup), len(X))):
+        signal_engine.weighted_predict_proba(models, X.iloc[i:i + 1], config.MODEL_WEIGHTS, trend_bias=trend_biases[i], **kwargs)
+    samples = []
+    outputs = []
+    for i in range(len(X)):
+        row = X.iloc[i:i + 1]
+        started = time.perf_counter()
+        probs = signal_engine.weighted_predict_proba(models, row, config.MODEL_WEIGHTS, trend_bias=trend_biases[i], **kwargs)
+        samples.append(time.perf_counter() - started)
+        outputs.append(probs)
+    return samples, np.asarray(outputs, dtype=float)
+
+
+def time_batch(models, X, trend_biases, *, model_metadata, repeats=3):
+    """整批调用 weighted_predict_proba_batch，返回 (最快一次耗时秒数, 概率矩阵)。"""
+    kwargs = {
+        "trend_biases": trend_biases,
+        "model_metadata": model_metadata,
+        "direction_model_weights": getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {}),
+    }
+    probs = signal_engine.weighted_predict_proba_batch(models, X, config.MODEL_WEIGHTS, **kwargs)
+    best = None
+    for _ in range(max(1, int(repeats))):
+        started = time.perf_counter()
+        signal_engine.weighted_predict_proba_batch(models, X, config.MODEL_WEIGHTS, **kwargs)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, probs
+
+
+def _batch_summary(seconds, rows):
+    return {
+        "batch_ms": round(seconds * 1000.0, 1),
+        "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+    }
+
+
+def run_benchmark(bars=500, source="okx", batch_rows=0):
+    feature_cols = list(joblib.load(os.path.join(BASE_DIR, config.FEATURE_LIST_PATH)))
+    model_paths = {name: os.path.join(BASE_DIR, path) for name, path in config.MODEL_PATHS.items()}
+    models = signal_engine.load_models(model_paths)
+    model_metadata = _load_metadata()
+
+    started = time.perf_counter()
+    compiled = compile_models(models, feature_cols=feature_cols)
+    compile_seconds = time.perf_counter() - started
+
+    if source == "probe":
+        X, trend_biases = _probe_rows(compiled, feature_cols, bars)
+    else:
+        X, trend_biases = _okx_rows(feature_cols, bars)
+
+    native_samples, native_probs = time_per_bar(models, X, trend_biases, model_metadata=model_metadata)
+    compiled_samples, compiled_probs = time_per_bar(compiled, X, trend_biases, model_metadata=model_metadata)
+    native = latency_percentiles(native_samples)
+    fast = latency_percentiles(compiled_samples)
+    batch = None
+    if int(batch_rows) > 0:
+        batch_X, batch_biases = _probe_rows(compiled, feature_cols, batch_rows)
+        native_sec, native_batch = time_batch(models, batch_X, batch_biases, model_metadata=model_metadata)
+        compiled_sec, compiled_batch = time_batch(compiled, batch_X, batch_biases, model_metadata=model_metadata)
+        batch = {
+            "rows": int(len(batch_X)),
+            "native": _batch_summary(native_sec, len(batch_X)),
+            "compiled": _batch_summary(compiled_sec, len(batch_X)),
+            "max_abs_prob_diff": float(np.max(np.abs(native_batch - compiled_batch))),
+        }
+    return {
+        "source": source,
+        "bars": int(len(X)),
+        "compiled_models": sorted(name for name in compiled if compiled[name] is not models[name]),
+        "compile_sec": round(compile_seconds, 3),
+        "native": native,
+        "compiled": fast,
+        "p50_speedup": round(native["p50_ms"] / fast["p50_ms"], 2) if fast["p50_ms"] else None,
+        "p99_speedup": round(native["p99_ms"] / fast["p99_ms"], 2) if fast["p99_ms"] else None,
+        "max_abs_prob_diff": float(np.max(np.abs(native_probs - compiled_probs))) if len(X) else 0.0,
+        "batch": batch,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="对比原生与编译树模型的逐 bar 推理延迟")
+    parser.add_argument("--bars", type=int, default=500, help="参与计时的 bar 数")
+    parser.add_argument("--source", choices=["okx", "probe"], default="okx", help="样本来源")
+    parser.add_argument("--batch-rows", type=int, default=0, help="大批量吞吐测量的 probe 行数，0 表示不测")
+    args = parser.parse_args()
+    print(json.dumps(
+        run_benchmark(bars=args.bars, source=args.source, batch_rows=args.batch_rows),
+        ensure_ascii=False,
+        indent=2,
+    ))
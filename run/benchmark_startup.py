@@ -0,0 +1,102 @@
+"""推理入口启动耗时基准（import 到模型就绪）。
+
+对 core.predict 和 run.live_trading_monitor 分别起若干个全新解释器，比较 joblib 原产物与
+紧凑产物（core.compact_models）两种加载方式下的模块导入耗时、模型加载耗时，以及进程里
+是否导入了 sklearn / xgboost / lightgbm。模型加载方式与各入口启动时一致：
+core.predict 走 load_inference_models，live monitor 走 model_reload.load_model_bundle（含编译推理）。
+
+用法:
+    PYTHONPATH=. python -m run.benchmark_startup [--runs 5]
+
+每种方式先跑一次预热（紧凑产物不存在时会在这次导出），不计入结果。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from core.compact_models import TRAINING_LIBRARIES
+from utils.utils import BASE_DIR
+
+
+TARGETS = {
+    "core.predict": (
+        "from core.compact_models import load_inference_models\n"
+        "loaded = load_inference_models()\n"
+    ),
+    "run.live_trading_monitor": (
+        "from core import model_reload\n"
+        "loaded = model_reload.load_model_bundle()\n"
+    ),
+}
+MODES = {
+    "joblib": {"MODEL_COMPACT_ARTIFACTS": "0"},
+    "compact": {"MODEL_COMPACT_ARTIFACTS": "1"},
+}
+
+_SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+{ready}ready = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000.0,
+    "load_ms": (ready - imported) * 1000.0,
+    "ready_ms": (ready - started) * 1000.0,
+    "training_libraries": [name for name in {libraries!r} if name in sys.modules],
+}}))
+"""
+
+
+def run_once(module, mode):
+    """在全新解释器里导入入口模块并加载模型，返回各阶段耗时（毫秒）。"""
+    script = _SNIPPET.format(module=module, ready=TARGETS[module], libraries=list(TRAINING_LIBRARIES))
+    env = dict(os.environ, PYTHONPATH=BASE_DIR, TELEGRAM_ENABLED="0", **MODES[mode])
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=BASE_DIR,
+        check=True,
+    )
+    process_ms = (time.perf_counter() - started) * 1000.0
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    sample["process_ms"] = process_ms
+    return sample
+
+
+def summarize(samples):
+    summary = {
+        key: round(float(np.median([sample[key] for sample in samples])), 1)
+        for key in ("import_ms", "load_ms", "ready_ms", "process_ms")
+    }
+    summary["training_libraries"] = samples[-1]["training_libraries"]
+    return summary
+
+
+def run_benchmark(runs=5, targets=None):
+    results = {}
+    for module in targets or TARGETS:
+        results[module] = {}
+        for mode in MODES:
+            run_once(module, mode)
+            results[module][mode] = summarize([run_once(module, mode) for _ in range(max(1, int(runs)))])
+        joblib_ms = results[module]["joblib"]["ready_ms"]
+        compact_ms = results[module]["compact"]["ready_ms"]
+        results[module]["ready_speedup"] = round(joblib_ms / compact_ms, 2) if compact_ms else None
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="对比 joblib 与紧凑模型产物下推理入口的启动耗时")
+    parser.add_argument("--runs", type=int, default=5, help="每种方式计时的进程数")
+    parser.add_argument("--target", choices=sorted(TARGETS), action="append", help="只测指定入口，可重复")
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(runs=args.runs, targets=args.target), ensure_ascii=False, indent=2))
@@ -1,11 +1,11 @@
 import argparse
 import contextlib
-import io
 import json
 import math
 import os
 import sys
 from datetime import datetime
+from functools import partial
 
 import numpy as np
 import pandas as pd
@@ -14,7 +14,9 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
-from backtest.backtest import Backtester
+from backtest.adaptive_search import compare_with_exhaustive, successive_halving_sweep
+from backtest.result_cache import BacktestResultStore
+from backtest.sweep import iter_sweep, run_sweep_candidate, seed_backtester_kwargs
 from config import config
 from run import training_diagnostics as td
 from utils.utils import LOGS_DIR, log_info
@@ -835,9 +837,8 @@ def fit_label_strength_candidate(seed_data, feature_cols, candidate, split):
 
 def _run_threshold_sweep_for_data(seed_bt, data, threshold_candidates, min_closed_trades):
     results = []
-    for candidate in threshold_candidates:
+    for candidate, summary in run_candidates(seed_bt, data, threshold_candidates):
         overrides = candidate["overrides"]
-        summary = run_candidate(seed_bt, data.copy(), overrides)
         summary["name"] = candidate["name"]
         summary["overrides"] = overrides
         summary["weak_signal_gate_counts"] = weak_signal_gate_counts(
@@ -1051,33 +1052,30 @@ def compact_summary(summary):
     return {key: summary.get(key) for key in keys if key in summary}
 
 
+def _compact_candidate_result(_backtester, summary):
+    return compact_summary(summary or {})
+
+
 def run_candidate(seed_bt, data, overrides):
-    originals = apply_overrides(overrides)
-    try:
-        bt = Backtester(
-            "multi_period",
-            seed_bt.window,
-            data_dict=seed_bt.data_dict,
-            reward_risk=seed_bt.reward_risk,
-            precomputed_data=data,
-            feature_cols=seed_bt.feature_cols,
-            models=seed_bt.models,
-            model_weights=seed_bt.model_weights,
-            funding_history=seed_bt.funding_history,
-            enable_csv_dump=False,
-            show_progress=False,
-            emit_diagnostics=False,
-        )
-        original_predict_row = bt._predict_row
-        bt._predict_row = lambda row: (row["long_prob"], row["short_prob"])
-        try:
-            with contextlib.redirect_stdout(io.StringIO()):
-                summary = bt.run_backtest()
-        finally:
-            bt._predict_row = original_predict_row
-        return compact_summary(summary or {})
-    finally:
-        restore_overrides(originals)
+    return run_sweep_candidate(seed_backtester_kwargs(seed_bt, data), overrides, summarize=_compact_candidate_result)
+
+
+def run_candidates(seed_bt, data, candidates):
+    """按顺序产出 (candidate, summary)；候选之间互不影响，按 BACKTEST_SWEEP_WORKERS 并行回测，已缓存的组合直接复用。"""
+    backtester_kwargs = seed_backtester_kwargs(seed_bt, data)
+    sweep = iter_sweep(
+        backtester_kwargs,
+        [(candidate["name"], candidate["overrides"]) for candidate in candidates],
+        run=partial(run_sweep_candidate, summarize=_compact_candidate_result),
+        cache=BacktestResultStore.open_scope(
+            backtester_kwargs,
+            kind="threshold_calibration_compact",
+            engine="backtester",
+            precomputed_probabilities=True,
+        ),
+    )
+    for candidate, (_, _, summary) in zip(candidates, sweep):
+        yield candidate, summary
 
 
 def score_candidate(item, min_closed_trades):
@@ -1121,29 +1119,64 @@ def build_candidates(
         for gap in gaps:
             for min_target_ratio in min_target_ratios:
                 for probability_center in position_probability_centers:
-                    backtest_min_adjust = min(
-                        float(config.MIN_ADJUST_AMOUNT),
-                        float(config.INITIAL_BALANCE) * float(min_target_ratio),
-                    )
                     candidates.append({
                         "name": (
                             f"tl{long_threshold:.2f}_ts{short_threshold:.2f}_"
                             f"gap{gap:.2f}_mt{min_target_ratio:.3f}_pc{probability_center:.2f}"
                         ),
-                        "overrides": {
-                            "THRESHOLD_LONG": float(long_threshold),
-                            "THRESHOLD_SHORT": float(short_threshold),
-                            "SIGNAL_MIN_PROB_DIFF": float(gap),
-                            "MIN_SIGNAL_TARGET_RATIO": float(min_target_ratio),
-                            "REGIME_RANGE_MIN_SIGNAL_TARGET_RATIO": float(min_target_ratio),
-                            "REGIME_HIGH_VOL_MIN_SIGNAL_TARGET_RATIO": float(min_target_ratio),
-                            "POSITION_PROBABILITY_CENTER": float(probability_center),
-                            "BACKTEST_MIN_ADJUST_AMOUNT": float(backtest_min_adjust),
-                        },
+                        "overrides": candidate_overrides(
+                            long_threshold,
+                            short_threshold,
+                            gap,
+                            min_target_ratio,
+                            probability_center,
+                        ),
                     })
     return candidates
 
 
+def candidate_overrides(long_threshold, short_threshold, gap, min_target_ratio, probability_center):
+    backtest_min_adjust = min(
+        float(config.MIN_ADJUST_AMOUNT),
+        float(config.INITIAL_BALANCE) * float(min_target_ratio),
+    )
+    return {
+        "THRESHOLD_LONG": float(long_threshold),
+        "THRESHOLD_SHORT": float(short_threshold),
+        "SIGNAL_MIN_PROB_DIFF": float(gap),
+        "MIN_SIGNAL_TARGET_RATIO": float(min_target_ratio),
+        "REGIME_RANGE_MIN_SIGNAL_TARGET_RATIO": float(min_target_ratio),
+        "REGIME_HIGH_VOL_MIN_SIGNAL_TARGET_RATIO": float(min_target_ratio),
+        "POSITION_PROBABILITY_CENTER": float(probability_center),
+        "BACKTEST_MIN_ADJUST_AMOUNT": float(backtest_min_adjust),
+    }
+
+
+def derive_candidate_overrides(overrides):
+    return candidate_overrides(
+        overrides["THRESHOLD_LONG"],
+        overrides["THRESHOLD_SHORT"],
+        overrides["SIGNAL_MIN_PROB_DIFF"],
+        overrides["MIN_SIGNAL_TARGET_RATIO"],
+        overrides["POSITION_PROBABILITY_CENTER"],
+    )
+
+
+def run_adaptive_candidates(seed_bt, data, candidates, min_closed_trades, *, eta=3, rungs=3, min_rows=0, proposals=0):
+    """逐级减半搜索：短窗口筛选全部候选，只有前 1/eta 进入更长窗口，最后一级为完整窗口。"""
+    return successive_halving_sweep(
+        seed_backtester_kwargs(seed_bt, data),
+        candidates,
+        score=lambda item: score_candidate(item, int(min_closed_trades)),
+        evaluate=partial(iter_sweep, run=partial(run_sweep_candidate, summarize=_compact_candidate_result)),
+        eta=eta,
+        rungs=rungs,
+        min_rows=min_rows,
+        proposals=proposals,
+        derive=derive_candidate_overrides,
+    )
+
+
 def write_report(report, output_path=None):
     if output_path is None:
         output_path = os.path.join(
@@ -1264,6 +1297,21 @@ def parse_args(argv=None):
         default=int(os.getenv("LABEL_STRENGTH_MODEL_TOP_N", "0")),
         help="对标签强度推荐前 N 个候选临时训练模型并跑阈值回测；0 表示跳过重训练 sweep",
     )
+    parser.add_argument(
+        "--search",
+        choices=["grid", "adaptive"],
+        default=os.getenv("THRESHOLD_CALIBRATION_SEARCH", "grid"),
+        help="grid=全量网格逐个回测；adaptive=逐级减半（短窗口筛选，前 1/eta 进入更长窗口）",
+    )
+    parser.add_argument("--adaptive-eta", type=int, default=int(os.getenv("THRESHOLD_CALIBRATION_ADAPTIVE_ETA", "3")), help="逐级减半每级保留 1/eta")
+    parser.add_argument("--adaptive-rungs", type=int, default=int(os.getenv("THRESHOLD_CALIBRATION_ADAPTIVE_RUNGS", "3")), help="逐级减半级数，最后一级为完整窗口")
+    parser.add_argument("--adaptive-min-rows", type=int, default=int(os.getenv("THRESHOLD_CALIBRATION_ADAPTIVE_MIN_ROWS", "288")), help="第 0 级窗口最少 K 线数")
+    parser.add_argument("--adaptive-proposals", type=int, default=int(os.getenv("THRESHOLD_CALIBRATION_ADAPTIVE_PROPOSALS", "8")), help="第 0 级后在好候选之间取中点补充的候选数")
+    parser.add_argument(
+        "--compare-exhaustive",
+        action="store_true",
+        help="adaptive 模式下同时跑全量网格，报告最终选择在全量排名中的位置与筛选排名相关性",
+    )
     parser.add_argument("--output", default=None, help="报告 JSON 输出路径")
     return parser.parse_args(argv)
 
@@ -1461,22 +1509,61 @@ def main(argv=None):
         )
 
     path = write_report(report, args.output)
-    log_info(f"阈值校准开始: candidates={len(candidates)} rows={len(data)}")
-    for idx, candidate in enumerate(candidates, start=1):
-        overrides = candidate["overrides"]
-        summary = run_candidate(seed_bt, data.copy(), overrides)
-        summary["name"] = candidate["name"]
-        summary["overrides"] = overrides
-        summary["weak_signal_gate_counts"] = weak_signal_gate_counts(
+    log_info(f"阈值校准开始: search={args.search} candidates={len(candidates)} rows={len(data)}")
+    # grid 模式的全量结果直接写进报告；adaptive + --compare-exhaustive 时仅作为对照基准
+    exhaustive = report["candidates"] if args.search == "grid" else []
+    if args.search == "grid" or args.compare_exhaustive:
+        for idx, (candidate, summary) in enumerate(run_candidates(seed_bt, data, candidates), start=1):
+            overrides = candidate["overrides"]
+            summary["name"] = candidate["name"]
+            summary["overrides"] = overrides
+            summary["weak_signal_gate_counts"] = weak_signal_gate_counts(
+                data,
+                overrides["THRESHOLD_LONG"],
+                overrides["THRESHOLD_SHORT"],
+                overrides["SIGNAL_MIN_PROB_DIFF"],
+            )
+            exhaustive.append(summary)
+            if idx % 10 == 0 or idx == len(candidates):
+                write_report(report, path)
+                log_info(f"阈值校准进度: {idx}/{len(candidates)}")
+
+    if args.search == "adaptive":
+        search = run_adaptive_candidates(
+            seed_bt,
             data,
-            overrides["THRESHOLD_LONG"],
-            overrides["THRESHOLD_SHORT"],
-            overrides["SIGNAL_MIN_PROB_DIFF"],
+            candidates,
+            int(args.min_closed_trades),
+            eta=int(args.adaptive_eta),
+            rungs=int(args.adaptive_rungs),
+            min_rows=int(args.adaptive_min_rows),
+            proposals=int(args.adaptive_proposals),
+        )
+        for summary in search["results"]:
+            overrides = summary["overrides"]
+            summary["weak_signal_gate_counts"] = weak_signal_gate_counts(
+                data,
+                overrides["THRESHOLD_LONG"],
+                overrides["THRESHOLD_SHORT"],
+                overrides["SIGNAL_MIN_PROB_DIFF"],
+            )
+        report["candidates"] = search["results"]
+        report["adaptive_search"] = {
+            key: value
+            for key, value in search.items()
+            if key not in {"results", "screening_summaries"}
+        }
+        if exhaustive:
+            report["adaptive_search"]["exhaustive_comparison"] = compare_with_exhaustive(
+                search,
+                exhaustive,
+                lambda item: score_candidate(item, int(args.min_closed_trades)),
+            )
+        log_info(
+            "自适应阈值搜索: "
+            f"evaluations={search['evaluations']} full_window_equivalents={search['full_window_equivalents']} "
+            f"saved_pct={search['saved_pct']:.2f}"
         )
-        report["candidates"].append(summary)
-        if idx % 10 == 0 or idx == len(candidates):
-            write_report(report, path)
-            log_info(f"阈值校准进度: {idx}/{len(candidates)}")
 
     ranked = sorted(
         report["candidates"],
@@ -1,33 +1,21 @@
-import contextlib
-import io
 import json
 import os
 import sys
 from collections import Counter
 from datetime import datetime
+from functools import partial
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from backtest.backtest import Backtester
+from backtest.result_cache import BacktestResultStore
+from backtest.sweep import run_sweep, run_sweep_candidate, seed_backtester_kwargs
 from config import config
 from utils.utils import LOGS_DIR, log_info
 
 
-def apply_overrides(overrides):
-    originals = {}
-    for key, value in overrides.items():
-        originals[key] = getattr(config, key)
-        setattr(config, key, value)
-    return originals
-
-
-def restore_overrides(originals):
-    for key, value in originals.items():
-        setattr(config, key, value)
-
-
 def build_seed_backtester():
     base_interval = config.INTERVALS[0] if config.INTERVALS else "5m"
     window = config.WINDOWS.get(base_interval, 1000)
@@ -55,31 +43,20 @@ def summarize_actions(trade_log):
     }
 
 
+def summarize_candidate(backtester, summary):
+    summary["action_counts"] = summarize_actions(backtester.trade_log)
+    return summary
+
+
 def run_candidate(seed_bt, name, overrides):
-    originals = apply_overrides(overrides)
-    try:
-        bt = Backtester(
-            "multi_period",
-            seed_bt.window,
-            data_dict=seed_bt.data_dict,
-            reward_risk=seed_bt.reward_risk,
-            precomputed_data=seed_bt.data,
-            feature_cols=seed_bt.feature_cols,
-            models=seed_bt.models,
-            model_weights=seed_bt.model_weights,
-            funding_history=seed_bt.funding_history,
-            enable_csv_dump=False,
-            show_progress=False,
-            emit_diagnostics=False,
-        )
-        with contextlib.redirect_stdout(io.StringIO()):
-            summary = bt.run_backtest()
-        summary["name"] = name
-        summary["overrides"] = overrides
-        summary["action_counts"] = summarize_actions(bt.trade_log)
-        return summary
-    finally:
-        restore_overrides(originals)
+    summary = run_sweep_candidate(
+        seed_backtester_kwargs(seed_bt, overrides=overrides),
+        overrides,
+        summarize=summarize_candidate,
+    )
+    summary["name"] = name
+    summary["overrides"] = overrides
+    return summary
 
 
 def write_report(results):
@@ -164,7 +141,18 @@ def main():
         ("trend_filter_on", {"TREND_FILTER_ENABLED": True}),
     ]
 
-    results = [run_candidate(seed_bt, name, overrides) for name, overrides in candidates]
+    backtester_kwargs = seed_backtester_kwargs(seed_bt)
+    results = run_sweep(
+        backtester_kwargs,
+        candidates,
+        run=partial(run_sweep_candidate, summarize=summarize_candidate),
+        cache=BacktestResultStore.open_scope(
+            backtester_kwargs,
+            kind="trend_filter_ab",
+            engine="backtester",
+            precomputed_probabilities=True,
+        ),
+    )
     print_table(results)
     print_delta(results)
     report_path = write_report(results)
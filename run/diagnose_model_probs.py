@@ -25,7 +25,8 @@ from core.ml_feature_engineering import (
     merge_multi_period_features,
 )
 from core.okx_api import OKXClient
-from core.trend_filter import derive_trend_context
+from core.prediction_cache import cached_weighted_predict_proba_batch
+from core.trend_filter import derive_trend_biases
 from utils.utils import BASE_DIR
 
 
@@ -52,26 +53,24 @@ def diagnose(bars=1500):
     X = merged[feature_cols].astype(float)
 
     n = min(int(bars), len(X) - config.MODEL_LABEL_FUTURE_WINDOW)
-    longs, shorts = [], []
-    for i in range(len(X) - n, len(X)):
-        trend_context = derive_trend_context(
-            merged.iloc[i],
-            interval=config.TREND_FILTER_INTERVAL,
-            fast_col=config.TREND_FILTER_FAST_COL,
-            slow_col=config.TREND_FILTER_SLOW_COL,
-            min_gap=config.TREND_FILTER_MIN_GAP,
-        )
-        probs = signal_engine.weighted_predict_proba(
-            models,
-            X.iloc[i:i + 1],
-            config.MODEL_WEIGHTS,
-            trend_bias=trend_context.get("trend_bias"),
-            model_metadata=model_metadata,
-        )
-        shorts.append(probs[0])
-        longs.append(probs[1])
-    longs = np.array(longs)
-    shorts = np.array(shorts)
+    trend_biases = derive_trend_biases(
+        merged.iloc[len(X) - n:],
+        interval=config.TREND_FILTER_INTERVAL,
+        fast_col=config.TREND_FILTER_FAST_COL,
+        slow_col=config.TREND_FILTER_SLOW_COL,
+        min_gap=config.TREND_FILTER_MIN_GAP,
+    )
+    # 同一份模型在同一批 bar 上的概率走持久化缓存，重复诊断只计算新增的 bar
+    probs = cached_weighted_predict_proba_batch(
+        models,
+        X.iloc[len(X) - n:],
+        config.MODEL_WEIGHTS,
+        trend_biases=trend_biases,
+        model_metadata=model_metadata,
+        feature_cols=feature_cols,
+    )
+    shorts = probs[:, 0]
+    longs = probs[:, 1]
     gap = np.abs(longs - shorts)
 
     print(f"\nlast {n} bars ensemble (strategy directional probs):")
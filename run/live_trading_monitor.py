@@ -2,18 +2,14 @@
 import os
 import time
 import json
-import joblib
 import threading
 import traceback
-import numpy as np
 import pandas as pd
 from collections import Counter
-from core import ml_feature_engineering, signal_engine, trend_filter
+from core import model_reload, model_server
 from core.reward_risk import get_configured_reward_risk
 from core.strategy_core import StrategyCore
 from core.dynamic_risk import DynamicRiskController
-from core.trend_filter import derive_trend_context
-from core.regime_filter import derive_market_regime
 from utils.utils import log_info, log_error, notify_important, BASE_DIR, LOGS_DIR
 from utils.utils import DISPLAY_TIMEZONE
 from utils.runtime_dashboard import write_runtime_dashboard_snapshot
@@ -423,19 +419,13 @@ class LiveTrader:
         self._last_tpsl_reconcile_at = None
 
         # ===== 模型/特征=====
-        feature_path = os.path.join(BASE_DIR, config.FEATURE_LIST_PATH) if "BASE_DIR" in globals() else config.FEATURE_LIST_PATH
-        self.feature_cols = joblib.load(feature_path)
-        metadata_path = os.path.join(BASE_DIR, config.TRAINING_METADATA_PATH) if "BASE_DIR" in globals() else config.TRAINING_METADATA_PATH
-        self.model_metadata = {}
-        if os.path.exists(metadata_path):
-            try:
-                with open(metadata_path, "r", encoding="utf-8") as file:
-                    self.model_metadata = json.load(file)
-            except Exception as exc:
-                log_error(f"模型训练元数据读取失败，按旧方向模型处理: {exc}")
-
-        model_paths = {n: os.path.join(BASE_DIR, p) for n, p in config.MODEL_PATHS.items()} if "BASE_DIR" in globals() else config.MODEL_PATHS
-        self.models = signal_engine.load_models(model_paths)
+        bundle = model_reload.load_model_bundle()
+        self.feature_cols = bundle["feature_cols"]
+        self.model_metadata = bundle["model_metadata"]
+        self.models = bundle["models"]
+        self.model_bundle_signature = bundle["signature"]
+        self.model_reload_watcher = None
+        self.model_server = None
         self.model_weights = config.MODEL_WEIGHTS
         self.direction_model_weights = getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {})
 
@@ -567,6 +557,25 @@ class LiveTrader:
             )
         self._reconcile_exchange_tpsl_on_startup()
 
+    def apply_pending_model_bundle(self):
+        """在两根 bar 之间换上热加载校验通过的模型；只能在没有进行中的特征/推理任务时调用。"""
+        watcher = getattr(self, "model_reload_watcher", None)
+        if watcher is None:
+            return False
+        bundle = watcher.take_pending()
+        if bundle is None:
+            return False
+        self.models = bundle["models"]
+        self.feature_cols = bundle["feature_cols"]
+        self.model_metadata = bundle["model_metadata"]
+        self.model_bundle_signature = bundle["signature"]
+        log_info(
+            "✅ 已热加载新模型: "
+            f"models={','.join(sorted(self.models))} features={len(self.feature_cols)} "
+            f"created_at={self.model_metadata.get('created_at') or '-'}"
+        )
+        return True
+
     def _load_reward_risk(self):
         reward_risk = get_configured_reward_risk()
         log_info(f"实盘使用固定 reward_risk={reward_risk:.4f}（与回测一致）")
@@ -583,99 +592,27 @@ class LiveTrader:
             - trend_short -> long_prob=0.1, short_prob=0.9
             - neutral -> long_prob=0.5, short_prob=0.5
         """
-        if bool(config.USE_SIMPLE_RULE_MODE):
-            # 简单规则模式 - 从特征推断 trend
-            trend_context = trend_filter.derive_trend_context(
-                row,
-                interval=config.TREND_FILTER_INTERVAL,
-                fast_col=config.TREND_FILTER_FAST_COL,
-                slow_col=config.TREND_FILTER_SLOW_COL,
-                min_gap=config.TREND_FILTER_MIN_GAP,
-            )
-            trend_bias = trend_context.get('trend_bias', 'neutral')
-
-            if trend_bias == 'long':
-                return 0.90, 0.10
-            elif trend_bias == 'short':
-                return 0.10, 0.90
-            else:
-                return 0.50, 0.50
-
-        trend_context = derive_trend_context(
+        return model_server.predict_latest_probs(
             row,
-            interval=config.TREND_FILTER_INTERVAL,
-            fast_col=config.TREND_FILTER_FAST_COL,
-            slow_col=config.TREND_FILTER_SLOW_COL,
-            min_gap=config.TREND_FILTER_MIN_GAP,
-        )
-
-        # 正常ML模式
-        X = row[self.feature_cols].values.reshape(1, -1).astype(float)
-        X = pd.DataFrame(X, columns=self.feature_cols)
-
-        avg = signal_engine.weighted_predict_proba(
-            self.models,
-            X,
-            self.model_weights,
-            trend_bias=trend_context.get("trend_bias"),
-            model_metadata=self.model_metadata,
+            {"models": self.models, "feature_cols": self.feature_cols, "model_metadata": self.model_metadata},
+            model_weights=self.model_weights,
             direction_model_weights=self.direction_model_weights,
         )
-        long_prob, short_prob = float(avg[1]), float(avg[0])
-        return long_prob, short_prob
 
     def _get_latest_features(self, client=None):
         data_client = client or self.client
         data_dict = data_client.fetch_data()
-        merged_df = ml_feature_engineering.merge_multi_period_features(data_dict)
-        merged_df = ml_feature_engineering.add_advanced_features(merged_df)
-        merged_df = merged_df.dropna().copy()
-
-        if merged_df.empty:
-            raise RuntimeError("特征数据不足，暂时无法生成已收盘 bar 信号")
-
-        # merge_multi_period_features 已经只保留确认收盘bar，并对高周期特征做了滞后一根对齐。
-        row = merged_df.iloc[-1]
-        bar_ts = ensure_utc_timestamp(merged_df.index[-1])
         try:
             price = float(data_client.get_price())
         except Exception as exc:
             log_error(f"get_price 失败，回退使用 bar 收盘价: {exc}")
-            price = float(row["5m_close"])
-        money_flow_ratio = float(row["money_flow_ratio"])
-
-        if pd.notna(row.get("volatility_15")):
-            volatility = float(row["volatility_15"])
-        else:
-            merged_df["log_return"] = np.log(merged_df["5m_close"] / merged_df["5m_close"].shift(1))
-            volatility = float(merged_df["log_return"].rolling(96).std().iloc[-1])
+            price = None
 
-        long_prob, short_prob = self._predict_latest_probs(row)
-        atr_value = row.get("5m_atr")
-        atr_ratio = None
-        if pd.notna(atr_value) and price > 0:
-            atr_ratio = float(atr_value) / price
-
-        trend_context = derive_trend_context(
-            row,
-            interval=config.TREND_FILTER_INTERVAL,
-            fast_col=config.TREND_FILTER_FAST_COL,
-            slow_col=config.TREND_FILTER_SLOW_COL,
-            min_gap=config.TREND_FILTER_MIN_GAP,
-        )
-        regime_context = derive_market_regime(
-            trend_bias=trend_context.get("trend_bias"),
-            trend_gap=trend_context.get("trend_gap"),
-            volatility=volatility,
-            atr_ratio=atr_ratio,
-            money_flow_ratio=money_flow_ratio,
-            trend_gap_threshold=config.REGIME_TREND_GAP_THRESHOLD,
-            high_vol_atr_threshold=config.REGIME_HIGH_VOL_ATR_THRESHOLD,
-            high_volatility_threshold=config.REGIME_HIGH_VOLATILITY_THRESHOLD,
-            money_flow_extreme_threshold=config.REGIME_MONEY_FLOW_EXTREME_THRESHOLD,
-        )
-
-        return bar_ts, price, long_prob, short_prob, money_flow_ratio, volatility, atr_ratio, trend_context, regime_context
+        server = getattr(self, "model_server", None)
+        if server is not None:
+            # 特征构建和推理在模型服务子进程中完成，本线程只等待共享内存里的结果
+            return server.request_latest_features(data_dict, price)
+        return model_server.build_latest_features(data_dict, price, self._predict_latest_probs)
 
     def _get_equity(self) -> float:
         account = self._get_account_snapshot()
@@ -2881,6 +2818,11 @@ def run():
         daemon=True,
     )
     risk_thread.start()
+    if bool(getattr(config, "LIVE_MODEL_SERVER_ENABLED", False)):
+        # 子进程自行加载并热替换模型，主进程不再运行热加载线程
+        trader.model_server = model_server.ModelServerClient().start()
+    elif bool(getattr(config, "LIVE_MODEL_HOT_RELOAD", True)):
+        trader.model_reload_watcher = model_reload.ModelBundleWatcher(trader.model_bundle_signature).start()
     bar_client = OKXClient()
     bar_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bar-features")
     bar_future = None
@@ -2896,6 +2838,9 @@ def run():
                     finally:
                         next_bar_poll_at = time.monotonic() + BAR_POLL_SEC
 
+                if bar_future is None:
+                    trader.apply_pending_model_bundle()
+
                 if bar_future is None and time.monotonic() >= next_bar_poll_at:
                     bar_future = bar_executor.submit(trader._get_latest_features, bar_client)
 
@@ -2922,7 +2867,11 @@ def run():
         risk_thread.join(timeout=max(2.0, float(POLL_SEC) * 2.0))
         if risk_thread.is_alive():
             log_error("实时风控线程未能在超时时间内停止")
+        if trader.model_reload_watcher is not None:
+            trader.model_reload_watcher.stop()
         bar_executor.shutdown(wait=False, cancel_futures=True)
+        if trader.model_server is not None:
+            trader.model_server.stop()
         if realtime_stream is not None:
             realtime_stream.stop()
 
@@ -0,0 +1,410 @@
+"""集成模型推理成本与边际贡献分析。
+
+逐个模型测量产物加载耗时、加载后的常驻内存增量、实盘单行推理延迟（开启 LIVE_COMPILED_INFERENCE
+时按编译树计时）和整批推理耗时；再在训练元数据的验证段上对 MODEL_WEIGHTS 的每个非空模型子集（按原权重比例归一）
+计算 trade precision/recall 与回测净收益，给出满足 LIVE_INFERENCE_LATENCY_BUDGET_MS 且质量损失
+最小的权重组合（可能去掉某个模型）。OOS 段只作为只读复核写进报告，不参与打分和选择，
+否则选出的组合在 OOS 上的表现不再是样本外结果。
+最终产物用 train+validation 重训（MODEL_FINAL_TRAIN_ON_VALIDATION，默认开启）时验证段对线上模型是样本内，
+此时只报告推理成本，拒绝给出权重建议。
+
+子集评估复用每个模型一次预测的原始概率（core.prediction_cache.ReplayModel），
+融合逻辑与实盘 signal_engine.weighted_predict_proba_batch 完全一致。
+
+用法:
+    PYTHONPATH=. python -m run.profile_ensemble [--latency-rows 300] [--budget-ms 20] [--skip-backtest]
+"""
+import argparse
+import contextlib
+import copy
+import gc
+import itertools
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from config import config
+from core import signal_engine
+from core.compiled_trees import compile_models, is_compiled, latency_percentiles
+from core.prediction_cache import ReplayModel
+from core.trend_filter import derive_trend_biases
+from run.retrain_models import (
+    _binary_metrics,
+    read_json,
+    restrict_backtester_to_oos,
+    restrict_backtester_to_validation,
+    walk_forward_diagnostic_threshold,
+    write_json_atomic,
+)
+from utils.utils import BASE_DIR, LOGS_DIR
+
+
+REPORT_DIR = os.path.join(LOGS_DIR, "ensemble_profile")
+
+
+def utc_now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _rss_bytes():
+    """当前进程常驻内存（字节）；读不到 /proc 时返回 None。"""
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def profile_model_cost(name, path, feature_cols, X, *, compiled=True, latency_rows=300, batch_repeats=3):
+    """加载单个模型并测量成本，返回 (模型, 成本摘要)。"""
+    gc.collect()
+    rss_before = _rss_bytes()
+    started = time.perf_counter()
+    model = signal_engine.load_models({name: path})[name]
+    load_ms = (time.perf_counter() - started) * 1000.0
+    rss_after = _rss_bytes()
+
+    live_model = compile_models({name: model}, feature_cols=feature_cols)[name] if compiled else model
+    row_samples = []
+    for i in range(min(int(latency_rows), len(X))):
+        row = X.iloc[i:i + 1]
+        started = time.perf_counter()
+        live_model.predict_proba(row)
+        row_samples.append(time.perf_counter() - started)
+
+    batch_sec = None
+    for _ in range(max(1, int(batch_repeats))):
+        started = time.perf_counter()
+        model.predict_proba(X)
+        elapsed = time.perf_counter() - started
+        batch_sec = elapsed if batch_sec is None else min(batch_sec, elapsed)
+
+    memory_mb = None
+    if rss_before is not None and rss_after is not None:
+        memory_mb = round(max(0, rss_after - rss_before) / 2**20, 2)
+    return model, {
+        "file_mb": round(os.path.getsize(path) / 2**20, 2),
+        "load_ms": round(load_ms, 1),
+        "memory_mb": memory_mb,
+        "compiled": bool(is_compiled(live_model)),
+        "row_latency": latency_percentiles(row_samples),
+        "batch_rows": int(len(X)),
+        "batch_ms": round(batch_sec * 1000.0, 1),
+        "batch_rows_per_sec": round(len(X) / batch_sec, 1) if batch_sec else None,
+    }
+
+
+def weight_subsets(model_weights, names):
+    """所有非空模型子集的权重，按原权重比例归一；子集里权重全为 0 的组合跳过。"""
+    base = {name: float(model_weights.get(name, 1.0)) for name in names}
+    subsets = []
+    for size in range(len(names), 0, -1):
+        for members in itertools.combinations(names, size):
+            total = sum(base[name] for name in members)
+            if total <= 0:
+                continue
+            subsets.append({name: base[name] / total for name in members})
+    return subsets
+
+
+def estimated_live_latency_ms(weights, costs, percentile="p99_ms"):
+    """实盘逐 bar 串行推理各模型，组合延迟按成员单行延迟之和估计。"""
+    return round(sum(float(costs[name]["row_latency"][percentile] or 0.0) for name in weights), 4)
+
+
+def format_model_weights(weights):
+    """输出可直接写进 .env 的 MODEL_WEIGHTS 字符串。"""
+    return ",".join(f"{name}:{round(float(weight), 4):g}" for name, weight in weights.items())
+
+
+def classification_quality(probabilities, y_true, threshold):
+    trade_prob = np.max(np.asarray(probabilities, dtype=float), axis=1)
+    y_pred = (trade_prob >= float(threshold)).astype(int)
+    return {
+        **_binary_metrics(np.asarray(y_true, dtype=int), y_pred),
+        "predicted_trades": int(y_pred.sum()),
+    }
+
+
+def subset_probabilities(models, raw_probabilities, X, weights, *, trend_biases, model_metadata):
+    """用缓存的逐模型原始概率按给定权重融合出 [short, long]。"""
+    replay = {name: ReplayModel(models[name], raw_probabilities[name]) for name in weights}
+    return signal_engine.weighted_predict_proba_batch(
+        replay,
+        X,
+        weights,
+        trend_biases=trend_biases,
+        model_metadata=model_metadata,
+        direction_model_weights=getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {}),
+    )
+
+
+def backtest_net_pnl(context_backtester, feature_cols, probabilities, model_metadata):
+    """用预先融合好的概率在 context_backtester 的数据段上跑一遍回测，返回净收益等摘要。"""
+    from backtest.backtest import Backtester
+
+    data = context_backtester.data.copy()
+    data["short_prob"] = probabilities[:, 0]
+    data["long_prob"] = probabilities[:, 1]
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        backtester = Backtester(
+            context_backtester.interval,
+            context_backtester.window,
+            data_dict=context_backtester.data_dict,
+            reward_risk=context_backtester.reward_risk,
+            precomputed_data=data,
+            feature_cols=feature_cols,
+            models={},
+            model_weights={},
+            model_metadata=model_metadata,
+            funding_history=context_backtester.funding_history,
+            precomputed_probabilities=True,
+            enable_csv_dump=False,
+            show_progress=False,
+            emit_diagnostics=False,
+        )
+        summary = backtester.run_backtest() or {}
+    return {
+        key: summary.get(key)
+        for key in ("net_pnl_after_costs", "profit_factor", "closed_trade_count", "max_drawdown_pct")
+    }
+
+
+def candidate_score(candidate):
+    """质量分：跑了回测时按验证段回测净收益，否则按验证段 trade F1。"""
+    backtest = candidate.get("backtest")
+    if backtest and backtest.get("net_pnl_after_costs") is not None:
+        return float(backtest["net_pnl_after_costs"])
+    return float(candidate["validation"]["trade_f1"])
+
+
+def propose_weight_set(candidates, budget_ms):
+    """在延迟预算内选质量分最高的组合，同分取延迟更低者；都超预算时退而取最快的组合。"""
+    if not candidates:
+        raise ValueError("没有可评估的模型组合")
+    within = [item for item in candidates if item["live_latency_ms"] <= float(budget_ms)]
+    if within:
+        chosen = max(within, key=lambda item: (candidate_score(item), -item["live_latency_ms"]))
+    else:
+        chosen = min(candidates, key=lambda item: item["live_latency_ms"])
+    baseline = candidates[0]
+    return {
+        "weights": chosen["weights"],
+        "model_weights_env": format_model_weights(chosen["weights"]),
+        "dropped_models": sorted(set(baseline["weights"]) - set(chosen["weights"])),
+        "live_latency_ms": chosen["live_latency_ms"],
+        "budget_ms": float(budget_ms),
+        "budget_met": bool(within),
+        "score": candidate_score(chosen),
+        "baseline_score": candidate_score(baseline),
+        "quality_loss": candidate_score(baseline) - candidate_score(chosen),
+        # 只读复核：选择已经完成，OOS 结果不回头影响选择
+        "oos_check": chosen.get("oos_check"),
+        "baseline_oos_check": baseline.get("oos_check"),
+    }
+
+
+def profile_window(context, labeled, feature_cols):
+    """一段数据上的特征、标签和 trend_bias；context 已限定到该段。"""
+    trend_biases = derive_trend_biases(
+        context.data,
+        interval=config.TREND_FILTER_INTERVAL,
+        fast_col=config.TREND_FILTER_FAST_COL,
+        slow_col=config.TREND_FILTER_SLOW_COL,
+        min_gap=config.TREND_FILTER_MIN_GAP,
+    )
+    X = context.data[feature_cols].astype(float)
+    y = labeled["target"].reindex(context.data.index)
+    return {"context": context, "X": X, "y": y, "trend_biases": trend_biases}
+
+
+def window_summary(window):
+    index = window["X"].index
+    return {
+        "start": index.min().isoformat() if len(index) else None,
+        "end": index.max().isoformat() if len(index) else None,
+        "rows": int(len(index)),
+        "labeled_rows": int(window["y"].notna().sum()),
+    }
+
+
+def build_profile_inputs(log_path, feature_cols, model_metadata):
+    """返回 {"validation": 打分用的验证段, "oos": 只读复核用的 OOS 段}，两段都按训练元数据切分。
+
+    标签在整段行情上生成后再切分，验证段末尾的标签与训练时一致，不因截断而缺失。
+    """
+    from backtest.backtest import Backtester
+    from train.train import create_labels
+
+    base_interval = config.INTERVALS[0] if config.INTERVALS else "5m"
+    with open(log_path, "a", encoding="utf-8") as file:
+        with contextlib.redirect_stdout(file):
+            context = Backtester(
+                "multi_period",
+                config.WINDOWS.get(base_interval, 1000),
+                enable_csv_dump=False,
+                show_progress=False,
+                emit_diagnostics=False,
+            )
+    labeled = create_labels(
+        context.data.copy(),
+        future_window=int(model_metadata.get("label_future_window", config.MODEL_LABEL_FUTURE_WINDOW)),
+        threshold=float(model_metadata.get("label_threshold", config.MODEL_LABEL_THRESHOLD)),
+    )
+    validation = restrict_backtester_to_validation(copy.copy(context), model_metadata)
+    oos = restrict_backtester_to_oos(copy.copy(context), model_metadata)
+    return {
+        "validation": profile_window(validation, labeled, feature_cols),
+        "oos": profile_window(oos, labeled, feature_cols),
+    }
+
+
+def evaluate_weights(models, raw_probabilities, window, weights, *, threshold, feature_cols, model_metadata, backtest=True):
+    """在一段数据上评估一组权重：trade precision/recall，以及可选的回测净收益。"""
+    probabilities = subset_probabilities(
+        models,
+        raw_probabilities,
+        window["X"],
+        weights,
+        trend_biases=window["trend_biases"],
+        model_metadata=model_metadata,
+    )
+    labeled_mask = window["y"].notna().to_numpy()
+    result = {
+        "classification": classification_quality(
+            probabilities[labeled_mask],
+            window["y"][labeled_mask].astype(int),
+            threshold,
+        ),
+    }
+    if backtest:
+        result["backtest"] = backtest_net_pnl(window["context"], feature_cols, probabilities, model_metadata)
+    return result
+
+
+def validation_in_final_train(model_metadata):
+    """最终产物是否用 train+validation 重训；旧元数据缺字段时按当前配置判断。"""
+    default = bool(getattr(config, "MODEL_FINAL_TRAIN_ON_VALIDATION", True))
+    return bool(model_metadata.get("final_train_on_validation", default))
+
+
+def score_weight_subsets(models, raw_probabilities, windows, costs, *, threshold, feature_cols, model_metadata, backtest=True):
+    """每个权重子集在验证段打分；OOS 段的同样指标只作为 oos_check 附带输出。"""
+    options = {
+        "threshold": threshold,
+        "feature_cols": feature_cols,
+        "model_metadata": model_metadata,
+        "backtest": backtest,
+    }
+    candidates = []
+    for weights in weight_subsets(config.MODEL_WEIGHTS, list(models)):
+        scored = evaluate_weights(models, raw_probabilities["validation"], windows["validation"], weights, **options)
+        candidate = {
+            "weights": weights,
+            "live_latency_ms": estimated_live_latency_ms(weights, costs),
+            "validation": scored["classification"],
+            "oos_check": evaluate_weights(models, raw_probabilities["oos"], windows["oos"], weights, **options),
+        }
+        if "backtest" in scored:
+            candidate["backtest"] = scored["backtest"]
+        candidates.append(candidate)
+
+    full = candidates[0]
+    for candidate in candidates[1:]:
+        candidate["marginal_vs_full"] = {
+            "score": candidate_score(candidate) - candidate_score(full),
+            "trade_precision": candidate["validation"]["trade_precision"] - full["validation"]["trade_precision"],
+            "trade_recall": candidate["validation"]["trade_recall"] - full["validation"]["trade_recall"],
+        }
+    return candidates
+
+
+def run_profile(args):
+    import joblib
+
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    log_path = os.path.join(output_dir, f"profile_{run_id}.log")
+
+    feature_cols = list(joblib.load(os.path.join(BASE_DIR, config.FEATURE_LIST_PATH)))
+    model_metadata = read_json(os.path.join(BASE_DIR, config.TRAINING_METADATA_PATH), {})
+    windows = build_profile_inputs(log_path, feature_cols, model_metadata)
+    validation, oos = windows["validation"], windows["oos"]
+
+    compiled = bool(getattr(config, "LIVE_COMPILED_INFERENCE", True))
+    in_sample = validation_in_final_train(model_metadata)
+    models, costs = {}, {}
+    raw_probabilities = {"validation": {}, "oos": {}}
+    for name, rel_path in config.MODEL_PATHS.items():
+        models[name], costs[name] = profile_model_cost(
+            name,
+            os.path.join(BASE_DIR, rel_path),
+            feature_cols,
+            validation["X"],
+            compiled=compiled,
+            latency_rows=args.latency_rows,
+        )
+        if in_sample:
+            continue
+        for window_name, window in windows.items():
+            raw_probabilities[window_name][name] = np.asarray(models[name].predict_proba(window["X"]), dtype=float)
+
+    threshold = walk_forward_diagnostic_threshold()
+    report = {
+        "created_at": utc_now_iso(),
+        "symbol": config.SYMBOL,
+        "scoring_window": window_summary(validation),
+        "oos_check_window": window_summary(oos),
+        "validation_in_final_train": in_sample,
+        "decision_threshold": threshold,
+        "compiled_live_inference": compiled,
+        "model_costs": costs,
+    }
+    if in_sample:
+        # 线上模型用 train+validation 重训过，验证段对它们是样本内：只报告推理成本，不给权重建议
+        report["candidates"] = []
+        report["proposal"] = {
+            "skipped": True,
+            "reason": "validation_in_final_train",
+            "detail": "线上模型训练覆盖了验证段，子集打分不是样本外；需 MODEL_FINAL_TRAIN_ON_VALIDATION=0 训练的产物",
+        }
+    else:
+        candidates = score_weight_subsets(
+            models,
+            raw_probabilities,
+            windows,
+            costs,
+            threshold=threshold,
+            feature_cols=feature_cols,
+            model_metadata=model_metadata,
+            backtest=not args.skip_backtest,
+        )
+        budget_ms = float(args.budget_ms if args.budget_ms is not None else config.LIVE_INFERENCE_LATENCY_BUDGET_MS)
+        report["candidates"] = candidates
+        report["proposal"] = propose_weight_set(candidates, budget_ms)
+    report_path = os.path.join(output_dir, f"profile_{run_id}.json")
+    write_json_atomic(report_path, report)
+    return report, report_path
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="测量各模型推理成本与边际贡献，按实盘延迟预算给出 MODEL_WEIGHTS 建议")
+    parser.add_argument("--latency-rows", type=int, default=300, help="单行推理延迟的采样行数")
+    parser.add_argument("--budget-ms", type=float, default=None, help="实盘单 bar 推理延迟预算，默认 LIVE_INFERENCE_LATENCY_BUDGET_MS")
+    parser.add_argument("--skip-backtest", action="store_true", help="只看 precision/recall，不跑验证段与 OOS 复核回测")
+    parser.add_argument("--output-dir", default=REPORT_DIR)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    report, report_path = run_profile(args)
+    print(json.dumps({"report": report_path, "model_costs": report["model_costs"], "proposal": report["proposal"]}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,12 @@
 import argparse
 import contextlib
-import io
 import json
 import math
 import os
 import shutil
 import subprocess
 import sys
+import tempfile
 import time
 from datetime import datetime, timezone
 
@@ -14,7 +14,7 @@ import joblib
 import pandas as pd
 
 from config import config
-from utils.utils import BASE_DIR, LOGS_DIR, notify_important
+from utils.utils import BASE_DIR, LOGS_DIR, notify_important, sha256_file
 
 
 LOCK_PATH = os.path.join(LOGS_DIR, "model_retrain.lock")
@@ -31,6 +31,12 @@ HARD_MIN_PROFIT_FACTOR = max(
     float(getattr(config, "MODEL_RETRAIN_HARD_MIN_PROFIT_FACTOR", ABSOLUTE_MIN_PROFIT_FACTOR)),
 )
 IMPROVEMENT_EPSILON = 1e-9
+WALK_FORWARD_SEED_FILE = "walk_forward_seed.joblib"
+# 只决定拉取多少行情的配置；训练切片内容已进入 fold 模型缓存 key，改它们（如 strict OOS 的 --windows）不应让 fold 模型失效
+FOLD_MODEL_CACHE_IGNORED_CONFIG = {"WINDOWS"}
+
+# 子进程内的 fold 共用输入，由 _init_walk_forward_worker 加载一次。
+_walk_forward_worker_state = None
 
 
 def utc_now_iso():
@@ -89,6 +95,7 @@ def artifact_paths():
         paths.append(os.path.join(BASE_DIR, rel_path))
     paths.append(os.path.join(BASE_DIR, config.FEATURE_LIST_PATH))
     paths.append(os.path.join(BASE_DIR, config.TRAINING_METADATA_PATH))
+    paths.append(os.path.join(BASE_DIR, config.MODEL_TRAIN_INCREMENTAL_STATE_PATH))
     return sorted(set(paths))
 
 
@@ -209,11 +216,13 @@ def validate_artifacts():
 
 def load_model_bundle(root_dir):
     models = {}
+    artifact_hashes = {}
     for name, rel_path in config.MODEL_PATHS.items():
         path = os.path.join(root_dir, rel_path)
         if not os.path.exists(path):
             raise RuntimeError(f"缺少模型文件: {path}")
         models[name] = joblib.load(path)
+        artifact_hashes[name] = sha256_file(path)
 
     feature_path = os.path.join(root_dir, config.FEATURE_LIST_PATH)
     if not os.path.exists(feature_path):
@@ -229,6 +238,7 @@ def load_model_bundle(root_dir):
         "feature_cols": joblib.load(feature_path),
         "metadata": metadata,
         "root_dir": root_dir,
+        "artifact_hashes": artifact_hashes,
     }
 
 
@@ -251,6 +261,37 @@ def run_subprocess(args, log_file):
         ).returncode
 
 
+def training_pipeline_report_path():
+    path = getattr(config, "MODEL_PIPELINE_REPORT_PATH", "logs/training_pipeline_report.json")
+    return path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+
+
+def read_training_pipeline_report(log_file):
+    """读取训练子进程写出的阶段耗时/缓存命中报告，并附加到重训日志。"""
+    report = read_json(training_pipeline_report_path(), None)
+    if not report:
+        return None
+    append_log_header(log_file, "training_pipeline")
+    with open(log_file, "a", encoding="utf-8") as file:
+        file.write(
+            f"total={float(report.get('total_seconds', 0.0)):.2f}s "
+            f"hits={report.get('cache_hits', 0)} misses={report.get('cache_misses', 0)}\n"
+        )
+        for item in report.get("stages") or []:
+            file.write(
+                f"{item.get('stage')}: {float(item.get('seconds', 0.0)):.2f}s cache={item.get('cache')}\n"
+            )
+    return {
+        "total_seconds": report.get("total_seconds"),
+        "cache_hits": report.get("cache_hits"),
+        "cache_misses": report.get("cache_misses"),
+        "stages": {
+            item.get("stage"): {"seconds": item.get("seconds"), "cache": item.get("cache")}
+            for item in report.get("stages") or []
+        },
+    }
+
+
 def run_backtest_validation(log_file, backup_dir=None):
     from backtest.backtest import Backtester
 
@@ -325,6 +366,23 @@ def filter_funding_history(funding_history, start_ts, end_ts=None):
     return filtered.copy()
 
 
+def _restrict_backtester_rows(context_backtester, rows):
+    from backtest.funding import FundingSchedule
+
+    context_backtester.data = rows
+    context_backtester.price_series = rows["5m_close"]
+    context_backtester.funding_history = filter_funding_history(
+        context_backtester.funding_history,
+        rows.index.min(),
+        rows.index.max(),
+    )
+    context_backtester.funding_schedule = FundingSchedule.build(
+        context_backtester.funding_history,
+        context_backtester.price_series,
+    )
+    return context_backtester
+
+
 def restrict_backtester_to_oos(context_backtester, metadata):
     if not metadata:
         raise RuntimeError("训练元数据缺失，无法执行严格样本外回测")
@@ -339,13 +397,24 @@ def restrict_backtester_to_oos(context_backtester, metadata):
     if len(oos_data) < min_oos_rows:
         raise RuntimeError(f"OOS回测样本不足: rows={len(oos_data)} < {min_oos_rows}")
 
-    context_backtester.data = oos_data
-    context_backtester.price_series = oos_data["5m_close"]
-    context_backtester.funding_history = filter_funding_history(
-        context_backtester.funding_history,
-        oos_data.index.min(),
-    )
-    return context_backtester
+    return _restrict_backtester_rows(context_backtester, oos_data)
+
+
+def restrict_backtester_to_validation(context_backtester, metadata):
+    """只保留训练元数据的验证段，供模型组合等选择使用；选择不能看 OOS 段。"""
+    if not metadata:
+        raise RuntimeError("训练元数据缺失，无法限定验证段")
+    missing = [key for key in ("validation_start", "validation_end") if not metadata.get(key)]
+    if missing:
+        raise RuntimeError(f"训练元数据缺少验证段字段: {','.join(missing)}")
+
+    index = context_backtester.data.index
+    validation_start = coerce_timestamp_for_index(metadata["validation_start"], index)
+    validation_end = coerce_timestamp_for_index(metadata["validation_end"], index)
+    validation_data = context_backtester.data.loc[(index >= validation_start) & (index <= validation_end)].copy()
+    if validation_data.empty:
+        raise RuntimeError("验证段回测样本为空")
+    return _restrict_backtester_rows(context_backtester, validation_data)
 
 
 def build_walk_forward_slices(index, metadata):
@@ -671,6 +740,72 @@ def walk_forward_estimator_config():
     }
 
 
+def walk_forward_fold_model_cache():
+    from train.pipeline import TrainingPipeline
+
+    return TrainingPipeline(
+        getattr(config, "MODEL_WALK_FORWARD_FOLD_CACHE_DIR", "models/walk_forward_fold_cache"),
+        enabled=bool(getattr(config, "MODEL_WALK_FORWARD_FOLD_CACHE_ENABLED", True)),
+        keep=int(getattr(config, "MODEL_WALK_FORWARD_FOLD_CACHE_KEEP", 64)),
+    )
+
+
+def walk_forward_fold_model_inputs(train_df, feature_cols, metadata, estimator_config):
+    """fold 模型缓存 key 的输入：训练切片区间与内容、是否共享分箱、标签参数、估计器参数、特征列 key 和训练相关配置。"""
+    from core.prediction_cache import feature_cache_key
+    from train.binned_dataset import shared_binning_enabled
+    from train.pipeline import config_fingerprint, fingerprint_value
+
+    metadata = metadata or {}
+    shared_binning = shared_binning_enabled()
+    return {
+        "train_start": str(train_df.index.min()),
+        "train_end": str(train_df.index.max()),
+        "train_rows": int(len(train_df)),
+        "train_data": fingerprint_value(train_df),
+        # 共享分箱的切点只由本 fold 训练行决定，train_data 已覆盖；这里只区分是否开启
+        "binning": {"shared": shared_binning},
+        "label": {
+            "future_window": int(metadata.get("label_future_window", config.MODEL_LABEL_FUTURE_WINDOW)),
+            "threshold": float(metadata.get("label_threshold", config.MODEL_LABEL_THRESHOLD)),
+        },
+        "estimator_config": estimator_config or {},
+        "features": feature_cache_key(feature_cols),
+        "config": {
+            name: value
+            for name, value in config_fingerprint().items()
+            if name.split(":")[-1] not in FOLD_MODEL_CACHE_IGNORED_CONFIG
+        },
+    }
+
+
+def train_walk_forward_fold_models(train_df, feature_cols, metadata, estimator_config):
+    """训练单个 fold 的模型；训练切片、标签与估计器参数都未变化时直接取回上次拟合的模型。
+
+    共享分箱开启时只用本 fold 的训练行分箱（在 train_direction_quality_bundle 内构建），不看验证段及之后的行。
+
+    返回 (models, 缓存记录)，缓存记录的 cache 为 hit / miss / off。
+    """
+    from train.train import train_direction_quality_bundle
+
+    def _train():
+        models, _, _, _, _ = train_direction_quality_bundle(
+            train_df[feature_cols].astype(float),
+            train_df["target"],
+            sample_context=train_df,
+            estimator_config=estimator_config,
+        )
+        return models
+
+    cache = walk_forward_fold_model_cache()
+    models = cache.run(
+        "walk_forward_fold_models",
+        _train,
+        inputs=walk_forward_fold_model_inputs(train_df, feature_cols, metadata, estimator_config),
+    )
+    return models, cache.records[-1].summary()
+
+
 def write_walk_forward_stage_timing(log_file, fold_number, stage, elapsed_sec):
     with open(log_file, "a", encoding="utf-8") as file:
         file.write(
@@ -1092,6 +1227,29 @@ def _threshold_sweep_early_stop_min_profit_factor():
     return max(HARD_MIN_PROFIT_FACTOR, configured)
 
 
+def _threshold_sweep_search():
+    search = str(getattr(config, "MODEL_WALK_FORWARD_THRESHOLD_SWEEP_SEARCH", "grid") or "grid").strip().lower()
+    return "adaptive" if search == "adaptive" else "grid"
+
+
+def _threshold_sweep_adaptive_config():
+    defaults = {
+        "max_candidates": ("MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_MAX_CANDIDATES", 192, 1),
+        "eta": ("MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_ETA", 3, 2),
+        "rungs": ("MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_RUNGS", 3, 1),
+        "min_rows": ("MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_MIN_ROWS", 288, 0),
+        "proposals": ("MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_PROPOSALS", 8, 0),
+    }
+    resolved = {}
+    for name, (key, default, minimum) in defaults.items():
+        try:
+            value = int(getattr(config, key, default))
+        except (TypeError, ValueError):
+            value = default
+        resolved[name] = max(minimum, value)
+    return resolved
+
+
 def _current_threshold_sweep_overrides():
     min_target_ratio = float(getattr(config, "MIN_SIGNAL_TARGET_RATIO", 0.0))
     return {
@@ -1160,6 +1318,34 @@ def downsample_threshold_sweep_candidates(candidates, limit):
     return [candidates[index] for index in sorted(selected)[:limit]]
 
 
+def threshold_sweep_overrides(threshold_long, threshold_short, gap, min_target_ratio, position_center):
+    backtest_min_adjust = min(
+        float(config.MIN_ADJUST_AMOUNT),
+        float(config.INITIAL_BALANCE) * float(min_target_ratio),
+    )
+    return {
+        "THRESHOLD_LONG": float(threshold_long),
+        "THRESHOLD_SHORT": float(threshold_short),
+        "SIGNAL_MIN_PROB_DIFF": float(gap),
+        "MIN_SIGNAL_TARGET_RATIO": float(min_target_ratio),
+        "REGIME_RANGE_MIN_SIGNAL_TARGET_RATIO": float(min_target_ratio),
+        "REGIME_HIGH_VOL_MIN_SIGNAL_TARGET_RATIO": float(min_target_ratio),
+        "POSITION_PROBABILITY_CENTER": float(position_center),
+        "BACKTEST_MIN_ADJUST_AMOUNT": float(backtest_min_adjust),
+    }
+
+
+def derive_threshold_sweep_overrides(overrides):
+    """自适应搜索取中点得到的候选：按网格同样的规则重新推导 regime 最小目标比例与回测最小调仓金额。"""
+    return threshold_sweep_overrides(
+        overrides["THRESHOLD_LONG"],
+        overrides["THRESHOLD_SHORT"],
+        overrides["SIGNAL_MIN_PROB_DIFF"],
+        overrides["MIN_SIGNAL_TARGET_RATIO"],
+        overrides["POSITION_PROBABILITY_CENTER"],
+    )
+
+
 def build_walk_forward_threshold_candidates():
     current = _current_threshold_sweep_overrides()
     thresholds = parse_float_candidates(
@@ -1202,20 +1388,7 @@ def build_walk_forward_threshold_candidates():
         for gap in gaps:
             for min_target_ratio in min_target_ratios:
                 for position_center in position_centers:
-                    backtest_min_adjust = min(
-                        float(config.MIN_ADJUST_AMOUNT),
-                        float(config.INITIAL_BALANCE) * float(min_target_ratio),
-                    )
-                    overrides = {
-                        "THRESHOLD_LONG": float(threshold),
-                        "THRESHOLD_SHORT": float(threshold),
-                        "SIGNAL_MIN_PROB_DIFF": float(gap),
-                        "MIN_SIGNAL_TARGET_RATIO": float(min_target_ratio),
-                        "REGIME_RANGE_MIN_SIGNAL_TARGET_RATIO": float(min_target_ratio),
-                        "REGIME_HIGH_VOL_MIN_SIGNAL_TARGET_RATIO": float(min_target_ratio),
-                        "POSITION_PROBABILITY_CENTER": float(position_center),
-                        "BACKTEST_MIN_ADJUST_AMOUNT": float(backtest_min_adjust),
-                    }
+                    overrides = threshold_sweep_overrides(threshold, threshold, gap, min_target_ratio, position_center)
                     add_candidate(
                         (
                             f"tl{threshold:.2f}_ts{threshold:.2f}_gap{gap:.2f}_"
@@ -1223,20 +1396,13 @@ def build_walk_forward_threshold_candidates():
                         ),
                         overrides,
                     )
-    return downsample_threshold_sweep_candidates(candidates, _threshold_sweep_candidate_limit())
-
-
-def apply_config_overrides(overrides):
-    originals = {}
-    for key, value in overrides.items():
-        originals[key] = getattr(config, key)
-        setattr(config, key, value)
-    return originals
-
-
-def restore_config_overrides(originals):
-    for key, value in originals.items():
-        setattr(config, key, value)
+    # 自适应搜索先在短窗口上筛选，能负担更大的网格
+    limit = (
+        _threshold_sweep_adaptive_config()["max_candidates"]
+        if _threshold_sweep_search() == "adaptive"
+        else _threshold_sweep_candidate_limit()
+    )
+    return downsample_threshold_sweep_candidates(candidates, limit)
 
 
 def compact_walk_forward_candidate_summary(summary):
@@ -1345,30 +1511,108 @@ def threshold_sweep_candidate_is_good_enough(summary):
     )
 
 
+def _compact_backtest_result(_backtester, summary):
+    return compact_walk_forward_candidate_summary(summary or {})
+
+
 def run_backtest_with_overrides(backtester_kwargs, overrides):
-    from backtest.backtest import Backtester
+    from backtest.sweep import run_sweep_candidate
+
+    return run_sweep_candidate(backtester_kwargs, overrides, summarize=_compact_backtest_result)
+
+
+def threshold_sweep_evaluator():
+    """按 BACKTEST_SWEEP_ENGINE 返回与 iter_sweep 同签名的评估函数：process=进程池逐候选回测，lockstep=同步推进。
+
+    每次调用按传入的种子数据打开回测结果缓存，命中的候选不再回测；产出的 summary 带 result_cache=hit/miss。
+    """
+    from backtest.lockstep_engine import iter_lockstep_sweep
+    from backtest.result_cache import BacktestResultStore
+    from backtest.sweep import iter_sweep
+
+    lockstep = str(getattr(config, "BACKTEST_SWEEP_ENGINE", "process")).strip().lower() == "lockstep"
+
+    def evaluate(backtester_kwargs, candidates):
+        cache = BacktestResultStore.open_scope(
+            backtester_kwargs,
+            kind="walk_forward_compact",
+            engine="lockstep" if lockstep else "backtester",
+            precomputed_probabilities=True,
+        )
+        if lockstep:
+            sweep = iter_lockstep_sweep(backtester_kwargs, candidates, summarize=_compact_backtest_result, cache=cache)
+        else:
+            sweep = iter_sweep(backtester_kwargs, candidates, run=run_backtest_with_overrides, cache=cache)
+        try:
+            for name, overrides, summary in sweep:
+                if cache is not None:
+                    summary["result_cache"] = cache.statuses.get(name)
+                yield name, overrides, summary
+        finally:
+            sweep.close()
+
+    return evaluate
 
-    backtester_kwargs = dict(backtester_kwargs)
-    use_precomputed_probabilities = bool(backtester_kwargs.pop("use_precomputed_probabilities", False))
-    originals = apply_config_overrides(overrides)
-    try:
-        with contextlib.redirect_stdout(io.StringIO()):
-            backtester = Backtester(**backtester_kwargs)
-            original_predict_row = backtester._predict_row
-            if use_precomputed_probabilities:
-                backtester._predict_row = lambda row: (row["long_prob"], row["short_prob"])
-            try:
-                summary = backtester.run_backtest()
-            finally:
-                backtester._predict_row = original_predict_row
-        return compact_walk_forward_candidate_summary(summary or {})
-    finally:
-        restore_config_overrides(originals)
+
+def threshold_sweep_cache_counts(results):
+    return {
+        "hits": sum(1 for item in results if item.get("result_cache") == "hit"),
+        "misses": sum(1 for item in results if item.get("result_cache") == "miss"),
+    }
+
+
+def run_adaptive_threshold_sweep(backtester_kwargs, candidates):
+    from backtest.adaptive_search import successive_halving_sweep
+
+    adaptive = _threshold_sweep_adaptive_config()
+    search = successive_halving_sweep(
+        backtester_kwargs,
+        candidates,
+        score=threshold_sweep_score,
+        evaluate=threshold_sweep_evaluator(),
+        eta=adaptive["eta"],
+        rungs=adaptive["rungs"],
+        min_rows=adaptive["min_rows"],
+        proposals=adaptive["proposals"],
+        derive=derive_threshold_sweep_overrides,
+        keep=("current",),
+    )
+    ranked = search["results"]
+    top_n = _threshold_sweep_top_n()
+    return {
+        "enabled": True,
+        "search": "adaptive",
+        "candidate_count": int(len(candidates)),
+        "evaluated_count": int(len(search["screening_summaries"])),
+        "stopped_early": False,
+        "early_stop_reason": None,
+        "result_cache": threshold_sweep_cache_counts(ranked),
+        "adaptive": {
+            key: search[key]
+            for key in (
+                "eta",
+                "rung_rows",
+                "rungs",
+                "proposed_count",
+                "evaluations",
+                "bar_evaluations",
+                "full_grid_bar_evaluations",
+                "full_window_equivalents",
+                "saved_pct",
+            )
+        },
+        "top_n": int(top_n),
+        "current": next((item for item in ranked if item["name"] == "current"), None),
+        "best": ranked[0] if ranked else None,
+        "recommended": ranked[:top_n],
+    }
 
 
 def run_walk_forward_threshold_sweep(backtester_kwargs, candidates):
     if not candidates:
         return {"enabled": False, "reason": "no_candidates", "candidate_count": 0}
+    if _threshold_sweep_search() == "adaptive":
+        return run_adaptive_threshold_sweep(backtester_kwargs, candidates)
 
     results = []
     best = None
@@ -1380,12 +1624,13 @@ def run_walk_forward_threshold_sweep(backtester_kwargs, candidates):
     early_stop_enabled = _threshold_sweep_early_stop_enabled()
     early_stop_patience = _threshold_sweep_early_stop_patience()
 
-    for candidate in candidates:
-        summary = run_backtest_with_overrides(backtester_kwargs, candidate["overrides"])
-        summary["name"] = candidate["name"]
-        summary["overrides"] = candidate["overrides"]
+    # 候选在进程池中并行回测（或 lockstep 同步推进），结果仍按候选顺序消费，提前停止的判定与执行方式无关
+    sweep = threshold_sweep_evaluator()(backtester_kwargs, candidates)
+    for name, overrides, summary in sweep:
+        summary["name"] = name
+        summary["overrides"] = overrides
         results.append(summary)
-        if candidate.get("name") == "current":
+        if name == "current":
             current = summary
 
         score = threshold_sweep_score(summary)
@@ -1408,16 +1653,19 @@ def run_walk_forward_threshold_sweep(backtester_kwargs, candidates):
                 f"no_improvement_patience_{early_stop_patience}_after_good_candidate"
             )
             break
+    sweep.close()
 
     ranked = sorted(results, key=threshold_sweep_score, reverse=True)
     top_n = _threshold_sweep_top_n()
     best = ranked[0] if ranked else None
     return {
         "enabled": True,
+        "search": "grid",
         "candidate_count": int(len(candidates)),
         "evaluated_count": int(len(results)),
         "stopped_early": bool(stopped_early),
         "early_stop_reason": early_stop_reason,
+        "result_cache": threshold_sweep_cache_counts(results),
         "early_stop_config": {
             "enabled": bool(early_stop_enabled),
             "patience": int(early_stop_patience),
@@ -1446,6 +1694,7 @@ def write_walk_forward_threshold_sweep(log_file, fold_number, sweep_summary):
             f"candidates={sweep_summary.get('candidate_count', 0)} "
             f"evaluated={sweep_summary.get('evaluated_count', 0)} "
             f"stopped_early={int(bool(sweep_summary.get('stopped_early')))} "
+            f"cache_hits={(sweep_summary.get('result_cache') or {}).get('hits', 0)} "
             f"best={best.get('name')} "
             f"closed={best.get('closed_trade_count', 0)} "
             f"net={float(best.get('net_pnl_after_costs') or 0.0):.2f} "
@@ -1477,7 +1726,7 @@ def write_walk_forward_threshold_sweep(log_file, fold_number, sweep_summary):
 
 def add_walk_forward_probabilities(data, feature_cols, fold_models, model_weights, metadata, direction_model_weights=None):
     from core import signal_engine
-    from core.trend_filter import derive_trend_context
+    from core.trend_filter import derive_trend_biases
 
     predicted = data.copy()
     if predicted.empty:
@@ -1486,16 +1735,13 @@ def add_walk_forward_probabilities(data, feature_cols, fold_models, model_weight
         return predicted
 
     X = predicted[feature_cols].astype(float)
-    trend_biases = []
-    for _, row in predicted.iterrows():
-        trend_context = derive_trend_context(
-            row,
-            interval=config.TREND_FILTER_INTERVAL,
-            fast_col=config.TREND_FILTER_FAST_COL,
-            slow_col=config.TREND_FILTER_SLOW_COL,
-            min_gap=config.TREND_FILTER_MIN_GAP,
-        )
-        trend_biases.append(str(trend_context.get("trend_bias") or "neutral"))
+    trend_biases = derive_trend_biases(
+        predicted,
+        interval=config.TREND_FILTER_INTERVAL,
+        fast_col=config.TREND_FILTER_FAST_COL,
+        slow_col=config.TREND_FILTER_SLOW_COL,
+        min_gap=config.TREND_FILTER_MIN_GAP,
+    )
 
     avg_pred = signal_engine.weighted_predict_proba_batch(
         fold_models,
@@ -1640,6 +1886,348 @@ def walk_forward_fold_failure_reason(fold_summary):
     return None
 
 
+def resolve_walk_forward_workers(fold_count, workers=None):
+    if workers is None:
+        workers = int(getattr(config, "MODEL_WALK_FORWARD_WORKERS", 0) or 0)
+    workers = int(workers or 0)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, int(fold_count)))
+
+
+def walk_forward_fold_context(
+    context_backtester,
+    labeled_data,
+    metadata,
+    feature_cols,
+    *,
+    estimator_config=None,
+    threshold_candidates=(),
+    include_trend_baseline=False,
+):
+    """各 fold 共用的只读输入；并行时整体用 joblib 落盘一次，子进程以内存映射加载。"""
+    return {
+        "labeled_data": labeled_data,
+        "data": context_backtester.data,
+        "data_dict": context_backtester.data_dict,
+        "funding_history": context_backtester.funding_history,
+        "interval": context_backtester.interval,
+        "window": context_backtester.window,
+        "reward_risk": context_backtester.reward_risk,
+        "feature_cols": list(feature_cols),
+        "metadata": metadata,
+        "estimator_config": estimator_config,
+        "threshold_candidates": list(threshold_candidates or []),
+        "include_trend_baseline": bool(include_trend_baseline),
+    }
+
+
+def _walk_forward_worker_config(workers):
+    """子进程沿用父进程 config，并按 fold 并发数均分训练线程；fold 内的阈值扫描改为串行，避免进程数相乘。"""
+    from backtest.sweep import config_snapshot
+    from train.parallel_fit import resolve_cpu_budget
+
+    values = config_snapshot()
+    values["MODEL_TRAIN_CPU_BUDGET"] = max(1, resolve_cpu_budget() // max(1, int(workers)))
+    values["BACKTEST_SWEEP_WORKERS"] = 1
+    return values
+
+
+def _init_walk_forward_worker(seed_path, config_values):
+    global _walk_forward_worker_state
+
+    for key, value in config_values.items():
+        setattr(config, key, value)
+    _walk_forward_worker_state = joblib.load(seed_path, mmap_mode="r")
+
+
+def _run_walk_forward_fold_in_worker(run, fold, log_file):
+    return run(_walk_forward_worker_state, fold, log_file)
+
+
+def _append_file(log_file, path):
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as source, open(log_file, "a", encoding="utf-8") as target:
+        shutil.copyfileobj(source, target)
+
+
+def iter_walk_forward_folds(shared, slices, log_file, *, run=None, workers=None, stop=None):
+    """按 fold 顺序逐个产出 (fold, fold_summary)。
+
+    run(shared, fold, log_file) 执行单个 fold，默认 run_walk_forward_fold；进程池模式下它必须能被 pickle。
+    workers<=1 或只有一个 fold 时在当前进程串行执行，日志直接写入 log_file；并行时每个 fold 先写各自的临时日志，
+    产出该 fold 时再按顺序追加到 log_file。stop(fold_summary) 为真或 fold 抛错时取消编号更大、尚未开始的 fold，
+    已在运行的 fold 会跑完；调用方停止消费后剩余任务同样被取消。
+    """
+    slices = list(slices)
+    if not slices:
+        return
+    run = run or run_walk_forward_fold
+    workers = resolve_walk_forward_workers(len(slices), workers)
+    if workers <= 1:
+        for fold in slices:
+            yield fold, run(shared, fold, log_file)
+        return
+
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    with tempfile.TemporaryDirectory(prefix="walk_forward_") as directory:
+        seed_path = os.path.join(directory, WALK_FORWARD_SEED_FILE)
+        joblib.dump(dict(shared), seed_path)
+        fold_logs = [os.path.join(directory, f"fold_{position}.log") for position in range(len(slices))]
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_walk_forward_worker,
+            initargs=(seed_path, _walk_forward_worker_config(workers)),
+        )
+        try:
+            futures = [
+                executor.submit(_run_walk_forward_fold_in_worker, run, fold, fold_log)
+                for fold, fold_log in zip(slices, fold_logs)
+            ]
+            positions = {future: position for position, future in enumerate(futures)}
+            pending = set(futures)
+            for position, fold in enumerate(slices):
+                while not futures[position].done():
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        failed = future.cancelled() or future.exception() is not None
+                        if failed or (stop is not None and stop(future.result())):
+                            for later in futures[positions[future] + 1:]:
+                                later.cancel()
+                _append_file(log_file, fold_logs[position])
+                yield fold, futures[position].result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def run_walk_forward_fold(shared, fold, log_file):
+    """训练并回测单个 walk-forward fold，返回该 fold 的 summary；shared 为 walk_forward_fold_context 的结果，只读。"""
+    from backtest.backtest import Backtester
+
+    labeled_data = shared["labeled_data"]
+    data = shared["data"]
+    feature_cols = shared["feature_cols"]
+    metadata = shared["metadata"]
+
+    fold_started_at = time.monotonic()
+    train_df = labeled_data.iloc[fold["train_start_pos"]:fold["train_end_pos"]].copy()
+    validation_df = labeled_data.iloc[
+        fold["validation_start_pos"]:fold["validation_end_pos"]
+    ].copy()
+    if train_df.empty or validation_df.empty:
+        raise RuntimeError(f"walk-forward fold={fold['fold']} 样本为空")
+
+    stage_started_at = time.monotonic()
+    fold_models, fold_model_cache = train_walk_forward_fold_models(
+        train_df,
+        feature_cols,
+        metadata,
+        shared["estimator_config"],
+    )
+    train_elapsed_sec = time.monotonic() - stage_started_at
+    with open(log_file, "a", encoding="utf-8") as file:
+        file.write(
+            "walk_forward_fold_model_cache "
+            f"fold={fold['fold']} status={fold_model_cache['cache']} key={fold_model_cache['key']}\n"
+        )
+    write_walk_forward_stage_timing(
+        log_file,
+        fold["fold"],
+        "train_models",
+        train_elapsed_sec,
+    )
+    fold_data = data.loc[
+        (data.index >= validation_df.index.min()) &
+        (data.index <= validation_df.index.max())
+    ].copy()
+    fold_funding_history = filter_funding_history(
+        shared["funding_history"],
+        fold_data.index.min(),
+        fold_data.index.max(),
+    )
+    stage_started_at = time.monotonic()
+    fold_predicted_data = add_walk_forward_probabilities(
+        fold_data,
+        feature_cols,
+        fold_models,
+        config.MODEL_WEIGHTS,
+        metadata,
+        direction_model_weights=getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {}),
+    )
+    probabilities_elapsed_sec = time.monotonic() - stage_started_at
+    write_walk_forward_stage_timing(
+        log_file,
+        fold["fold"],
+        "precompute_probabilities",
+        probabilities_elapsed_sec,
+    )
+
+    stage_started_at = time.monotonic()
+    fold_diagnostics = build_walk_forward_fold_diagnostics(
+        fold,
+        train_df,
+        validation_df,
+        feature_cols,
+        fold_models,
+        config.MODEL_WEIGHTS,
+        metadata,
+        precomputed_probabilities=fold_predicted_data[["long_prob", "short_prob"]],
+        include_model_diagnostics=bool(
+            getattr(config, "MODEL_WALK_FORWARD_MODEL_DIAGNOSTICS", False)
+        ),
+        direction_model_weights=getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {}),
+    )
+    diagnostics_elapsed_sec = time.monotonic() - stage_started_at
+    write_walk_forward_stage_timing(
+        log_file,
+        fold["fold"],
+        "diagnostics",
+        diagnostics_elapsed_sec,
+    )
+    write_walk_forward_fold_diagnostics(log_file, fold_diagnostics)
+
+    append_log_header(log_file, f"walk_forward_fold_{fold['fold']}")
+    stage_started_at = time.monotonic()
+    with open(log_file, "a", encoding="utf-8") as file:
+        file.write(
+            "fold_range "
+            f"fold={fold['fold']} train_rows={len(train_df)} validation_rows={len(fold_data)} "
+            f"validation_start={validation_df.index.min().isoformat()} "
+            f"validation_end={validation_df.index.max().isoformat()}\n"
+        )
+        with contextlib.redirect_stdout(file):
+            backtester = Backtester(
+                shared["interval"],
+                shared["window"],
+                data_dict=shared["data_dict"],
+                reward_risk=shared["reward_risk"],
+                precomputed_data=fold_predicted_data,
+                feature_cols=feature_cols,
+                models=fold_models,
+                model_weights=config.MODEL_WEIGHTS,
+                model_metadata=metadata,
+                funding_history=fold_funding_history,
+                precomputed_probabilities=True,
+                enable_csv_dump=False,
+                show_progress=False,
+                emit_diagnostics=False,
+            )
+            fold_summary = backtester.run_backtest()
+    backtest_elapsed_sec = time.monotonic() - stage_started_at
+    write_walk_forward_stage_timing(
+        log_file,
+        fold["fold"],
+        "backtest_current",
+        backtest_elapsed_sec,
+    )
+
+    if not fold_summary:
+        raise RuntimeError(f"walk-forward fold={fold['fold']} 未返回 summary")
+    if shared["include_trend_baseline"]:
+        baseline_data = add_trend_baseline_probabilities(fold_data)
+        stage_started_at = time.monotonic()
+        with open(log_file, "a", encoding="utf-8") as file:
+            with contextlib.redirect_stdout(file):
+                baseline_backtester = Backtester(
+                    shared["interval"],
+                    shared["window"],
+                    data_dict=shared["data_dict"],
+                    reward_risk=shared["reward_risk"],
+                    precomputed_data=baseline_data,
+                    feature_cols=feature_cols,
+                    models=fold_models,
+                    model_weights=config.MODEL_WEIGHTS,
+                    model_metadata=metadata,
+                    funding_history=fold_funding_history,
+                    precomputed_probabilities=True,
+                    enable_csv_dump=False,
+                    show_progress=False,
+                    emit_diagnostics=False,
+                )
+                trend_baseline_summary = baseline_backtester.run_backtest()
+        if not trend_baseline_summary:
+            raise RuntimeError(
+                f"walk-forward fold={fold['fold']} 趋势基线未返回 summary"
+            )
+        trend_baseline_summary.update({
+            "fold": fold["fold"],
+            "validation_start": validation_df.index.min().isoformat(),
+            "validation_end": validation_df.index.max().isoformat(),
+        })
+        fold_summary["trend_baseline_summary"] = trend_baseline_summary
+        write_walk_forward_stage_timing(
+            log_file,
+            fold["fold"],
+            "trend_baseline",
+            time.monotonic() - stage_started_at,
+        )
+    threshold_sweep = None
+    threshold_sweep_elapsed_sec = 0.0
+    if _threshold_sweep_enabled() and shared["threshold_candidates"] and fold_predicted_data is not None:
+        stage_started_at = time.monotonic()
+        threshold_sweep = run_walk_forward_threshold_sweep(
+            {
+                "interval": shared["interval"],
+                "window": shared["window"],
+                "data_dict": shared["data_dict"],
+                "reward_risk": shared["reward_risk"],
+                "precomputed_data": fold_predicted_data,
+                "feature_cols": feature_cols,
+                "models": fold_models,
+                "model_weights": config.MODEL_WEIGHTS,
+                "model_metadata": metadata,
+                "funding_history": fold_funding_history,
+                "enable_csv_dump": False,
+                "show_progress": False,
+                "emit_diagnostics": False,
+            },
+            shared["threshold_candidates"],
+        )
+        threshold_sweep_elapsed_sec = time.monotonic() - stage_started_at
+        write_walk_forward_threshold_sweep(log_file, fold["fold"], threshold_sweep)
+        write_walk_forward_stage_timing(
+            log_file,
+            fold["fold"],
+            "threshold_sweep",
+            threshold_sweep_elapsed_sec,
+        )
+    fold_summary.update({
+        "fold": fold["fold"],
+        "train_rows": int(len(train_df)),
+        "validation_rows": int(len(fold_data)),
+        "fold_model_cache": fold_model_cache["cache"],
+        "validation_start": validation_df.index.min().isoformat(),
+        "validation_end": validation_df.index.max().isoformat(),
+        "fold_diagnostics": fold_diagnostics,
+        "elapsed_sec": float(time.monotonic() - fold_started_at),
+        "stage_timing": {
+            "train_models": float(train_elapsed_sec),
+            "diagnostics": float(diagnostics_elapsed_sec),
+            "precompute_probabilities": float(probabilities_elapsed_sec),
+            "backtest_current": float(backtest_elapsed_sec),
+            "threshold_sweep": float(threshold_sweep_elapsed_sec),
+        },
+    })
+    if threshold_sweep is not None:
+        fold_summary["threshold_sweep"] = threshold_sweep
+    with open(log_file, "a", encoding="utf-8") as file:
+        file.write(
+            "walk_forward_fold_timing "
+            f"fold={fold['fold']} "
+            f"elapsed_sec={fold_summary['elapsed_sec']:.2f} "
+            f"train_models_sec={train_elapsed_sec:.2f} "
+            f"diagnostics_sec={diagnostics_elapsed_sec:.2f} "
+            f"precompute_probabilities_sec={probabilities_elapsed_sec:.2f} "
+            f"backtest_current_sec={backtest_elapsed_sec:.2f} "
+            f"threshold_sweep_sec={threshold_sweep_elapsed_sec:.2f} "
+            f"threshold_sweep_evaluated="
+            f"{(threshold_sweep or {}).get('evaluated_count', 0)}\n"
+        )
+    return fold_summary
+
+
 def run_walk_forward_validation(
     log_file,
     context_backtester,
@@ -1654,8 +2242,7 @@ def run_walk_forward_validation(
     if not metadata:
         raise RuntimeError("训练元数据缺失，无法执行 walk-forward 验证")
 
-    from backtest.backtest import Backtester
-    from train.train import create_labels, train_direction_quality_bundle
+    from train.train import create_labels
 
     append_log_header(log_file, "walk_forward_validation")
     labeled_data = create_labels(
@@ -1678,9 +2265,19 @@ def run_walk_forward_validation(
         else []
     )
     estimator_config = walk_forward_estimator_config()
+    workers = resolve_walk_forward_workers(max(1, len(slices)))
+    shared = walk_forward_fold_context(
+        context_backtester,
+        labeled_data,
+        metadata,
+        feature_cols,
+        estimator_config=estimator_config,
+        threshold_candidates=threshold_candidates,
+        include_trend_baseline=include_trend_baseline,
+    )
 
     with open(log_file, "a", encoding="utf-8") as file:
-        file.write(f"walk-forward folds={len(slices)}\n")
+        file.write(f"walk-forward folds={len(slices)} workers={workers}\n")
         file.write(
             "walk-forward estimator_config "
             f"lightweight={int(estimator_config is not None)} "
@@ -1693,246 +2290,35 @@ def run_walk_forward_validation(
                 f"diagnostic_threshold={walk_forward_diagnostic_threshold():.4f}\n"
             )
 
-    for fold in slices:
-        fold_started_at = time.monotonic()
-        train_df = labeled_data.iloc[fold["train_start_pos"]:fold["train_end_pos"]].copy()
-        validation_df = labeled_data.iloc[
-            fold["validation_start_pos"]:fold["validation_end_pos"]
-        ].copy()
-        if train_df.empty or validation_df.empty:
-            raise RuntimeError(f"walk-forward fold={fold['fold']} 样本为空")
-
-        X_train = train_df[feature_cols].astype(float)
-        y_train = train_df["target"]
-        stage_started_at = time.monotonic()
-        fold_models, _, _, _, _ = train_direction_quality_bundle(
-            X_train,
-            y_train,
-            sample_context=train_df,
-            estimator_config=estimator_config,
-        )
-        train_elapsed_sec = time.monotonic() - stage_started_at
-        write_walk_forward_stage_timing(
-            log_file,
-            fold["fold"],
-            "train_models",
-            train_elapsed_sec,
-        )
-        fold_data = context_backtester.data.loc[
-            (context_backtester.data.index >= validation_df.index.min()) &
-            (context_backtester.data.index <= validation_df.index.max())
-        ].copy()
-        fold_funding_history = filter_funding_history(
-            context_backtester.funding_history,
-            fold_data.index.min(),
-            fold_data.index.max(),
-        )
-        stage_started_at = time.monotonic()
-        fold_predicted_data = add_walk_forward_probabilities(
-            fold_data,
-            feature_cols,
-            fold_models,
-            config.MODEL_WEIGHTS,
-            metadata,
-            direction_model_weights=getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {}),
-        )
-        probabilities_elapsed_sec = time.monotonic() - stage_started_at
-        write_walk_forward_stage_timing(
-            log_file,
-            fold["fold"],
-            "precompute_probabilities",
-            probabilities_elapsed_sec,
-        )
-
-        stage_started_at = time.monotonic()
-        fold_diagnostics = build_walk_forward_fold_diagnostics(
-            fold,
-            train_df,
-            validation_df,
-            feature_cols,
-            fold_models,
-            config.MODEL_WEIGHTS,
-            metadata,
-            precomputed_probabilities=fold_predicted_data[["long_prob", "short_prob"]],
-            include_model_diagnostics=bool(
-                getattr(config, "MODEL_WALK_FORWARD_MODEL_DIAGNOSTICS", False)
-            ),
-            direction_model_weights=getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {}),
-        )
-        diagnostics_elapsed_sec = time.monotonic() - stage_started_at
-        write_walk_forward_stage_timing(
-            log_file,
-            fold["fold"],
-            "diagnostics",
-            diagnostics_elapsed_sec,
-        )
-        write_walk_forward_fold_diagnostics(log_file, fold_diagnostics)
-
-        append_log_header(log_file, f"walk_forward_fold_{fold['fold']}")
-        stage_started_at = time.monotonic()
-        with open(log_file, "a", encoding="utf-8") as file:
-            file.write(
-                "fold_range "
-                f"fold={fold['fold']} train_rows={len(train_df)} validation_rows={len(fold_data)} "
-                f"validation_start={validation_df.index.min().isoformat()} "
-                f"validation_end={validation_df.index.max().isoformat()}\n"
-            )
-            with contextlib.redirect_stdout(file):
-                backtester = Backtester(
-                    context_backtester.interval,
-                    context_backtester.window,
-                    data_dict=context_backtester.data_dict,
-                    reward_risk=context_backtester.reward_risk,
-                    precomputed_data=fold_predicted_data,
-                    feature_cols=feature_cols,
-                    models=fold_models,
-                    model_weights=config.MODEL_WEIGHTS,
-                    model_metadata=metadata,
-                    funding_history=fold_funding_history,
-                    enable_csv_dump=False,
-                    show_progress=False,
-                    emit_diagnostics=False,
+    fail_fast = enforce_gates and walk_forward_fail_fast_enabled()
+    folds = iter_walk_forward_folds(
+        shared,
+        slices,
+        log_file,
+        workers=workers,
+        stop=(lambda fold_summary: bool(walk_forward_fold_failure_reason(fold_summary))) if fail_fast else None,
+    )
+    try:
+        for fold, fold_summary in folds:
+            fold_summaries.append(fold_summary)
+            failure_reason = walk_forward_fold_failure_reason(fold_summary)
+            if failure_reason and fail_fast:
+                partial_summary = aggregate_backtest_summaries(fold_summaries)
+                partial_summary["failed"] = True
+                partial_summary["failure_reason"] = failure_reason
+                partial_summary["failed_fold"] = fold["fold"]
+                update_candidate_training_metadata(
+                    walk_forward_failure_summary=partial_summary,
+                    candidate_status="walk_forward_failed",
                 )
-                original_predict_row = backtester._predict_row
-                backtester._predict_row = lambda row: (row["long_prob"], row["short_prob"])
-                try:
-                    fold_summary = backtester.run_backtest()
-                finally:
-                    backtester._predict_row = original_predict_row
-        backtest_elapsed_sec = time.monotonic() - stage_started_at
-        write_walk_forward_stage_timing(
-            log_file,
-            fold["fold"],
-            "backtest_current",
-            backtest_elapsed_sec,
-        )
-
-        if not fold_summary:
-            raise RuntimeError(f"walk-forward fold={fold['fold']} 未返回 summary")
-        if include_trend_baseline:
-            baseline_data = add_trend_baseline_probabilities(fold_data)
-            stage_started_at = time.monotonic()
-            with open(log_file, "a", encoding="utf-8") as file:
-                with contextlib.redirect_stdout(file):
-                    baseline_backtester = Backtester(
-                        context_backtester.interval,
-                        context_backtester.window,
-                        data_dict=context_backtester.data_dict,
-                        reward_risk=context_backtester.reward_risk,
-                        precomputed_data=baseline_data,
-                        feature_cols=feature_cols,
-                        models=fold_models,
-                        model_weights=config.MODEL_WEIGHTS,
-                        model_metadata=metadata,
-                        funding_history=fold_funding_history,
-                        enable_csv_dump=False,
-                        show_progress=False,
-                        emit_diagnostics=False,
-                    )
-                    original_predict_row = baseline_backtester._predict_row
-                    baseline_backtester._predict_row = (
-                        lambda row: (row["long_prob"], row["short_prob"])
+                with open(log_file, "a", encoding="utf-8") as file:
+                    file.write(
+                        "walk_forward_fail_fast "
+                        f"fold={fold['fold']} reason={failure_reason}\n"
                     )
-                    try:
-                        trend_baseline_summary = baseline_backtester.run_backtest()
-                    finally:
-                        baseline_backtester._predict_row = original_predict_row
-            if not trend_baseline_summary:
-                raise RuntimeError(
-                    f"walk-forward fold={fold['fold']} 趋势基线未返回 summary"
-                )
-            trend_baseline_summary.update({
-                "fold": fold["fold"],
-                "validation_start": validation_df.index.min().isoformat(),
-                "validation_end": validation_df.index.max().isoformat(),
-            })
-            fold_summary["trend_baseline_summary"] = trend_baseline_summary
-            write_walk_forward_stage_timing(
-                log_file,
-                fold["fold"],
-                "trend_baseline",
-                time.monotonic() - stage_started_at,
-            )
-        threshold_sweep = None
-        threshold_sweep_elapsed_sec = 0.0
-        if _threshold_sweep_enabled() and threshold_candidates and fold_predicted_data is not None:
-            stage_started_at = time.monotonic()
-            threshold_sweep = run_walk_forward_threshold_sweep(
-                {
-                    "interval": context_backtester.interval,
-                    "window": context_backtester.window,
-                    "data_dict": context_backtester.data_dict,
-                    "reward_risk": context_backtester.reward_risk,
-                    "precomputed_data": fold_predicted_data,
-                    "feature_cols": feature_cols,
-                    "models": fold_models,
-                    "model_weights": config.MODEL_WEIGHTS,
-                    "model_metadata": metadata,
-                    "funding_history": fold_funding_history,
-                    "enable_csv_dump": False,
-                    "show_progress": False,
-                    "emit_diagnostics": False,
-                    "use_precomputed_probabilities": True,
-                },
-                threshold_candidates,
-            )
-            threshold_sweep_elapsed_sec = time.monotonic() - stage_started_at
-            write_walk_forward_threshold_sweep(log_file, fold["fold"], threshold_sweep)
-            write_walk_forward_stage_timing(
-                log_file,
-                fold["fold"],
-                "threshold_sweep",
-                threshold_sweep_elapsed_sec,
-            )
-        fold_summary.update({
-            "fold": fold["fold"],
-            "train_rows": int(len(train_df)),
-            "validation_rows": int(len(fold_data)),
-            "validation_start": validation_df.index.min().isoformat(),
-            "validation_end": validation_df.index.max().isoformat(),
-            "fold_diagnostics": fold_diagnostics,
-            "elapsed_sec": float(time.monotonic() - fold_started_at),
-            "stage_timing": {
-                "train_models": float(train_elapsed_sec),
-                "diagnostics": float(diagnostics_elapsed_sec),
-                "precompute_probabilities": float(probabilities_elapsed_sec),
-                "backtest_current": float(backtest_elapsed_sec),
-                "threshold_sweep": float(threshold_sweep_elapsed_sec),
-            },
-        })
-        if threshold_sweep is not None:
-            fold_summary["threshold_sweep"] = threshold_sweep
-        fold_summaries.append(fold_summary)
-        with open(log_file, "a", encoding="utf-8") as file:
-            file.write(
-                "walk_forward_fold_timing "
-                f"fold={fold['fold']} "
-                f"elapsed_sec={fold_summary['elapsed_sec']:.2f} "
-                f"train_models_sec={train_elapsed_sec:.2f} "
-                f"diagnostics_sec={diagnostics_elapsed_sec:.2f} "
-                f"precompute_probabilities_sec={probabilities_elapsed_sec:.2f} "
-                f"backtest_current_sec={backtest_elapsed_sec:.2f} "
-                f"threshold_sweep_sec={threshold_sweep_elapsed_sec:.2f} "
-                f"threshold_sweep_evaluated="
-                f"{(threshold_sweep or {}).get('evaluated_count', 0)}\n"
-            )
-
-        failure_reason = walk_forward_fold_failure_reason(fold_summary)
-        if failure_reason and enforce_gates and walk_forward_fail_fast_enabled():
-            partial_summary = aggregate_backtest_summaries(fold_summaries)
-            partial_summary["failed"] = True
-            partial_summary["failure_reason"] = failure_reason
-            partial_summary["failed_fold"] = fold["fold"]
-            update_candidate_training_metadata(
-                walk_forward_failure_summary=partial_summary,
-                candidate_status="walk_forward_failed",
-            )
-            with open(log_file, "a", encoding="utf-8") as file:
-                file.write(
-                    "walk_forward_fail_fast "
-                    f"fold={fold['fold']} reason={failure_reason}\n"
-                )
-            raise RuntimeError(failure_reason)
+                raise RuntimeError(failure_reason)
+    finally:
+        folds.close()
 
     summary = aggregate_backtest_summaries(fold_summaries)
     if include_trend_baseline:
@@ -1955,26 +2341,45 @@ def run_walk_forward_validation(
 
 def run_backtest_with_bundle(log_file, title, context_backtester, bundle):
     from backtest.backtest import Backtester
+    from backtest.result_cache import BacktestResultStore
 
     append_log_header(log_file, title)
+    backtester_kwargs = {
+        "data_dict": context_backtester.data_dict,
+        "reward_risk": context_backtester.reward_risk,
+        "precomputed_data": context_backtester.data,
+        "feature_cols": bundle["feature_cols"],
+        "models": bundle["models"],
+        "model_weights": config.MODEL_WEIGHTS,
+        "model_metadata": bundle.get("metadata") or {},
+        "funding_history": context_backtester.funding_history,
+    }
+    # 同一份 OOS 数据 + 同一组模型产物 + 同一套配置的回测（如旧模型基线）直接复用上次的 summary
+    cache = BacktestResultStore.open_scope(
+        {**backtester_kwargs, "interval": context_backtester.interval},
+        kind="summary",
+        engine="backtester",
+        artifact_hashes=bundle.get("artifact_hashes"),
+    )
+    cached = cache.get(name=title) if cache is not None else None
     with open(log_file, "a", encoding="utf-8") as file:
+        if cache is not None:
+            file.write(f"backtest_result_cache title={title} status={cache.statuses[title]} key={cache.key()}\n")
+        if cached is not None:
+            return cached
         with contextlib.redirect_stdout(file):
             backtester = Backtester(
                 context_backtester.interval,
                 context_backtester.window,
-                data_dict=context_backtester.data_dict,
-                reward_risk=context_backtester.reward_risk,
-                precomputed_data=context_backtester.data,
-                feature_cols=bundle["feature_cols"],
-                models=bundle["models"],
-                model_weights=config.MODEL_WEIGHTS,
-                model_metadata=bundle.get("metadata") or {},
-                funding_history=context_backtester.funding_history,
                 enable_csv_dump=False,
                 show_progress=False,
                 emit_diagnostics=False,
+                **backtester_kwargs,
             )
-            return backtester.run_backtest()
+            summary = backtester.run_backtest()
+    if cache is not None and summary:
+        cache.put(None, summary, name=title)
+    return summary
 
 
 def validate_regime_signal_summary(summary):
@@ -2147,7 +2552,7 @@ def write_state(**updates):
     write_json_atomic(STATE_PATH, state)
 
 
-def retrain_once(*, validate_backtest=None):
+def retrain_once(*, validate_backtest=None, full_rebuild=False):
     os.makedirs(LOGS_DIR, exist_ok=True)
     run_id = timestamp_id()
     log_file = os.path.join(LOGS_DIR, f"model_retrain_{run_id}.log")
@@ -2169,11 +2574,18 @@ def retrain_once(*, validate_backtest=None):
 
     try:
         backup_dir, manifest = make_backup(run_id)
-        train_returncode = run_subprocess([sys.executable, "-m", "train.train"], log_file)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(training_pipeline_report_path())
+        train_args = [sys.executable, "-m", "train.train"]
+        if full_rebuild:
+            train_args.append("--full-rebuild")
+        train_returncode = run_subprocess(train_args, log_file)
+        training_pipeline = read_training_pipeline_report(log_file)
         if train_returncode != 0:
             raise RuntimeError(f"训练命令失败: exit_code={train_returncode}")
 
         loaded_artifacts = validate_artifacts()
+        training_lineage = read_json(os.path.join(BASE_DIR, config.TRAINING_METADATA_PATH), {}).get("lineage")
         backtest_summary = None
         if validate_backtest:
             backtest_summary = run_backtest_validation(log_file, backup_dir=backup_dir)
@@ -2188,6 +2600,8 @@ def retrain_once(*, validate_backtest=None):
             last_backup_path=backup_dir,
             loaded_artifacts=loaded_artifacts,
             backtest_summary=backtest_summary,
+            training_pipeline=training_pipeline,
+            training_lineage=training_lineage,
         )
         print(f"模型重训成功: log={log_file}")
         if backtest_summary:
@@ -2234,8 +2648,13 @@ def main():
         action="store_true",
         help="Only train and validate model files, without backtest gating",
     )
+    parser.add_argument(
+        "--full-rebuild",
+        action="store_true",
+        help="Retrain all models from scratch instead of warm-starting from the current generation",
+    )
     args = parser.parse_args()
-    return retrain_once(validate_backtest=not args.skip_backtest)
+    return retrain_once(validate_backtest=not args.skip_backtest, full_rebuild=args.full_rebuild)
 
 
 if __name__ == "__main__":
@@ -169,8 +169,12 @@ def model_retrain_job():
         raise RuntimeError(f"自动模型重训失败: exit_code={result.returncode}")
 
     logger.info("✅ 自动模型重训完成")
-    if bool(config.MODEL_RETRAIN_RESTART_LIVE_MONITOR):
-        stop_live_monitor_for_model_reload()
+    if not bool(config.MODEL_RETRAIN_RESTART_LIVE_MONITOR):
+        return
+    if bool(getattr(config, "LIVE_MODEL_HOT_RELOAD", True)):
+        logger.info("✅ live monitor 已开启模型热加载，将在 bar 间隙切换新模型，无需重启")
+        return
+    stop_live_monitor_for_model_reload()
 
 def should_run_daily_report(now=None):
     now = now or datetime.now()
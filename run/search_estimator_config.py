@@ -0,0 +1,146 @@
+import argparse
+import contextlib
+import json
+import math
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from backtest.backtest import Backtester
+from config import config
+from run.retrain_models import build_walk_forward_slices, load_model_bundle, write_json_atomic
+from train.hyperparameter_search import (
+    DEFAULT_SEARCH_SPACE,
+    SharedTrainingMatrix,
+    sample_trials,
+    successive_halving_search,
+)
+from train.train import create_labels
+from utils.utils import BASE_DIR, LOGS_DIR
+
+
+REPORT_DIR = os.path.join(LOGS_DIR, "estimator_search")
+
+
+def utc_now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _finite_or_none(value):
+    if isinstance(value, dict):
+        return {key: _finite_or_none(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_finite_or_none(item) for item in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def load_search_space(path):
+    if not path:
+        return dict(DEFAULT_SEARCH_SPACE)
+    with open(path, "r", encoding="utf-8") as file:
+        space = json.load(file)
+    if not isinstance(space, dict) or not all(isinstance(values, list) and values for values in space.values()):
+        raise ValueError("搜索空间文件必须是 {参数名: [候选值, ...]} 形式的 JSON")
+    return space
+
+
+def build_search_inputs(log_path):
+    """按 walk-forward 验证的方式准备标签数据与 fold 切分。"""
+    bundle = load_model_bundle(BASE_DIR)
+    metadata = bundle.get("metadata")
+    feature_cols = list(bundle["feature_cols"])
+    base_interval = config.INTERVALS[0] if config.INTERVALS else "5m"
+    with open(log_path, "a", encoding="utf-8") as file:
+        with contextlib.redirect_stdout(file):
+            context = Backtester(
+                "multi_period",
+                config.WINDOWS.get(base_interval, 1000),
+                enable_csv_dump=False,
+                show_progress=False,
+                emit_diagnostics=False,
+            )
+    labeled = create_labels(
+        context.data.copy(),
+        future_window=int(metadata.get("label_future_window", config.MODEL_LABEL_FUTURE_WINDOW)),
+        threshold=float(metadata.get("label_threshold", config.MODEL_LABEL_THRESHOLD)),
+    )
+    missing_cols = [col for col in feature_cols if col not in labeled.columns]
+    if missing_cols:
+        raise RuntimeError(f"超参搜索缺少特征列: {','.join(missing_cols[:10])}")
+    folds = build_walk_forward_slices(labeled.index, metadata)
+    return labeled, feature_cols, folds
+
+
+def run_search(args):
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+    log_path = os.path.join(output_dir, f"search_{run_id}.log")
+
+    labeled, feature_cols, folds = build_search_inputs(log_path)
+    space = load_search_space(args.space)
+    trial_configs = sample_trials(space, args.trials, seed=args.seed)
+    with tempfile.TemporaryDirectory(prefix="estimator_search_", dir=output_dir) as matrix_dir:
+        SharedTrainingMatrix.write(
+            matrix_dir,
+            labeled[feature_cols].astype(float),
+            labeled["target"],
+            labeled,
+        )
+        result = successive_halving_search(
+            matrix_dir,
+            folds,
+            trial_configs,
+            eta=args.eta,
+            cpu_budget=args.cpu_budget or None,
+            max_workers=args.workers,
+        )
+
+    report = _finite_or_none({
+        "created_at": utc_now_iso(),
+        "symbol": config.SYMBOL,
+        "rows": int(len(labeled)),
+        "feature_count": len(feature_cols),
+        "folds": folds,
+        "search_space": space,
+        "seed": int(args.seed),
+        **result,
+    })
+    report_path = os.path.join(output_dir, f"search_{run_id}.json")
+    write_json_atomic(report_path, report)
+    best_path = os.path.abspath(args.best_output) if args.best_output else os.path.join(output_dir, "best_estimator_config.json")
+    write_json_atomic(best_path, report["best_estimator_config"])
+    return report, report_path, best_path
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Search estimator hyperparameters with successive halving over walk-forward folds.",
+    )
+    parser.add_argument("--trials", type=int, default=27)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=0, help="Concurrent trial processes; 0 derives it from the CPU budget")
+    parser.add_argument("--cpu-budget", type=int, default=0, help="Total CPU threads; 0 uses MODEL_TRAIN_CPU_BUDGET")
+    parser.add_argument("--space", default="", help="JSON file mapping estimator_config keys to candidate lists")
+    parser.add_argument("--output-dir", default=REPORT_DIR)
+    parser.add_argument("--best-output", default="", help="Where to write the best estimator_config JSON")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    report, report_path, best_path = run_search(args)
+    print(json.dumps({
+        "best_score": report["best_score"],
+        "best_estimator_config": report["best_estimator_config"],
+        "trials_per_hour": report["trials_per_hour"],
+        "report_path": report_path,
+        "best_config_path": best_path,
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
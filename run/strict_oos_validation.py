@@ -8,6 +8,7 @@ from datetime import datetime, timezone
 import pandas as pd
 
 from backtest.backtest import Backtester
+from backtest.funding import FundingSchedule
 from config import config
 from run.retrain_models import (
     aggregate_backtest_summaries,
@@ -408,6 +409,7 @@ def run_audit(args):
             )
         context.data = scoped_data
         context.price_series = scoped_data["5m_close"]
+        context.funding_schedule = FundingSchedule.build(context.funding_history, context.price_series)
         metadata = dict(bundle.get("metadata") or {})
         metadata.update({
             "validation_start": audit_start.isoformat(),
@@ -2,13 +2,15 @@ import json
 import os
 import sys
 from datetime import datetime
+from functools import partial
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from config import config
-from run.compare_trend_filter import build_seed_backtester, run_candidate
+from backtest.sweep import probability_overrides, run_sweep, run_sweep_candidate, seed_backtester_kwargs
+from run.compare_trend_filter import build_seed_backtester, summarize_candidate
 from utils.utils import LOGS_DIR
 
 
@@ -125,10 +127,20 @@ def print_recommendation(results):
 def main():
     config.TELEGRAM_ENABLED = False
     seed_bt = build_seed_backtester()
-    raw_results = [
-        run_candidate(seed_bt, name, overrides)
-        for name, overrides in candidate_overrides()
-    ]
+    # 趋势周期/阈值会改变模型概率：同一组概率配置共用一份种子，组内候选并行
+    groups = {}
+    for name, overrides in candidate_overrides():
+        key = tuple(sorted(probability_overrides(overrides).items()))
+        groups.setdefault(key, []).append((name, overrides))
+    raw_results = []
+    for key, candidates in groups.items():
+        raw_results.extend(
+            run_sweep(
+                seed_backtester_kwargs(seed_bt, overrides=dict(key)),
+                candidates,
+                run=partial(run_sweep_candidate, summarize=summarize_candidate),
+            )
+        )
     ranked_results = sort_results(add_baseline_deltas(raw_results))
     print_table(ranked_results)
     print_recommendation(ranked_results)
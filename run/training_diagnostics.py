@@ -20,6 +20,7 @@ if PROJECT_ROOT not in sys.path:
 from backtest.backtest import Backtester
 from config import config
 from core import signal_engine
+from core.prediction_cache import cached_weighted_predict_proba_batch
 from core.regime_filter import derive_market_regime
 from core.trend_filter import derive_trend_context
 from train.train import create_labels
@@ -70,9 +71,10 @@ def read_json(path, default=None):
 
 def load_model_bundle(model_root):
     root_dir = os.path.abspath(model_root or BASE_DIR)
-    models = {}
-    for name, rel_path in config.MODEL_PATHS.items():
-        models[name] = joblib.load(resolve_artifact_path(root_dir, rel_path))
+    models = signal_engine.load_models({
+        name: resolve_artifact_path(root_dir, rel_path)
+        for name, rel_path in config.MODEL_PATHS.items()
+    })
 
     feature_cols = joblib.load(resolve_artifact_path(root_dir, config.FEATURE_LIST_PATH))
     metadata = read_json(resolve_artifact_path(root_dir, config.TRAINING_METADATA_PATH), default={})
@@ -88,24 +90,20 @@ def load_model_bundle(model_root):
 def weighted_predict_matrix(models, X, model_weights, *, trend_biases=None, model_metadata=None):
     binary_quality = is_binary_trade_quality(model_metadata)
     trend_biases = list(trend_biases) if trend_biases is not None else [None] * len(X)
-    rows = []
-    for row_idx in range(len(X)):
-        row_frame = X.iloc[row_idx:row_idx + 1] if hasattr(X, "iloc") else X[row_idx:row_idx + 1]
-        directional = signal_engine.weighted_predict_proba(
-            models,
-            row_frame,
-            model_weights,
-            trend_bias=trend_biases[row_idx],
-            model_metadata=model_metadata,
-        )
-        short_prob = float(directional[0])
-        long_prob = float(directional[1])
-        if binary_quality:
-            no_trade_prob = max(0.0, min(1.0, 1.0 - max(short_prob, long_prob)))
-        else:
-            no_trade_prob = 0.0
-        rows.append([short_prob, long_prob, no_trade_prob])
-    return np.asarray(rows, dtype=float)
+    directional = cached_weighted_predict_proba_batch(
+        models,
+        X,
+        model_weights,
+        trend_biases=trend_biases,
+        model_metadata=model_metadata,
+    )
+    short_prob = directional[:, 0]
+    long_prob = directional[:, 1]
+    if binary_quality:
+        no_trade_prob = np.clip(1.0 - np.maximum(short_prob, long_prob), 0.0, 1.0)
+    else:
+        no_trade_prob = np.zeros(len(X), dtype=float)
+    return np.column_stack([short_prob, long_prob, no_trade_prob]).astype(float)
 
 
 def enrich_regime_context(data):
@@ -330,17 +328,13 @@ def run_backtest(seed_bt, data):
         models=seed_bt.models,
         model_weights=seed_bt.model_weights,
         funding_history=seed_bt.funding_history,
+        precomputed_probabilities=True,
         enable_csv_dump=False,
         show_progress=False,
         emit_diagnostics=False,
     )
-    original_predict_row = bt._predict_row
-    bt._predict_row = lambda row: (row["long_prob"], row["short_prob"])
-    try:
-        with contextlib.redirect_stdout(io.StringIO()):
-            summary = bt.run_backtest()
-    finally:
-        bt._predict_row = original_predict_row
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = bt.run_backtest()
     return compact_backtest_summary(summary or {})
 
 
@@ -1,24 +1,10 @@
-import contextlib
-import io
-
 from backtest.backtest import Backtester
+from backtest.result_cache import BacktestResultStore
+from backtest.sweep import run_sweep, run_sweep_candidate, seed_backtester_kwargs
 from config import config
 from utils.utils import log_info
 
 
-def apply_overrides(overrides):
-    originals = {}
-    for key, value in overrides.items():
-        originals[key] = getattr(config, key)
-        setattr(config, key, value)
-    return originals
-
-
-def restore_overrides(originals):
-    for key, value in originals.items():
-        setattr(config, key, value)
-
-
 def build_seed_backtester():
     base_interval = config.INTERVALS[0] if config.INTERVALS else "5m"
     window = config.WINDOWS.get(base_interval, 1000)
@@ -33,29 +19,10 @@ def build_seed_backtester():
 
 
 def run_candidate(seed_bt, name, overrides):
-    originals = apply_overrides(overrides)
-    try:
-        bt = Backtester(
-            "multi_period",
-            seed_bt.window,
-            data_dict=seed_bt.data_dict,
-            reward_risk=seed_bt.reward_risk,
-            precomputed_data=seed_bt.data,
-            feature_cols=seed_bt.feature_cols,
-            models=seed_bt.models,
-            model_weights=seed_bt.model_weights,
-            funding_history=seed_bt.funding_history,
-            enable_csv_dump=False,
-            show_progress=False,
-            emit_diagnostics=False,
-        )
-        with contextlib.redirect_stdout(io.StringIO()):
-            summary = bt.run_backtest()
-        summary["name"] = name
-        summary["overrides"] = overrides
-        return summary
-    finally:
-        restore_overrides(originals)
+    summary = run_sweep_candidate(seed_backtester_kwargs(seed_bt, record_decisions=False), overrides)
+    summary["name"] = name
+    summary["overrides"] = overrides
+    return summary
 
 
 def main():
@@ -128,11 +95,18 @@ def main():
     ]
 
     seed_bt = build_seed_backtester()
-
-    results = []
-    for name, overrides in candidates:
-        result = run_candidate(seed_bt, name, overrides)
-        results.append(result)
+    # 只按收益 / 回撤排序，不读决策诊断
+    backtester_kwargs = seed_backtester_kwargs(seed_bt, record_decisions=False)
+    results = run_sweep(
+        backtester_kwargs,
+        candidates,
+        cache=BacktestResultStore.open_scope(
+            backtester_kwargs,
+            kind="summary",
+            engine="backtester",
+            precomputed_probabilities=True,
+        ),
+    )
 
     results.sort(
         key=lambda item: (
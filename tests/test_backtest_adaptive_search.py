@@ -0,0 +1,158 @@
+import unittest
+from functools import partial
+from unittest.mock import patch
+
+from backtest import adaptive_search, sweep
+from tests.test_backtest_array_engine import BASE_CONFIG, make_backtester, make_market_data
+
+
+def score_summary(summary):
+    return (summary["score"],)
+
+
+def make_fake_evaluate(calls):
+    def evaluate(backtester_kwargs, candidates):
+        rows = len(backtester_kwargs["precomputed_data"])
+        for name, overrides in candidates:
+            calls.append((name, rows))
+            # 短窗口上的得分带噪声，完整窗口上得分即 x
+            noise = 0.0 if rows >= 900 else (0.3 if overrides["x"] in (2.0, 5.0) else 0.0)
+            yield name, overrides, {"score": overrides["x"] + noise, "rows": rows}
+    return evaluate
+
+
+class FakeData:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def iloc(self):
+        return self
+
+    def __getitem__(self, item):
+        return FakeData(len(range(self.rows)[item]))
+
+
+class AdaptiveSearchTests(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("backtest.adaptive_search.log_info")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rung_rows_end_with_full_window_and_respect_min_rows(self):
+        self.assertEqual(adaptive_search.rung_row_counts(900, rungs=3, eta=3), [100, 300, 900])
+        self.assertEqual(adaptive_search.rung_row_counts(900, rungs=3, eta=3, min_rows=400), [400, 900])
+        self.assertEqual(adaptive_search.rung_row_counts(50, rungs=3, eta=3, min_rows=400), [50])
+
+    def test_halving_prunes_on_short_windows_and_keeps_pinned_candidate(self):
+        candidates = [("current", {"x": 0.0})] + [(f"c{i}", {"x": float(i)}) for i in range(1, 9)]
+        calls = []
+
+        result = adaptive_search.successive_halving_sweep(
+            {"precomputed_data": FakeData(900)},
+            candidates,
+            score=score_summary,
+            evaluate=make_fake_evaluate(calls),
+            eta=3,
+            rungs=3,
+            keep=("current",),
+        )
+
+        self.assertEqual([rung["evaluated"] for rung in result["rungs"]], [9, 4, 3])
+        self.assertEqual({name for name, rows in calls if rows == 900}, {"current", "c8", "c7"})
+        self.assertEqual([item["name"] for item in result["results"]], ["c8", "c7", "current"])
+        self.assertEqual(result["results"][0]["rows"], 900)
+        self.assertEqual(result["statuses"]["c1"], "pruned")
+        self.assertEqual(result["bar_evaluations"], 9 * 100 + 4 * 300 + 3 * 900)
+        self.assertEqual(result["full_grid_bar_evaluations"], 9 * 900)
+        self.assertAlmostEqual(result["saved_pct"], 100.0 * (1 - 4800 / 8100), places=2)
+
+    def test_midpoint_proposals_are_derived_and_deduplicated(self):
+        ranked = [("a", {"x": 1.0, "y": 2.0, "mode": "m"}), ("b", {"x": 3.0, "y": 2.0, "mode": "n"}), ("c", {"x": 1.0, "y": 4.0, "mode": "n"})]
+        existing = {adaptive_search._overrides_key({"x": 1.0, "y": 3.0, "mode": "m", "sum": 4.0})}
+
+        proposals = adaptive_search.midpoint_proposals(
+            ranked,
+            existing,
+            limit=5,
+            derive=lambda overrides: {**overrides, "sum": overrides["x"] + overrides["y"]},
+        )
+
+        self.assertEqual(proposals, [("mid_a_b", {"x": 2.0, "y": 2.0, "mode": "m", "sum": 4.0})])
+
+    def test_proposals_join_first_rung(self):
+        candidates = [(f"c{i}", {"x": float(i)}) for i in range(1, 10)]
+        calls = []
+
+        result = adaptive_search.successive_halving_sweep(
+            {"precomputed_data": FakeData(900)},
+            candidates,
+            score=score_summary,
+            evaluate=make_fake_evaluate(calls),
+            proposals=2,
+        )
+
+        self.assertEqual(result["proposed_count"], 2)
+        self.assertEqual(result["rungs"][0]["evaluated"], 11)
+        self.assertIn("mid_c9_c8", result["statuses"])
+
+    def test_compare_with_exhaustive_reports_pick_rank_and_screening_correlation(self):
+        exhaustive = [{"name": f"c{i}", "score": float(i)} for i in range(5)]
+        search = {
+            "results": [{"name": "c3", "score": 3.0}],
+            "screening_summaries": {f"c{i}": {"score": float(i)} for i in range(5)},
+        }
+
+        comparison = adaptive_search.compare_with_exhaustive(search, exhaustive, score_summary)
+
+        self.assertEqual(comparison["pick_exhaustive_rank"], 2)
+        self.assertEqual(comparison["exhaustive_best"], "c4")
+        self.assertFalse(comparison["pick_at_least_exhaustive_best"])
+        self.assertAlmostEqual(comparison["screening_spearman"], 1.0)
+
+
+class AdaptiveBacktestSearchTests(unittest.TestCase):
+    def setUp(self):
+        patches = [patch(f"config.config.{key}", value) for key, value in BASE_CONFIG.items()]
+        patches += [
+            patch("backtest.backtest.log_info"),
+            patch("backtest.sweep.log_info"),
+            patch("backtest.adaptive_search.log_info"),
+        ]
+        for item in patches:
+            item.start()
+            self.addCleanup(item.stop)
+
+    def test_final_rung_matches_full_window_backtest(self):
+        kwargs = sweep.seed_backtester_kwargs(make_backtester(make_market_data(rows=900)))
+        candidates = [
+            (f"tl{threshold:.2f}", {"THRESHOLD_LONG": threshold, "THRESHOLD_SHORT": threshold})
+            for threshold in (0.52, 0.56, 0.60, 0.64, 0.68, 0.72)
+        ]
+
+        def score(summary):
+            return (summary["final_equity"],)
+
+        result = adaptive_search.successive_halving_sweep(
+            kwargs,
+            candidates,
+            score=score,
+            evaluate=partial(sweep.iter_sweep, workers=1),
+            eta=3,
+            rungs=2,
+        )
+
+        self.assertEqual(result["rung_rows"], [300, 900])
+        self.assertEqual(len(result["results"]), 2)
+        for item in result["results"]:
+            full = sweep.run_sweep_candidate(kwargs, item["overrides"])
+            self.assertEqual(item["final_equity"], full["final_equity"])
+            self.assertEqual(item["trade_count"], full["trade_count"])
+        self.assertLess(result["bar_evaluations"], result["full_grid_bar_evaluations"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from backtest import array_engine
+from backtest.backtest import Backtester
+from core.regime_filter import derive_market_regime, derive_market_regimes
+from core.trend_filter import derive_trend_context, derive_trend_gaps
+
+
+def make_market_data(rows=1500, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(scale=0.004, size=rows)))
+    open_ = np.concatenate([[100.0], close[:-1]]) * (1 + rng.normal(scale=0.0005, size=rows))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0.0, 0.004, size=rows))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0.0, 0.004, size=rows))
+    # 概率带自相关，才会出现持仓、加减仓和反向平仓
+    drift = np.convolve(rng.normal(size=rows), np.ones(12) / 12, mode="same") * 2.5
+    long_prob = np.clip(0.5 + 0.35 * np.tanh(drift), 0.02, 0.98)
+    volatility = np.abs(rng.normal(0.0012, 0.0005, size=rows))
+    volatility[rng.choice(rows, size=20, replace=False)] = np.nan
+    ema_fast = pd.Series(close).ewm(span=240).mean().to_numpy()
+    ema_slow = pd.Series(close).ewm(span=720).mean().to_numpy()
+    ema_fast[:5] = np.nan
+    return pd.DataFrame(
+        {
+            "5m_open": open_,
+            "5m_high": high,
+            "5m_low": low,
+            "5m_close": close,
+            "5m_atr": close * np.abs(rng.normal(0.0015, 0.0006, size=rows)),
+            "money_flow_ratio": np.abs(rng.normal(1.0, 0.6, size=rows)),
+            "volatility_15": volatility,
+            "1H_ema_20": ema_fast,
+            "1H_ema_60": ema_slow,
+            "long_prob": long_prob,
+            "short_prob": 1.0 - long_prob,
+        },
+        index=pd.date_range("2026-01-01", periods=rows, freq="5min", tz="UTC"),
+    )
+
+
+def make_backtester(data, funding_history=None):
+    if funding_history is None:
+        funding_history = pd.DataFrame(columns=["funding_time", "funding_rate"])
+    return Backtester(
+        "multi_period",
+        len(data),
+        data_dict={},
+        reward_risk=2.8,
+        precomputed_data=data,
+        feature_cols=[],
+        models={},
+        model_weights={},
+        model_metadata={},
+        funding_history=funding_history,
+        precomputed_probabilities=True,
+        enable_csv_dump=False,
+        show_progress=False,
+        emit_diagnostics=False,
+    )
+
+
+BASE_CONFIG = {
+    "THRESHOLD_LONG": 0.6,
+    "THRESHOLD_SHORT": 0.6,
+    "SIGNAL_MIN_PROB_DIFF": 0.1,
+    "MIN_SIGNAL_TARGET_RATIO": 0.01,
+    "REVERSE_EXIT_CONSECUTIVE_BARS": 3,
+    "MIN_HOLD_BARS": 2,
+    "TRADE_COOLDOWN_BARS": 2,
+    "STOP_LOSS_COOLDOWN_BARS": 6,
+    "BACKTEST_MIN_ADJUST_AMOUNT": 10.0,
+    "MIN_EXPECTED_NET_EDGE": -1.0,
+    "POSITION_MAX": 0.9,
+    "TREND_FILTER_ENABLED": False,
+    "REGIME_FILTER_ENABLED": False,
+    "LOSS_CONDITION_GUARD_ENABLED": False,
+    "LOSS_GUARD_BLOCK_DIRECTIONS": "",
+    "LONG_ENTRY_GUARD_ENABLED": False,
+}
+
+
+class ArrayEngineParityTests(unittest.TestCase):
+    def run_parity(self, data, funding_history=None, **overrides):
+        patches = [patch(f"config.config.{key}", value) for key, value in {**BASE_CONFIG, **overrides}.items()]
+        for item in patches:
+            item.start()
+            self.addCleanup(item.stop)
+        with patch("backtest.array_engine.log_info"), patch("backtest.backtest.log_info"):
+            return array_engine.check_parity(make_backtester(data, funding_history))
+
+    def assert_parity(self, report):
+        self.assertTrue(report["match"], report["differences"])
+        self.assertGreater(report["trade_count"], 10)
+
+    def test_matches_reference_with_funding_and_adds(self):
+        data = make_market_data()
+        funding = pd.DataFrame({
+            "funding_time": pd.date_range("2026-01-01 04:00", periods=12, freq="8h", tz="UTC"),
+            "funding_rate": np.linspace(-0.0004, 0.0006, 12),
+        })
+        report = self.run_parity(data, funding, ADD_THRESHOLD=0.05, BLOCK_LOSING_POSITION_ADDS=False)
+        self.assert_parity(report)
+
+    def test_matches_reference_with_regime_and_entry_guards(self):
+        report = self.run_parity(
+            make_market_data(seed=11),
+            REGIME_FILTER_ENABLED=True,
+            REGIME_RANGE_THRESHOLD_BONUS=0.02,
+            REGIME_HIGH_VOL_ALLOW_TRADES=True,
+            TREND_FILTER_ENABLED=True,
+            LOSS_CONDITION_GUARD_ENABLED=True,
+            LOSS_GUARD_BLOCK_NEW_REGIMES="range_high_vol",
+            LOSS_GUARD_EXIT_REGIMES="range_high_vol",
+            LOSS_GUARD_EXIT_CONFIRM_BARS=2,
+            LONG_ENTRY_GUARD_ENABLED=True,
+            LONG_ENTRY_MIN_TREND_GAP=0.001,
+        )
+        self.assert_parity(report)
+
+    def test_matches_reference_with_intrabar_tp_sl(self):
+        report = self.run_parity(make_market_data(seed=3), BACKTEST_INTRABAR_TP_SL=True)
+        self.assert_parity(report)
+
+    def test_run_backtest_dispatches_to_array_engine(self):
+        data = make_market_data(rows=300)
+        backtester = make_backtester(data)
+        with patch("backtest.array_engine.run_array_backtest", return_value={"engine": "array"}) as run_array:
+            self.assertEqual(backtester.run_backtest(engine="array"), {"engine": "array"})
+        run_array.assert_called_once_with(backtester)
+
+
+class VectorizedContextTests(unittest.TestCase):
+    def test_trend_gaps_and_regimes_match_row_helpers(self):
+        data = make_market_data(rows=400, seed=5)
+        gaps = derive_trend_gaps(data)
+        biases = ["long", "short", "neutral", "long"] * 100
+        atr_ratio = (data["5m_atr"] / data["5m_close"]).to_numpy()
+        regimes, is_high_vol = derive_market_regimes(
+            trend_biases=biases,
+            trend_gaps=gaps,
+            volatility=data["volatility_15"].to_numpy(),
+            atr_ratio=atr_ratio,
+            money_flow_ratio=data["money_flow_ratio"].to_numpy(),
+        )
+        for position, (_, row) in enumerate(data.iterrows()):
+            expected_gap = derive_trend_context(row)["trend_gap"]
+            if expected_gap is None:
+                self.assertTrue(np.isnan(gaps[position]))
+            else:
+                self.assertAlmostEqual(gaps[position], expected_gap)
+            expected = derive_market_regime(
+                trend_bias=biases[position],
+                trend_gap=expected_gap,
+                volatility=row["volatility_15"],
+                atr_ratio=atr_ratio[position],
+                money_flow_ratio=row["money_flow_ratio"],
+            )
+            self.assertEqual(regimes[position], expected["regime"])
+            self.assertEqual(bool(is_high_vol[position]), expected["is_high_vol"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import contextlib
+import io
+import unittest
+from collections import Counter
+from unittest.mock import patch
+
+from backtest import array_engine, sweep
+from backtest.decision_log import (
+    EDGE_GATE_FAIL,
+    EDGE_GATE_PASS,
+    EDGE_GATE_SKIPPED,
+    NUMERIC_FIELDS,
+    DecisionLog,
+    finite_quantiles,
+)
+from tests.test_backtest_array_engine import BASE_CONFIG, make_backtester, make_market_data
+
+
+HEADLINE_KEYS = ("final_equity", "trade_count", "closed_trade_count", "fees_paid", "max_drawdown_pct", "funding_pnl")
+
+
+def row_values(**values):
+    return tuple(values.get(field, float("nan")) for field in NUMERIC_FIELDS)
+
+
+class DecisionLogTests(unittest.TestCase):
+    def test_counts_follow_first_occurrence_and_survive_growth(self):
+        log = DecisionLog(2)
+        rows = [
+            ("HOLD", "WeakSignal", "flat", "range", "short", row_values(dominant_prob=0.5, prob_edge_margin=-0.1), EDGE_GATE_SKIPPED),
+            ("OPEN", "Open", "up", "trend", "long", row_values(dominant_prob=0.7, prob_edge_margin=0.05), EDGE_GATE_PASS),
+            ("HOLD", "Cooldown(1)", "up", "trend", "long", row_values(dominant_prob=0.65, prob_edge_margin=-0.02), EDGE_GATE_FAIL),
+            ("HOLD", "WeakSignal", "flat", "range", "long", row_values(dominant_prob=0.55), EDGE_GATE_SKIPPED),
+            ("CLOSE", "StopLoss", "down", None, "short", row_values(dominant_prob=0.6, prob_edge_margin=0.01), EDGE_GATE_PASS),
+        ]
+        expected = {field: Counter() for field in ("action", "reason", "regime", "direction")}
+        for action, reason, trend, regime, direction, values, gate in rows:
+            log.append(action, reason, trend, regime, direction, values, gate)
+            for field, value in zip(expected, (action, reason, regime, direction)):
+                expected[field][value] += 1
+
+        self.assertEqual(len(log), 5)
+        for field, counts in expected.items():
+            self.assertEqual(list(log.counts(field).items()), list(counts.items()))
+        self.assertEqual(
+            list(log.pair_counts("regime", "direction").items()),
+            [(("range", "short"), 1), (("trend", "long"), 2), (("range", "long"), 1), ((None, "short"), 1)],
+        )
+        self.assertEqual(log.edge_gate_counts(), Counter({"pass": 2, "fail": 1}))
+        self.assertEqual(log.quantiles("dominant_prob"), finite_quantiles([0.5, 0.7, 0.65, 0.55, 0.6]))
+        self.assertEqual(
+            log.quantiles_by("prob_edge_margin", "regime"),
+            {"None": finite_quantiles([0.01]), "range": finite_quantiles([-0.1]), "trend": finite_quantiles([0.05, -0.02])},
+        )
+
+    def test_engine_counts_merge_into_recorded_counts(self):
+        log = DecisionLog()
+        log.append("HOLD", "WeakSignal", "flat", "range", "long", row_values(), EDGE_GATE_SKIPPED)
+        log.add_counts("action", Counter({"OPEN": 2, "HOLD": 3}))
+        log.add_counts(("regime", "direction"), Counter({("trend", "short"): 4}))
+
+        self.assertEqual(list(log.counts("action").items()), [("HOLD", 4), ("OPEN", 2)])
+        self.assertEqual(log.pair_counts("regime", "direction"), Counter({("range", "long"): 1, ("trend", "short"): 4}))
+        self.assertEqual(log.counts("trend"), Counter({"flat": 1}))
+
+
+class LeanBacktestTests(unittest.TestCase):
+    def setUp(self):
+        patches = [patch(f"config.config.{key}", value) for key, value in BASE_CONFIG.items()]
+        patches += [patch("backtest.backtest.log_info"), patch("backtest.sweep.log_info")]
+        for item in patches:
+            item.start()
+            self.addCleanup(item.stop)
+        self.kwargs = sweep.seed_backtester_kwargs(make_backtester(make_market_data(rows=800)))
+
+    def run_candidate(self, record_decisions, engine=None):
+        backtester = sweep.build_candidate_backtester({**self.kwargs, "record_decisions": record_decisions}, {})
+        if engine is not None:
+            return engine(backtester)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return backtester.run_backtest()
+
+    def test_lean_mode_keeps_headline_and_drops_decision_fields(self):
+        for engine in (None, array_engine.run_array_backtest):
+            full = self.run_candidate(True, engine)
+            lean = self.run_candidate(False, engine)
+
+            self.assertGreater(full["trade_count"], 0)
+            self.assertTrue(full["decision_action_counts"])
+            for key in HEADLINE_KEYS:
+                self.assertEqual(lean[key], full[key], key)
+            self.assertEqual(lean["closed_trade_attribution"], full["closed_trade_attribution"])
+            self.assertEqual(lean["decision_action_counts"], {})
+            self.assertEqual(lean["decision_reason_top"], [])
+            self.assertEqual(lean["decision_regime_signal_summary"], {})
+            self.assertEqual(lean["decision_probability_quantiles"], {field: {} for field in NUMERIC_FIELDS})
+
+
+if __name__ == "__main__":
+    unittest.main()
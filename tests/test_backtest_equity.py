@@ -1,9 +1,12 @@
 import unittest
 from unittest.mock import patch
 
+import numpy as np
 import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
 
 from backtest.backtest import Backtester, mark_to_market_equity
+from core.direction_quality import DirectionQualityModel
 
 
 class MarkToMarketEquityTests(unittest.TestCase):
@@ -90,5 +93,78 @@ class BacktestSizingTests(unittest.TestCase):
         self.assertEqual(backtester.trade_log[-1][1], "期末平仓")
 
 
+class BacktestBatchPredictionTests(unittest.TestCase):
+    def make_backtester(self):
+        rng = np.random.default_rng(2)
+        rows = 120
+        features = ["f0", "f1", "trend_bias_num"]
+        data = pd.DataFrame(
+            {
+                "f0": rng.normal(size=rows),
+                "f1": rng.normal(size=rows),
+                "trend_bias_num": rng.choice([-1.0, 0.0, 1.0], size=rows),
+                "5m_close": 100.0 + rng.normal(size=rows),
+                "1H_ema_20": 100.0 + rng.normal(scale=0.5, size=rows),
+                "1H_ema_60": 100.0 + rng.normal(scale=0.5, size=rows),
+            },
+            index=pd.date_range("2026-01-01", periods=rows, freq="5min"),
+        )
+        y = (data["f0"] > 0).astype(int)
+
+        def forest(seed):
+            return RandomForestClassifier(n_estimators=5, max_depth=3, random_state=seed, n_jobs=1).fit(data[features], y)
+
+        models = {
+            "rf_a": DirectionQualityModel(forest(0), direction_models={"long": forest(1), "short": forest(2)}),
+            "rf_b": DirectionQualityModel(forest(3)),
+        }
+        with patch.object(Backtester, "_load_funding_history", return_value=pd.DataFrame()):
+            backtester = Backtester(
+                "multi_period",
+                10,
+                data_dict={},
+                reward_risk=2.8,
+                precomputed_data=data,
+                feature_cols=features,
+                models=models,
+                model_weights={"rf_a": 0.6, "rf_b": 0.4},
+                model_metadata={},
+                enable_csv_dump=False,
+                show_progress=False,
+                emit_diagnostics=False,
+            )
+        return backtester, data
+
+    def test_batch_probabilities_match_per_row_path(self):
+        backtester, data = self.make_backtester()
+
+        batch = backtester._predict_probabilities(data, chunk_rows=32, parity_rows=0)
+        expected = np.asarray([backtester._predict_row(row) for _, row in data.iterrows()], dtype=float)
+
+        np.testing.assert_allclose(batch, expected, rtol=0, atol=1e-12)
+
+    def test_parity_mismatch_falls_back_to_per_row(self):
+        backtester, data = self.make_backtester()
+        expected = np.asarray([backtester._predict_row(row) for _, row in data.iterrows()], dtype=float)
+
+        with patch(
+            "backtest.backtest.signal_engine.weighted_predict_proba_batch",
+            side_effect=lambda models, X, *args, **kwargs: np.full((len(X), 2), 0.5),
+        ):
+            probs = backtester._predict_probabilities(data, parity_rows=4)
+
+        np.testing.assert_allclose(probs, expected)
+
+    def test_precomputed_probabilities_skip_model_inference(self):
+        backtester, data = self.make_backtester()
+        backtester.data = data.iloc[:1].assign(long_prob=0.7, short_prob=0.2)
+        backtester.precomputed_probabilities = True
+
+        with patch.object(Backtester, "_predict_probabilities", side_effect=AssertionError("不应调用模型")):
+            backtester.run_backtest()
+
+        self.assertEqual(float(backtester.data["long_prob"].iloc[0]), 0.7)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from backtest import backtest
+from backtest.funding import FundingSchedule
+
+
+def sequential_due_counts(times, index):
+    """原逐 bar 推进口径：遇到 funding_time > ts 即停。"""
+    counts, cursor = [], 0
+    for ts in index:
+        while cursor < len(times) and not times[cursor] > ts:
+            cursor += 1
+        counts.append(cursor)
+    return counts
+
+
+class FundingScheduleTests(unittest.TestCase):
+    def setUp(self):
+        index = pd.date_range("2026-01-01", periods=48, freq="1h", tz="UTC")
+        close = np.linspace(100.0, 147.0, len(index))
+        close[9] = np.nan
+        self.prices = pd.Series(close, index=index)
+
+    def test_due_counts_and_marks_match_sequential_lookup(self):
+        times = [
+            pd.Timestamp("2025-12-31 20:00", tz="UTC"),
+            pd.Timestamp("2026-01-01 09:00", tz="UTC"),
+            pd.Timestamp("2026-01-01 17:30", tz="UTC"),
+            # 乱序事件要等前面更晚的事件到期后才结算
+            pd.Timestamp("2026-01-01 12:00", tz="UTC"),
+            pd.Timestamp("2026-01-02 01:00", tz="UTC"),
+            pd.Timestamp("2026-01-03 08:00", tz="UTC"),
+        ]
+        funding = pd.DataFrame({"funding_time": times, "funding_rate": np.linspace(-0.0003, 0.0002, len(times))})
+
+        schedule = FundingSchedule.build(funding, self.prices)
+
+        self.assertEqual(schedule.due_counts.tolist(), sequential_due_counts(times, self.prices.index))
+        self.assertEqual(schedule.times, times)
+        self.assertEqual(schedule.rates, [float(rate) for rate in funding["funding_rate"]])
+        expected_marks = [float(self.prices.asof(ts)) for ts in times]
+        np.testing.assert_array_equal(schedule.marks, expected_marks)
+        self.assertEqual(schedule.marks[1], self.prices.iloc[8])
+
+    def test_empty_history_has_no_due_events(self):
+        for funding in (None, pd.DataFrame(), pd.DataFrame(columns=["funding_time", "funding_rate"])):
+            schedule = FundingSchedule.build(funding, self.prices)
+            self.assertEqual(len(schedule), 0)
+            self.assertEqual(schedule.due_counts.tolist(), [0] * len(self.prices))
+
+
+
+class FundingWindowCacheTests(unittest.TestCase):
+    def setUp(self):
+        patches = [patch.dict(backtest._funding_windows, clear=True), patch("backtest.backtest.log_info")]
+        for item in patches:
+            item.start()
+            self.addCleanup(item.stop)
+        self.start = pd.Timestamp("2026-01-01 00:00", tz="UTC")
+        self.end = pd.Timestamp("2026-01-03 00:00", tz="UTC")
+
+    def history(self, first, periods):
+        times = pd.date_range(first, periods=periods, freq="8h", tz="UTC")
+        return pd.DataFrame({"funding_time": times, "funding_rate": [0.0001] * periods})
+
+    def fetch(self, responses):
+        patcher = patch("backtest.backtest.okx_api.OKXClient")
+        client = patcher.start()
+        self.addCleanup(patcher.stop)
+        client.return_value.fetch_funding_rate_history.side_effect = responses
+        return client.return_value.fetch_funding_rate_history
+
+    def test_only_complete_non_empty_windows_are_reused(self):
+        fetch = self.fetch([
+            pd.DataFrame(columns=["funding_time", "funding_rate"]),
+            # 分页中途放弃：没拉到窗口起点
+            self.history("2026-01-02 00:00", 4),
+            self.history("2025-12-31 16:00", 10),
+        ])
+
+        self.assertTrue(backtest._fetch_funding_window(self.start, self.end, 32).empty)
+        self.assertEqual(len(backtest._fetch_funding_window(self.start, self.end, 32)), 4)
+        complete = backtest._fetch_funding_window(self.start, self.end, 32)
+        again = backtest._fetch_funding_window(self.start, self.end, 32)
+
+        self.assertEqual(fetch.call_count, 3)
+        self.assertIs(again, complete)
+        self.assertEqual(len(complete), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
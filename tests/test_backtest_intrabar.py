@@ -1,6 +1,37 @@
+import os
+import tempfile
 import unittest
+from unittest.mock import patch
 
+import pandas as pd
+
+from backtest import array_engine, lockstep_engine, sweep
 from backtest.backtest import resolve_intrabar_tp_sl
+from backtest.intrabar_replay import IntrabarCandleStore, IntrabarReplay
+from tests.test_backtest_array_engine import BASE_CONFIG, make_backtester, make_market_data
+
+
+def fine_candles(start, path):
+    """按 path 中的价格依次生成 1m K 线，每根 open=前一价、close=当前价。"""
+    rows = []
+    for minute, (open_, close) in enumerate(zip(path[:-1], path[1:])):
+        rows.append({
+            "timestamp": start + pd.Timedelta(minutes=minute),
+            "open": open_,
+            "high": max(open_, close),
+            "low": min(open_, close),
+        })
+    return pd.DataFrame(rows)
+
+
+def high_first_fetcher(data, calls):
+    """用基础 K 线合成细粒度路径：开盘 -> 最高 -> 最低 -> 收盘。"""
+    def fetch(start_ts, end_ts):
+        calls.append(start_ts)
+        row = data.loc[start_ts]
+        path = [row["5m_open"], row["5m_high"], row["5m_low"], row["5m_close"], row["5m_close"], row["5m_close"]]
+        return fine_candles(start_ts, path)
+    return fetch
 
 
 class ResolveIntrabarTpSlTests(unittest.TestCase):
@@ -51,5 +82,127 @@ class ResolveIntrabarTpSlTests(unittest.TestCase):
         self.assertIsNone(hit)
 
 
+class IntrabarReplayTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_dir = directory.name
+        self.bar = pd.Timestamp("2026-01-01 00:05", tz="UTC")
+        self.calls = []
+
+    def make_replay(self, path, fetch=True):
+        def fetcher(start_ts, end_ts):
+            self.calls.append((start_ts, end_ts))
+            return fine_candles(start_ts, path)
+        return IntrabarReplay(IntrabarCandleStore(self.cache_dir, "1m", "TEST", fetcher if fetch else None))
+
+    def coarse_long_conflict(self):
+        return resolve_intrabar_tp_sl(1.0, 100.0, 100.0, 103.0, 98.0, 0.02, 0.01, worst_case=True)
+
+    def test_ambiguous_bar_is_replayed_on_fine_path_and_cached(self):
+        coarse = self.coarse_long_conflict()
+        self.assertTrue(coarse["ambiguous"])
+
+        replay = self.make_replay([100.0, 101.0, 103.0, 98.0, 99.0, 99.5])
+        hit = replay.resolve(self.bar, coarse, 1.0, 100.0, 0.02, 0.01)
+
+        self.assertEqual(hit["reason"], "TP")
+        self.assertAlmostEqual(hit["trigger_price"], 102.0)
+        self.assertEqual(self.calls, [(self.bar, self.bar + pd.Timedelta(minutes=5))])
+        self.assertEqual(replay.stats["sl_to_tp"], 1)
+
+        # 另一个进程 / 候选：只读本地缓存也能重放，不再拉取
+        cached = self.make_replay([], fetch=False)
+        with patch.dict("backtest.intrabar_replay._MEMORY", clear=True):
+            self.assertEqual(cached.resolve(self.bar, coarse, 1.0, 100.0, 0.02, 0.01)["reason"], "TP")
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(cached.summary()["store_disk"], 1)
+
+    def test_losing_cache_rename_race_counts_as_written(self):
+        store = IntrabarCandleStore(self.cache_dir, "1m", "TEST", lambda start_ts, end_ts: fine_candles(start_ts, [100.0, 103.0]))
+        path = store._path(self.bar)
+        real_replace = os.replace
+
+        def lose_race(source, target):
+            # 另一个进程先完成重命名，本进程的重命名随后失败
+            real_replace(source, target)
+            raise PermissionError(target)
+
+        with patch.dict("backtest.intrabar_replay._MEMORY", clear=True), \
+                patch("backtest.intrabar_replay.os.replace", side_effect=lose_race), \
+                patch("backtest.intrabar_replay.log_info") as log:
+            candles = store.candles(self.bar)
+
+        self.assertIsNotNone(candles)
+        log.assert_not_called()
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(path)])
+
+    def test_unambiguous_or_missing_data_keeps_coarse_result(self):
+        replay = self.make_replay([100.0, 98.0, 103.0], fetch=False)
+        single = resolve_intrabar_tp_sl(1.0, 100.0, 100.0, 100.5, 98.0, 0.02, 0.01)
+        self.assertIs(replay.resolve(self.bar, single, 1.0, 100.0, 0.02, 0.01), single)
+        self.assertIsNone(replay.resolve(self.bar, None, 1.0, 100.0, 0.02, 0.01))
+
+        coarse = self.coarse_long_conflict()
+        self.assertIs(replay.resolve(self.bar, coarse, 1.0, 100.0, 0.02, 0.01), coarse)
+        self.assertEqual(replay.stats["no_data"], 1)
+        self.assertEqual(self.calls, [])
+
+
+class IntrabarReplayEngineTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = {
+            **BASE_CONFIG,
+            "BACKTEST_INTRABAR_TP_SL": True,
+            "BACKTEST_INTRABAR_REPLAY_ENABLED": True,
+            "BACKTEST_INTRABAR_REPLAY_CACHE_DIR": os.path.join(directory.name, "candles"),
+            "ADAPTIVE_TAKE_PROFIT_MIN": 0.002,
+            "ADAPTIVE_STOP_LOSS_MIN": 0.002,
+            "ATR_TAKE_PROFIT_MULTIPLIER": 0.6,
+            "ATR_STOP_LOSS_MULTIPLIER": 0.6,
+        }
+        patches = [patch(f"config.config.{key}", value) for key, value in overrides.items()]
+        patches += [
+            patch("backtest.backtest.log_info"),
+            patch("backtest.array_engine.log_info"),
+            patch("backtest.lockstep_engine.log_info"),
+        ]
+        for item in patches:
+            item.start()
+            self.addCleanup(item.stop)
+        self.data = make_market_data(rows=1200, seed=5)
+        self.calls = []
+        fetcher = patch("backtest.intrabar_replay._okx_fetcher", return_value=high_first_fetcher(self.data, self.calls))
+        fetcher.start()
+        self.addCleanup(fetcher.stop)
+        memory = patch.dict("backtest.intrabar_replay._MEMORY", clear=True)
+        memory.start()
+        self.addCleanup(memory.stop)
+
+    def test_engines_agree_and_fetch_only_ambiguous_bars(self):
+        report = array_engine.check_parity(make_backtester(self.data))
+        self.assertTrue(report["match"], report["differences"])
+
+        backtester = array_engine.clone_backtester(make_backtester(self.data))
+        summary = backtester.run_backtest(engine="reference")
+        stats = summary["intrabar_replay"]
+        self.assertGreater(stats["ambiguous"], 0)
+        self.assertEqual(stats["replayed"], stats["ambiguous"])
+        self.assertGreater(stats.get("sl_to_tp", 0), 0)
+        self.assertEqual(len(set(self.calls)), len(self.calls))
+        self.assertLess(len(self.calls), len(self.data) // 10)
+
+        kwargs = sweep.seed_backtester_kwargs(make_backtester(self.data))
+        candidates = [("base", {}), ("worst_off", {"BACKTEST_WORST_CASE_TP_SL": False})]
+        lockstep = list(lockstep_engine.iter_lockstep_sweep(kwargs, candidates, summarize=lambda bt, result: (bt, result)))
+        for (name, overrides), (_, _, (candidate, result)) in zip(candidates, lockstep):
+            reference = sweep.build_candidate_backtester(kwargs, overrides)
+            reference_summary = array_engine.run_array_backtest(reference)
+            self.assertEqual(array_engine.compare_results(reference, candidate, reference_summary, result, tolerance=0.0), [], name)
+            self.assertEqual(result["intrabar_replay"]["ambiguous"], reference_summary["intrabar_replay"]["ambiguous"], name)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from backtest import array_engine, lockstep_engine, sweep
+from tests.test_backtest_array_engine import BASE_CONFIG, make_backtester, make_market_data
+
+
+CANDIDATES = [
+    ("base", {}),
+    ("strict", {"THRESHOLD_LONG": 0.7, "THRESHOLD_SHORT": 0.7, "SIGNAL_MIN_PROB_DIFF": 0.2}),
+    ("centered", {"POSITION_PROBABILITY_CENTER": 0.55, "MIN_SIGNAL_TARGET_RATIO": 0.005}),
+    ("wide_tp", {"ATR_TAKE_PROFIT_MULTIPLIER": 5.0, "ATR_STOP_LOSS_MULTIPLIER": 1.2, "MIN_HOLD_BARS": 4}),
+    ("adds", {"ADD_THRESHOLD": 0.05, "BLOCK_LOSING_POSITION_ADDS": False, "TRADE_COOLDOWN_BARS": 0}),
+]
+
+
+class LockstepEngineTests(unittest.TestCase):
+    def setUp(self):
+        patches = [patch(f"config.config.{key}", value) for key, value in BASE_CONFIG.items()]
+        patches += [
+            patch("backtest.backtest.log_info"),
+            patch("backtest.lockstep_engine.log_info"),
+        ]
+        for item in patches:
+            item.start()
+            self.addCleanup(item.stop)
+
+    def assert_matches_array_engine(self, data, candidates, funding_history=None):
+        kwargs = sweep.seed_backtester_kwargs(make_backtester(data, funding_history))
+        lockstep = list(lockstep_engine.iter_lockstep_sweep(kwargs, candidates, summarize=lambda bt, summary: (bt, summary)))
+        self.assertEqual([name for name, _, _ in lockstep], [name for name, _ in candidates])
+        for (name, overrides), (_, _, (backtester, summary)) in zip(candidates, lockstep):
+            reference = sweep.build_candidate_backtester(kwargs, overrides)
+            reference_summary = array_engine.run_array_backtest(reference)
+            differences = array_engine.compare_results(reference, backtester, reference_summary, summary, tolerance=0.0)
+            self.assertEqual(differences, [], name)
+            self.assertEqual(backtester.funding_log, reference.funding_log, name)
+        self.assertGreater(sum(summary["trade_count"] for _, _, (_, summary) in lockstep), 50)
+
+    def test_matches_array_engine_per_candidate(self):
+        funding = pd.DataFrame({
+            "funding_time": pd.date_range("2026-01-01 04:00", periods=12, freq="8h", tz="UTC"),
+            "funding_rate": np.linspace(-0.0004, 0.0006, 12),
+        })
+        self.assert_matches_array_engine(make_market_data(), CANDIDATES, funding)
+
+    def test_matches_array_engine_with_guards_and_intrabar(self):
+        guards = {
+            "REGIME_FILTER_ENABLED": True,
+            "TREND_FILTER_ENABLED": True,
+            "LOSS_CONDITION_GUARD_ENABLED": True,
+            "LOSS_GUARD_EXIT_REGIMES": "range_high_vol",
+            "LOSS_GUARD_EXIT_CONFIRM_BARS": 2,
+            "BACKTEST_INTRABAR_TP_SL": True,
+        }
+        candidates = [(name, {**guards, **overrides}) for name, overrides in CANDIDATES]
+        candidates.append(("best_case_fill", {**guards, "BACKTEST_WORST_CASE_TP_SL": False}))
+        self.assert_matches_array_engine(make_market_data(seed=11), candidates)
+
+    def test_groups_candidates_by_market_config(self):
+        data = make_market_data(rows=600)
+        kwargs = sweep.seed_backtester_kwargs(make_backtester(data))
+        candidates = [
+            ("a", {}),
+            ("b", {"REGIME_HIGH_VOLATILITY_THRESHOLD": 0.002}),
+            ("c", {"THRESHOLD_LONG": 0.7}),
+        ]
+        with patch.object(lockstep_engine, "run_lockstep_backtests", wraps=lockstep_engine.run_lockstep_backtests) as run:
+            results = list(lockstep_engine.iter_lockstep_sweep(kwargs, candidates))
+
+        self.assertEqual([len(call.args[0]) for call in run.call_args_list], [2, 1])
+        self.assertEqual([name for name, _, _ in results], ["a", "b", "c"])
+        for (_, overrides, summary) in results:
+            reference = array_engine.run_array_backtest(sweep.build_candidate_backtester(kwargs, overrides))
+            self.assertEqual(summary["final_equity"], reference["final_equity"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from backtest import lockstep_engine, sweep
+from backtest.result_cache import BacktestResultStore, normalized_overrides
+from config import config
+from run import backtest_result_cache as cli
+from tests.test_backtest_array_engine import BASE_CONFIG, make_backtester, make_market_data
+
+
+class BacktestResultCacheTests(unittest.TestCase):
+    def setUp(self):
+        patches = [patch(f"config.config.{key}", value) for key, value in BASE_CONFIG.items()]
+        patches += [
+            patch("backtest.backtest.log_info"),
+            patch("backtest.sweep.log_info"),
+            patch("backtest.lockstep_engine.log_info"),
+        ]
+        for item in patches:
+            item.start()
+            self.addCleanup(item.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = BacktestResultStore(directory.name)
+        self.data = make_market_data(rows=500)
+        self.kwargs = sweep.seed_backtester_kwargs(make_backtester(self.data))
+
+    def scope(self, kwargs=None, **options):
+        options.setdefault("kind", "summary")
+        options.setdefault("engine", "backtester")
+        options.setdefault("precomputed_probabilities", True)
+        return self.store.scope(kwargs or self.kwargs, **options)
+
+    def test_key_depends_on_content_not_on_redundant_overrides(self):
+        scope = self.scope()
+
+        self.assertEqual(scope.key({"THRESHOLD_LONG": config.THRESHOLD_LONG}), scope.key({}))
+        self.assertNotEqual(scope.key({"THRESHOLD_LONG": 0.71}), scope.key({}))
+        self.assertEqual(normalized_overrides({"THRESHOLD_LONG": 0.71, "THRESHOLD_SHORT": config.THRESHOLD_SHORT}), {"THRESHOLD_LONG": 0.71})
+        self.assertEqual(self.scope().key({}), scope.key({}))
+        self.assertNotEqual(self.scope(kind="walk_forward_compact").key({}), scope.key({}))
+        self.assertNotEqual(self.scope(engine="lockstep").key({}), scope.key({}))
+
+        shifted = make_market_data(rows=500)
+        shifted.iloc[-1, shifted.columns.get_loc("long_prob")] += 0.01
+        self.assertNotEqual(self.scope({**self.kwargs, "precomputed_data": shifted}).key({}), scope.key({}))
+        with patch.object(config, "TRADE_COOLDOWN_BARS", BASE_CONFIG["TRADE_COOLDOWN_BARS"] + 1):
+            self.assertNotEqual(self.scope().key({}), scope.key({}))
+
+    def test_model_driven_backtest_needs_artifact_hashes(self):
+        self.assertIsNone(self.scope(precomputed_probabilities=False))
+        first = self.scope(precomputed_probabilities=False, artifact_hashes={"lgb": "a"})
+        second = self.scope(precomputed_probabilities=False, artifact_hashes={"lgb": "b"})
+        self.assertNotEqual(first.key(), second.key())
+
+        precomputed_key = self.scope().key()
+        with patch("backtest.result_cache.inference_code_hash", return_value="changed"):
+            self.assertNotEqual(self.scope(precomputed_probabilities=False, artifact_hashes={"lgb": "a"}).key(), first.key())
+            # 预计算概率的回测不经过推理代码
+            self.assertEqual(self.scope().key(), precomputed_key)
+
+    def test_results_with_missing_intrabar_data_are_not_cached(self):
+        scope = self.scope()
+        partial = {"final_equity": 1.0, "intrabar_replay": {"ambiguous": 2, "no_data": 1}}
+
+        self.assertIsNone(scope.put({}, partial, name="base"))
+        self.assertIsNone(scope.get({}))
+        self.assertEqual(scope.stats["uncached"], 1)
+
+        complete = {**partial, "intrabar_replay": {"ambiguous": 2, "replayed": 2}}
+        self.assertEqual(scope.put({}, complete), scope.key({}))
+        self.assertEqual(scope.get({})["final_equity"], 1.0)
+
+    def test_prune_skips_entries_removed_by_another_process(self):
+        store = BacktestResultStore(self.store.cache_dir, keep=1)
+        store.save("first", {"final_equity": 1.0}, {"key": "first"})
+        vanished = store._path("first", ".joblib")
+        real_getmtime = os.path.getmtime
+
+        def getmtime(path):
+            if path == vanished:
+                raise FileNotFoundError(path)
+            return real_getmtime(path)
+
+        with patch("backtest.result_cache.os.path.getmtime", side_effect=getmtime):
+            store.save("second", {"final_equity": 2.0}, {"key": "second"})
+
+        self.assertEqual(store.load("second")["final_equity"], 2.0)
+        self.assertFalse(any(".tmp-" in name for name in os.listdir(store.cache_dir)))
+
+    def test_sweep_second_run_is_served_from_cache(self):
+        candidates = [("base", {}), ("strict", {"THRESHOLD_LONG": 0.7, "THRESHOLD_SHORT": 0.7})]
+        calls = []
+
+        def run(backtester_kwargs, overrides):
+            calls.append(dict(overrides))
+            return sweep.run_sweep_candidate(backtester_kwargs, overrides)
+
+        first = sweep.run_sweep(self.kwargs, candidates, run=run, workers=1, cache=self.scope())
+        cache = self.scope()
+        second = sweep.run_sweep(self.kwargs, candidates, run=run, workers=1, cache=cache)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(cache.statuses, {"base": "hit", "strict": "hit"})
+        self.assertEqual([item["final_equity"] for item in second], [item["final_equity"] for item in first])
+
+        cache = self.scope()
+        sweep.run_sweep(self.kwargs, candidates + [("loose", {"THRESHOLD_LONG": 0.55})], run=run, workers=1, cache=cache)
+        self.assertEqual(calls[-1], {"THRESHOLD_LONG": 0.55})
+        self.assertEqual(cache.stats, {"hits": 2, "misses": 1})
+
+    def test_lockstep_sweep_skips_cached_candidates(self):
+        candidates = [("base", {}), ("strict", {"THRESHOLD_LONG": 0.7, "THRESHOLD_SHORT": 0.7})]
+        first = list(lockstep_engine.iter_lockstep_sweep(self.kwargs, candidates, cache=self.scope(engine="lockstep")))
+        with patch.object(lockstep_engine, "run_lockstep_backtests") as run:
+            second = list(lockstep_engine.iter_lockstep_sweep(self.kwargs, candidates, cache=self.scope(engine="lockstep")))
+
+        run.assert_not_called()
+        self.assertEqual(
+            [summary["final_equity"] for _, _, summary in second],
+            [summary["final_equity"] for _, _, summary in first],
+        )
+
+    def test_cli_lists_and_compares_cached_runs(self):
+        scope = self.scope()
+        base_key = scope.put({}, {"final_equity": 1000.0, "net_pnl_after_costs": 0.0}, name="base")
+        strict_key = scope.put({"THRESHOLD_LONG": 0.7}, {"final_equity": 1010.0, "net_pnl_after_costs": 10.0}, name="strict")
+
+        entries = self.store.entries()
+        self.assertEqual({entry["name"] for entry in entries}, {"base", "strict"})
+        self.assertEqual(cli.filter_entries(entries, name="str")[0]["key"], strict_key)
+
+        comparison = cli.compare_entries([self.store.resolve(base_key[:10]), self.store.resolve(strict_key[:10])])
+        self.assertEqual(comparison["headline"]["final_equity"], [1000.0, 1010.0])
+        self.assertEqual(comparison["only_diff"], {"THRESHOLD_LONG": [None, 0.7]})
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            cli.main(["--cache-dir", self.store.cache_dir, "list", "--kind", "summary"])
+        self.assertEqual(len(output.getvalue().strip().splitlines()), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import pickle
+import unittest
+from unittest.mock import patch
+
+from backtest import sweep
+from backtest.backtest import Backtester
+from backtest.settings import BacktestSettings
+from config import config
+from tests.test_backtest_array_engine import BASE_CONFIG, make_backtester, make_market_data
+
+
+def summarize_equity(backtester, summary):
+    return {
+        "final_equity": summary["final_equity"],
+        "trade_count": summary["trade_count"],
+        "threshold_long": backtester.settings.THRESHOLD_LONG,
+    }
+
+
+class BacktestSettingsTests(unittest.TestCase):
+    def test_overrides_take_priority_and_fall_back_to_config(self):
+        settings = BacktestSettings.from_overrides({"THRESHOLD_LONG": 0.71})
+
+        self.assertEqual(settings.THRESHOLD_LONG, 0.71)
+        self.assertEqual(settings.THRESHOLD_SHORT, config.THRESHOLD_SHORT)
+        self.assertEqual(settings.as_dict(), {"THRESHOLD_LONG": 0.71})
+        self.assertIs(BacktestSettings.from_overrides(settings), settings)
+
+    def test_unknown_override_is_rejected(self):
+        with self.assertRaises(KeyError):
+            BacktestSettings.from_overrides({"NOT_A_CONFIG_KEY": 1})
+
+    def test_settings_pickle_round_trip(self):
+        settings = BacktestSettings.from_overrides({"THRESHOLD_LONG": 0.71})
+        restored = pickle.loads(pickle.dumps(settings))
+
+        self.assertEqual(restored, settings)
+        self.assertEqual(restored.THRESHOLD_LONG, 0.71)
+
+
+class BacktestSweepTests(unittest.TestCase):
+    def setUp(self):
+        patches = [patch(f"config.config.{key}", value) for key, value in BASE_CONFIG.items()]
+        patches.append(patch("backtest.backtest.log_info"))
+        patches.append(patch("backtest.sweep.log_info"))
+        for item in patches:
+            item.start()
+            self.addCleanup(item.stop)
+        self.data = make_market_data(rows=800)
+        self.kwargs = sweep.seed_backtester_kwargs(make_backtester(self.data))
+        self.candidates = [
+            ("base", {}),
+            ("strict", {"THRESHOLD_LONG": 0.7, "THRESHOLD_SHORT": 0.7}),
+            ("loose", {"THRESHOLD_LONG": 0.55, "MIN_HOLD_BARS": 4}),
+        ]
+
+    def test_settings_match_patched_global_config(self):
+        overrides = {"THRESHOLD_LONG": 0.7, "TRADE_COOLDOWN_BARS": 4}
+        result = sweep.run_sweep_candidate(self.kwargs, overrides)
+        with patch.multiple(config, **overrides):
+            backtester = make_backtester(self.data)
+            expected = backtester.run_backtest()
+
+        self.assertEqual(result["final_equity"], expected["final_equity"])
+        self.assertEqual(result["trade_count"], expected["trade_count"])
+        self.assertEqual(config.THRESHOLD_LONG, BASE_CONFIG["THRESHOLD_LONG"])
+
+    def test_parallel_results_match_serial_in_candidate_order(self):
+        serial = sweep.run_sweep(self.kwargs, self.candidates, run=run_summarized, workers=1)
+        parallel = sweep.run_sweep(self.kwargs, self.candidates, run=run_summarized, workers=2)
+
+        self.assertEqual([item["name"] for item in parallel], ["base", "strict", "loose"])
+        self.assertEqual(parallel, serial)
+        self.assertEqual(serial[1]["threshold_long"], 0.7)
+
+    def test_probability_key_must_match_seed(self):
+        with self.assertRaises(ValueError):
+            list(sweep.iter_sweep(self.kwargs, [("gap", {"TREND_FILTER_MIN_GAP": 0.5})], workers=1))
+
+    def test_seed_with_probability_override_recomputes_probabilities(self):
+        seed_bt = make_backtester(self.data)
+        with patch.object(Backtester, "_predict_probabilities", return_value=[[0.4, 0.6]] * len(self.data)) as predict:
+            kwargs = sweep.seed_backtester_kwargs(seed_bt, overrides={"TREND_FILTER_MIN_GAP": 0.5, "THRESHOLD_LONG": 0.7})
+
+        predict.assert_called_once()
+        self.assertEqual(kwargs["settings"].as_dict(), {"TREND_FILTER_MIN_GAP": 0.5})
+        self.assertEqual(float(kwargs["precomputed_data"]["long_prob"].iloc[0]), 0.4)
+        self.assertNotEqual(float(self.data["long_prob"].iloc[0]), 0.4)
+
+
+def run_summarized(backtester_kwargs, overrides):
+    return sweep.run_sweep_candidate(backtester_kwargs, overrides, summarize=summarize_equity)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+from lightgbm import LGBMClassifier
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+
+from config import config
+from train import binned_dataset
+from train.parallel_fit import FitJob
+
+
+def make_frame(rows=400, seed=7):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2025-01-01", periods=rows, freq="5min")
+    X = pd.DataFrame(rng.normal(size=(rows, 4)), index=index, columns=["f0", "f1", "f2", "f3"])
+    y = pd.Series((X["f0"] + 0.5 * X["f1"] + rng.normal(scale=0.3, size=rows) > 0).astype(int), index=index)
+    return X, y
+
+
+def xgb_model():
+    return XGBClassifier(n_estimators=10, max_depth=3, tree_method="hist", n_jobs=1)
+
+
+def lgb_model():
+    return LGBMClassifier(n_estimators=20, num_leaves=7, min_child_samples=5, random_state=0, verbose=-1, n_jobs=1)
+
+
+class BinnedFeatureMatrixTests(unittest.TestCase):
+    def test_positions_require_known_ordered_rows(self):
+        X, _ = make_frame(rows=20)
+        matrix = binned_dataset.BinnedFeatureMatrix.from_frame(X)
+
+        np.testing.assert_array_equal(matrix.positions(X.iloc[5:10]), np.arange(5, 10))
+        self.assertIsNone(matrix.positions(X.iloc[[3, 1]]))
+        self.assertIsNone(matrix.positions(X[["f1", "f0", "f2", "f3"]]))
+        shifted = X.iloc[:3].copy()
+        shifted.index = shifted.index + pd.Timedelta(days=1)
+        self.assertIsNone(matrix.positions(shifted))
+
+    def test_full_rows_match_plain_xgboost_fit(self):
+        X, y = make_frame()
+        matrix = binned_dataset.BinnedFeatureMatrix.from_frame(X)
+        plain = xgb_model().fit(X, y)
+        shared = xgb_model()
+
+        FitJob("global", "xgb_v1", shared, X, y, binned_matrix=matrix).fit()
+
+        np.testing.assert_allclose(shared.predict_proba(X), plain.predict_proba(X))
+        self.assertEqual(list(shared.feature_names_in_), list(X.columns))
+        self.assertEqual(shared.classes_.tolist(), [0, 1])
+
+    def test_subset_fit_uses_its_own_labels_and_weights(self):
+        X, y = make_frame()
+        matrix = binned_dataset.BinnedFeatureMatrix.from_frame(X)
+        X_sub = X.iloc[100:300]
+        y_sub = 1 - y.iloc[100:300]
+        weight = np.linspace(0.5, 1.5, len(y_sub))
+        model = xgb_model()
+
+        FitJob("long", "xgb_v1", model, X_sub, y_sub, sample_weight=weight, binned_matrix=matrix).fit()
+
+        accuracy = float((model.predict(X_sub) == y_sub.to_numpy()).mean())
+        self.assertGreater(accuracy, 0.7)
+        self.assertEqual(len(matrix._xgb_references), 1)
+
+    def test_other_estimators_fit_unchanged(self):
+        X, y = make_frame()
+        matrix = binned_dataset.BinnedFeatureMatrix.from_frame(X)
+        plain = lgb_model().fit(X, y)
+        lgb_shared = lgb_model()
+        forest = RandomForestClassifier(n_estimators=3, random_state=0)
+
+        FitJob("global", "lgb_v1", lgb_shared, X, y, binned_matrix=matrix).fit()
+        FitJob("global", "rf_v1", forest, X, y, binned_matrix=matrix).fit()
+
+        np.testing.assert_allclose(lgb_shared.predict_proba(X), plain.predict_proba(X))
+        self.assertTrue(hasattr(forest, "estimators_"))
+        self.assertEqual(matrix._xgb_references, {})
+
+    def test_shared_binning_is_opt_in(self):
+        with patch.object(config, "MODEL_TRAIN_SHARED_BINNING", False):
+            self.assertFalse(binned_dataset.shared_binning_enabled())
+        with patch.object(config, "MODEL_TRAIN_SHARED_BINNING", True):
+            self.assertTrue(binned_dataset.shared_binning_enabled())
+
+if __name__ == "__main__":
+    unittest.main()
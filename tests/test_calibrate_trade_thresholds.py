@@ -220,14 +220,19 @@ class TradeThresholdCalibrationTests(unittest.TestCase):
         }]
 
         with patch.object(calibration, "fit_label_strength_candidate", return_value=(predicted, metadata, {"rows": 2})):
-            with patch.object(calibration, "run_candidate", return_value={
+            summary = {
                 "closed_trade_count": 2,
                 "trade_count": 2,
                 "net_pnl_after_costs": 3.0,
                 "profit_factor": 2.0,
                 "win_rate_pct": 50.0,
                 "max_drawdown_pct": -0.1,
-            }):
+            }
+            with patch.object(
+                calibration,
+                "run_candidates",
+                side_effect=lambda _seed, _data, candidates: ((item, dict(summary)) for item in candidates),
+            ):
                 report = calibration.build_label_strength_model_sweep(
                     SimpleNamespace(data=predicted),
                     ["feature"],
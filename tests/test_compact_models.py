@@ -0,0 +1,124 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import joblib
+import numpy as np
+import pandas as pd
+from lightgbm import LGBMClassifier
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+from xgboost import XGBClassifier
+
+from core import signal_engine
+from core.compact_models import MANIFEST_NAME, TRAINING_LIBRARIES, load_compact_models
+from core.compiled_trees import is_compiled, probe_frame, compiled_arena
+from core.direction_quality import BinaryProbabilityCalibrator, DirectionQualityModel
+from utils.utils import BASE_DIR
+
+
+COLUMNS = ["f0", "f1", "f2", "regime_trend_long", "trend_bias_num"]
+
+
+def make_frame(rows=400, seed=3):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(rows, len(COLUMNS))), columns=COLUMNS)
+    X["trend_bias_num"] = rng.choice([-1.0, 0.0, 1.0], size=rows)
+    X["regime_trend_long"] = rng.choice([0.0, 1.0], size=rows)
+    X.loc[::9, "f2"] = np.nan
+    y = pd.Series(((X["f0"] + X["f1"] * X["trend_bias_num"] + rng.normal(scale=0.5, size=rows)) > 0).astype(int))
+    return X, y
+
+
+def write_models(root, X, y):
+    grid = np.linspace(0.0, 1.0, 40)
+    sigmoid = LogisticRegression().fit(grid.reshape(-1, 1), (grid > 0.4).astype(int))
+    isotonic = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip").fit(grid, np.clip(grid * 1.2 - 0.1, 0, 1))
+    lgb = LGBMClassifier(n_estimators=20, num_leaves=7, min_child_samples=5, verbose=-1, n_jobs=1)
+    models = {
+        "lgb_v1": DirectionQualityModel(
+            lgb.fit(X, y),
+            direction_models={"long": LGBMClassifier(n_estimators=10, verbose=-1, n_jobs=1).fit(X, y)},
+            direction_calibrators={"long": BinaryProbabilityCalibrator(method="sigmoid", model=sigmoid)},
+            direction_regime_calibrators={
+                "long": {"trend_long": BinaryProbabilityCalibrator(method="isotonic", model=isotonic)},
+            },
+            diagnostics={"long": {"trade_pct": np.float64(41.5)}},
+        ),
+        "xgb_v1": XGBClassifier(n_estimators=15, max_depth=3, n_jobs=1).fit(X, y),
+        "rf_v1": RandomForestClassifier(n_estimators=8, max_depth=4, random_state=0, n_jobs=1).fit(X, y),
+        "logit": LogisticRegression().fit(X.fillna(0.0), y),
+    }
+    paths = {}
+    for name, model in models.items():
+        paths[name] = os.path.join(root, f"{name}.pkl")
+        joblib.dump(model, paths[name])
+    feature_path = os.path.join(root, "feature_list.pkl")
+    joblib.dump(list(COLUMNS), feature_path)
+    return models, paths, feature_path
+
+
+class CompactModelsTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.root = cls.tmp.name
+        cls.X, cls.y = make_frame()
+        cls.models, cls.paths, cls.feature_path = write_models(cls.root, cls.X, cls.y)
+        cls.compact_dir = os.path.join(cls.root, "compact")
+        cls.loaded = load_compact_models(cls.paths, cls.feature_path, root=cls.compact_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_compact_models_match_native_probabilities(self):
+        self.assertEqual(self.loaded["feature_cols"], COLUMNS)
+        self.assertTrue(is_compiled(self.loaded["models"]["lgb_v1"]))
+        self.assertTrue(is_compiled(self.loaded["models"]["xgb_v1"]))
+        self.assertIsInstance(self.loaded["models"]["logit"], LogisticRegression)
+        probe = probe_frame(compiled_arena(self.loaded["models"]), COLUMNS, rows=200)
+        for frame in (self.X, probe):
+            for name, model in self.models.items():
+                np.testing.assert_allclose(
+                    self.loaded["models"][name].predict_proba(frame.fillna(0.0) if name == "logit" else frame),
+                    model.predict_proba(frame.fillna(0.0) if name == "logit" else frame),
+                    rtol=0,
+                    atol=1e-6,
+                    err_msg=name,
+                )
+        self.assertEqual(self.loaded["models"]["lgb_v1"].diagnostics["long"]["trade_pct"], 41.5)
+
+    def test_arrays_are_memory_mapped_and_reused_for_same_sources(self):
+        arena = compiled_arena(self.loaded["models"])
+        self.assertIsInstance(arena.threshold, np.memmap)
+        again = load_compact_models(self.paths, self.feature_path, root=self.compact_dir, build=False)
+        self.assertEqual(again["directory"], self.loaded["directory"])
+        self.assertEqual(
+            signal_engine.model_artifact_hash(again["models"]["rf_v1"]),
+            signal_engine.model_artifact_hash(signal_engine.load_models({"rf_v1": self.paths["rf_v1"]})["rf_v1"]),
+        )
+        with open(os.path.join(self.loaded["directory"], MANIFEST_NAME), "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+        self.assertEqual(manifest["models"]["logit"]["kind"], "joblib")
+
+    def test_loading_compact_models_does_not_import_training_libraries(self):
+        paths = {name: path for name, path in self.paths.items() if name != "logit"}
+        load_compact_models(paths, self.feature_path, root=self.compact_dir)
+        script = (
+            "import json, sys\n"
+            "from core.compact_models import load_compact_models\n"
+            f"loaded = load_compact_models({paths!r}, {self.feature_path!r}, root={self.compact_dir!r}, build=False)\n"
+            f"print(json.dumps([name for name in {list(TRAINING_LIBRARIES)!r} if name in sys.modules]))\n"
+        )
+        env = dict(os.environ, PYTHONPATH=BASE_DIR)
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env, cwd=BASE_DIR, check=True)
+        self.assertEqual(json.loads(result.stdout.strip().splitlines()[-1]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from lightgbm import LGBMClassifier
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from xgboost import XGBClassifier
+
+from core import signal_engine
+from core.compiled_trees import (
+    CompiledTreeEnsemble,
+    compile_models,
+    compiled_arena,
+    is_compiled,
+    latency_percentiles,
+    probe_frame,
+)
+from core.direction_quality import BinaryProbabilityCalibrator, DirectionQualityModel
+
+
+COLUMNS = ["f0", "f1", "f2", "f3", "trend_bias_num"]
+
+
+def make_frame(rows=600, seed=5):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(rows, len(COLUMNS))), columns=COLUMNS)
+    X["trend_bias_num"] = rng.choice([-1.0, 0.0, 1.0], size=rows)
+    X.loc[::11, "f2"] = np.nan
+    X.loc[::7, "f3"] = 0.0
+    y = pd.Series(((X["f0"] + X["f1"] * X["trend_bias_num"] + rng.normal(scale=0.5, size=rows)) > 0).astype(int))
+    return X, y
+
+
+def fitted_models(X, y):
+    def lgb(**params):
+        return LGBMClassifier(n_estimators=30, num_leaves=15, min_child_samples=5, verbose=-1, n_jobs=1, **params).fit(X, y)
+
+    calibration = LogisticRegression().fit(np.linspace(0.0, 1.0, 20).reshape(-1, 1), np.resize([0, 1], 20))
+    return {
+        "lgb_v1": DirectionQualityModel(
+            lgb(),
+            direction_models={"long": lgb(), "short": lgb(zero_as_missing=True)},
+            direction_calibrators={"long": BinaryProbabilityCalibrator(method="sigmoid", model=calibration)},
+        ),
+        "xgb_v1": DirectionQualityModel(XGBClassifier(n_estimators=30, max_depth=4, n_jobs=1).fit(X, y)),
+        "rf_v1": DirectionQualityModel(RandomForestClassifier(n_estimators=20, max_depth=5, random_state=0, n_jobs=1).fit(X, y)),
+    }
+
+
+class CompiledTreesTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.X, cls.y = make_frame()
+        cls.models = fitted_models(cls.X, cls.y)
+        cls.compiled = compile_models(cls.models, feature_cols=COLUMNS)
+
+    def test_all_tree_models_share_one_arena(self):
+        self.assertTrue(all(is_compiled(model) for model in self.compiled.values()))
+        arena = compiled_arena(self.compiled)
+        self.assertIs(self.compiled["lgb_v1"].direction_models["short"].arena, arena)
+        self.assertIs(self.compiled["rf_v1"].global_model.arena, arena)
+        self.assertEqual(len(arena.roots), 30 * 3 + 30 + 20)
+        self.assertIs(self.compiled["lgb_v1"].direction_calibrators, self.models["lgb_v1"].direction_calibrators)
+
+    def test_probabilities_match_native_models(self):
+        frames = [self.X, probe_frame(compiled_arena(self.compiled), COLUMNS, rows=200)]
+        for frame in frames:
+            for name, model in self.models.items():
+                np.testing.assert_allclose(
+                    self.compiled[name].predict_proba(frame),
+                    model.predict_proba(frame),
+                    rtol=0,
+                    atol=1e-6,
+                    err_msg=name,
+                )
+
+    def test_weighted_predict_proba_matches_per_bar(self):
+        weights = {"lgb_v1": 0.5, "xgb_v1": 0.3, "rf_v1": 0.2}
+        for i, trend_bias in zip(range(0, 60, 6), ["long", "short", "neutral"] * 4):
+            row = self.X.iloc[i:i + 1]
+            native = signal_engine.weighted_predict_proba(self.models, row, weights, trend_bias=trend_bias)
+            fast = signal_engine.weighted_predict_proba(self.compiled, row, weights, trend_bias=trend_bias)
+            np.testing.assert_allclose(fast, native, rtol=0, atol=1e-6)
+
+    def test_unsupported_or_mismatched_models_keep_native_inference(self):
+        logistic = LogisticRegression().fit(self.X.fillna(0.0), self.y)
+        compiled = compile_models({"logit": logistic, "rf_v1": self.models["rf_v1"]}, feature_cols=COLUMNS)
+        self.assertIs(compiled["logit"], logistic)
+        self.assertTrue(is_compiled(compiled["rf_v1"]))
+
+        strict = compile_models({"xgb_v1": self.models["xgb_v1"]}, feature_cols=COLUMNS, tolerance=-1.0)
+        self.assertIs(strict["xgb_v1"], self.models["xgb_v1"])
+
+    def test_compiled_estimator_reorders_columns_by_feature_names(self):
+        estimator = self.compiled["xgb_v1"].global_model
+        self.assertIsInstance(estimator, CompiledTreeEnsemble)
+        shuffled = self.X[list(reversed(COLUMNS))]
+        np.testing.assert_allclose(estimator.predict_proba(shuffled), estimator.predict_proba(self.X))
+
+    def test_latency_percentiles_in_milliseconds(self):
+        summary = latency_percentiles([0.001] * 99 + [0.01])
+        self.assertEqual(summary["count"], 100)
+        self.assertAlmostEqual(summary["p50_ms"], 1.0)
+        self.assertGreater(summary["p99_ms"], 1.0)
+        self.assertIsNone(latency_percentiles([])["p50_ms"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+from lightgbm import LGBMClassifier
+
+from config import config
+from train import feature_pruning
+
+
+def make_frame(rows=1600, seed=4):
+    rng = np.random.default_rng(seed)
+    signal = rng.normal(size=rows)
+    second = rng.normal(size=rows)
+    X = pd.DataFrame({
+        "signal": signal,
+        "second": second,
+        "signal_copy": signal * 2.0 + 1e-6 * rng.normal(size=rows),
+        "noise_a": rng.normal(size=rows),
+        "noise_b": rng.normal(size=rows),
+        "constant": np.ones(rows),
+        "trend_bias_num": rng.choice([-1.0, 0.0, 1.0], size=rows),
+    })
+    y = pd.Series(((signal + 0.7 * second + rng.normal(scale=0.6, size=rows)) > 0).astype(int))
+    return X, y
+
+
+def make_estimator():
+    return LGBMClassifier(n_estimators=30, num_leaves=7, min_child_samples=20, verbose=-1, n_jobs=1, random_state=0)
+
+
+class FeaturePruningTests(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.multiple(
+            config,
+            MODEL_FEATURE_PRUNE_FOLDS=2,
+            MODEL_FEATURE_PRUNE_PERMUTATION_REPEATS=1,
+            MODEL_FEATURE_PRUNE_MIN_FEATURES=2,
+            MODEL_FEATURE_PRUNE_MIN_GAIN_SHARE=0.02,
+            MODEL_FEATURE_PRUNE_QUALITY_TOLERANCE=0.01,
+            MODEL_PURGE_BARS=5,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_folds_are_expanding_and_purged(self):
+        folds = feature_pruning.pruning_folds(1000, folds=3, purge_bars=10, min_train_rows=100, min_validation_rows=50)
+
+        self.assertEqual(folds, [(250, 260, 500), (500, 510, 750), (750, 760, 1000)])
+        self.assertEqual(feature_pruning.pruning_folds(100, folds=3, min_train_rows=200), [])
+
+    def test_drops_redundant_and_noise_features_but_keeps_protected(self):
+        X, y = make_frame()
+
+        summary = feature_pruning.select_features(X, y, list(X.columns), make_estimator, max_rows=0)
+
+        kept = summary["feature_cols"]
+        self.assertIn("second", kept)
+        self.assertIn("trend_bias_num", kept)
+        self.assertEqual(len({"signal", "signal_copy"} & set(kept)), 1)
+        self.assertTrue(any(reason.startswith("redundant:") for reason in summary["dropped"].values()))
+        self.assertEqual(summary["dropped"].get("constant"), "low_importance")
+        self.assertLessEqual(summary["baseline_score"] - summary["pruned_score"], 0.01)
+        self.assertEqual(kept, [col for col in X.columns if col in kept])
+
+    def test_quality_tolerance_backs_off_to_keep_useful_features(self):
+        X, y = make_frame()
+
+        with patch.multiple(config, MODEL_FEATURE_PRUNE_MIN_GAIN_SHARE=0.6, MODEL_FEATURE_PRUNE_QUALITY_TOLERANCE=0.0):
+            summary = feature_pruning.select_features(X, y, list(X.columns), make_estimator, max_rows=0)
+
+        self.assertIn("second", summary["feature_cols"])
+        self.assertGreaterEqual(len(summary["attempts"]), 1)
+        self.assertLessEqual(summary["baseline_score"] - summary["pruned_score"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from train import hyperparameter_search as search
+from train.train import build_model_estimators
+
+
+def make_matrix_inputs(rows=50):
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2025-01-01", periods=rows, freq="5min", tz="UTC")
+    X = pd.DataFrame(rng.normal(size=(rows, 3)), index=index, columns=["f0", "f1", "f2"])
+    y = pd.Series((X["f0"] > 0).astype(int), index=index)
+    context = X.copy()
+    context["label_regime"] = "range"
+    context["target"] = y
+    return X, y, context
+
+
+class HyperparameterSearchTests(unittest.TestCase):
+    def test_search_config_keys_are_accepted_by_build_model_estimators(self):
+        models = build_model_estimators({
+            "lgb_n_estimators": "40",
+            "lgb_max_depth": 4,
+            "xgb_learning_rate": 0.05,
+            "rf_min_samples_leaf": 5,
+        })
+
+        self.assertEqual(models["lgb_v1"].n_estimators, 40)
+        self.assertEqual(models["lgb_v1"].max_depth, 4)
+        self.assertEqual(models["xgb_v1"].learning_rate, 0.05)
+        self.assertEqual(models["rf_v1"].min_samples_leaf, 5)
+        self.assertEqual(models["rf_v1"].max_depth, 6)
+
+    def test_sample_trials_are_unique_and_capped_by_space(self):
+        space = {"lgb_max_depth": [4, 6], "rf_max_depth": [4, 6]}
+
+        trials = search.sample_trials(space, 10, seed=1)
+
+        self.assertEqual(len(trials), 4)
+        self.assertEqual(len({tuple(sorted(trial.items())) for trial in trials}), 4)
+        self.assertEqual(search.sample_trials(space, 3, seed=1), trials[:3])
+
+    def test_shared_matrix_round_trip_is_memory_mapped(self):
+        X, y, context = make_matrix_inputs()
+        with tempfile.TemporaryDirectory() as tmp:
+            search.SharedTrainingMatrix.write(tmp, X, y, context)
+            matrix = search.SharedTrainingMatrix.load(tmp)
+
+            self.assertIsInstance(matrix.features, np.memmap)
+            X_slice, y_slice, context_slice = matrix.frame(10, 20)
+
+        np.testing.assert_allclose(X_slice.to_numpy(), X.iloc[10:20].to_numpy(), rtol=1e-6)
+        self.assertTrue(y_slice.equals(y.iloc[10:20]))
+        self.assertEqual(list(context_slice.columns), ["label_regime", "target", "f0", "f1", "f2"])
+
+    def test_successive_halving_prunes_weak_trials_on_first_folds(self):
+        trial_configs = [{"lgb_max_depth": depth} for depth in range(9)]
+        folds = [
+            {"fold": number, "train_start_pos": 0, "train_end_pos": 10, "validation_start_pos": 10, "validation_end_pos": 20}
+            for number in (1, 2, 3)
+        ]
+        calls = []
+
+        def evaluate(trial_id, estimator_config, fold):
+            calls.append((trial_id, fold["fold"]))
+            return trial_id, fold["fold"], estimator_config["lgb_max_depth"] / 10.0, 0.01
+
+        result = search.successive_halving_search(None, folds, trial_configs, eta=3, evaluate=evaluate)
+
+        self.assertEqual(result["best_estimator_config"], {"lgb_max_depth": 8})
+        self.assertEqual([rung["evaluated"] for rung in result["rungs"]], [9, 3])
+        self.assertEqual(len(calls), 12)
+        self.assertEqual({trial_id for trial_id, fold in calls if fold == 2}, {6, 7, 8})
+        statuses = {trial["trial"]: trial["status"] for trial in result["trials"]}
+        self.assertEqual(statuses[8], "completed")
+        self.assertEqual(sum(status == "pruned" for status in statuses.values()), 8)
+        first_rung_best = [point["best_score"] for point in result["best_so_far"] if point["rung"] == 0]
+        self.assertEqual(first_rung_best, sorted(first_rung_best))
+        self.assertGreater(result["trials_per_hour"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from config import config
+from core import model_reload
+from core.direction_quality import DirectionQualityModel
+from run.live_trading_monitor import LiveTrader
+from utils.utils import sha256_file
+
+
+FEATURES = ["f0", "f1", "trend_bias_num"]
+WEIGHTS = {"rf_a": 1.0}
+
+
+def write_bundle(root, *, seed=0, features=FEATURES, hash_override=None):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(120, len(features))), columns=features)
+    y = (X[features[0]] > 0).astype(int)
+    forest = RandomForestClassifier(n_estimators=4, max_depth=3, random_state=seed, n_jobs=1).fit(X, y)
+    paths = {
+        "models": {"rf_a": os.path.join(root, "rf_a.pkl")},
+        "feature_list": os.path.join(root, "features.pkl"),
+        "metadata": os.path.join(root, "metadata.json"),
+    }
+    joblib.dump(DirectionQualityModel(forest, direction_models={"long": forest}), paths["models"]["rf_a"])
+    joblib.dump(list(features), paths["feature_list"])
+    artifact_hashes = {
+        os.path.relpath(path, model_reload.BASE_DIR): sha256_file(path)
+        for path in (paths["models"]["rf_a"], paths["feature_list"])
+    }
+    artifact_hashes.update(hash_override or {})
+    with open(paths["metadata"], "w", encoding="utf-8") as file:
+        json.dump({"created_at": f"seed-{seed}", "feature_count": len(features), "artifact_hashes": artifact_hashes}, file)
+    return paths
+
+
+class ModelReloadTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        patcher = patch.multiple(
+            config,
+            MODEL_WEIGHTS=WEIGHTS,
+            MODEL_DIRECTION_MODEL_WEIGHTS={},
+            MODEL_COMPACT_DIR=os.path.join(self.root, "compact"),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        lock_patcher = patch.object(model_reload, "RETRAIN_LOCK_PATH", os.path.join(self.root, "model_retrain.lock"))
+        lock_patcher.start()
+        self.addCleanup(lock_patcher.stop)
+
+    def touch_forward(self, paths, step_ns=10**9):
+        for path in [*paths["models"].values(), paths["feature_list"], paths["metadata"]]:
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + step_ns))
+
+    def test_watcher_stages_validated_bundle_after_stable_manifest(self):
+        paths = write_bundle(self.root, seed=0)
+        initial = model_reload.load_model_bundle(paths, validate=True, compiled=False)
+        watcher = model_reload.ModelBundleWatcher(initial["signature"], paths=paths)
+        self.assertFalse(watcher.check_once())
+
+        write_bundle(self.root, seed=1)
+        self.touch_forward(paths)
+        self.assertFalse(watcher.check_once())
+        self.assertTrue(watcher.check_once())
+        self.assertFalse(watcher.check_once())
+
+        trader = LiveTrader.__new__(LiveTrader)
+        trader.models = initial["models"]
+        trader.feature_cols = initial["feature_cols"]
+        trader.model_metadata = initial["model_metadata"]
+        trader.model_reload_watcher = watcher
+        self.assertTrue(trader.apply_pending_model_bundle())
+        self.assertEqual(trader.model_metadata["created_at"], "seed-1")
+        self.assertIsNot(trader.models, initial["models"])
+        self.assertEqual(trader.model_bundle_signature, model_reload.manifest_signature(paths))
+        self.assertFalse(trader.apply_pending_model_bundle())
+        self.assertFalse(watcher.check_once())
+
+    def test_watcher_waits_for_retrain_lock(self):
+        paths = write_bundle(self.root, seed=0)
+        watcher = model_reload.ModelBundleWatcher(model_reload.manifest_signature(paths), paths=paths)
+        write_bundle(self.root, seed=1)
+        self.touch_forward(paths)
+        with open(model_reload.RETRAIN_LOCK_PATH, "w", encoding="utf-8") as file:
+            json.dump({"pid": os.getpid()}, file)
+
+        self.assertFalse(watcher.check_once())
+        self.assertFalse(watcher.check_once())
+        self.assertIsNone(watcher.take_pending())
+
+        os.remove(model_reload.RETRAIN_LOCK_PATH)
+        self.assertFalse(watcher.check_once())
+        self.assertTrue(watcher.check_once())
+
+    def test_rejects_bundle_with_mismatched_artifact_hash(self):
+        paths = write_bundle(self.root, seed=0)
+        watcher = model_reload.ModelBundleWatcher(model_reload.manifest_signature(paths), paths=paths)
+        rel_path = os.path.relpath(paths["models"]["rf_a"], model_reload.BASE_DIR)
+        write_bundle(self.root, seed=1, hash_override={rel_path: "0" * 64})
+        self.touch_forward(paths)
+
+        with patch.object(model_reload, "log_error") as log_error:
+            self.assertFalse(watcher.check_once())
+            self.assertFalse(watcher.check_once())
+        self.assertIn("产物哈希", log_error.call_args.args[0])
+        self.assertIsNone(watcher.take_pending())
+        # 同一份被拒绝的产物不会反复加载
+        self.assertFalse(watcher.check_once())
+
+    def test_rejects_bundle_with_feature_count_mismatch(self):
+        paths = write_bundle(self.root, seed=0)
+        rng = np.random.default_rng(0)
+        X = pd.DataFrame(rng.normal(size=(50, 2)), columns=["f0", "f1"])
+        forest = RandomForestClassifier(n_estimators=2, max_depth=2, random_state=0, n_jobs=1).fit(X, X["f0"] > 0)
+        joblib.dump(forest, paths["models"]["rf_a"])
+        with open(paths["metadata"], "w", encoding="utf-8") as file:
+            json.dump({"feature_count": len(FEATURES)}, file)
+
+        with self.assertRaisesRegex(RuntimeError, "输入特征数"):
+            model_reload.load_model_bundle(paths, validate=True, compiled=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
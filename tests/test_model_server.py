@@ -0,0 +1,107 @@
+import threading
+import types
+import unittest
+from unittest.mock import Mock, patch
+
+import pandas as pd
+
+from core import model_server
+from run.live_trading_monitor import LiveTrader
+
+
+# 用线程代替子进程驱动同一套协议，测试里的 loader/compute 不需要能被 pickle
+THREAD_CONTEXT = types.SimpleNamespace(Process=threading.Thread, Semaphore=threading.Semaphore)
+
+
+def fake_bundle():
+    return {"models": {"rf_a": object()}, "feature_cols": ["f0", "f1"], "model_metadata": {}, "signature": ("s",)}
+
+
+def echo_compute(bundle, request, options):
+    if request.get("price") is None:
+        raise ValueError("缺少价格")
+    closes = request["data_dict"]["5m"]["close"]
+    return (closes.index[-1], request["price"], 0.6, 0.4, float(closes.sum()), len(bundle["feature_cols"]))
+
+
+class SharedMemoryRingTests(unittest.TestCase):
+    def setUp(self):
+        self.ring = model_server.SharedMemoryRing.create(2, 4096, THREAD_CONTEXT)
+        self.addCleanup(self.ring.close)
+
+    def test_round_trip_wraps_around_slots(self):
+        for index in range(5):
+            self.ring.put({"seq": index, "values": list(range(index))})
+            self.assertEqual(self.ring.get(timeout=0.1), {"seq": index, "values": list(range(index))})
+
+        self.ring.put("a")
+        self.ring.put("b")
+        with self.assertRaisesRegex(TimeoutError, "已满"):
+            self.ring.put("c", timeout=0.01)
+        self.assertEqual([self.ring.get(timeout=0.1), self.ring.get(timeout=0.1)], ["a", "b"])
+        with self.assertRaises(TimeoutError):
+            self.ring.get(timeout=0.01)
+
+    def test_rejects_message_larger_than_slot(self):
+        with self.assertRaisesRegex(ValueError, "槽位容量"):
+            self.ring.put(b"x" * 8192)
+        # 超大消息不占用槽位
+        self.ring.put("ok", timeout=0.01)
+        self.ring.put("ok", timeout=0.01)
+
+
+class ModelServerClientTests(unittest.TestCase):
+    def make_client(self, **options):
+        client = model_server.ModelServerClient(
+            slots=2,
+            slot_bytes=1024 * 1024,
+            timeout_sec=5,
+            startup_timeout_sec=5,
+            options={"loader": fake_bundle, "compute": echo_compute, "hot_reload": False, **options},
+            context=THREAD_CONTEXT,
+        )
+        self.addCleanup(client.stop)
+        return client
+
+    def test_request_returns_worker_result_and_surfaces_errors(self):
+        client = self.make_client().start()
+        index = pd.date_range("2026-04-24", periods=3, freq="5min", tz="UTC")
+        data_dict = {"5m": pd.DataFrame({"close": [1.0, 2.0, 3.0]}, index=index)}
+
+        result = client.request_latest_features(data_dict, 101.5)
+        self.assertEqual(result, (index[-1], 101.5, 0.6, 0.4, 6.0, 2))
+
+        with self.assertRaisesRegex(RuntimeError, "缺少价格"):
+            client.request_latest_features(data_dict, None)
+        # 出错后子进程继续服务后续请求
+        self.assertEqual(client.request_latest_features(data_dict, 99.0)[1], 99.0)
+
+        worker = client._process
+        client.stop()
+        worker.join(timeout=2)
+        self.assertFalse(worker.is_alive())
+
+    def test_start_raises_when_worker_cannot_load_models(self):
+        def broken_loader():
+            raise FileNotFoundError("rf_a.pkl")
+
+        client = self.make_client(loader=broken_loader)
+        with self.assertRaisesRegex(RuntimeError, "模型加载失败: rf_a.pkl"):
+            client.start()
+        self.assertFalse(client.is_alive())
+
+    def test_live_trader_routes_features_through_model_server(self):
+        trader = LiveTrader.__new__(LiveTrader)
+        trader.model_server = Mock()
+        trader.model_server.request_latest_features.return_value = ("result",)
+        client = Mock()
+        client.fetch_data.return_value = {"5m": "candles"}
+        client.get_price.side_effect = RuntimeError("timeout")
+
+        with patch("run.live_trading_monitor.log_error"):
+            self.assertEqual(trader._get_latest_features(client), ("result",))
+        trader.model_server.request_latest_features.assert_called_once_with({"5m": "candles"}, None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import threading
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from train import parallel_fit
+
+
+class RecordingEstimator:
+    def __init__(self, log, label):
+        self.log = log
+        self.label = label
+
+    def fit(self, X, y, sample_weight=None):
+        self.log.append((self.label, len(y), threading.current_thread().name))
+        return self
+
+
+class ParallelFitTests(unittest.TestCase):
+    def test_thread_budget_never_oversubscribes(self):
+        self.assertEqual(parallel_fit.plan_thread_budget(3, 8, max_concurrent=0), (3, 2))
+        self.assertEqual(parallel_fit.plan_thread_budget(9, 4, max_concurrent=0), (4, 1))
+        self.assertEqual(parallel_fit.plan_thread_budget(9, 16, max_concurrent=2), (2, 8))
+        workers, threads = parallel_fit.plan_thread_budget(5, 12, max_concurrent=0)
+        self.assertLessEqual(workers * threads, 12)
+
+    def test_set_estimator_threads_uses_n_jobs(self):
+        model = RandomForestClassifier(n_estimators=2, n_jobs=-1)
+
+        self.assertTrue(parallel_fit.set_estimator_threads(model, 3))
+        self.assertEqual(model.n_jobs, 3)
+        self.assertFalse(parallel_fit.set_estimator_threads(object(), 3))
+
+    def test_fit_model_jobs_reports_each_model(self):
+        X = pd.DataFrame({"a": np.linspace(0.0, 1.0, 40)})
+        y = pd.Series([0, 1] * 20)
+        jobs = [
+            parallel_fit.FitJob("global", "rf_v1", RandomForestClassifier(n_estimators=3, random_state=0), X, y),
+            parallel_fit.FitJob("long", "rf_v1", RandomForestClassifier(n_estimators=3, random_state=0), X, y),
+        ]
+
+        report = parallel_fit.fit_model_jobs(jobs, cpu_budget=4, max_concurrent=0, parallel=True)
+
+        self.assertEqual(report["fit_count"], 2)
+        self.assertEqual(report["concurrent_fits"], 2)
+        self.assertEqual(report["threads_per_fit"], 2)
+        self.assertEqual([(item["bundle"], item["model"]) for item in report["fits"]], [
+            ("global", "rf_v1"),
+            ("long", "rf_v1"),
+        ])
+        for job in jobs:
+            self.assertEqual(job.model.n_jobs, 2)
+            self.assertTrue(hasattr(job.model, "estimators_"))
+
+    def test_shared_estimator_instance_is_fitted_in_submission_order(self):
+        log = []
+        shared = RecordingEstimator(log, "shared")
+        jobs = [
+            parallel_fit.FitJob("global", "m", shared, [0] * 3, [0, 1, 0]),
+            parallel_fit.FitJob("long", "m", RecordingEstimator(log, "other"), [0] * 2, [0, 1]),
+            parallel_fit.FitJob("short", "m", shared, [0] * 5, [0, 1, 0, 1, 0]),
+        ]
+
+        parallel_fit.fit_model_jobs(jobs, cpu_budget=4, max_concurrent=0, parallel=True)
+
+        shared_fits = [item for item in log if item[0] == "shared"]
+        self.assertEqual([item[1] for item in shared_fits], [3, 5])
+        self.assertEqual(shared_fits[0][2], shared_fits[1][2])
+
+    def test_sequential_mode_uses_full_budget_per_fit(self):
+        log = []
+        jobs = [
+            parallel_fit.FitJob("global", "a", RecordingEstimator(log, "a"), [0], [0]),
+            parallel_fit.FitJob("global", "b", RecordingEstimator(log, "b"), [0], [0]),
+        ]
+
+        report = parallel_fit.fit_model_jobs(jobs, cpu_budget=6, parallel=False)
+
+        self.assertEqual(report["concurrent_fits"], 1)
+        self.assertEqual(report["threads_per_fit"], 6)
+        self.assertEqual([item[0] for item in log], ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
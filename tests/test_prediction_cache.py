@@ -0,0 +1,157 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from config import config
+from core import signal_engine
+from core.direction_quality import DirectionQualityModel
+from core.prediction_cache import PredictionStore, cached_weighted_predict_proba_batch
+
+
+FEATURES = ["f0", "f1", "trend_bias_num"]
+WEIGHTS = {"rf_a": 0.6, "rf_b": 0.4}
+
+
+def make_frame(rows=80, seed=4):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(
+        {
+            "f0": rng.normal(size=rows),
+            "f1": rng.normal(size=rows),
+            "trend_bias_num": rng.choice([-1.0, 0.0, 1.0], size=rows),
+        },
+        index=pd.date_range("2026-01-01", periods=rows, freq="5min"),
+    )
+    trend_biases = np.where(X["trend_bias_num"] > 0, "long", np.where(X["trend_bias_num"] < 0, "short", "neutral")).tolist()
+    return X, trend_biases
+
+
+class PredictionCacheTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        patcher = patch.multiple(
+            config,
+            PREDICTION_CACHE_ENABLED=True,
+            PREDICTION_CACHE_DIR=os.path.join(self.tmp, "cache"),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.X, self.trend_biases = make_frame()
+        y = (self.X["f0"] > 0).astype(int)
+        paths = {}
+        for seed, name in enumerate(WEIGHTS):
+            forest = RandomForestClassifier(n_estimators=5, max_depth=3, random_state=seed, n_jobs=1).fit(self.X, y)
+            paths[name] = os.path.join(self.tmp, f"{name}.pkl")
+            joblib.dump(DirectionQualityModel(forest, direction_models={"long": forest}), paths[name])
+        self.models = signal_engine.load_models(paths)
+
+    def predict(self, X, trend_biases, weights=WEIGHTS):
+        return cached_weighted_predict_proba_batch(
+            self.models,
+            X,
+            weights,
+            trend_biases=trend_biases,
+            model_metadata={},
+            feature_cols=FEATURES,
+        )
+
+    def expected(self, X, trend_biases, weights=WEIGHTS):
+        return signal_engine.weighted_predict_proba_batch(self.models, X, weights, trend_biases=trend_biases, model_metadata={})
+
+    def count_model_rows(self):
+        calls = []
+        original = DirectionQualityModel.predict_proba
+
+        def counting(model, X):
+            calls.append(len(X))
+            return original(model, X)
+
+        return calls, patch.object(DirectionQualityModel, "predict_proba", counting)
+
+    def test_store_requires_models_loaded_from_disk(self):
+        self.assertIsNotNone(PredictionStore.for_models(self.models, FEATURES))
+        in_memory = {name: DirectionQualityModel(model.global_model) for name, model in self.models.items()}
+        self.assertIsNone(PredictionStore.for_models(in_memory, FEATURES))
+        with patch.object(config, "PREDICTION_CACHE_ENABLED", False):
+            self.assertIsNone(PredictionStore.for_models(self.models, FEATURES))
+
+    def test_inference_code_change_switches_store(self):
+        store = PredictionStore.for_models(self.models, FEATURES)
+        with patch("core.prediction_cache.inference_code_hash", return_value="changed"):
+            changed = PredictionStore.for_models(self.models, FEATURES)
+
+        self.assertNotEqual(changed.key, store.key)
+        self.assertEqual(PredictionStore.for_models(self.models, FEATURES).key, store.key)
+
+    def test_concurrent_saves_use_distinct_temp_files(self):
+        store = PredictionStore.for_models(self.models, FEATURES)
+        table = pd.DataFrame({"row_hash": ["a"]}, index=self.X.index[:1])
+        real_dump = joblib.dump
+        tmp_paths = []
+
+        def dump(payload, path):
+            tmp_paths.append(path)
+            return real_dump(payload, path)
+
+        with patch("core.prediction_cache.joblib.dump", side_effect=dump):
+            store.save(table)
+            store.save(table)
+
+        self.assertEqual(len(set(tmp_paths)), 2)
+        self.assertTrue(all(path.startswith(f"{store.path}.tmp-{os.getpid()}-") for path in tmp_paths))
+        self.assertEqual(os.listdir(store.cache_dir), [os.path.basename(store.path)])
+        self.assertEqual(store.load().index.tolist(), table.index.tolist())
+
+    def test_repeat_run_reads_cache_and_extension_computes_only_new_bars(self):
+        first = self.predict(self.X.iloc[:60], self.trend_biases[:60])
+        np.testing.assert_allclose(first, self.expected(self.X.iloc[:60], self.trend_biases[:60]))
+
+        calls, patcher = self.count_model_rows()
+        with patcher:
+            repeat = self.predict(self.X.iloc[:60], self.trend_biases[:60])
+        self.assertEqual(calls, [])
+        np.testing.assert_allclose(repeat, first)
+
+        with patcher:
+            extended = self.predict(self.X, self.trend_biases)
+        self.assertEqual(calls, [20, 20])
+        np.testing.assert_allclose(extended, self.expected(self.X, self.trend_biases))
+
+    def test_changed_feature_values_invalidate_cached_bars(self):
+        self.predict(self.X, self.trend_biases)
+        changed = self.X.copy()
+        changed.iloc[:5, 0] += 1.0
+
+        calls, patcher = self.count_model_rows()
+        with patcher:
+            result = self.predict(changed, self.trend_biases)
+
+        self.assertEqual(calls, [5, 5])
+        np.testing.assert_allclose(result, self.expected(changed, self.trend_biases))
+
+    def test_fusion_changes_reuse_raw_probabilities(self):
+        self.predict(self.X, self.trend_biases)
+        weights = {"rf_a": 0.1, "rf_b": 0.9}
+        flipped = ["short" if bias == "long" else bias for bias in self.trend_biases]
+
+        calls, patcher = self.count_model_rows()
+        with patcher:
+            reweighted = self.predict(self.X, self.trend_biases, weights)
+            retrended = self.predict(self.X, flipped, weights)
+
+        self.assertEqual(calls, [])
+        np.testing.assert_allclose(reweighted, self.expected(self.X, self.trend_biases, weights))
+        np.testing.assert_allclose(retrended, self.expected(self.X, flipped, weights))
+
+
+if __name__ == "__main__":
+    unittest.main()
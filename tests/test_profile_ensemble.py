@@ -0,0 +1,147 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from run import profile_ensemble
+
+
+def make_candidate(weights, latency_ms, pnl, f1=0.5):
+    return {
+        "weights": weights,
+        "live_latency_ms": latency_ms,
+        "validation": {"trade_precision": 0.5, "trade_recall": 0.5, "trade_f1": f1},
+        "backtest": {"net_pnl_after_costs": pnl},
+    }
+
+
+class ProfileEnsembleTests(unittest.TestCase):
+    def test_weight_subsets_renormalize_original_proportions(self):
+        subsets = profile_ensemble.weight_subsets({"lgb_v1": 0.5, "xgb_v1": 0.3, "rf_v1": 0.2}, ["lgb_v1", "xgb_v1", "rf_v1"])
+
+        self.assertEqual(len(subsets), 7)
+        self.assertEqual(subsets[0], {"lgb_v1": 0.5, "xgb_v1": 0.3, "rf_v1": 0.2})
+        pair = next(item for item in subsets if set(item) == {"lgb_v1", "rf_v1"})
+        self.assertAlmostEqual(pair["lgb_v1"], 0.5 / 0.7)
+        self.assertAlmostEqual(pair["rf_v1"], 0.2 / 0.7)
+        self.assertEqual(profile_ensemble.format_model_weights(pair), "lgb_v1:0.7143,rf_v1:0.2857")
+
+    def test_proposal_keeps_best_quality_within_latency_budget(self):
+        candidates = [
+            make_candidate({"lgb_v1": 0.5, "xgb_v1": 0.3, "rf_v1": 0.2}, 30.0, 120.0),
+            make_candidate({"lgb_v1": 0.625, "xgb_v1": 0.375}, 8.0, 110.0),
+            make_candidate({"lgb_v1": 1.0}, 4.0, 90.0),
+        ]
+
+        proposal = profile_ensemble.propose_weight_set(candidates, budget_ms=10.0)
+        self.assertTrue(proposal["budget_met"])
+        self.assertEqual(proposal["dropped_models"], ["rf_v1"])
+        self.assertAlmostEqual(proposal["quality_loss"], 10.0)
+
+        # OOS 复核结果只随提案输出，不改变选择
+        candidates[2]["oos_check"] = {"backtest": {"net_pnl_after_costs": 500.0}}
+        self.assertEqual(profile_ensemble.propose_weight_set(candidates, budget_ms=10.0)["weights"], proposal["weights"])
+
+        fallback = profile_ensemble.propose_weight_set(candidates, budget_ms=1.0)
+        self.assertFalse(fallback["budget_met"])
+        self.assertEqual(fallback["weights"], {"lgb_v1": 1.0})
+
+    def test_inputs_score_on_validation_window_and_keep_oos_separate(self):
+        index = pd.date_range("2026-01-01", periods=12, freq="5min")
+        data = pd.DataFrame({"5m_close": np.arange(12.0), "f0": np.arange(12.0)}, index=index)
+        context = SimpleNamespace(data=data, price_series=data["5m_close"], funding_history=pd.DataFrame())
+        metadata = {
+            "validation_start": index[4].isoformat(),
+            "validation_end": index[7].isoformat(),
+            "oos_start": index[9].isoformat(),
+        }
+        labeled = data.assign(target=np.arange(12) % 2)
+
+        with tempfile.TemporaryDirectory() as root, \
+                patch("backtest.backtest.Backtester", return_value=context), \
+                patch("train.train.create_labels", return_value=labeled), \
+                patch.object(profile_ensemble, "derive_trend_biases", side_effect=lambda frame, **_: ["neutral"] * len(frame)), \
+                patch("run.retrain_models.config.MODEL_RETRAIN_MIN_OOS_ROWS", 3):
+            windows = profile_ensemble.build_profile_inputs(os.path.join(root, "profile.log"), ["f0"], metadata)
+
+        self.assertEqual(list(windows["validation"]["X"].index), list(index[4:8]))
+        self.assertEqual(windows["validation"]["y"].tolist(), [0, 1, 0, 1])
+        self.assertEqual(list(windows["oos"]["context"].data.index), list(index[9:]))
+        self.assertEqual(profile_ensemble.window_summary(windows["validation"])["rows"], 4)
+
+    def test_in_sample_validation_refuses_weight_proposal(self):
+        X = pd.DataFrame({"f0": np.arange(6.0)})
+        window = {"X": X, "y": pd.Series([0, 1] * 3), "context": None}
+        windows = {"validation": window, "oos": window}
+        model = SimpleNamespace(predict_proba=lambda frame: np.full((len(frame), 2), 0.5))
+
+        def run(metadata):
+            with tempfile.TemporaryDirectory() as root, \
+                    patch("joblib.load", return_value=["f0"]), \
+                    patch.object(profile_ensemble, "read_json", return_value=metadata), \
+                    patch.object(profile_ensemble, "build_profile_inputs", return_value=windows), \
+                    patch.object(profile_ensemble, "window_summary", return_value={}), \
+                    patch.object(profile_ensemble, "profile_model_cost", return_value=(model, {})), \
+                    patch.object(profile_ensemble, "score_weight_subsets", return_value=[make_candidate({"rf_v1": 1.0}, 1.0, 1.0)]) as scorer, \
+                    patch.object(profile_ensemble.config, "MODEL_PATHS", {"rf_v1": "rf.pkl"}):
+                report, _ = profile_ensemble.run_profile(
+                    SimpleNamespace(output_dir=root, latency_rows=5, skip_backtest=True, budget_ms=None)
+                )
+            return report, scorer
+
+        # 旧元数据缺字段时按配置默认（重训覆盖验证段）处理
+        with patch.object(profile_ensemble.config, "MODEL_FINAL_TRAIN_ON_VALIDATION", True):
+            for metadata in ({"final_train_on_validation": True}, {}):
+                report, scorer = run(metadata)
+                self.assertTrue(report["validation_in_final_train"])
+                self.assertTrue(report["proposal"]["skipped"])
+                self.assertEqual(report["candidates"], [])
+                scorer.assert_not_called()
+
+        report, scorer = run({"final_train_on_validation": False})
+        self.assertFalse(report["validation_in_final_train"])
+        self.assertEqual(report["proposal"]["weights"], {"rf_v1": 1.0})
+        scorer.assert_called_once()
+
+    def test_subset_probabilities_match_direct_prediction_and_costs_are_measured(self):
+        rng = np.random.default_rng(5)
+        X = pd.DataFrame(rng.normal(size=(80, 3)), columns=["f0", "f1", "trend_bias_num"])
+        y = (X["f0"] > 0).astype(int)
+        with tempfile.TemporaryDirectory() as root:
+            paths = {}
+            for name, seed in (("rf_a", 0), ("rf_b", 1)):
+                paths[name] = os.path.join(root, f"{name}.pkl")
+                joblib.dump(RandomForestClassifier(n_estimators=4, max_depth=3, random_state=seed, n_jobs=1).fit(X, y), paths[name])
+
+            models, costs = {}, {}
+            for name, path in paths.items():
+                models[name], costs[name] = profile_ensemble.profile_model_cost(name, path, list(X.columns), X, latency_rows=5)
+
+        self.assertTrue(costs["rf_a"]["compiled"])
+        self.assertEqual(costs["rf_a"]["row_latency"]["count"], 5)
+        self.assertGreater(costs["rf_a"]["batch_ms"], 0.0)
+        self.assertEqual(
+            profile_ensemble.estimated_live_latency_ms({"rf_a": 1.0, "rf_b": 1.0}, costs),
+            round(costs["rf_a"]["row_latency"]["p99_ms"] + costs["rf_b"]["row_latency"]["p99_ms"], 4),
+        )
+
+        raw = {name: model.predict_proba(X) for name, model in models.items()}
+        trend_biases = np.resize(["long", "short", "neutral"], len(X)).tolist()
+        weights = {"rf_a": 0.25, "rf_b": 0.75}
+        np.testing.assert_allclose(
+            profile_ensemble.subset_probabilities(models, raw, X, weights, trend_biases=trend_biases, model_metadata={}),
+            profile_ensemble.signal_engine.weighted_predict_proba_batch(models, X, weights, trend_biases=trend_biases, model_metadata={}),
+        )
+        quality = profile_ensemble.classification_quality(np.column_stack([np.zeros(len(y)), y]), y, 0.5)
+        self.assertEqual(quality["trade_precision"], 1.0)
+        self.assertEqual(quality["trade_recall"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -62,6 +62,14 @@ def build_summary(**overrides):
     return summary
 
 
+def fake_walk_forward_fold(shared, fold, log_file):
+    with open(log_file, "a", encoding="utf-8") as file:
+        file.write(f"fold={fold['fold']}\n")
+    if fold["fold"] in shared["fail_folds"]:
+        raise RuntimeError(f"fold {fold['fold']} failed")
+    return {"fold": fold["fold"], "rows": int(len(shared["labeled_data"]))}
+
+
 class RetrainBacktestValidationTests(unittest.TestCase):
     def test_hard_gates_cannot_drop_below_absolute_safety_floor(self):
         self.assertGreaterEqual(
@@ -285,6 +293,31 @@ class RetrainBacktestValidationTests(unittest.TestCase):
         self.assertEqual(list(context.data.index), list(index[4:]))
         self.assertEqual(list(context.price_series), list(range(4, 8)))
         self.assertEqual(list(context.funding_history["funding_time"]), [index[5]])
+        self.assertEqual(context.funding_schedule.due_counts.tolist(), [0, 1, 1, 1])
+
+    @unittest.skipUnless(HAS_REAL_PANDAS, "requires pandas")
+    def test_validation_restriction_stops_before_oos(self):
+        pd = retrain_models.pd
+        index = pd.date_range("2026-01-01", periods=10, freq="5min")
+        context = SimpleNamespace(
+            data=pd.DataFrame({"5m_close": range(10)}, index=index),
+            price_series=None,
+            funding_history=pd.DataFrame({
+                "funding_time": [index[1], index[4], index[8]],
+                "funding_rate": [0.0001, 0.0002, 0.0003],
+            }),
+        )
+
+        retrain_models.restrict_backtester_to_validation(
+            context,
+            {"validation_start": index[3].isoformat(), "validation_end": index[6].isoformat(), "oos_start": index[7].isoformat()},
+        )
+
+        self.assertEqual(list(context.data.index), list(index[3:7]))
+        self.assertEqual(list(context.funding_history["funding_time"]), [index[4]])
+        self.assertEqual(context.funding_schedule.due_counts.tolist(), [0, 1, 1, 1])
+        with self.assertRaisesRegex(RuntimeError, "validation_end"):
+            retrain_models.restrict_backtester_to_validation(context, {"validation_start": index[3].isoformat()})
 
     @unittest.skipUnless(HAS_REAL_PANDAS, "requires pandas")
     def test_walk_forward_slices_keep_purge_gap_before_each_validation_fold(self):
@@ -750,7 +783,10 @@ class RetrainBacktestValidationTests(unittest.TestCase):
             calls.append(overrides["id"])
             return dict(summaries[overrides["id"]])
 
-        with patch("run.retrain_models.run_backtest_with_overrides", side_effect=fake_backtest):
+        # mock 不能跨进程，固定在当前进程串行执行
+        with patch("run.retrain_models.run_backtest_with_overrides", side_effect=fake_backtest), patch(
+            "run.retrain_models.config.BACKTEST_SWEEP_WORKERS", 1
+        ):
             with patch("run.retrain_models.config.MODEL_WALK_FORWARD_THRESHOLD_SWEEP_EARLY_STOP_ENABLED", True):
                 with patch("run.retrain_models.config.MODEL_WALK_FORWARD_THRESHOLD_SWEEP_EARLY_STOP_PATIENCE", 2):
                     with patch("run.retrain_models.config.MODEL_WALK_FORWARD_THRESHOLD_SWEEP_EARLY_STOP_MIN_CLOSED_TRADES", 1):
@@ -788,13 +824,114 @@ class RetrainBacktestValidationTests(unittest.TestCase):
                 "decision_action_counts": {"OPEN": 2, "CLOSE": 2},
             }
 
-        with patch("run.retrain_models.run_backtest_with_overrides", side_effect=fake_backtest):
+        with patch("run.retrain_models.run_backtest_with_overrides", side_effect=fake_backtest), patch(
+            "run.retrain_models.config.BACKTEST_SWEEP_WORKERS", 1
+        ):
             sweep = retrain_models.run_walk_forward_threshold_sweep({}, candidates)
 
         self.assertEqual(sweep["current"]["name"], "current")
         self.assertEqual(sweep["current"]["closed_trade_count"], 0)
         self.assertEqual(sweep["best"]["name"], "better")
 
+    def test_walk_forward_threshold_sweep_uses_lockstep_engine_when_configured(self):
+        candidates = [
+            {"name": "current", "overrides": {"id": 0}},
+            {"name": "better", "overrides": {"id": 1}},
+        ]
+        summaries = [
+            {"closed_trade_count": 0, "net_pnl_after_costs": 0.0, "profit_factor": 0.0, "max_drawdown_pct": 0.0},
+            {"closed_trade_count": 2, "net_pnl_after_costs": 1.5, "profit_factor": 1.4, "max_drawdown_pct": -0.1},
+        ]
+
+        def fake_lockstep(_kwargs, items, summarize=None, cache=None):
+            for item in items:
+                yield item["name"], item["overrides"], dict(summaries[item["overrides"]["id"]])
+
+        with patch("backtest.lockstep_engine.iter_lockstep_sweep", side_effect=fake_lockstep) as lockstep, patch(
+            "run.retrain_models.run_backtest_with_overrides"
+        ) as process_run, patch("run.retrain_models.config.BACKTEST_SWEEP_ENGINE", "lockstep"):
+            sweep = retrain_models.run_walk_forward_threshold_sweep({}, candidates)
+
+        lockstep.assert_called_once()
+        process_run.assert_not_called()
+        self.assertEqual(sweep["best"]["name"], "better")
+
+    def test_adaptive_threshold_sweep_keeps_current_and_reports_savings(self):
+        candidates = [{"name": "current", "overrides": {"id": 0}}] + [
+            {"name": f"c{i}", "overrides": {"id": i}}
+            for i in range(1, 9)
+        ]
+
+        def fake_backtest(_kwargs, overrides):
+            net = float(overrides["id"])
+            return {"closed_trade_count": 3, "net_pnl_after_costs": net, "profit_factor": 1.2, "max_drawdown_pct": -0.1}
+
+        import pandas as pd
+
+        data = pd.DataFrame({"x": range(900)})
+        with patch("run.retrain_models.run_backtest_with_overrides", side_effect=fake_backtest), patch.multiple(
+            "run.retrain_models.config",
+            BACKTEST_SWEEP_WORKERS=1,
+            MODEL_WALK_FORWARD_THRESHOLD_SWEEP_SEARCH="adaptive",
+            MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_MIN_ROWS=0,
+            MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ADAPTIVE_PROPOSALS=0,
+            BACKTEST_RESULT_CACHE_ENABLED=False,
+        ), patch("backtest.adaptive_search.log_info"), patch("backtest.sweep.log_info"):
+            sweep = retrain_models.run_walk_forward_threshold_sweep({"precomputed_data": data}, candidates)
+
+        self.assertEqual(sweep["search"], "adaptive")
+        self.assertEqual(sweep["best"]["name"], "c8")
+        self.assertEqual(sweep["current"]["name"], "current")
+        self.assertEqual(sweep["evaluated_count"], 9)
+        self.assertEqual(sweep["adaptive"]["rung_rows"], [100, 300, 900])
+        self.assertGreater(sweep["adaptive"]["saved_pct"], 0.0)
+
+    def test_derived_threshold_sweep_overrides_follow_grid_rules(self):
+        overrides = retrain_models.threshold_sweep_overrides(0.3, 0.3, 0.08, 0.0075, 0.15)
+        midpoint = dict(overrides, REGIME_RANGE_MIN_SIGNAL_TARGET_RATIO=0.0, BACKTEST_MIN_ADJUST_AMOUNT=0.0)
+
+        self.assertEqual(retrain_models.derive_threshold_sweep_overrides(midpoint), overrides)
+
+    def test_bundle_backtest_result_is_reused_across_runs(self):
+        import pandas as pd
+
+        index = pd.date_range("2026-01-01", periods=5, freq="5min", tz="UTC")
+        context = SimpleNamespace(
+            interval="multi_period",
+            window=5,
+            data_dict={},
+            reward_risk=2.0,
+            data=pd.DataFrame({"5m_close": [1.0, 2.0, 3.0, 4.0, 5.0]}, index=index),
+            funding_history=pd.DataFrame(columns=["funding_time", "funding_rate"]),
+        )
+        bundle = {"feature_cols": ["f0"], "models": {}, "metadata": {}, "artifact_hashes": {"lgb": "abc"}}
+        runs = []
+
+        class FakeBacktester:
+            def __init__(self, *args, **kwargs):
+                pass
+
+            def run_backtest(self):
+                runs.append(1)
+                return {"final_equity": 1001.0}
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            log_file = os.path.join(tmpdir, "retrain.log")
+            with patch("backtest.backtest.Backtester", FakeBacktester), patch.multiple(
+                "run.retrain_models.config",
+                BACKTEST_RESULT_CACHE_DIR=os.path.join(tmpdir, "cache"),
+                BACKTEST_RESULT_CACHE_ENABLED=True,
+            ):
+                first = retrain_models.run_backtest_with_bundle(log_file, "backtest_candidate_new_model", context, bundle)
+                second = retrain_models.run_backtest_with_bundle(log_file, "backtest_candidate_new_model", context, bundle)
+            with open(log_file, encoding="utf-8") as file:
+                log_text = file.read()
+
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(first, second)
+        self.assertIn("title=backtest_candidate_new_model status=miss", log_text)
+        self.assertIn("title=backtest_candidate_new_model status=hit", log_text)
+
     def test_threshold_sweep_candidate_comparison_summarizes_gate_difference(self):
         current = {
             "name": "current",
@@ -837,5 +974,100 @@ class RetrainBacktestValidationTests(unittest.TestCase):
         self.assertEqual(diff["MIN_SIGNAL_TARGET_RATIO"], [0.10, 0.04])
 
 
+    @unittest.skipUnless(HAS_REAL_PANDAS, "requires pandas")
+    def test_walk_forward_folds_run_in_workers_and_keep_fold_order(self):
+        import pandas as pd
+
+        labeled = pd.DataFrame({"f1": [float(i) for i in range(40)]}, index=pd.RangeIndex(40))
+        shared = {"labeled_data": labeled, "feature_cols": ["f1"], "fail_folds": ()}
+        slices = [{"fold": number} for number in range(1, 5)]
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = os.path.join(directory, "retrain.log")
+            folds = list(retrain_models.iter_walk_forward_folds(
+                shared,
+                slices,
+                log_file,
+                run=fake_walk_forward_fold,
+                workers=2,
+            ))
+            with open(log_file, encoding="utf-8") as file:
+                log_lines = file.read().splitlines()
+
+        self.assertEqual([summary["fold"] for _, summary in folds], [1, 2, 3, 4])
+        self.assertEqual({summary["rows"] for _, summary in folds}, {40})
+        self.assertEqual(log_lines, [f"fold={number}" for number in range(1, 5)])
+
+    @unittest.skipUnless(HAS_REAL_PANDAS, "requires pandas")
+    def test_walk_forward_fold_failure_cancels_later_folds(self):
+        import pandas as pd
+
+        shared = {"labeled_data": pd.DataFrame({"f1": [0.0, 1.0]}), "feature_cols": ["f1"], "fail_folds": (2,)}
+        slices = [{"fold": number} for number in range(1, 7)]
+        with tempfile.TemporaryDirectory() as directory:
+            log_file = os.path.join(directory, "retrain.log")
+            seen = []
+            with self.assertRaisesRegex(RuntimeError, "fold 2 failed"):
+                for fold, _ in retrain_models.iter_walk_forward_folds(
+                    shared,
+                    slices,
+                    log_file,
+                    run=fake_walk_forward_fold,
+                    workers=2,
+                ):
+                    seen.append(fold["fold"])
+            with open(log_file, encoding="utf-8") as file:
+                log_lines = file.read().splitlines()
+
+        self.assertEqual(seen, [1])
+        # 失败 fold 的日志照常追加，之后的 fold 不再写入主日志
+        self.assertEqual(log_lines, ["fold=1", "fold=2"])
+
+    @unittest.skipUnless(HAS_REAL_PANDAS, "requires pandas")
+    def test_walk_forward_fold_models_are_reused_until_inputs_change(self):
+        import pandas as pd
+
+        train_df = pd.DataFrame(
+            {"f1": [0.1, 0.2, 0.3, 0.4], "target": [0, 1, 0, 1]},
+            index=pd.date_range("2026-01-01", periods=4, freq="5min", tz="UTC"),
+        )
+        metadata = {"label_future_window": 6, "label_threshold": 0.003}
+        calls = []
+
+        def fake_train(X_train, y_train, sample_context=None, estimator_config=None):
+            calls.append(len(X_train))
+            return {"lgb_v1": f"model_{len(calls)}"}, None, None, None, None
+
+        with tempfile.TemporaryDirectory() as directory, patch.multiple(
+            retrain_models.config,
+            MODEL_WALK_FORWARD_FOLD_CACHE_DIR=directory,
+            MODEL_WALK_FORWARD_FOLD_CACHE_ENABLED=True,
+        ), patch("train.train.train_direction_quality_bundle", side_effect=fake_train):
+            first, first_cache = retrain_models.train_walk_forward_fold_models(train_df, ["f1"], metadata, {"lgb_n_estimators": 40})
+            with patch.object(retrain_models.config, "WINDOWS", {"5m": 123456}):
+                second, second_cache = retrain_models.train_walk_forward_fold_models(train_df, ["f1"], metadata, {"lgb_n_estimators": 40})
+            _, estimator_cache = retrain_models.train_walk_forward_fold_models(train_df, ["f1"], metadata, {"lgb_n_estimators": 80})
+            shifted = train_df.copy()
+            shifted.iloc[-1, 0] = 0.5
+            _, data_cache = retrain_models.train_walk_forward_fold_models(shifted, ["f1"], metadata, {"lgb_n_estimators": 40})
+            with patch.object(retrain_models.config, "MODEL_TRAIN_SHARED_BINNING", True):
+                binned_inputs = retrain_models.walk_forward_fold_model_inputs(train_df, ["f1"], metadata, {})
+                _, binned_cache = retrain_models.train_walk_forward_fold_models(train_df, ["f1"], metadata, {"lgb_n_estimators": 40})
+
+        self.assertEqual(first_cache["cache"], "miss")
+        self.assertEqual(second_cache["cache"], "hit")
+        self.assertEqual(second, first)
+        self.assertEqual(second_cache["key"], first_cache["key"])
+        self.assertEqual(estimator_cache["cache"], "miss")
+        self.assertEqual(data_cache["cache"], "miss")
+        self.assertEqual(binned_cache["cache"], "miss")
+        self.assertEqual(binned_inputs["binning"], {"shared": True})
+        self.assertEqual(len(calls), 4)
+
+    def test_walk_forward_workers_are_capped_by_fold_count(self):
+        with patch.object(retrain_models.config, "MODEL_WALK_FORWARD_WORKERS", 8):
+            self.assertEqual(retrain_models.resolve_walk_forward_workers(3), 3)
+        self.assertEqual(retrain_models.resolve_walk_forward_workers(3, workers=1), 1)
+
+
 if __name__ == "__main__":
     unittest.main()
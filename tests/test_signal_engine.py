@@ -313,6 +313,69 @@ class WeightedPredictProbaTests(unittest.TestCase):
         self.assertAlmostEqual(float(batch[1][0]), float(second[0]))
         self.assertAlmostEqual(float(batch[1][1]), float(second[1]))
 
+    def test_parallel_batch_prediction_matches_serial(self):
+        import threading
+
+        import numpy as np
+        import pandas as pd
+
+        rng = np.random.default_rng(7)
+        rows = 64
+        threads = {}
+
+        class ThreadRecordingModel(BatchStubModel):
+            def __init__(self, name, probabilities):
+                super().__init__(probabilities, classes=[0, 1])
+                self.name = name
+
+            def predict_proba(self, X):
+                threads[self.name] = threading.current_thread().name
+                return super().predict_proba(X)
+
+        models = {}
+        for name in ("lgb_v1", "xgb_v1", "rf_v1"):
+            positive = rng.uniform(size=rows)
+            models[name] = ThreadRecordingModel(name, np.column_stack([1.0 - positive, positive]))
+        X = pd.DataFrame({"feature": np.arange(rows, dtype=float)})
+        trend_biases = list(rng.choice(["long", "short", "neutral", "LONG", None], size=rows))
+        kwargs = {
+            "trend_biases": trend_biases,
+            "model_metadata": {"target_schema": "binary_trade_quality"},
+            "direction_model_weights": {"short": "lgb_v1:1.0|rf_v1:0.0"},
+        }
+        weights = {"lgb_v1": 0.5, "xgb_v1": 0.3, "rf_v1": 0.2}
+
+        with patch("core.signal_engine.config.MODEL_QUALITY_PROBABILITY_EXECUTION_SCALE_ENABLED", False):
+            with patch.multiple(signal_engine.config, MODEL_PREDICT_THREADS=1, MODEL_PREDICT_PARALLEL_MIN_ROWS=0):
+                serial = signal_engine.weighted_predict_proba_batch(models, X, weights, **kwargs)
+            self.assertTrue(all(name == threading.current_thread().name for name in threads.values()))
+            with patch.multiple(signal_engine.config, MODEL_PREDICT_THREADS=2, MODEL_PREDICT_PARALLEL_MIN_ROWS=0):
+                parallel = signal_engine.weighted_predict_proba_batch(models, X, weights, **kwargs)
+            expected = [
+                signal_engine.weighted_predict_proba(
+                    {name: BatchStubModel(model.probabilities[index:index + 1], classes=[0, 1]) for name, model in models.items()},
+                    X.iloc[index:index + 1],
+                    weights,
+                    trend_bias=trend_biases[index],
+                    model_metadata=kwargs["model_metadata"],
+                    direction_model_weights=kwargs["direction_model_weights"],
+                )
+                for index in range(rows)
+            ]
+
+        self.assertTrue(all(name.startswith("model-predict") for name in threads.values()))
+        np.testing.assert_array_equal(parallel, serial)
+        np.testing.assert_allclose(parallel, np.asarray(expected, dtype=float), rtol=0, atol=1e-12)
+
+    def test_trend_bias_codes_fall_back_to_neutral_on_length_mismatch(self):
+        import numpy as np
+
+        np.testing.assert_array_equal(
+            signal_engine.trend_bias_codes(["Long", "short", None, "flat"], 4),
+            [signal_engine.TREND_CODE_LONG, signal_engine.TREND_CODE_SHORT, 0, 0],
+        )
+        np.testing.assert_array_equal(signal_engine.trend_bias_codes(["long"], 3), [0, 0, 0])
+
     def test_direction_quality_model_uses_direction_specific_submodel(self):
         import pandas as pd
 
@@ -430,6 +493,60 @@ class WeightedPredictProbaTests(unittest.TestCase):
         self.assertAlmostEqual(float(range_out[1]), 0.0)
         self.assertEqual(model.calibrated_direction_regimes, ["short:trend_short"])
 
+    def test_direction_quality_batch_matches_row_by_row_and_precomputed_codes(self):
+        import numpy as np
+        import pandas as pd
+        from sklearn.isotonic import IsotonicRegression
+        from sklearn.linear_model import LogisticRegression
+
+        class FeatureModel:
+            classes_ = [0, 1]
+
+            def __init__(self, scale):
+                self.scale = scale
+
+            def predict_proba(self, X):
+                trade = np.clip(np.asarray(X["feature"], dtype=float) * self.scale, 0.0, 1.0)
+                return np.column_stack([1.0 - trade, trade])
+
+        rng = np.random.default_rng(11)
+        grid = rng.uniform(size=200)
+        hits = (grid + rng.normal(scale=0.3, size=200) > 0.5).astype(int)
+        sigmoid = BinaryProbabilityCalibrator(method="sigmoid", model=LogisticRegression().fit(grid.reshape(-1, 1), hits))
+        isotonic = BinaryProbabilityCalibrator(
+            method="isotonic",
+            model=IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip").fit(grid, hits),
+        )
+        probe = rng.uniform(-0.2, 1.2, size=500)
+        np.testing.assert_array_equal(
+            sigmoid.predict_trade_probability(probe),
+            np.clip(sigmoid.model.predict_proba(np.clip(probe, 0, 1).reshape(-1, 1))[:, 1], 0, 1),
+        )
+        np.testing.assert_array_equal(isotonic.predict_trade_probability(probe), isotonic.model.predict(np.clip(probe, 0, 1)))
+
+        model = DirectionQualityModel(
+            FeatureModel(0.3),
+            direction_models={"long": FeatureModel(0.9), "short": FeatureModel(0.6)},
+            direction_calibrators={"long": sigmoid, "short": isotonic},
+            direction_regime_calibrators={"long": {"Trend_Long": isotonic}},
+        )
+        rows = 300
+        X = pd.DataFrame({
+            "feature": rng.uniform(size=rows),
+            "trend_bias_num": rng.choice([-1.0, 0.0, 1.0, np.nan], size=rows),
+            "regime_trend_long": rng.choice([0.0, 1.0], size=rows),
+        })
+        batch = model.predict_proba(X)
+        row_by_row = np.vstack([model.predict_proba(X.iloc[index:index + 1]) for index in range(rows)])
+        np.testing.assert_array_equal(batch, row_by_row)
+        np.testing.assert_array_equal(
+            model.predict_proba(X, trend_codes=model.trend_codes(X), regime_codes=model.regime_codes(X)),
+            batch,
+        )
+
+        codes, names = model.regime_codes(pd.DataFrame({"label_regime": ["Trend_Long ", None, "", "range"]}))
+        self.assertEqual([names[code] for code in codes], ["trend_long", "unknown", "unknown", "range"])
+
     def test_empty_models_are_rejected(self):
         with self.assertRaisesRegex(ValueError, "模型列表为空"):
             signal_engine.weighted_predict_proba({}, object(), {})
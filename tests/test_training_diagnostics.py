@@ -0,0 +1,28 @@
+import unittest
+from unittest.mock import patch
+
+from backtest.backtest import Backtester
+from run import training_diagnostics
+from tests.test_backtest_array_engine import BASE_CONFIG, make_backtester, make_market_data
+
+
+class DiagnosticBacktestTests(unittest.TestCase):
+    def setUp(self):
+        patches = [patch(f"config.config.{key}", value) for key, value in BASE_CONFIG.items()]
+        patches.append(patch("backtest.backtest.log_info"))
+        for item in patches:
+            item.start()
+            self.addCleanup(item.stop)
+
+    def test_backtest_uses_injected_probabilities_without_model_inference(self):
+        data = make_market_data(rows=600)
+        seed_bt = make_backtester(data)
+
+        with patch.object(Backtester, "_predict_probabilities", side_effect=AssertionError("模型不应重新推理")):
+            summary = training_diagnostics.run_backtest(seed_bt, data.copy())
+
+        self.assertGreater(summary["trade_count"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
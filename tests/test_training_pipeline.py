@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from train import pipeline as pipeline_module
+
+
+class TrainingPipelineTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def make_pipeline(self, **kwargs):
+        kwargs.setdefault("code_hash", "code-v1")
+        return pipeline_module.TrainingPipeline(self.tmpdir.name, enabled=True, **kwargs)
+
+    def test_second_run_with_same_inputs_hits_cache(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            return pd.DataFrame({"a": [1.0, 2.0]})
+
+        first = self.make_pipeline()
+        first_value = first.run("features", build, inputs={"raw": "abc"}, hash_output=True)
+        second = self.make_pipeline()
+        second_value = second.run("features", build, inputs={"raw": "abc"}, hash_output=True)
+
+        self.assertEqual(len(calls), 1)
+        pd.testing.assert_frame_equal(first_value, second_value)
+        self.assertEqual(first.records[0].cache, "miss")
+        self.assertEqual(second.records[0].cache, "hit")
+        self.assertEqual(first.output_hash("features"), second.output_hash("features"))
+
+    def test_changed_inputs_or_code_invalidate_cache(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            return {"rows": len(calls)}
+
+        self.make_pipeline().run("labels", build, inputs={"config": {"X": 1}})
+        self.make_pipeline().run("labels", build, inputs={"config": {"X": 2}})
+        self.make_pipeline(code_hash="code-v2").run("labels", build, inputs={"config": {"X": 1}})
+
+        self.assertEqual(len(calls), 3)
+
+    def test_uncacheable_stage_always_runs_and_hashes_content(self):
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            return {"5m": pd.DataFrame({"close": [1.0, 2.0]})}
+
+        first = self.make_pipeline()
+        first.run("fetch_data", fetch, cacheable=False, hash_output=True)
+        second = self.make_pipeline()
+        second.run("fetch_data", fetch, cacheable=False, hash_output=True)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(second.records[0].cache, "off")
+        self.assertEqual(first.output_hash("fetch_data"), second.output_hash("fetch_data"))
+
+    def test_fingerprint_tracks_frame_content(self):
+        frame = pd.DataFrame({"a": [1.0, 2.0]}, index=pd.RangeIndex(2))
+        changed = frame.copy()
+        changed.iloc[1, 0] = 3.0
+
+        self.assertEqual(
+            pipeline_module.fingerprint_value(frame),
+            pipeline_module.fingerprint_value(frame.copy()),
+        )
+        self.assertNotEqual(
+            pipeline_module.fingerprint_value(frame),
+            pipeline_module.fingerprint_value(changed),
+        )
+
+    def test_config_fingerprint_ignores_runtime_only_settings(self):
+        with patch.object(pipeline_module.config, "MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ENABLED", False):
+            before = pipeline_module.config_fingerprint()
+        with patch.object(pipeline_module.config, "MODEL_WALK_FORWARD_THRESHOLD_SWEEP_ENABLED", True):
+            after = pipeline_module.config_fingerprint()
+        self.assertEqual(before, after)
+
+        with patch.object(pipeline_module.config, "MODEL_LABEL_TAKE_PROFIT", 0.123):
+            changed = pipeline_module.config_fingerprint()
+        self.assertNotEqual(before, changed)
+
+    def test_prune_keeps_latest_entries_per_stage(self):
+        pipeline = self.make_pipeline(keep=2)
+        for value in range(4):
+            pipeline.run("labels", lambda value=value: value, inputs={"value": value})
+
+        entries = [name for name in os.listdir(os.path.join(self.tmpdir.name, "labels")) if name.endswith(".joblib")]
+        self.assertEqual(len(entries), 2)
+
+    def test_report_is_written_with_stage_timings(self):
+        pipeline = self.make_pipeline()
+        pipeline.run("splits", lambda: (1, 2, 3, 4), cacheable=False)
+        pipeline.run("labels", lambda: 1, inputs={"x": 1})
+        report_path = os.path.join(self.tmpdir.name, "report.json")
+
+        pipeline.write_report(report_path)
+
+        with open(report_path, "r", encoding="utf-8") as file:
+            report = json.load(file)
+        self.assertEqual([item["stage"] for item in report["stages"]], ["splits", "labels"])
+        self.assertEqual(report["cache_misses"], 1)
+        self.assertEqual(report["cache_hits"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
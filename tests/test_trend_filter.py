@@ -1,6 +1,9 @@
 import unittest
 
-from core.trend_filter import derive_trend_context, trend_allows_direction
+import numpy as np
+import pandas as pd
+
+from core.trend_filter import derive_trend_biases, derive_trend_context, trend_allows_direction
 
 
 class TrendFilterTests(unittest.TestCase):
@@ -42,6 +45,22 @@ class TrendFilterTests(unittest.TestCase):
 
         self.assertEqual(context["trend_bias"], "neutral")
 
+    def test_batch_trend_biases_match_row_context(self):
+        rng = np.random.default_rng(1)
+        frame = pd.DataFrame({
+            "5m_close": 100.0 + rng.normal(scale=1.0, size=200),
+            "1H_ema_20": 100.0 + rng.normal(scale=0.5, size=200),
+            "1H_ema_60": 100.0 + rng.normal(scale=0.5, size=200),
+        })
+        frame.loc[::17, "1H_ema_60"] = np.nan
+        frame.loc[::13, "5m_close"] = 0.0
+        frame.loc[::19, "1H_ema_20"] = np.inf
+
+        expected = [derive_trend_context(row, min_gap=0.002)["trend_bias"] for _, row in frame.iterrows()]
+
+        self.assertEqual(derive_trend_biases(frame, min_gap=0.002), expected)
+        self.assertEqual(derive_trend_biases(frame.drop(columns=["1H_ema_20"])), ["neutral"] * len(frame))
+
     def test_direction_gate_blocks_only_opposite_trend(self):
         self.assertTrue(trend_allows_direction("long", "long"))
         self.assertTrue(trend_allows_direction("short", "neutral"))
@@ -0,0 +1,176 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+from lightgbm import LGBMClassifier
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+
+from config import config
+from core.direction_quality import DirectionQualityModel
+from train import warm_start
+
+
+def make_frame(rows=300, seed=3):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2025-01-01", periods=rows, freq="5min", tz="UTC")
+    X = pd.DataFrame(rng.normal(size=(rows, 3)), index=index, columns=["f0", "f1", "f2"])
+    y = pd.Series((X["f0"] + rng.normal(scale=0.5, size=rows) > 0).astype(int), index=index)
+    return X, y
+
+
+def lgb_model(n_estimators):
+    return LGBMClassifier(n_estimators=n_estimators, num_leaves=7, min_child_samples=5, random_state=0, verbose=-1, n_jobs=1)
+
+
+def xgb_model(n_estimators):
+    return XGBClassifier(n_estimators=n_estimators, max_depth=3, n_jobs=1)
+
+
+def rf_model(n_estimators):
+    return RandomForestClassifier(n_estimators=n_estimators, max_depth=3, random_state=42, n_jobs=1)
+
+
+def parent_bundle(X, y):
+    return {
+        "lgb_v1": DirectionQualityModel(lgb_model(20).fit(X, y), direction_models={"long": lgb_model(10).fit(X, y)}),
+        "xgb_v1": DirectionQualityModel(xgb_model(20).fit(X, y)),
+        "rf_v1": DirectionQualityModel(rf_model(10).fit(X, y)),
+    }
+
+
+class WarmStartSourceTests(unittest.TestCase):
+    def test_boosted_models_continue_from_parent_trees(self):
+        X, y = make_frame()
+        source = warm_start.WarmStartSource(parent_bundle(X, y), extra_trees=5)
+
+        for name, fresh in (("lgb_v1", lgb_model(160)), ("xgb_v1", xgb_model(160))):
+            job = source.fit_job("global", name, fresh, X.iloc[200:], y.iloc[200:])
+            job.fit()
+            self.assertEqual(warm_start.model_tree_count(fresh), 25)
+            self.assertEqual(fresh.get_params()["n_estimators"], 25)
+
+        records = source.summary()["fits"]
+        self.assertEqual([(item["model"], item["added_trees"]) for item in records], [("lgb_v1", 5), ("xgb_v1", 5)])
+
+    def test_forest_replaces_oldest_trees(self):
+        X, y = make_frame()
+        parent = parent_bundle(X, y)
+        parent_trees = list(parent["rf_v1"].global_model.estimators_)
+        source = warm_start.WarmStartSource(parent, rf_replace_ratio=0.3, seed_offset=1)
+        fresh = rf_model(100)
+
+        source.fit_job("global", "rf_v1", fresh, X.iloc[200:], y.iloc[200:]).fit()
+
+        self.assertEqual(fresh.n_estimators, 10)
+        self.assertEqual(fresh.estimators_[:7], parent_trees[3:])
+        self.assertTrue(all(tree not in parent_trees for tree in fresh.estimators_[7:]))
+        self.assertEqual(fresh.predict_proba(X).shape, (len(X), 2))
+
+    def test_direction_parent_lookup_and_carry_forward(self):
+        X, y = make_frame()
+        parent = parent_bundle(X, y)
+        source = warm_start.WarmStartSource({"lgb_v1": parent["lgb_v1"]})
+        models, calibrators, regime_calibrators = {}, {}, {}
+
+        self.assertTrue(source.has_direction("long"))
+        self.assertFalse(source.has_direction("short"))
+        self.assertIs(source.parent_estimator("long_calibration", "lgb_v1"), parent["lgb_v1"].direction_models["long"])
+        source.carry_forward("long", models, calibrators, regime_calibrators)
+
+        self.assertIs(models["lgb_v1"]["long"], parent["lgb_v1"].direction_models["long"])
+        self.assertEqual(calibrators, {})
+
+    def test_unknown_parent_fits_fresh_model(self):
+        X, y = make_frame(rows=60)
+        source = warm_start.WarmStartSource({})
+        fresh = rf_model(4)
+
+        job = source.fit_job("global", "rf_v1", fresh, X, y)
+        job.fit()
+
+        self.assertEqual(len(fresh.estimators_), 4)
+        self.assertEqual(source.summary()["fits"], [])
+
+
+class IncrementalPlanTests(unittest.TestCase):
+    def setUp(self):
+        self.X, self.y = make_frame(rows=400)
+        models = parent_bundle(self.X.iloc[:300], self.y.iloc[:300])
+        self.parent = {
+            "metadata": {
+                "created_at": "2025-01-02T00:00:00+00:00",
+                "artifact_hashes": {"models/lgb_model.pkl": "abc"},
+                "feature_columns_sha256": "cols",
+                "final_train_end": self.y.index[299].isoformat(),
+                "lineage": {"lineage_fingerprint": "key", "generation": 2, "increments_since_full_rebuild": 2},
+            },
+            "state": {
+                "version": warm_start.INCREMENTAL_STATE_VERSION,
+                "evaluation_models": models,
+                "evaluation_train_end": self.y.index[249].isoformat(),
+                "lineage_fingerprint": "key",
+            },
+            "models": models,
+        }
+        patcher = patch.multiple(
+            config,
+            MODEL_TRAIN_INCREMENTAL=True,
+            MODEL_TRAIN_INCREMENTAL_EXTRA_TREES=10,
+            MODEL_TRAIN_INCREMENTAL_MAX_TREES=100,
+            MODEL_TRAIN_INCREMENTAL_FULL_REBUILD_EVERY=5,
+            MODEL_TRAIN_INCREMENTAL_MIN_ROWS=80,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def plan(self, **overrides):
+        kwargs = {
+            "train_end": 300,
+            "final_train_end": 350,
+            "feature_columns_sha256": "cols",
+            "lineage_key": "key",
+            "parent": self.parent,
+        }
+        kwargs.update(overrides)
+        return warm_start.plan_incremental_run(self.y, **kwargs)
+
+    def test_incremental_slices_cover_new_rows_plus_context(self):
+        plan = self.plan()
+
+        self.assertEqual(plan["mode"], "incremental")
+        self.assertEqual(plan["generation"], 3)
+        self.assertEqual(plan["increments_since_full_rebuild"], 3)
+        self.assertEqual((plan["evaluation_slice"]["new_start"], plan["evaluation_slice"]["start"]), (250, 220))
+        self.assertEqual((plan["final_slice"]["new_start"], plan["final_slice"]["start"]), (300, 270))
+        summary = warm_start.lineage_summary(plan)
+        self.assertNotIn("final_source", summary)
+        self.assertEqual(summary["parent"]["artifact_hashes"], {"models/lgb_model.pkl": "abc"})
+
+    def test_full_rebuild_reasons(self):
+        self.assertEqual(self.plan(full_rebuild=True)["fallback_reason"], "full_rebuild_requested")
+        self.assertEqual(self.plan(parent=None, parent_reason="parent_state_missing")["fallback_reason"], "parent_state_missing")
+        self.assertEqual(self.plan(lineage_key="other")["fallback_reason"], "config_or_code_changed")
+        self.assertEqual(self.plan(feature_columns_sha256="other")["fallback_reason"], "feature_columns_changed")
+        self.assertEqual(self.plan(train_end=250)["fallback_reason"], "evaluation_no_new_rows")
+        with patch.object(config, "MODEL_TRAIN_INCREMENTAL_FULL_REBUILD_EVERY", 3):
+            self.assertEqual(self.plan()["fallback_reason"], "full_rebuild_due")
+        with patch.object(config, "MODEL_TRAIN_INCREMENTAL_MAX_TREES", 25):
+            self.assertEqual(self.plan()["fallback_reason"], "tree_budget_exhausted")
+        with patch.object(config, "MODEL_TRAIN_INCREMENTAL", False):
+            plan = self.plan()
+        self.assertEqual((plan["mode"], plan["fallback_reason"]), ("full", "disabled"))
+        self.assertEqual(warm_start.lineage_summary(plan)["generation"], 0)
+
+    def test_lineage_fingerprint_ignores_incremental_settings(self):
+        base = {"MODEL_LABEL_THRESHOLD": 0.002, "MODEL_TRAIN_INCREMENTAL_EXTRA_TREES": 30}
+        tuned = {"MODEL_LABEL_THRESHOLD": 0.002, "env:MODEL_TRAIN_INCREMENTAL_EXTRA_TREES": "50"}
+        changed = {"MODEL_LABEL_THRESHOLD": 0.003}
+
+        self.assertEqual(warm_start.lineage_fingerprint(base), warm_start.lineage_fingerprint(tuned))
+        self.assertNotEqual(warm_start.lineage_fingerprint(base), warm_start.lineage_fingerprint(changed))
+
+
+if __name__ == "__main__":
+    unittest.main()
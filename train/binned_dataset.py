@@ -0,0 +1,86 @@
+import threading
+
+import numpy as np
+
+from config import config
+
+
+def shared_binning_enabled():
+    return bool(getattr(config, "MODEL_TRAIN_SHARED_BINNING", False))
+
+
+class BinnedFeatureMatrix:
+    """训练截止前的特征行只做一次分位数分箱，同一截止位置的各个拟合（global / long / short）按行位置复用。
+
+    XGBoost 以整表的 QuantileDMatrix 作为 ref，显式构建子集的 QuantileDMatrix 并用 xgb.train 训练，
+    再载回 sklearn 封装。LightGBM 的 sklearn 封装没有接收预建 Dataset 的公开入口，RandomForest 不分箱，
+    二者都照常拟合。分箱只使用特征值，不使用标签。
+    """
+
+    def __init__(self, X):
+        self.columns = list(X.columns)
+        self.index = X.index
+        self.values = np.ascontiguousarray(X.to_numpy(dtype=np.float32))
+        self._lock = threading.Lock()
+        self._xgb_references = {}
+
+    @classmethod
+    def from_frame(cls, X):
+        if X is None or X.empty or not X.index.is_unique:
+            return None
+        return cls(X)
+
+    def positions(self, X):
+        """返回 X 各行在整表中的位置；列不一致、有行不在整表中或行序不递增时返回 None。"""
+        if list(X.columns) != self.columns:
+            return None
+        positions = self.index.get_indexer(X.index)
+        if len(positions) == 0 or (positions < 0).any():
+            return None
+        if len(positions) > 1 and (np.diff(positions) <= 0).any():
+            return None
+        return positions.astype(np.int32, copy=False)
+
+    def xgb_reference(self, model):
+        import xgboost as xgb
+
+        max_bin = getattr(model, "max_bin", None)
+        with self._lock:
+            reference = self._xgb_references.get(max_bin)
+            if reference is None:
+                kwargs = {"max_bin": int(max_bin)} if max_bin is not None else {}
+                reference = xgb.QuantileDMatrix(self.values, **kwargs)
+                self._xgb_references[max_bin] = reference
+        return reference
+
+    def fit(self, model, X, y, sample_weight=None):
+        """能复用共享分箱时在这里完成拟合并返回 True；不适用时返回 False，由调用方照常 model.fit。"""
+        if not _is_xgb_model(model) or not hasattr(X, "columns"):
+            return False
+        positions = self.positions(X)
+        labels = np.asarray(y)
+        # 只接管标准的二分类标签，其余情况交给 XGBClassifier 自己校验
+        if positions is None or set(np.unique(labels).tolist()) != {0, 1}:
+            return False
+
+        import xgboost as xgb
+
+        max_bin = getattr(model, "max_bin", None)
+        train_matrix = xgb.QuantileDMatrix(
+            self.values[positions],
+            label=labels,
+            weight=None if sample_weight is None else np.asarray(sample_weight, dtype=float),
+            ref=self.xgb_reference(model),
+            feature_names=self.columns,
+            missing=model.missing,
+            nthread=model.n_jobs,
+            **({"max_bin": int(max_bin)} if max_bin is not None else {}),
+        )
+        booster = xgb.train(model.get_xgb_params(), train_matrix, num_boost_round=model.get_num_boosting_rounds())
+        model.load_model(bytearray(booster.save_raw(raw_format="ubj")))
+        return True
+
+
+def _is_xgb_model(model):
+    module = type(model).__module__ or ""
+    return module.startswith("xgboost") and hasattr(model, "get_xgb_params")
@@ -0,0 +1,209 @@
+"""walk-forward 重要性特征剪枝。
+
+在训练集内部按时间顺序切出若干 expanding fold，每个 fold 用轻量 LightGBM 计算 gain 占比和
+验证段置换重要性（ROC AUC 下降），据此：
+  - 冗余：与更重要的特征 |相关系数| 超过 MODEL_FEATURE_PRUNE_MAX_CORR 的特征；
+  - 低重要性：gain 占比低于 MODEL_FEATURE_PRUNE_MIN_GAIN_SHARE 且置换后 AUC 不降的特征。
+剔除后在同样的 fold 上重训比较平均 AUC，损失超过 MODEL_FEATURE_PRUNE_QUALITY_TOLERANCE 时
+只保留最不重要的一半候选再试，直到满足容忍度或候选为空。
+
+趋势/regime 列（REGIME_TREND_FEATURE_COLUMNS）决定方向子模型路由和 regime 校准，始终保留。
+"""
+import numpy as np
+import pandas as pd
+
+from config import config
+from core.ml_feature_engineering import REGIME_TREND_FEATURE_COLUMNS
+from utils.utils import log_info
+
+
+PROTECTED_FEATURES = frozenset(REGIME_TREND_FEATURE_COLUMNS)
+
+
+def feature_pruning_enabled():
+    return bool(getattr(config, "MODEL_FEATURE_PRUNE_ENABLED", False))
+
+
+def pruning_folds(row_count, *, folds=3, purge_bars=0, min_train_rows=200, min_validation_rows=50):
+    """expanding walk-forward 切分：[(train_end, valid_start, valid_end), ...]，训练段都从 0 开始。"""
+    folds = max(1, int(folds))
+    block = int(row_count) // (folds + 1)
+    result = []
+    for index in range(1, folds + 1):
+        train_end = index * block
+        valid_start = train_end + max(0, int(purge_bars))
+        valid_end = row_count if index == folds else (index + 1) * block
+        if train_end < int(min_train_rows) or valid_end - valid_start < int(min_validation_rows):
+            continue
+        result.append((train_end, valid_start, valid_end))
+    return result
+
+
+def _auc(y_true, scores):
+    from sklearn.metrics import roc_auc_score
+
+    if len(np.unique(y_true)) < 2:
+        return None
+    return float(roc_auc_score(y_true, scores))
+
+
+def _gain_share(model, feature_count):
+    booster = getattr(model, "booster_", None)
+    if booster is not None:
+        gain = np.asarray(booster.feature_importance(importance_type="gain"), dtype=float)
+    else:
+        gain = np.asarray(getattr(model, "feature_importances_", np.zeros(feature_count)), dtype=float)
+    total = gain.sum()
+    return gain / total if total > 0 else np.zeros(feature_count, dtype=float)
+
+
+def _fold_score(make_estimator, X, y, fold, columns):
+    train_end, valid_start, valid_end = fold
+    model = make_estimator().fit(X[:train_end][:, columns], y[:train_end])
+    return model, _auc(y[valid_start:valid_end], model.predict_proba(X[valid_start:valid_end][:, columns])[:, 1])
+
+
+def fold_importance(make_estimator, X, y, fold, *, repeats=2, seed=42):
+    """单个 fold 的 (gain 占比, 置换 AUC 下降, 基线 AUC)；验证段单一类别时返回 None。"""
+    columns = np.arange(X.shape[1])
+    model, base = _fold_score(make_estimator, X, y, fold, columns)
+    if base is None:
+        return None
+    _train_end, valid_start, valid_end = fold
+    X_valid = np.array(X[valid_start:valid_end], copy=True)
+    y_valid = y[valid_start:valid_end]
+    rng = np.random.default_rng(seed)
+    drops = np.zeros(X.shape[1], dtype=float)
+    for column in columns:
+        original = X_valid[:, column].copy()
+        for _ in range(max(1, int(repeats))):
+            X_valid[:, column] = rng.permutation(original)
+            drops[column] += base - _auc(y_valid, model.predict_proba(X_valid)[:, 1])
+        X_valid[:, column] = original
+    return _gain_share(model, X.shape[1]), drops / max(1, int(repeats)), base
+
+
+def redundant_features(X, feature_cols, importance, *, max_corr=0.98, protected=PROTECTED_FEATURES):
+    """按重要性从高到低贪心保留，与已保留特征高度相关的记为冗余：{特征: 与之重复的特征}。"""
+    values = np.asarray(X, dtype=float)
+    std = values.std(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = np.abs(np.corrcoef(values, rowvar=False))
+    corr[~np.isfinite(corr)] = 0.0
+    kept = []
+    redundant = {}
+    for index in np.argsort(-np.asarray(importance, dtype=float), kind="stable"):
+        name = feature_cols[index]
+        if name not in protected and std[index] > 0:
+            duplicate = next((other for other in kept if corr[index, other] >= float(max_corr)), None)
+            if duplicate is not None:
+                redundant[name] = feature_cols[duplicate]
+                continue
+        kept.append(index)
+    return redundant
+
+
+def _mean_score(make_estimator, X, y, folds, columns):
+    scores = [score for _model, score in (_fold_score(make_estimator, X, y, fold, columns) for fold in folds)]
+    scores = [score for score in scores if score is not None]
+    return float(np.mean(scores)) if scores else None
+
+
+def select_features(X, y, feature_cols, make_estimator, *, max_rows=None):
+    """返回剪枝摘要，summary["feature_cols"] 是保留下来的特征（保持原顺序）。"""
+    feature_cols = list(feature_cols)
+    if max_rows is None:
+        max_rows = int(getattr(config, "MODEL_FEATURE_PRUNE_MAX_ROWS", 60000))
+    if max_rows and len(X) > int(max_rows):
+        X, y = X.iloc[-int(max_rows):], y.iloc[-int(max_rows):]
+    values = np.asarray(pd.DataFrame(X, columns=feature_cols).astype(float), dtype=float)
+    targets = np.asarray(y, dtype=int)
+
+    summary = {
+        "enabled": True,
+        "input_feature_count": len(feature_cols),
+        "feature_cols": feature_cols,
+        "dropped": {},
+        "rows": int(len(values)),
+    }
+    folds = pruning_folds(
+        len(values),
+        folds=int(getattr(config, "MODEL_FEATURE_PRUNE_FOLDS", 3)),
+        purge_bars=int(getattr(config, "MODEL_PURGE_BARS", 0)),
+    )
+    results = [
+        result
+        for result in (
+            fold_importance(
+                make_estimator,
+                values,
+                targets,
+                fold,
+                repeats=int(getattr(config, "MODEL_FEATURE_PRUNE_PERMUTATION_REPEATS", 2)),
+            )
+            for fold in folds
+        )
+        if result is not None
+    ]
+    summary["folds"] = len(results)
+    if not results:
+        summary["skipped_reason"] = "no_scorable_folds"
+        return summary
+
+    gain_share = np.mean([result[0] for result in results], axis=0)
+    permutation = np.mean([result[1] for result in results], axis=0)
+    baseline = float(np.mean([result[2] for result in results]))
+    redundant = redundant_features(
+        values[:folds[-1][0]],
+        feature_cols,
+        gain_share,
+        max_corr=float(getattr(config, "MODEL_FEATURE_PRUNE_MAX_CORR", 0.98)),
+    )
+    min_gain_share = float(getattr(config, "MODEL_FEATURE_PRUNE_MIN_GAIN_SHARE", 0.002))
+    reasons = {name: f"redundant:{other}" for name, other in redundant.items()}
+    for index, name in enumerate(feature_cols):
+        if name in PROTECTED_FEATURES or name in reasons:
+            continue
+        if gain_share[index] < min_gain_share and permutation[index] <= 0.0:
+            reasons[name] = "low_importance"
+
+    # 候选按重要性从低到高排列，超出容忍度时保留最不重要的一半继续尝试
+    order = {name: index for index, name in enumerate(feature_cols)}
+    candidates = sorted(reasons, key=lambda name: (gain_share[order[name]], permutation[order[name]]))
+    min_features = max(1, int(getattr(config, "MODEL_FEATURE_PRUNE_MIN_FEATURES", 20)))
+    candidates = candidates[:max(0, len(feature_cols) - min_features)]
+    tolerance = float(getattr(config, "MODEL_FEATURE_PRUNE_QUALITY_TOLERANCE", 0.005))
+    attempts = []
+    accepted = []
+    pruned_score = baseline
+    while candidates:
+        dropped = set(candidates)
+        columns = np.asarray([order[name] for name in feature_cols if name not in dropped])
+        score = _mean_score(make_estimator, values, targets, folds, columns)
+        attempts.append({"dropped": len(candidates), "score": score})
+        if score is not None and baseline - score <= tolerance:
+            accepted, pruned_score = candidates, score
+            break
+        candidates = candidates[:len(candidates) // 2]
+
+    summary.update({
+        "feature_cols": [name for name in feature_cols if name not in set(accepted)],
+        "dropped": {name: reasons[name] for name in accepted},
+        "baseline_score": baseline,
+        "pruned_score": pruned_score,
+        "quality_tolerance": tolerance,
+        "attempts": attempts,
+        "importance": {
+            name: {"gain_share": float(gain_share[index]), "permutation_auc_drop": float(permutation[index])}
+            for index, name in enumerate(feature_cols)
+        },
+    })
+    summary["output_feature_count"] = len(summary["feature_cols"])
+    log_info(
+        "特征剪枝: "
+        f"features={summary['input_feature_count']}->{summary['output_feature_count']} "
+        f"folds={summary['folds']} auc={baseline:.4f}->{pruned_score:.4f} "
+        f"redundant={sum(1 for reason in summary['dropped'].values() if reason.startswith('redundant'))} "
+        f"low_importance={sum(1 for reason in summary['dropped'].values() if reason == 'low_importance')}"
+    )
+    return summary
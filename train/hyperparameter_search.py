@@ -0,0 +1,280 @@
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import average_precision_score
+
+from config import config
+from train.parallel_fit import plan_thread_budget, resolve_cpu_budget
+from utils.utils import log_info
+
+
+# 默认搜索空间：键名即 build_model_estimators(estimator_config=...) 接受的 "<模型>_<参数>" 形式。
+DEFAULT_SEARCH_SPACE = {
+    "lgb_n_estimators": [80, 160, 240],
+    "lgb_learning_rate": [0.01, 0.02, 0.05],
+    "lgb_max_depth": [4, 6, 8],
+    "lgb_min_child_samples": [5, 20, 50],
+    "lgb_colsample_bytree": [0.6, 0.8, 1.0],
+    "xgb_n_estimators": [80, 160, 240],
+    "xgb_learning_rate": [0.01, 0.02, 0.05],
+    "xgb_max_depth": [4, 6, 8],
+    "xgb_min_child_weight": [1, 5, 10],
+    "rf_n_estimators": [60, 100, 160],
+    "rf_max_depth": [4, 6, 8],
+    "rf_min_samples_leaf": [1, 5, 20],
+}
+
+FEATURES_FILE = "features.npy"
+LABELS_FILE = "labels.npy"
+META_FILE = "meta.joblib"
+
+# 子进程内的共享矩阵（只读内存映射），由 _init_worker 加载一次。
+_worker_matrix = None
+
+
+def sample_trials(space, n_trials, seed=42):
+    """从离散搜索空间无放回地抽取 n_trials 组参数；空间不足时返回全部组合。"""
+    names = sorted(space)
+    total = math.prod(len(space[name]) for name in names)
+    rng = random.Random(seed)
+    trials = []
+    seen = set()
+    while len(trials) < min(int(n_trials), total):
+        values = tuple(rng.choice(list(space[name])) for name in names)
+        if values in seen:
+            continue
+        seen.add(values)
+        trials.append(dict(zip(names, values)))
+    return trials
+
+
+class SharedTrainingMatrix:
+    """特征/标签以 .npy 落盘后按只读内存映射加载，多个搜索进程共享同一份物理页。"""
+
+    def __init__(self, features, labels, columns, index, context):
+        self.features = features
+        self.labels = labels
+        self.columns = list(columns)
+        self.index = index
+        self.context = context
+
+    @classmethod
+    def write(cls, directory, X, y, context):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, FEATURES_FILE), np.ascontiguousarray(X.to_numpy(dtype=np.float32)))
+        np.save(os.path.join(directory, LABELS_FILE), np.asarray(y, dtype=np.int8))
+        context_cols = [col for col in context.columns if col not in set(X.columns)]
+        joblib.dump(
+            {"columns": list(X.columns), "index": X.index, "context": context[context_cols]},
+            os.path.join(directory, META_FILE),
+        )
+        return directory
+
+    @classmethod
+    def load(cls, directory):
+        meta = joblib.load(os.path.join(directory, META_FILE))
+        return cls(
+            np.load(os.path.join(directory, FEATURES_FILE), mmap_mode="r"),
+            np.load(os.path.join(directory, LABELS_FILE), mmap_mode="r"),
+            meta["columns"],
+            meta["index"],
+            meta["context"],
+        )
+
+    def frame(self, start, end):
+        index = self.index[start:end]
+        X = pd.DataFrame(np.asarray(self.features[start:end]), index=index, columns=self.columns)
+        y = pd.Series(np.asarray(self.labels[start:end], dtype=int), index=index, name="target")
+        context = pd.concat([self.context.iloc[start:end], X], axis=1)
+        return X, y, context
+
+
+def _init_worker(matrix_dir, threads):
+    global _worker_matrix
+    _worker_matrix = SharedTrainingMatrix.load(matrix_dir)
+    # 每个试验进程只拿到自己那份线程预算，避免多进程 × 多线程超订 CPU。
+    config.MODEL_TRAIN_CPU_BUDGET = int(threads)
+
+
+def score_trial_fold(matrix, estimator_config, fold):
+    """在一个 walk-forward fold 上训练完整的方向质量模型组，返回验证集集成交易概率的平均精度。"""
+    from train.train import ensemble_trade_probability, train_direction_quality_bundle
+
+    X_train, y_train, train_context = matrix.frame(fold["train_start_pos"], fold["train_end_pos"])
+    X_valid, y_valid, valid_context = matrix.frame(fold["validation_start_pos"], fold["validation_end_pos"])
+    models, _, _, _, _ = train_direction_quality_bundle(
+        X_train,
+        y_train,
+        sample_context=train_context,
+        estimator_config=estimator_config,
+    )
+    if y_valid.nunique() < 2:
+        return float("nan")
+    probability = ensemble_trade_probability(
+        models,
+        X_valid,
+        config.MODEL_WEIGHTS,
+        sample_context=valid_context,
+        direction_model_weights=getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {}),
+    )
+    return float(average_precision_score(y_valid, probability))
+
+
+def _timed_evaluation(matrix, trial_id, estimator_config, fold):
+    started = time.perf_counter()
+    score = score_trial_fold(matrix, estimator_config, fold)
+    return trial_id, fold["fold"], score, time.perf_counter() - started
+
+
+def _evaluate_in_worker(trial_id, estimator_config, fold):
+    return _timed_evaluation(_worker_matrix, trial_id, estimator_config, fold)
+
+
+def _mean_score(scores):
+    finite = [score for score in scores if math.isfinite(score)]
+    return float(np.mean(finite)) if finite else float("-inf")
+
+
+def _run_rung(executor, survivors, fold, evaluate):
+    if executor is None:
+        for trial in survivors:
+            yield evaluate(trial["trial"], trial["estimator_config"], fold)
+        return
+    futures = [
+        executor.submit(_evaluate_in_worker, trial["trial"], trial["estimator_config"], fold)
+        for trial in survivors
+    ]
+    for future in as_completed(futures):
+        yield future.result()
+
+
+def successive_halving_search(matrix_dir, folds, trial_configs, *, eta=3, cpu_budget=None, max_workers=None, evaluate=None):
+    """按 fold 顺序做逐级减半：每一级所有存活试验评估下一个 fold，只保留均分前 1/eta 进入下一级。
+
+    弱试验在最早的 fold 上即被淘汰，只有少数试验跑满全部 fold。max_workers<=1 时在当前进程串行评估
+    （evaluate 可替换评估函数，供测试使用）；否则试验在进程池中并行，每个进程分到 cpu_budget/workers 个线程。
+    """
+    eta = max(2, int(eta))
+    trials = [
+        {"trial": trial_id, "estimator_config": dict(estimator_config), "scores": [], "status": "running"}
+        for trial_id, estimator_config in enumerate(trial_configs)
+    ]
+    cpu_budget = resolve_cpu_budget(cpu_budget)
+    workers, threads = plan_thread_budget(len(trials), cpu_budget, max_workers)
+    in_process = workers <= 1 or evaluate is not None
+    if in_process:
+        if evaluate is None:
+            matrix = SharedTrainingMatrix.load(matrix_dir)
+
+            def evaluate(trial_id, estimator_config, fold):
+                return _timed_evaluation(matrix, trial_id, estimator_config, fold)
+        workers, threads = 1, cpu_budget
+    log_info(
+        "估计器超参搜索: "
+        f"trials={len(trials)} folds={len(folds)} eta={eta} workers={workers} threads_per_trial={threads}"
+    )
+
+    started = time.perf_counter()
+    evaluations = 0
+    finished_trials = 0
+    curve = []
+    rungs = []
+    survivors = list(trials)
+    executor = None if in_process else ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(matrix_dir, threads),
+    )
+    try:
+        for rung, fold in enumerate(folds):
+            by_id = {trial["trial"]: trial for trial in survivors}
+            best_rung_score = float("-inf")
+            best_rung_trial = None
+            for trial_id, fold_number, score, seconds in _run_rung(executor, survivors, fold, evaluate):
+                trial = by_id[trial_id]
+                trial["scores"].append(float(score))
+                trial.setdefault("fit_seconds", 0.0)
+                trial["fit_seconds"] += float(seconds)
+                evaluations += 1
+                mean_score = _mean_score(trial["scores"])
+                if mean_score > best_rung_score:
+                    best_rung_score, best_rung_trial = mean_score, trial_id
+                elapsed = time.perf_counter() - started
+                curve.append({
+                    "elapsed_sec": round(elapsed, 3),
+                    "evaluations": evaluations,
+                    "rung": rung,
+                    "fold": int(fold_number),
+                    "trial": trial_id,
+                    "score": score,
+                    "best_score": best_rung_score,
+                    "best_trial": best_rung_trial,
+                })
+
+            survivors.sort(key=lambda item: _mean_score(item["scores"]), reverse=True)
+            last_rung = rung == len(folds) - 1
+            keep = len(survivors) if last_rung else max(1, math.ceil(len(survivors) / eta))
+            for trial in survivors[keep:]:
+                trial["status"] = "pruned"
+                trial["pruned_after_fold"] = int(fold["fold"])
+                finished_trials += 1
+            survivors = survivors[:keep]
+            if last_rung or len(survivors) == 1:
+                for trial in survivors:
+                    trial["status"] = "completed"
+                    finished_trials += 1
+
+            elapsed = time.perf_counter() - started
+            hours = max(elapsed, 1e-9) / 3600.0
+            rung_summary = {
+                "rung": rung,
+                "fold": int(fold["fold"]),
+                "evaluated": len(by_id),
+                "kept": len(survivors),
+                "best_trial": survivors[0]["trial"],
+                "best_score": _mean_score(survivors[0]["scores"]),
+                "elapsed_sec": round(elapsed, 3),
+                "trials_per_hour": round(finished_trials / hours, 2),
+                "evaluations_per_hour": round(evaluations / hours, 2),
+            }
+            rungs.append(rung_summary)
+            log_info(
+                "超参搜索进度: "
+                f"rung={rung} fold={rung_summary['fold']} evaluated={rung_summary['evaluated']} "
+                f"kept={rung_summary['kept']} best_trial={rung_summary['best_trial']} "
+                f"best_score={rung_summary['best_score']:.4f} "
+                f"trials/h={rung_summary['trials_per_hour']:.1f} evals/h={rung_summary['evaluations_per_hour']:.1f} "
+                f"elapsed={elapsed:.1f}s"
+            )
+            if len(survivors) == 1:
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    best = survivors[0]
+    elapsed = time.perf_counter() - started
+    hours = max(elapsed, 1e-9) / 3600.0
+    return {
+        "best_estimator_config": dict(best["estimator_config"]),
+        "best_trial": best["trial"],
+        "best_score": _mean_score(best["scores"]),
+        "best_folds_evaluated": len(best["scores"]),
+        "score_metric": "ensemble_trade_average_precision",
+        "eta": eta,
+        "workers": workers,
+        "threads_per_trial": threads,
+        "evaluations": evaluations,
+        "elapsed_sec": round(elapsed, 3),
+        "trials_per_hour": round(len(trials) / hours, 2),
+        "evaluations_per_hour": round(evaluations / hours, 2),
+        "rungs": rungs,
+        "best_so_far": curve,
+        "trials": trials,
+    }
@@ -0,0 +1,151 @@
+import contextlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import config
+from utils.utils import log_info
+
+
+class FitJob:
+    """一次独立的模型拟合：bundle 标识所属模型组（global / long / short 等）。"""
+
+    def __init__(self, bundle, name, model, X, y, sample_weight=None, binned_matrix=None, fit_params=None, finalize=None):
+        self.bundle = bundle
+        self.name = name
+        self.model = model
+        self.X = X
+        self.y = y
+        self.sample_weight = sample_weight
+        self.binned_matrix = binned_matrix
+        self.fit_params = dict(fit_params or {})
+        # 拟合完成后在同一线程内调用，用于增量续训后的树合并/计数等收尾。
+        self.finalize = finalize
+
+    def fit(self):
+        # 增量续训带 init_model / xgb_model，走 sklearn 封装原路径
+        binned = (
+            self.binned_matrix is not None
+            and not self.fit_params
+            and self.binned_matrix.fit(self.model, self.X, self.y, self.sample_weight)
+        )
+        if not binned:
+            self.model.fit(self.X, self.y, sample_weight=self.sample_weight, **self.fit_params)
+        if self.finalize is not None:
+            self.finalize(self.model)
+
+
+def resolve_cpu_budget(cpu_budget=None):
+    if cpu_budget is None:
+        cpu_budget = int(getattr(config, "MODEL_TRAIN_CPU_BUDGET", 0) or 0)
+    cpu_budget = int(cpu_budget or 0)
+    if cpu_budget <= 0:
+        cpu_budget = os.cpu_count() or 1
+    return max(1, cpu_budget)
+
+
+def plan_thread_budget(job_count, cpu_budget, max_concurrent=None):
+    """返回 (并发拟合数, 每个拟合的线程数)，二者乘积不超过 CPU 预算。"""
+    if job_count <= 0:
+        return 0, max(1, int(cpu_budget))
+    if max_concurrent is None:
+        max_concurrent = int(getattr(config, "MODEL_TRAIN_MAX_CONCURRENT_FITS", 0) or 0)
+    workers = min(int(job_count), int(cpu_budget))
+    if int(max_concurrent or 0) > 0:
+        workers = min(workers, int(max_concurrent))
+    workers = max(1, workers)
+    return workers, max(1, int(cpu_budget) // workers)
+
+
+def set_estimator_threads(model, threads):
+    """LightGBM / XGBoost / sklearn 均通过 n_jobs 控制线程；不支持的估计器保持原样。"""
+    get_params = getattr(model, "get_params", None)
+    set_params = getattr(model, "set_params", None)
+    if get_params is None or set_params is None:
+        return False
+    try:
+        if "n_jobs" not in get_params(deep=False):
+            return False
+        set_params(n_jobs=int(threads))
+    except Exception:
+        return False
+    return True
+
+
+def _native_thread_limit(threads):
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return contextlib.nullcontext()
+    return threadpool_limits(limits=int(threads))
+
+
+def _fit_group(jobs, threads):
+    timings = []
+    for job in jobs:
+        set_estimator_threads(job.model, threads)
+        started = time.perf_counter()
+        job.fit()
+        timings.append({
+            "bundle": job.bundle,
+            "model": job.name,
+            "rows": int(len(job.y)),
+            "threads": int(threads),
+            "seconds": round(time.perf_counter() - started, 4),
+        })
+    return timings
+
+
+def fit_model_jobs(jobs, *, cpu_budget=None, max_concurrent=None, parallel=None):
+    """并发拟合互不依赖的模型，按 CPU 预算为每个拟合分配线程数，返回每个模型的耗时报告。
+
+    LightGBM / XGBoost / sklearn 的拟合主体都在释放 GIL 的原生代码里运行，因此用线程池即可并行，
+    不需要复制训练数据到子进程。同一个估计器实例出现在多个任务中时按提交顺序串行拟合。
+    """
+    jobs = list(jobs)
+    if parallel is None:
+        parallel = bool(getattr(config, "MODEL_TRAIN_PARALLEL_FITS", True))
+    cpu_budget = resolve_cpu_budget(cpu_budget)
+
+    groups = {}
+    for job in jobs:
+        groups.setdefault(id(job.model), []).append(job)
+    ordered_groups = list(groups.values())
+
+    if parallel:
+        workers, threads = plan_thread_budget(len(ordered_groups), cpu_budget, max_concurrent)
+    else:
+        workers, threads = 1, cpu_budget
+
+    started = time.perf_counter()
+    timings = []
+    if workers <= 1:
+        with _native_thread_limit(threads):
+            for group in ordered_groups:
+                timings.extend(_fit_group(group, threads))
+    else:
+        with _native_thread_limit(threads):
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="model-fit") as executor:
+                futures = [executor.submit(_fit_group, group, threads) for group in ordered_groups]
+                for future in futures:
+                    timings.extend(future.result())
+
+    wall_seconds = time.perf_counter() - started
+    fit_seconds = sum(item["seconds"] for item in timings)
+    report = {
+        "cpu_budget": int(cpu_budget),
+        "concurrent_fits": int(max(workers, 1) if jobs else 0),
+        "threads_per_fit": int(threads),
+        "fit_count": len(timings),
+        "wall_seconds": round(wall_seconds, 4),
+        "fit_seconds": round(fit_seconds, 4),
+        "fits": timings,
+    }
+    if timings:
+        log_info(
+            "模型拟合耗时: "
+            f"fits={len(timings)} concurrent={report['concurrent_fits']} "
+            f"threads_per_fit={threads} wall={wall_seconds:.2f}s sum={fit_seconds:.2f}s "
+            + " ".join(f"{item['bundle']}/{item['model']}={item['seconds']:.2f}s" for item in timings)
+        )
+    return report
@@ -0,0 +1,320 @@
+import hashlib
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from config import config
+from utils.utils import BASE_DIR, log_info
+
+
+PIPELINE_CACHE_VERSION = 1
+
+# 这些前缀的配置只影响回测、扫参、重训调度或实盘运行，不改变数据/特征/标签/模型产物，
+# 因此不进入阶段缓存 key；只改它们时重训可以直接命中缓存。
+RUNTIME_ONLY_CONFIG_PREFIXES = (
+    "MODEL_WALK_FORWARD_",
+    "MODEL_RETRAIN_",
+    "MODEL_PIPELINE_",
+    "BACKTEST_",
+    "LIVE_",
+    "OKX_",
+    "TELEGRAM_",
+    "DAILY_REPORT_",
+    "RISK_",
+    "EXCHANGE_TPSL_",
+    "TPSL_",
+    "PREDICTION_CACHE_",
+    "MODEL_COMPACT_",
+    "MODEL_PREDICT_",
+)
+RUNTIME_ONLY_CONFIG_NAMES = {
+    "USE_SERVER",
+    "POLL_SEC",
+    "BAR_POLL_SEC",
+    "MAX_DAILY_LOSS_PCT",
+    "KILL_SWITCH_FILE",
+    "MODEL_TRAIN_PARALLEL_FITS",
+    "MODEL_TRAIN_CPU_BUDGET",
+    "MODEL_TRAIN_MAX_CONCURRENT_FITS",
+}
+
+# 阶段产物依赖的源码；源码变化时缓存整体失效，避免旧逻辑产物被误复用。
+PIPELINE_CODE_PATHS = (
+    "train/train.py",
+    "train/pipeline.py",
+    "train/binned_dataset.py",
+    "train/warm_start.py",
+    "train/feature_pruning.py",
+    "core/ml_feature_engineering.py",
+    "core/direction_quality.py",
+    "core/trend_filter.py",
+    "core/regime_filter.py",
+)
+
+
+def _is_runtime_only_config(name):
+    return name in RUNTIME_ONLY_CONFIG_NAMES or name.startswith(RUNTIME_ONLY_CONFIG_PREFIXES)
+
+
+def _jsonable(value):
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_jsonable(item) for item in value]
+        return sorted(items, key=repr) if isinstance(value, (set, frozenset)) else items
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return repr(value)
+
+
+def config_fingerprint(names=None, *, prefixes=None):
+    """收集影响阶段产物的配置快照（含同名环境变量覆盖），用于缓存 key。"""
+    if names is None and prefixes is None:
+        selected = [
+            name for name in dir(config)
+            if name.isupper() and not name.startswith("_") and not _is_runtime_only_config(name)
+        ]
+    else:
+        selected = set(names or [])
+        if prefixes:
+            selected.update(name for name in dir(config) if name.isupper() and name.startswith(tuple(prefixes)))
+        selected = list(selected)
+    snapshot = {}
+    for name in sorted(selected):
+        if hasattr(config, name):
+            snapshot[name] = _jsonable(getattr(config, name))
+        if name in os.environ:
+            snapshot[f"env:{name}"] = os.environ[name]
+    return snapshot
+
+
+def code_fingerprint(paths=PIPELINE_CODE_PATHS, base_dir=BASE_DIR):
+    h = hashlib.sha256()
+    for rel_path in paths:
+        path = os.path.join(base_dir, rel_path)
+        h.update(rel_path.encode("utf-8"))
+        if not os.path.exists(path):
+            h.update(b"<missing>")
+            continue
+        with open(path, "rb") as file:
+            h.update(file.read())
+    return h.hexdigest()
+
+
+def fingerprint_value(value):
+    """对 DataFrame/Series/ndarray 做内容哈希，dict/list 递归；其他值按 JSON 表示哈希。"""
+    h = hashlib.sha256()
+    _update_fingerprint(h, value)
+    return h.hexdigest()
+
+
+def _hash_pandas(value):
+    try:
+        hashed = pd.util.hash_pandas_object(value, index=True)
+    except TypeError:
+        # 诊断列里可能有 dict/list 等不可哈希对象，退化为按字符串表示哈希。
+        hashed = pd.util.hash_pandas_object(value.astype(str), index=True)
+    return hashed.to_numpy().tobytes()
+
+
+def _update_fingerprint(h, value):
+    if isinstance(value, pd.DataFrame):
+        h.update(b"frame")
+        h.update(json.dumps([str(col) for col in value.columns]).encode("utf-8"))
+        h.update(json.dumps([str(dtype) for dtype in value.dtypes]).encode("utf-8"))
+        h.update(_hash_pandas(value))
+    elif isinstance(value, pd.Series):
+        h.update(b"series")
+        h.update(str(value.name).encode("utf-8"))
+        h.update(_hash_pandas(value))
+    elif isinstance(value, np.ndarray):
+        h.update(b"ndarray")
+        h.update(str(value.dtype).encode("utf-8"))
+        h.update(str(value.shape).encode("utf-8"))
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        h.update(b"dict")
+        for key in sorted(value, key=str):
+            h.update(str(key).encode("utf-8"))
+            _update_fingerprint(h, value[key])
+    elif isinstance(value, (list, tuple)):
+        h.update(b"list")
+        for item in value:
+            _update_fingerprint(h, item)
+    else:
+        h.update(json.dumps(_jsonable(value), sort_keys=True).encode("utf-8"))
+
+
+class StageRecord:
+    def __init__(self, name, *, key=None, output_hash=None, cache="off", seconds=0.0):
+        self.name = name
+        self.key = key
+        self.output_hash = output_hash
+        self.cache = cache
+        self.seconds = float(seconds)
+
+    def summary(self):
+        return {
+            "stage": self.name,
+            "cache": self.cache,
+            "seconds": round(self.seconds, 4),
+            "key": self.key,
+            "output_hash": self.output_hash,
+        }
+
+
+class TrainingPipeline:
+    """按名称执行训练阶段；可缓存阶段按输入内容哈希持久化产物，并记录耗时与命中情况。"""
+
+    def __init__(self, cache_dir=None, *, enabled=None, keep=None, code_hash=None):
+        if cache_dir is None:
+            cache_dir = getattr(config, "MODEL_PIPELINE_CACHE_DIR", "models/pipeline_cache")
+        self.cache_dir = cache_dir if os.path.isabs(cache_dir) else os.path.join(BASE_DIR, cache_dir)
+        self.enabled = (
+            bool(getattr(config, "MODEL_PIPELINE_CACHE_ENABLED", True))
+            if enabled is None
+            else bool(enabled)
+        )
+        self.keep = max(1, int(getattr(config, "MODEL_PIPELINE_CACHE_KEEP", 3) if keep is None else keep))
+        self.code_hash = code_fingerprint() if code_hash is None else str(code_hash)
+        self.records = []
+        self._records_by_name = {}
+
+    def output_hash(self, name):
+        record = self._records_by_name.get(name)
+        if record is None:
+            raise KeyError(f"训练流水线阶段尚未执行: {name}")
+        return record.output_hash
+
+    def stage_key(self, name, inputs):
+        payload = {
+            "version": PIPELINE_CACHE_VERSION,
+            "stage": name,
+            "code": self.code_hash,
+            "inputs": fingerprint_value(inputs),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _cache_path(self, name, key):
+        return os.path.join(self.cache_dir, name, f"{key}.joblib")
+
+    def _load_cached(self, name, key):
+        path = self._cache_path(name, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            payload = joblib.load(path)
+        except Exception as exc:
+            log_info(f"⚠ 训练流水线缓存读取失败，将重新计算: stage={name} err={exc}")
+            return None
+        if not isinstance(payload, dict) or payload.get("key") != key:
+            return None
+        os.utime(path, None)
+        return payload
+
+    def _store(self, name, key, value, output_hash):
+        path = self._cache_path(name, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        joblib.dump({"key": key, "output_hash": output_hash, "value": value}, tmp_path)
+        os.replace(tmp_path, path)
+        self._prune(name)
+
+    def _prune(self, name):
+        stage_dir = os.path.join(self.cache_dir, name)
+        entries = [
+            os.path.join(stage_dir, file_name)
+            for file_name in os.listdir(stage_dir)
+            if file_name.endswith(".joblib")
+        ]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.keep:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def run(self, name, func, *, inputs=None, cacheable=True, hash_output=None):
+        """执行一个阶段。
+
+        inputs 决定缓存 key（通常是上游阶段的 output_hash 加本阶段相关配置）。
+        hash_output=True 时对产物做内容哈希，供下游阶段作为输入；否则沿用本阶段 key。
+        """
+        started = time.perf_counter()
+        key = self.stage_key(name, inputs) if inputs is not None else None
+        use_cache = self.enabled and cacheable and key is not None
+        if use_cache:
+            cached = self._load_cached(name, key)
+            if cached is not None:
+                record = StageRecord(
+                    name,
+                    key=key,
+                    output_hash=cached.get("output_hash") or key,
+                    cache="hit",
+                    seconds=time.perf_counter() - started,
+                )
+                self._append(record)
+                return cached["value"]
+
+        value = func()
+        if hash_output or key is None:
+            output_hash = fingerprint_value(value)
+        else:
+            output_hash = key
+        if use_cache:
+            self._store(name, key, value, output_hash)
+        record = StageRecord(
+            name,
+            key=key,
+            output_hash=output_hash,
+            cache="miss" if use_cache else "off",
+            seconds=time.perf_counter() - started,
+        )
+        self._append(record)
+        return value
+
+    def _append(self, record):
+        self.records.append(record)
+        self._records_by_name[record.name] = record
+
+    def report(self):
+        stages = [record.summary() for record in self.records]
+        return {
+            "cache_enabled": bool(self.enabled),
+            "cache_dir": self.cache_dir,
+            "total_seconds": round(sum(record.seconds for record in self.records), 4),
+            "cache_hits": sum(1 for record in self.records if record.cache == "hit"),
+            "cache_misses": sum(1 for record in self.records if record.cache == "miss"),
+            "stages": stages,
+        }
+
+    def log_report(self):
+        report = self.report()
+        log_info(
+            "训练流水线阶段报告: "
+            f"total={report['total_seconds']:.2f}s "
+            f"hits={report['cache_hits']} misses={report['cache_misses']} "
+            f"cache={'on' if report['cache_enabled'] else 'off'}"
+        )
+        for item in report["stages"]:
+            log_info(f"  - {item['stage']:<20} {item['seconds']:>9.2f}s cache={item['cache']}")
+        return report
+
+    def write_report(self, path=None):
+        if path is None:
+            path = getattr(config, "MODEL_PIPELINE_REPORT_PATH", "logs/training_pipeline_report.json")
+        path = path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+        return path
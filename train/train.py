@@ -12,10 +12,24 @@ import xgboost as xgb
 
 from core.ml_feature_engineering import merge_multi_period_features, add_advanced_features, model_feature_columns
 from core.okx_api import OKXClient
+from core.compact_models import compact_artifacts_enabled, default_model_paths, export_compact_bundle
 from core.direction_quality import DirectionQualityModel, BinaryProbabilityCalibrator, fit_binary_probability_calibrator
 from core.regime_filter import derive_market_regime, regime_allows_direction
 from core.trend_filter import derive_trend_context, trend_allows_direction
-from utils.utils import log_info, BASE_DIR
+from train.binned_dataset import BinnedFeatureMatrix, shared_binning_enabled
+from train.feature_pruning import feature_pruning_enabled, select_features
+from train.parallel_fit import FitJob, fit_model_jobs, resolve_cpu_budget
+from train.pipeline import TrainingPipeline, config_fingerprint
+from train.warm_start import (
+    incremental_enabled,
+    lineage_fingerprint,
+    lineage_summary,
+    load_incremental_parent,
+    log_incremental_plan,
+    plan_incremental_run,
+    write_incremental_state,
+)
+from utils.utils import log_info, BASE_DIR, sha256_file
 
 # 统一拼接绝对路径
 lgb_path = os.path.join(BASE_DIR,config.MODEL_PATHS.get("lgb_v1"))
@@ -27,7 +41,11 @@ candidate_training_metadata_path = os.path.join(
     os.path.dirname(training_metadata_path),
     "candidate_training_metadata.json",
 )
+incremental_state_path = os.path.join(BASE_DIR, config.MODEL_TRAIN_INCREMENTAL_STATE_PATH)
 
+# 特征阶段只依赖这些配置；标签与模型阶段使用完整的非运行期配置快照。
+FEATURE_STAGE_CONFIG_NAMES = ("INTERVALS", "MA_PERIOD", "RSI_PERIOD", "MODEL_USE_RUBIK_FEATURES", "MODEL_RUBIK_PERIOD")
+FEATURE_STAGE_CONFIG_PREFIXES = ("TREND_FILTER_", "REGIME_")
 
 TARGET_NO_TRADE = 0
 TARGET_TRADE = 1
@@ -1849,6 +1867,30 @@ def _trend_biases_from_features(X, sample_context=None):
     return ["neutral"] * len(X)
 
 
+def ensemble_trade_probability(
+    models,
+    X,
+    model_weights,
+    *,
+    sample_context=None,
+    direction_model_weights=None,
+    label_quality_summary=None,
+):
+    """按线上信号引擎的加权方式计算集成后的交易概率（多空方向取大）。"""
+    from core import signal_engine
+
+    X = pd.DataFrame(X)
+    directional_probability = signal_engine.weighted_predict_proba_batch(
+        models,
+        X,
+        model_weights,
+        trend_biases=_trend_biases_from_features(X, sample_context=sample_context),
+        model_metadata=_validation_model_metadata(label_quality_summary),
+        direction_model_weights=direction_model_weights,
+    )
+    return np.max(directional_probability, axis=1)
+
+
 def build_validation_gate_summary(
     models,
     model_weights,
@@ -1887,15 +1929,14 @@ def build_validation_gate_summary(
             **_binary_metrics_for_gate(y_validation, model_pred),
         }
 
-    directional_probability = signal_engine.weighted_predict_proba_batch(
+    weighted_probability = ensemble_trade_probability(
         models,
         X_validation,
         model_weights,
-        trend_biases=trend_biases,
-        model_metadata=model_metadata,
+        sample_context=sample_context,
         direction_model_weights=direction_model_weights,
+        label_quality_summary=label_quality_summary,
     )
-    weighted_probability = np.max(directional_probability, axis=1)
     y_pred = pd.Series((weighted_probability >= threshold).astype(int), index=y_validation.index)
     trade_rows = int((y_validation == TARGET_TRADE).sum())
     predicted_trade_rows = int((y_pred == TARGET_TRADE).sum())
@@ -1999,14 +2040,6 @@ def _json_safe(value):
     return value
 
 
-def sha256_file(path):
-    h = hashlib.sha256()
-    with open(path, "rb") as file:
-        for chunk in iter(lambda: file.read(1024 * 1024), b""):
-            h.update(chunk)
-    return h.hexdigest()
-
-
 def write_json_atomic(path, payload):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     tmp_path = f"{path}.tmp"
@@ -2030,8 +2063,12 @@ def write_candidate_training_metadata(metadata):
     log_info(f"候选训练诊断元数据已保存至: {candidate_training_metadata_path}")
 
 
-def build_training_metadata(*, X, y, feature_cols, train_end, validation_start, validation_end, oos_start, original_train_rows, balanced_train_rows, validation_metrics, artifact_paths, label_filter_summary=None, label_quality_summary=None, sample_weight_summary=None, evaluation_sample_weight_summary=None, direction_quality_summary=None, validation_gate_summary=None, final_train_end=None):
+def build_training_metadata(*, X, y, feature_cols, train_end, validation_start, validation_end, oos_start, original_train_rows, balanced_train_rows, validation_metrics, artifact_paths, label_filter_summary=None, label_quality_summary=None, sample_weight_summary=None, evaluation_sample_weight_summary=None, direction_quality_summary=None, validation_gate_summary=None, final_train_end=None, lineage=None, feature_pruning_summary=None):
     final_train_end = train_end if final_train_end is None else int(final_train_end)
+    created_at = pd.Timestamp.utcnow().isoformat()
+    lineage = dict(lineage or {"mode": "full", "generation": 0, "increments_since_full_rebuild": 0})
+    if not lineage.get("full_rebuild_created_at"):
+        lineage["full_rebuild_created_at"] = created_at
     artifact_hashes = {
         os.path.relpath(path, BASE_DIR): sha256_file(path)
         for path in artifact_paths
@@ -2045,7 +2082,7 @@ def build_training_metadata(*, X, y, feature_cols, train_end, validation_start,
     }
     return {
         "schema_version": 2,
-        "created_at": pd.Timestamp.utcnow().isoformat(),
+        "created_at": created_at,
         "source": "train.train",
         "symbol": config.SYMBOL,
         "intervals": list(config.INTERVALS),
@@ -2090,6 +2127,11 @@ def build_training_metadata(*, X, y, feature_cols, train_end, validation_start,
         "evaluation_sample_weight_summary": evaluation_sample_weight_summary or {},
         "validation_gate_summary": validation_gate_summary or {},
         "direction_quality_models": direction_quality_summary or {},
+        "feature_pruning": {
+            key: value
+            for key, value in (feature_pruning_summary or {"enabled": False}).items()
+            if key not in {"feature_cols", "importance"}
+        },
         "train_ratio": float(config.MODEL_TRAIN_RATIO),
         "validation_ratio": float(config.MODEL_VALIDATION_RATIO),
         "purge_bars": int(config.MODEL_PURGE_BARS),
@@ -2108,55 +2150,62 @@ def build_training_metadata(*, X, y, feature_cols, train_end, validation_start,
         "validation_end": X.index[validation_end - 1].isoformat(),
         "oos_start": X.index[oos_start].isoformat(),
         "oos_end": X.index[-1].isoformat(),
+        "lineage": lineage,
+    }
+
+
+def _estimator_overrides(estimator_config, prefix):
+    """estimator_config 里 "<prefix>_<参数名>" 形式的键覆盖对应估计器的构造参数，如 lgb_max_depth。"""
+    marker = f"{prefix}_"
+    return {
+        key[len(marker):]: value
+        for key, value in estimator_config.items()
+        if key.startswith(marker)
     }
 
 
 def build_model_estimators(estimator_config=None):
     estimator_config = dict(estimator_config or {})
-    lgb_estimators = int(estimator_config.get(
-        "lgb_n_estimators",
-        getattr(config, "MODEL_TRAIN_LGB_ESTIMATORS", 160),
-    ))
-    xgb_estimators = int(estimator_config.get(
-        "xgb_n_estimators",
-        getattr(config, "MODEL_TRAIN_XGB_ESTIMATORS", 160),
-    ))
-    rf_estimators = int(estimator_config.get(
-        "rf_n_estimators",
-        getattr(config, "MODEL_TRAIN_RF_ESTIMATORS", 100),
-    ))
+    lgb_params = {
+        "n_estimators": getattr(config, "MODEL_TRAIN_LGB_ESTIMATORS", 160),
+        "learning_rate": 0.02,
+        "max_depth": 6,
+        "subsample": 0.8,
+        "colsample_bytree": 0.8,
+        "reg_alpha": 0.1,
+        "reg_lambda": 1.0,
+        "min_child_samples": 5,
+        "min_split_gain": 0.0,
+        "force_col_wise": True,
+        "verbosity": -1,
+        "random_state": 42,
+    }
+    xgb_params = {
+        "n_estimators": getattr(config, "MODEL_TRAIN_XGB_ESTIMATORS", 160),
+        "learning_rate": 0.02,
+        "max_depth": 6,
+        "subsample": 0.8,
+        "colsample_bytree": 0.8,
+        "reg_alpha": 0.1,
+        "reg_lambda": 1.0,
+        "verbosity": 0,
+        "random_state": 42,
+    }
+    rf_params = {
+        "n_estimators": getattr(config, "MODEL_TRAIN_RF_ESTIMATORS", 100),
+        "max_depth": 6,
+        "random_state": 42,
+        "n_jobs": -1,
+    }
+    lgb_params.update(_estimator_overrides(estimator_config, "lgb"))
+    xgb_params.update(_estimator_overrides(estimator_config, "xgb"))
+    rf_params.update(_estimator_overrides(estimator_config, "rf"))
+    for params in (lgb_params, xgb_params, rf_params):
+        params["n_estimators"] = int(params["n_estimators"])
     return {
-        "lgb_v1": lgb.LGBMClassifier(
-            n_estimators=lgb_estimators,
-            learning_rate=0.02,
-            max_depth=6,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            reg_alpha=0.1,
-            reg_lambda=1.0,
-            min_child_samples=5,
-            min_split_gain=0.0,
-            force_col_wise=True,
-            verbosity=-1,
-            random_state=42
-        ),
-        "xgb_v1": xgb.XGBClassifier(
-            n_estimators=xgb_estimators,
-            learning_rate=0.02,
-            max_depth=6,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            reg_alpha=0.1,
-            reg_lambda=1.0,
-            verbosity=0,
-            random_state=42
-        ),
-        "rf_v1": RandomForestClassifier(
-            n_estimators=rf_estimators,
-            max_depth=6,
-            random_state=42,
-            n_jobs=-1,
-        ),
+        "lgb_v1": lgb.LGBMClassifier(**lgb_params),
+        "xgb_v1": xgb.XGBClassifier(**xgb_params),
+        "rf_v1": RandomForestClassifier(**rf_params),
     }
 
 
@@ -2183,7 +2232,11 @@ def validation_estimator_config():
     }
 
 
-def train_model_bundle(X_train, y_train, sample_context=None, estimator_config=None):
+def prepare_model_bundle(X_train, y_train, sample_context=None, estimator_config=None, *, bundle="global", binned_matrix=None, warm_start=None):
+    """构建未拟合的模型组与对应的拟合任务，供 fit_model_jobs 统一调度。
+
+    warm_start 为 WarmStartSource 时，拟合任务在上一代对应模型上续训，不再使用共享分箱。
+    """
     X_balanced, y_balanced, sample_weight, sample_weight_summary = balance_samples(
         X_train,
         y_train,
@@ -2192,8 +2245,27 @@ def train_model_bundle(X_train, y_train, sample_context=None, estimator_config=N
     X_balanced = pd.DataFrame(X_balanced, columns=X_train.columns)
 
     models = build_model_estimators(estimator_config=estimator_config)
-    for model in models.values():
-        model.fit(X_balanced, y_balanced, sample_weight=sample_weight)
+    if warm_start is not None:
+        jobs = [
+            warm_start.fit_job(bundle, name, model, X_balanced, y_balanced, sample_weight)
+            for name, model in models.items()
+        ]
+    else:
+        jobs = [
+            FitJob(bundle, name, model, X_balanced, y_balanced, sample_weight, binned_matrix=binned_matrix)
+            for name, model in models.items()
+        ]
+    return models, X_balanced, y_balanced, sample_weight_summary, jobs
+
+
+def train_model_bundle(X_train, y_train, sample_context=None, estimator_config=None):
+    models, X_balanced, y_balanced, sample_weight_summary, jobs = prepare_model_bundle(
+        X_train,
+        y_train,
+        sample_context=sample_context,
+        estimator_config=estimator_config,
+    )
+    fit_model_jobs(jobs)
     return models, X_balanced, y_balanced, sample_weight_summary
 
 
@@ -2287,21 +2359,33 @@ def _split_direction_train_calibration(X_dir, y_dir, context_dir, *, min_rows, m
     )
 
 
-def train_direction_quality_bundle(X_train, y_train, sample_context=None, estimator_config=None):
-    """Train global binary quality models plus long/short quality submodels."""
-    global_models, X_balanced, y_balanced, sample_weight_summary = train_model_bundle(
+def train_direction_quality_bundle(X_train, y_train, sample_context=None, estimator_config=None, *, binned_matrix=None, warm_start=None):
+    """Train global binary quality models plus long/short quality submodels.
+
+    binned_matrix 是覆盖 X_train 各行的共享分箱矩阵，只能由训练截止之前的行构建，否则分位切点会看到未来行；
+    未传入时按 X_train 构建一次，供 global 与各方向子模型共用。
+    warm_start 为上一代模型时做增量续训：X_train 只是新切片，切片内样本不足的方向沿用上一代子模型。
+    """
+    if binned_matrix is None and warm_start is None and shared_binning_enabled():
+        binned_matrix = BinnedFeatureMatrix.from_frame(X_train)
+    global_models, X_balanced, y_balanced, sample_weight_summary, fit_jobs = prepare_model_bundle(
         X_train,
         y_train,
         sample_context=sample_context,
         estimator_config=estimator_config,
+        binned_matrix=binned_matrix,
+        warm_start=warm_start,
     )
 
     direction_summary = direction_quality_sample_summary(y_train, sample_context)
     if not _direction_quality_enabled():
+        fit_report = fit_model_jobs(fit_jobs)
         return global_models, X_balanced, y_balanced, sample_weight_summary, {
             "enabled": False,
             "fallback_reason": "disabled",
             "directions": direction_summary,
+            "fit_report": fit_report,
+            "warm_start": warm_start.summary() if warm_start is not None else None,
         }
 
     min_rows = max(1, _direction_quality_min_rows())
@@ -2320,6 +2404,8 @@ def train_direction_quality_bundle(X_train, y_train, sample_context=None, estima
     direction_calibrators_by_name = {name: {} for name in global_models}
     direction_regime_calibrators_by_name = {name: {} for name in global_models}
 
+    # 先为 global 与各方向准备全部拟合任务，再一次性并发拟合；校准依赖拟合结果，放到第二轮。
+    direction_plans = []
     for direction in ("long", "short"):
         X_dir, y_dir, context_dir = _direction_subset(X_train, y_train, sample_context, direction)
         rows = int(len(y_dir))
@@ -2334,23 +2420,28 @@ def train_direction_quality_bundle(X_train, y_train, sample_context=None, estima
             "min_trade_rows": int(min_trade_rows),
         })
 
+        fallback_reason = None
         if rows < min_rows:
+            fallback_reason = "rows_below_minimum"
+        elif trade_rows < min_trade_rows:
+            fallback_reason = "trade_rows_below_minimum"
+        elif y_dir.astype(int).nunique() < 2:
+            fallback_reason = "single_class_direction_data"
+        elif warm_start is not None and not warm_start.has_direction(direction):
+            fallback_reason = "warm_start_parent_direction_missing"
+        if fallback_reason:
             direction_summary[direction].update({
                 "enabled": False,
-                "fallback_reason": "rows_below_minimum",
-            })
-            continue
-        if trade_rows < min_trade_rows:
-            direction_summary[direction].update({
-                "enabled": False,
-                "fallback_reason": "trade_rows_below_minimum",
-            })
-            continue
-        if y_dir.astype(int).nunique() < 2:
-            direction_summary[direction].update({
-                "enabled": False,
-                "fallback_reason": "single_class_direction_data",
+                "fallback_reason": fallback_reason,
             })
+            if warm_start is not None and warm_start.has_direction(direction):
+                warm_start.carry_forward(
+                    direction,
+                    direction_models_by_name,
+                    direction_calibrators_by_name,
+                    direction_regime_calibrators_by_name,
+                )
+                direction_summary[direction]["carried_forward_from_parent"] = True
             continue
 
         (
@@ -2371,26 +2462,64 @@ def train_direction_quality_bundle(X_train, y_train, sample_context=None, estima
         calibration_source_models = {}
         calibration_model_weight_summary = None
         if X_calibration_dir.empty or calibration_method == "none":
-            dir_models, _, _, dir_weight_summary = train_model_bundle(
+            dir_models, _, _, dir_weight_summary, dir_jobs = prepare_model_bundle(
                 X_dir,
                 y_dir,
                 sample_context=context_dir,
                 estimator_config=estimator_config,
+                bundle=direction,
+                binned_matrix=binned_matrix,
+                warm_start=warm_start,
             )
             calibration_source_models = dir_models
+            fit_jobs.extend(dir_jobs)
         else:
-            calibration_source_models, _, _, calibration_model_weight_summary = train_model_bundle(
+            calibration_source_models, _, _, calibration_model_weight_summary, calibration_jobs = prepare_model_bundle(
                 X_model_dir,
                 y_model_dir,
                 sample_context=context_model_dir,
                 estimator_config=estimator_config,
+                bundle=f"{direction}_calibration",
+                binned_matrix=binned_matrix,
+                warm_start=warm_start,
             )
-            dir_models, _, _, dir_weight_summary = train_model_bundle(
+            dir_models, _, _, dir_weight_summary, dir_jobs = prepare_model_bundle(
                 X_dir,
                 y_dir,
                 sample_context=context_dir,
                 estimator_config=estimator_config,
+                bundle=direction,
+                binned_matrix=binned_matrix,
+                warm_start=warm_start,
             )
+            fit_jobs.extend(calibration_jobs)
+            fit_jobs.extend(dir_jobs)
+        direction_plans.append({
+            "direction": direction,
+            "y_model_dir": y_model_dir,
+            "X_calibration_dir": X_calibration_dir,
+            "y_calibration_dir": y_calibration_dir,
+            "context_calibration_dir": context_calibration_dir,
+            "calibration_split_fallback": calibration_split_fallback,
+            "calibration_source_models": calibration_source_models,
+            "calibration_model_weight_summary": calibration_model_weight_summary,
+            "dir_models": dir_models,
+            "dir_weight_summary": dir_weight_summary,
+        })
+
+    fit_report = fit_model_jobs(fit_jobs)
+
+    for plan in direction_plans:
+        direction = plan["direction"]
+        y_model_dir = plan["y_model_dir"]
+        X_calibration_dir = plan["X_calibration_dir"]
+        y_calibration_dir = plan["y_calibration_dir"]
+        context_calibration_dir = plan["context_calibration_dir"]
+        calibration_split_fallback = plan["calibration_split_fallback"]
+        calibration_source_models = plan["calibration_source_models"]
+        calibration_model_weight_summary = plan["calibration_model_weight_summary"]
+        dir_models = plan["dir_models"]
+        dir_weight_summary = plan["dir_weight_summary"]
         calibration_summary_by_model = {}
         regime_calibration_summary_by_model = {}
         for name, model in dir_models.items():
@@ -2547,10 +2676,22 @@ def train_direction_quality_bundle(X_train, y_train, sample_context=None, estima
         "calibrated_directions": calibrated_directions,
         "calibrated_direction_regimes": calibrated_direction_regimes,
         "directions": _json_safe(direction_summary),
+        "fit_report": fit_report,
+        "warm_start": warm_start.summary() if warm_start is not None else None,
     }
     return wrapped_models, X_balanced, y_balanced, sample_weight_summary, diagnostics
 
 
+def _feature_pruning_estimator():
+    """特征剪枝用的轻量 LightGBM，参数与验证门禁评估模型一致。"""
+    estimator_config = {**(validation_estimator_config() or {}), "lgb_n_jobs": resolve_cpu_budget()}
+    return build_model_estimators(estimator_config)["lgb_v1"]
+
+
+def _prune_feature_payload(X_train, y_train, feature_cols):
+    return select_features(X_train, y_train, feature_cols, _feature_pruning_estimator)
+
+
 def build_time_splits(length):
     train_ratio = float(config.MODEL_TRAIN_RATIO)
     validation_ratio = float(config.MODEL_VALIDATION_RATIO)
@@ -2570,24 +2711,84 @@ def build_time_splits(length):
     return train_end, validation_start, validation_end, oos_start
 
 
-def train():
-    remove_candidate_training_metadata()
+def _fetch_training_data():
     client = OKXClient()
     data_dict = client.fetch_data()
-    merged_df = merge_multi_period_features(data_dict)
     rubik_data = None
     if bool(config.MODEL_USE_RUBIK_FEATURES):
         rubik_data = client.fetch_rubik_data(period=config.MODEL_RUBIK_PERIOD)
         log_info(f"已拉取 Rubik 特征数据 (period={config.MODEL_RUBIK_PERIOD})")
-    merged_df = add_advanced_features(merged_df, rubik_data=rubik_data)
-    merged_df = merged_df.dropna().copy()
-    merged_df = create_labels(
-        merged_df,
+    return {"data_dict": data_dict, "rubik_data": rubik_data}
+
+
+def _build_feature_frame(raw_data):
+    merged_df = merge_multi_period_features(raw_data["data_dict"])
+    merged_df = add_advanced_features(merged_df, rubik_data=raw_data["rubik_data"])
+    return merged_df.dropna().copy()
+
+
+def _build_labeled_frame(feature_df):
+    labeled_df = create_labels(
+        feature_df,
         future_window=int(config.MODEL_LABEL_FUTURE_WINDOW),
         threshold=float(config.MODEL_LABEL_THRESHOLD),
     )
-    label_filter_summary = merged_df.attrs.get("label_filter_summary", {})
-    label_quality_summary = merged_df.attrs.get("label_quality_summary", {})
+    return {
+        "frame": labeled_df,
+        "label_filter_summary": labeled_df.attrs.get("label_filter_summary", {}),
+        "label_quality_summary": labeled_df.attrs.get("label_quality_summary", {}),
+    }
+
+
+def _train_bundle_payload(X_train, y_train, sample_context, estimator_config=None, warm_start=None):
+    models, X_balanced, _, sample_weight_summary, direction_quality_summary = train_direction_quality_bundle(
+        X_train,
+        y_train,
+        sample_context=sample_context,
+        estimator_config=estimator_config,
+        warm_start=warm_start,
+    )
+    return {
+        "models": models,
+        "balanced_train_rows": len(X_balanced),
+        "sample_weight_summary": sample_weight_summary,
+        "direction_quality_summary": direction_quality_summary,
+    }
+
+
+def train(pipeline=None, *, full_rebuild=False):
+    remove_candidate_training_metadata()
+    pipeline = TrainingPipeline() if pipeline is None else pipeline
+    try:
+        _run_training_pipeline(pipeline, full_rebuild=full_rebuild)
+    finally:
+        pipeline.log_report()
+        pipeline.write_report()
+
+
+def _run_training_pipeline(pipeline, full_rebuild=False):
+    training_config = config_fingerprint()
+
+    # 行情数据每次都重新拉取，但对内容做哈希：数据未变化时下游阶段全部命中缓存。
+    raw_data = pipeline.run("fetch_data", _fetch_training_data, cacheable=False, hash_output=True)
+    feature_df = pipeline.run(
+        "features",
+        lambda: _build_feature_frame(raw_data),
+        inputs={
+            "raw_data": pipeline.output_hash("fetch_data"),
+            "config": config_fingerprint(FEATURE_STAGE_CONFIG_NAMES, prefixes=FEATURE_STAGE_CONFIG_PREFIXES),
+        },
+        hash_output=True,
+    )
+    labeled = pipeline.run(
+        "labels",
+        lambda: _build_labeled_frame(feature_df),
+        inputs={"features": pipeline.output_hash("features"), "config": training_config},
+        hash_output=True,
+    )
+    merged_df = labeled["frame"]
+    label_filter_summary = labeled["label_filter_summary"]
+    label_quality_summary = labeled["label_quality_summary"]
     if label_filter_summary:
         log_info(f"标签过滤摘要: {json.dumps(label_filter_summary, ensure_ascii=False, sort_keys=True)}")
     if label_quality_summary:
@@ -2606,46 +2807,116 @@ def train():
     X = merged_df[feature_cols].astype(float)
     y = merged_df['target']
 
-    train_end, validation_start, validation_end, oos_start = build_time_splits(len(X))
-    if len(X.iloc[oos_start:]) < int(config.MODEL_RETRAIN_MIN_OOS_ROWS):
-        raise ValueError(
-            f"OOS样本不足: rows={len(X.iloc[oos_start:])} < {int(config.MODEL_RETRAIN_MIN_OOS_ROWS)}"
+    def _splits():
+        splits = build_time_splits(len(X))
+        oos_rows = len(X) - splits[3]
+        if oos_rows < int(config.MODEL_RETRAIN_MIN_OOS_ROWS):
+            raise ValueError(
+                f"OOS样本不足: rows={oos_rows} < {int(config.MODEL_RETRAIN_MIN_OOS_ROWS)}"
+            )
+        return splits
+
+    train_end, validation_start, validation_end, oos_start = pipeline.run("splits", _splits, cacheable=False)
+
+    # 可选特征剪枝：只用训练段的 walk-forward fold 评估，剪枝后的特征列用于后续全部模型训练与产物
+    feature_pruning_summary = None
+    if feature_pruning_enabled():
+        feature_pruning_summary = pipeline.run(
+            "feature_pruning",
+            lambda: _prune_feature_payload(X.iloc[:train_end], y.iloc[:train_end], feature_cols),
+            inputs={
+                "labels": pipeline.output_hash("labels"),
+                "feature_cols": feature_cols,
+                "train_end": train_end,
+                "config": training_config,
+            },
+        )
+        feature_cols = list(feature_pruning_summary["feature_cols"])
+        X = X[feature_cols]
+    final_train_end = validation_end if bool(config.MODEL_FINAL_TRAIN_ON_VALIDATION) else train_end
+
+    # 增量模式：门禁评估模型与线上模型各自在上一代上续训新切片；任一前提不满足则全量重建。
+    lineage_key = lineage_fingerprint(training_config)
+    parent, parent_reason = None, None
+    if incremental_enabled() and not full_rebuild:
+        parent, parent_reason = load_incremental_parent(
+            metadata_path=training_metadata_path,
+            state_path=incremental_state_path,
+            model_paths={"lgb_v1": lgb_path, "xgb_v1": xgb_path, "rf_v1": rf_path},
         )
+    incremental_plan = plan_incremental_run(
+        y,
+        train_end=train_end,
+        final_train_end=final_train_end,
+        feature_columns_sha256=hashlib.sha256("\n".join(feature_cols).encode("utf-8")).hexdigest(),
+        lineage_key=lineage_key,
+        parent=parent,
+        parent_reason=parent_reason,
+        full_rebuild=full_rebuild,
+    )
+    log_incremental_plan(incremental_plan)
+    incremental = incremental_plan["mode"] == "incremental"
+    eval_start = incremental_plan["evaluation_slice"]["start"] if incremental else 0
 
     original_train_rows = train_end
-    X_train = X.iloc[:train_end].copy()
+    X_train = X.iloc[eval_start:train_end].copy()
     X_test = X.iloc[validation_start:validation_end].copy()
-    y_train = y.iloc[:train_end].copy()
+    y_train = y.iloc[eval_start:train_end].copy()
     y_test = y.iloc[validation_start:validation_end].copy()
 
     # 只在训练集内部计算评估模型的样本权重，避免把未来样本混回验证过程。
-    eval_sample_context = merged_df.iloc[:train_end].copy()
+    eval_sample_context = merged_df.iloc[eval_start:train_end].copy()
     eval_estimator_config = validation_estimator_config()
     if eval_estimator_config:
         log_info(f"验证/门禁评估使用轻量模型参数: {eval_estimator_config}")
-    eval_models, X_eval_train, _, evaluation_sample_weight_summary, evaluation_direction_quality_summary = train_direction_quality_bundle(
-        X_train,
-        y_train,
-        sample_context=eval_sample_context,
-        estimator_config=eval_estimator_config,
+    eval_inputs = {
+        "labels": pipeline.output_hash("labels"),
+        "feature_cols": feature_cols,
+        "train_end": train_end,
+        "estimator_config": eval_estimator_config or {},
+        "config": training_config,
+    }
+    if incremental:
+        eval_inputs["warm_start"] = {
+            "parent": incremental_plan["parent"],
+            "slice": incremental_plan["evaluation_slice"],
+        }
+    eval_bundle = pipeline.run(
+        "evaluation_bundle",
+        lambda: _train_bundle_payload(
+            X_train,
+            y_train,
+            eval_sample_context,
+            eval_estimator_config,
+            warm_start=incremental_plan.get("evaluation_source"),
+        ),
+        inputs=eval_inputs,
     )
+    eval_models = eval_bundle["models"]
+    evaluation_sample_weight_summary = eval_bundle["sample_weight_summary"]
+    evaluation_direction_quality_summary = eval_bundle["direction_quality_summary"]
     X_test = pd.DataFrame(X_test, columns=feature_cols)
 
-    validation_metrics = {
-        "lgb_v1": evaluate_model(eval_models["lgb_v1"], "LightGBM", X_test, y_test),
-        "xgb_v1": evaluate_model(eval_models["xgb_v1"], "XGBoost", X_test, y_test),
-        "rf_v1": evaluate_model(eval_models["rf_v1"], "RandomForest", X_test, y_test),
-    }
-    validation_gate_summary = build_validation_gate_summary(
-        eval_models,
-        config.MODEL_WEIGHTS,
-        X_test,
-        y_test,
-        sample_context=merged_df.iloc[validation_start:validation_end],
-        direction_model_weights=getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {}),
-        label_quality_summary=label_quality_summary,
-    )
-    validation_metrics["ensemble_threshold"] = validation_gate_summary
+    def _validation_gate():
+        metrics = {
+            "lgb_v1": evaluate_model(eval_models["lgb_v1"], "LightGBM", X_test, y_test),
+            "xgb_v1": evaluate_model(eval_models["xgb_v1"], "XGBoost", X_test, y_test),
+            "rf_v1": evaluate_model(eval_models["rf_v1"], "RandomForest", X_test, y_test),
+        }
+        gate_summary = build_validation_gate_summary(
+            eval_models,
+            config.MODEL_WEIGHTS,
+            X_test,
+            y_test,
+            sample_context=merged_df.iloc[validation_start:validation_end],
+            direction_model_weights=getattr(config, "MODEL_DIRECTION_MODEL_WEIGHTS", {}),
+            label_quality_summary=label_quality_summary,
+        )
+        metrics["ensemble_threshold"] = gate_summary
+        return metrics, gate_summary
+
+    # 门禁阈值属于 MODEL_RETRAIN_* 运行期配置，评估很快，始终重新计算。
+    validation_metrics, validation_gate_summary = pipeline.run("validation_gate", _validation_gate, cacheable=False)
     log_info(
         "验证集候选交易门禁: "
         f"threshold={validation_gate_summary.get('decision_threshold', 0.0):.4f} "
@@ -2684,7 +2955,7 @@ def train():
         validation_end=validation_end,
         oos_start=oos_start,
         original_train_rows=original_train_rows,
-        balanced_train_rows=len(X_eval_train),
+        balanced_train_rows=eval_bundle["balanced_train_rows"],
         validation_metrics=validation_metrics,
         artifact_paths=[],
         label_filter_summary=label_filter_summary,
@@ -2698,6 +2969,11 @@ def train():
         direction_quality_summary={},
         validation_gate_summary=validation_gate_summary,
         final_train_end=train_end,
+        lineage=lineage_summary(
+            incremental_plan,
+            evaluation_warm_start=evaluation_direction_quality_summary.get("warm_start"),
+        ),
+        feature_pruning_summary=feature_pruning_summary,
     )
     write_candidate_training_metadata(candidate_metadata)
     try:
@@ -2710,30 +2986,71 @@ def train():
         })
         raise
 
-    final_train_end = validation_end if bool(config.MODEL_FINAL_TRAIN_ON_VALIDATION) else train_end
-    X_final_train = X.iloc[:final_train_end].copy()
-    y_final_train = y.iloc[:final_train_end].copy()
-    final_sample_context = merged_df.iloc[:final_train_end].copy()
-    models, X_final_train, _, sample_weight_summary, direction_quality_summary = train_direction_quality_bundle(
-        X_final_train,
-        y_final_train,
-        sample_context=final_sample_context,
+    final_start = incremental_plan["final_slice"]["start"] if incremental else 0
+    X_final_train = X.iloc[final_start:final_train_end].copy()
+    y_final_train = y.iloc[final_start:final_train_end].copy()
+    final_sample_context = merged_df.iloc[final_start:final_train_end].copy()
+    final_inputs = {
+        "labels": pipeline.output_hash("labels"),
+        "feature_cols": feature_cols,
+        "final_train_end": final_train_end,
+        "config": training_config,
+    }
+    if incremental:
+        final_inputs["warm_start"] = {
+            "parent": incremental_plan["parent"],
+            "slice": incremental_plan["final_slice"],
+        }
+    final_bundle = pipeline.run(
+        "final_bundle",
+        lambda: _train_bundle_payload(
+            X_final_train,
+            y_final_train,
+            final_sample_context,
+            warm_start=incremental_plan.get("final_source"),
+        ),
+        inputs=final_inputs,
     )
+    models = final_bundle["models"]
+    sample_weight_summary = final_bundle["sample_weight_summary"]
+    direction_quality_summary = final_bundle["direction_quality_summary"]
+
+    def _write_artifacts():
+        lgb_model = models["lgb_v1"]
+        joblib.dump(lgb_model, lgb_path)
+        log_info(f"✅ LGB 模型已保存至: {lgb_path}")
+
+        xgb_model = models["xgb_v1"]
+        joblib.dump(xgb_model, xgb_path)
+        log_info(f"✅ XGB 模型已保存至: {xgb_path}")
+
+        rf_model = models["rf_v1"]
+        joblib.dump(rf_model, rf_path)
+        log_info(f"✅ RF 模型已保存至: {rf_path}")
+
+        joblib.dump(feature_cols, feature_path)
+        log_info(f"✅ 特征列已保存至: {feature_path}")
+
+        if compact_artifacts_enabled():
+            try:
+                export_compact_bundle(
+                    {name: models[name] for name in config.MODEL_PATHS},
+                    feature_cols,
+                    default_model_paths(),
+                    feature_path,
+                )
+            except Exception as exc:
+                log_info(f"⚠ 紧凑模型产物导出失败，推理入口首次启动时会重新导出: {exc}")
+
+        write_incremental_state(
+            incremental_state_path,
+            evaluation_models=eval_models,
+            evaluation_train_end=X.index[train_end - 1].isoformat(),
+            lineage_fingerprint=lineage_key,
+        )
+        log_info(f"✅ 增量重训状态已保存至: {incremental_state_path}")
 
-    lgb_model = models["lgb_v1"]
-    joblib.dump(lgb_model, lgb_path)
-    log_info(f"✅ LGB 模型已保存至: {lgb_path}")
-
-    xgb_model = models["xgb_v1"]
-    joblib.dump(xgb_model, xgb_path)
-    log_info(f"✅ XGB 模型已保存至: {xgb_path}")
-
-    rf_model = models["rf_v1"]
-    joblib.dump(rf_model, rf_path)
-    log_info(f"✅ RF 模型已保存至: {rf_path}")
-
-    joblib.dump(feature_cols, feature_path)
-    log_info(f"✅ 特征列已保存至: {feature_path}")
+    pipeline.run("write_artifacts", _write_artifacts, cacheable=False)
 
     metadata = build_training_metadata(
         X=X,
@@ -2744,9 +3061,9 @@ def train():
         validation_end=validation_end,
         oos_start=oos_start,
         original_train_rows=original_train_rows,
-        balanced_train_rows=len(X_final_train),
+        balanced_train_rows=final_bundle["balanced_train_rows"],
         validation_metrics=validation_metrics,
-        artifact_paths=[lgb_path, xgb_path, rf_path, feature_path],
+        artifact_paths=[lgb_path, xgb_path, rf_path, feature_path, incremental_state_path],
         label_filter_summary=label_filter_summary,
         label_quality_summary=label_quality_summary,
         sample_weight_summary=sample_weight_summary,
@@ -2758,6 +3075,12 @@ def train():
         direction_quality_summary=direction_quality_summary,
         validation_gate_summary=validation_gate_summary,
         final_train_end=final_train_end,
+        lineage=lineage_summary(
+            incremental_plan,
+            evaluation_warm_start=evaluation_direction_quality_summary.get("warm_start"),
+            final_warm_start=direction_quality_summary.get("warm_start"),
+        ),
+        feature_pruning_summary=feature_pruning_summary,
     )
     write_json_atomic(training_metadata_path, metadata)
     remove_candidate_training_metadata()
@@ -2768,6 +3091,20 @@ def train():
         f"final_train={metadata['final_train_rows']} "
         f"oos={metadata['oos_rows']} oos_start={metadata['oos_start']}"
     )
+    log_info(
+        "模型谱系: "
+        f"mode={metadata['lineage']['mode']} generation={metadata['lineage']['generation']} "
+        f"increments_since_full={metadata['lineage']['increments_since_full_rebuild']} "
+        f"full_rebuild_at={metadata['lineage']['full_rebuild_created_at']}"
+    )
 
 if __name__ == '__main__':
-    train()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train model artifacts")
+    parser.add_argument(
+        "--full-rebuild",
+        action="store_true",
+        help="Ignore the previous generation and rebuild all models from scratch",
+    )
+    train(full_rebuild=parser.parse_args().full_rebuild)
@@ -0,0 +1,360 @@
+import json
+import os
+import threading
+
+import joblib
+import lightgbm as lgb
+import pandas as pd
+import xgboost as xgb
+from sklearn.ensemble import RandomForestClassifier
+
+from config import config
+from train.parallel_fit import FitJob
+from train.pipeline import PIPELINE_CODE_PATHS, code_fingerprint, fingerprint_value
+from utils.utils import log_info
+
+
+INCREMENTAL_STATE_VERSION = 1
+
+# 只调整增量步长/重建周期时不必推倒重来，这些配置不进入谱系指纹。
+LINEAGE_IGNORED_CONFIG_PREFIXES = ("MODEL_TRAIN_INCREMENTAL",)
+
+
+def incremental_enabled():
+    return bool(getattr(config, "MODEL_TRAIN_INCREMENTAL", False))
+
+
+def incremental_extra_trees():
+    return max(1, int(getattr(config, "MODEL_TRAIN_INCREMENTAL_EXTRA_TREES", 30)))
+
+
+def incremental_max_trees():
+    return max(1, int(getattr(config, "MODEL_TRAIN_INCREMENTAL_MAX_TREES", 400)))
+
+
+def incremental_full_rebuild_every():
+    return max(1, int(getattr(config, "MODEL_TRAIN_INCREMENTAL_FULL_REBUILD_EVERY", 7)))
+
+
+def incremental_rf_replace_ratio():
+    ratio = float(getattr(config, "MODEL_TRAIN_INCREMENTAL_RF_REPLACE_RATIO", 0.2))
+    return min(1.0, max(0.0, ratio))
+
+
+def incremental_min_rows():
+    return max(1, int(getattr(config, "MODEL_TRAIN_INCREMENTAL_MIN_ROWS", 2000)))
+
+
+def lineage_fingerprint(training_config):
+    """标签/模型配置与训练源码的指纹；与上一代不一致时必须全量重建。"""
+    relevant = {
+        name: value
+        for name, value in dict(training_config or {}).items()
+        if not name.removeprefix("env:").startswith(LINEAGE_IGNORED_CONFIG_PREFIXES)
+    }
+    return fingerprint_value({
+        "config": relevant,
+        "code": code_fingerprint(PIPELINE_CODE_PATHS),
+    })
+
+
+def model_tree_count(model):
+    if isinstance(model, lgb.LGBMModel):
+        return int(model.booster_.num_trees())
+    if isinstance(model, xgb.XGBModel):
+        return int(model.get_booster().num_boosted_rounds())
+    estimators = getattr(model, "estimators_", None)
+    if estimators is not None:
+        return int(len(estimators))
+    return None
+
+
+def _global_estimator(model):
+    return getattr(model, "global_model", model)
+
+
+def _max_global_trees(models):
+    counts = [model_tree_count(_global_estimator(model)) for model in dict(models or {}).values()]
+    counts = [count for count in counts if count is not None]
+    return max(counts) if counts else 0
+
+
+class WarmStartSource:
+    """上一代已拟合的模型组（DirectionQualityModel 字典），作为本次增量拟合的起点。
+
+    LightGBM / XGBoost 在上一代 booster 上继续提升 extra_trees 棵树；
+    RandomForest 用新切片训练的少量树替换最旧的同等数量的树，总树数不变。
+    """
+
+    def __init__(self, parent_models, *, extra_trees=None, rf_replace_ratio=None, seed_offset=0):
+        self.parent_models = dict(parent_models or {})
+        self.extra_trees = incremental_extra_trees() if extra_trees is None else max(1, int(extra_trees))
+        self.rf_replace_ratio = incremental_rf_replace_ratio() if rf_replace_ratio is None else float(rf_replace_ratio)
+        self.seed_offset = int(seed_offset)
+        self.records = []
+        self._lock = threading.Lock()
+
+    def parent_estimator(self, bundle, name):
+        model = self.parent_models.get(name)
+        if model is None:
+            return None
+        if bundle == "global":
+            return _global_estimator(model)
+        direction = str(bundle).split("_", 1)[0]
+        return dict(getattr(model, "direction_models", {}) or {}).get(direction)
+
+    def has_direction(self, direction):
+        return bool(self.parent_models) and all(
+            self.parent_estimator(direction, name) is not None for name in self.parent_models
+        )
+
+    def fit_job(self, bundle, name, model, X, y, sample_weight=None):
+        parent = self.parent_estimator(bundle, name)
+        if parent is None:
+            return FitJob(bundle, name, model, X, y, sample_weight)
+
+        parent_trees = model_tree_count(parent)
+        if isinstance(parent, lgb.LGBMModel):
+            model.set_params(n_estimators=self.extra_trees)
+            fit_params = {"init_model": parent.booster_}
+            finalize = self._boosted_finalizer(bundle, name, parent_trees)
+        elif isinstance(parent, xgb.XGBModel):
+            model.set_params(n_estimators=self.extra_trees)
+            fit_params = {"xgb_model": parent.get_booster()}
+            finalize = self._boosted_finalizer(bundle, name, parent_trees)
+        elif isinstance(parent, RandomForestClassifier):
+            replaced = int(round(parent_trees * self.rf_replace_ratio))
+            replaced = min(parent_trees, max(1, replaced))
+            random_state = parent.random_state if isinstance(parent.random_state, int) else 0
+            model.set_params(n_estimators=replaced, random_state=random_state + self.seed_offset)
+            fit_params = {}
+            finalize = self._forest_finalizer(bundle, name, parent, replaced)
+        else:
+            return FitJob(bundle, name, model, X, y, sample_weight)
+        return FitJob(bundle, name, model, X, y, sample_weight, fit_params=fit_params, finalize=finalize)
+
+    def _record(self, **item):
+        with self._lock:
+            self.records.append(item)
+
+    def _boosted_finalizer(self, bundle, name, parent_trees):
+        def finalize(model):
+            total_trees = model_tree_count(model)
+            # 续训后的 booster 包含上一代全部树，n_estimators 同步为总树数，便于下一代判断树预算。
+            model.set_params(n_estimators=total_trees)
+            self._record(
+                bundle=bundle,
+                model=name,
+                method="continue_boosting",
+                parent_trees=parent_trees,
+                added_trees=int(total_trees - parent_trees),
+                total_trees=total_trees,
+            )
+
+        return finalize
+
+    def _forest_finalizer(self, bundle, name, parent, replaced):
+        def finalize(model):
+            if list(model.classes_) != list(parent.classes_) or model.n_features_in_ != parent.n_features_in_:
+                raise ValueError(
+                    f"RandomForest 增量替换失败: bundle={bundle} model={name} 新旧模型类别或特征数不一致"
+                )
+            model.estimators_ = list(parent.estimators_[replaced:]) + list(model.estimators_)
+            model.n_estimators = len(model.estimators_)
+            self._record(
+                bundle=bundle,
+                model=name,
+                method="replace_oldest_trees",
+                parent_trees=int(len(parent.estimators_)),
+                added_trees=int(replaced),
+                total_trees=int(model.n_estimators),
+            )
+
+        return finalize
+
+    def carry_forward(self, direction, direction_models_by_name, calibrators_by_name, regime_calibrators_by_name):
+        """新切片不足以重训某方向时，沿用上一代该方向的子模型与校准器。"""
+        for name, parent in self.parent_models.items():
+            direction_model = dict(getattr(parent, "direction_models", {}) or {}).get(direction)
+            if direction_model is None:
+                continue
+            direction_models_by_name.setdefault(name, {})[direction] = direction_model
+            calibrator = dict(getattr(parent, "direction_calibrators", {}) or {}).get(direction)
+            if calibrator is not None:
+                calibrators_by_name.setdefault(name, {})[direction] = calibrator
+            by_regime = dict(getattr(parent, "direction_regime_calibrators", {}) or {}).get(direction)
+            if by_regime:
+                regime_calibrators_by_name.setdefault(name, {})[direction] = dict(by_regime)
+
+    def summary(self):
+        with self._lock:
+            records = sorted(self.records, key=lambda item: (str(item["bundle"]), str(item["model"])))
+        return {
+            "extra_trees": int(self.extra_trees),
+            "rf_replace_ratio": float(self.rf_replace_ratio),
+            "fits": records,
+        }
+
+
+def read_incremental_state(path):
+    if not os.path.exists(path):
+        return None
+    payload = joblib.load(path)
+    if not isinstance(payload, dict):
+        return None
+    return payload
+
+
+def write_incremental_state(path, *, evaluation_models, evaluation_train_end, lineage_fingerprint):
+    """保存门禁评估模型组：下一次增量重训在它上面续训，再用新的验证集跑门禁。"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    joblib.dump({
+        "version": INCREMENTAL_STATE_VERSION,
+        "evaluation_models": dict(evaluation_models),
+        "evaluation_train_end": str(evaluation_train_end),
+        "lineage_fingerprint": lineage_fingerprint,
+    }, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_incremental_parent(*, metadata_path, state_path, model_paths):
+    """读取上一代的训练元数据、评估模型状态与线上模型；缺失或损坏时返回 (None, 原因)。"""
+    if not os.path.exists(metadata_path):
+        return None, "parent_metadata_missing"
+    try:
+        with open(metadata_path, "r", encoding="utf-8") as file:
+            metadata = json.load(file)
+        state = read_incremental_state(state_path)
+        if state is None:
+            return None, "parent_state_missing"
+        models = {name: joblib.load(path) for name, path in dict(model_paths).items()}
+    except Exception as exc:
+        return None, f"parent_load_failed: {exc}"
+    return {"metadata": metadata, "state": state, "models": models}, None
+
+
+def _timestamp_for_index(value, index):
+    ts = pd.Timestamp(value)
+    tz = getattr(index, "tz", None)
+    if tz is not None and ts.tzinfo is None:
+        return ts.tz_localize(tz)
+    if tz is None and ts.tzinfo is not None:
+        return ts.tz_convert(None)
+    return ts
+
+
+def _incremental_slice(y, parent_end, end, min_rows):
+    new_start = int(y.index.searchsorted(_timestamp_for_index(parent_end, y.index), side="right"))
+    if new_start >= end:
+        return None, "no_new_rows"
+    start = max(0, min(new_start, end - min_rows))
+    if y.iloc[start:end].astype(int).nunique() < 2:
+        return None, "slice_single_class"
+    return {
+        "start": start,
+        "new_start": new_start,
+        "end": int(end),
+        "rows": int(end - start),
+        "new_rows": int(end - new_start),
+        "start_time": y.index[start].isoformat(),
+        "new_start_time": y.index[new_start].isoformat(),
+        "end_time": y.index[end - 1].isoformat(),
+    }, None
+
+
+def plan_incremental_run(y, *, train_end, final_train_end, feature_columns_sha256, lineage_key, parent, parent_reason=None, full_rebuild=False):
+    """决定本次重训是增量续训还是全量重建，并给出两条谱系（门禁评估 / 线上模型）各自的训练切片。"""
+    def full(reason):
+        return {
+            "mode": "full",
+            "requested_mode": "incremental" if incremental_enabled() else "full",
+            "fallback_reason": reason,
+            "lineage_fingerprint": lineage_key,
+        }
+
+    if not incremental_enabled():
+        return full("disabled")
+    if full_rebuild:
+        return full("full_rebuild_requested")
+    if parent is None:
+        return full(parent_reason or "parent_missing")
+
+    metadata = parent["metadata"]
+    state = parent["state"]
+    parent_lineage = dict(metadata.get("lineage") or {})
+    if state.get("version") != INCREMENTAL_STATE_VERSION:
+        return full("parent_state_version_mismatch")
+    if parent_lineage.get("lineage_fingerprint") != lineage_key or state.get("lineage_fingerprint") != lineage_key:
+        return full("config_or_code_changed")
+    if metadata.get("feature_columns_sha256") != feature_columns_sha256:
+        return full("feature_columns_changed")
+
+    increments = int(parent_lineage.get("increments_since_full_rebuild", 0) or 0) + 1
+    if increments >= incremental_full_rebuild_every():
+        return full("full_rebuild_due")
+    extra_trees = incremental_extra_trees()
+    parent_trees = max(_max_global_trees(parent["models"]), _max_global_trees(state.get("evaluation_models")))
+    if parent_trees + extra_trees > incremental_max_trees():
+        return full("tree_budget_exhausted")
+
+    min_rows = incremental_min_rows()
+    evaluation_slice, reason = _incremental_slice(y, state.get("evaluation_train_end"), train_end, min_rows)
+    if evaluation_slice is None:
+        return full(f"evaluation_{reason}")
+    final_slice, reason = _incremental_slice(y, metadata.get("final_train_end"), final_train_end, min_rows)
+    if final_slice is None:
+        return full(f"final_{reason}")
+
+    generation = int(parent_lineage.get("generation", 0) or 0) + 1
+    return {
+        "mode": "incremental",
+        "requested_mode": "incremental",
+        "fallback_reason": None,
+        "lineage_fingerprint": lineage_key,
+        "generation": generation,
+        "increments_since_full_rebuild": increments,
+        "full_rebuild_created_at": parent_lineage.get("full_rebuild_created_at"),
+        "parent": {
+            "created_at": metadata.get("created_at"),
+            "artifact_hashes": dict(metadata.get("artifact_hashes") or {}),
+            "final_train_end": metadata.get("final_train_end"),
+            "evaluation_train_end": state.get("evaluation_train_end"),
+            "generation": int(parent_lineage.get("generation", 0) or 0),
+        },
+        "evaluation_slice": evaluation_slice,
+        "final_slice": final_slice,
+        "evaluation_source": WarmStartSource(state["evaluation_models"], seed_offset=generation),
+        "final_source": WarmStartSource(parent["models"], seed_offset=generation),
+    }
+
+
+def lineage_summary(plan, *, evaluation_warm_start=None, final_warm_start=None):
+    """写入 training_metadata.json 的谱系信息（不含模型对象）。"""
+    summary = {
+        key: value
+        for key, value in plan.items()
+        if key not in {"evaluation_source", "final_source"}
+    }
+    if plan.get("mode") == "full":
+        summary.update({"generation": 0, "increments_since_full_rebuild": 0, "full_rebuild_created_at": None})
+    else:
+        summary["warm_start"] = {
+            "evaluation": evaluation_warm_start or {},
+            "final": final_warm_start or {},
+        }
+    return summary
+
+
+def log_incremental_plan(plan):
+    if plan["mode"] == "incremental":
+        log_info(
+            "增量重训: "
+            f"generation={plan['generation']} "
+            f"increments_since_full={plan['increments_since_full_rebuild']} "
+            f"eval_rows={plan['evaluation_slice']['rows']} (new={plan['evaluation_slice']['new_rows']}) "
+            f"final_rows={plan['final_slice']['rows']} (new={plan['final_slice']['new_rows']}) "
+            f"extra_trees={incremental_extra_trees()}"
+        )
+    else:
+        log_info(f"全量重训: reason={plan['fallback_reason']}")
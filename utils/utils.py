@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import os
 from datetime import datetime, timedelta, timezone
@@ -27,6 +28,14 @@ except Exception:
     DISPLAY_TIMEZONE = timezone(timedelta(hours=8))
 
 
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
 class DisplayTimezoneFormatter(logging.Formatter):
     """Force log timestamps to render in Asia/Shanghai for operator clarity."""
 